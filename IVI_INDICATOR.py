@@ -83,29 +83,124 @@ class IVIIndicator:
         except:
             return None
 
+    @staticmethod
+    def _rolling_mean(values, period):
+        """
+        Media móvil de `period` valores terminando en cada índice (último eje)
+        mediante sumas acumuladas; los índices con menos de `period` valores
+        previos quedan en NaN
+        """
+        cumsum = np.cumsum(values, axis=-1)
+        cumsum = np.concatenate([np.zeros(values.shape[:-1] + (1,)), cumsum], axis=-1)
+        means = np.full(values.shape, np.nan)
+        means[..., period - 1:] = (cumsum[..., period:] - cumsum[..., :-period]) / period
+        return means
+
+    def _atr(self, high, low, close, period):
+        """ATR vectorizado sobre el último eje (arrays 1D o símbolos x barras)"""
+        n = high.shape[-1]
+        if n < period + 1:
+            return np.zeros(high.shape)
+
+        prev_close = np.roll(close, 1, axis=-1)
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+        # ATR usando media móvil simple (0 en las primeras `period` barras)
+        atr = self._rolling_mean(true_range, period)
+        atr[..., :period] = 0
+        return atr
+
+    def _candle_strength(self, open_price, high, low, close):
+        atr = self._atr(high, low, close, self.config['atr_period'])
+
+        # 1. Tamaño del cuerpo vs rango total
+        total_range = high - low
+        valid = (atr != 0) & (total_range != 0)
+        valid[..., 0] = False
+        safe_range = np.where(valid, total_range, 1.0)
+        body_ratio = np.abs(close - open_price) / safe_range
+
+        # 2. Comparación con ATR
+        atr_ratio = np.where(atr > 0, total_range / np.where(atr > 0, atr, 1.0), 0)
+
+        # 3. Tipo de vela
+        upper_wick = high - np.maximum(open_price, close)
+        lower_wick = np.minimum(open_price, close) - low
+        wick_ratio = np.where(total_range > 0, (upper_wick + lower_wick) / safe_range, 0)
+
+        # 4. Score de la vela: cuerpo (0-40) + ATR (0-30) + estructura (0-30)
+        score = (
+            np.select([body_ratio >= 0.8, body_ratio >= 0.6, body_ratio >= 0.4], [40, 30, 20], 10)
+            + np.select([atr_ratio >= 3.0, atr_ratio >= 2.0, atr_ratio >= 1.5], [30, 20, 10], 0)
+            + np.select([wick_ratio <= 0.2, wick_ratio <= 0.4, wick_ratio <= 0.6], [30, 20, 10], 0)
+        )
+        return np.where(valid, np.minimum(100, score), 0).astype(float)
+
+    def _volume_factor(self, volumes):
+        period = self.config['volume_period']
+        volumes = volumes.astype(float)
+
+        # Promedio de las `period` barras anteriores (sin incluir la actual)
+        avg_volume = np.full(volumes.shape, np.nan)
+        avg_volume[..., period:] = self._rolling_mean(volumes, period)[..., period - 1:-1]
+        valid = np.isfinite(avg_volume) & (avg_volume != 0)
+        volume_ratio = volumes / np.where(valid, avg_volume, 1.0)
+
+        # Convertir ratio a score 0-100
+        score = np.select(
+            [volume_ratio >= 3.0, volume_ratio >= 2.0, volume_ratio >= 1.5, volume_ratio >= 1.2, volume_ratio >= 1.0],
+            [100, 80, 60, 40, 20],
+            10
+        )
+        return np.where(valid, score, 0).astype(float)
+
+    def _velocities(self, close):
+        """% de cambio respecto a `velocity_period` barras atrás (0 antes)"""
+        period = self.config['velocity_period']
+        velocities = np.zeros(close.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            velocities[..., period:] = (close[..., period:] - close[..., :-period]) / close[..., :-period] * 100
+        return velocities
+
+    def _velocity_factor(self, close, velocities=None):
+        period = self.config['velocity_period']
+        if velocities is None:
+            velocities = self._velocities(close)
+
+        # Convertir velocidad a score 0-100
+        abs_velocity = np.abs(velocities)
+        with np.errstate(invalid='ignore'):
+            score = np.select(
+                [abs_velocity >= 2.0, abs_velocity >= 1.0, abs_velocity >= 0.5, abs_velocity >= 0.2, abs_velocity >= 0.1],
+                [100, 80, 60, 40, 20],
+                10
+            ).astype(float)
+        score[..., :period] = 0
+        return score
+
+    def _acceleration_factor(self, close, velocities=None):
+        vel_period = self.config['velocity_period']
+        acc_period = self.config['acceleration_period']
+        if velocities is None:
+            velocities = self._velocities(close)
+
+        acceleration = np.zeros(close.shape)
+        acceleration[..., acc_period:] = np.abs(velocities[..., acc_period:] - velocities[..., :-acc_period])
+
+        # Convertir aceleración a score 0-100
+        with np.errstate(invalid='ignore'):
+            score = np.select(
+                [acceleration >= 1.0, acceleration >= 0.5, acceleration >= 0.2, acceleration >= 0.1, acceleration >= 0.05],
+                [100, 80, 60, 40, 20],
+                10
+            ).astype(float)
+        score[..., :vel_period + acc_period] = 0
+        return score
+
     def calculate_atr(self, rates, period=14):
         """Calcular ATR (Average True Range)"""
         try:
-            if len(rates) < period + 1:
-                return np.zeros(len(rates))
-
-            high = rates['high']
-            low = rates['low']
-            close = rates['close']
-
-            # True Range
-            tr1 = high - low
-            tr2 = np.abs(high - np.roll(close, 1))
-            tr3 = np.abs(low - np.roll(close, 1))
-
-            true_range = np.maximum(tr1, np.maximum(tr2, tr3))
-
-            # ATR usando media móvil simple
-            atr = np.zeros(len(rates))
-            for i in range(period, len(rates)):
-                atr[i] = np.mean(true_range[i-period+1:i+1])
-
-            return atr
+            return self._atr(rates['high'], rates['low'], rates['close'], period)
         except:
             return np.zeros(len(rates))
 
@@ -115,67 +210,7 @@ class IVIIndicator:
         Basado en: cuerpo, mechas, ATR, tipo de patrón
         """
         try:
-            candle_scores = np.zeros(len(rates))
-            atr = self.calculate_atr(rates, self.config['atr_period'])
-
-            for i in range(1, len(rates)):
-                if atr[i] == 0:
-                    continue
-
-                candle = rates[i]
-                open_price = candle['open']
-                high_price = candle['high']
-                low_price = candle['low']
-                close_price = candle['close']
-
-                # 1. Tamaño del cuerpo vs rango total
-                total_range = high_price - low_price
-                if total_range == 0:
-                    continue
-
-                body_size = abs(close_price - open_price)
-                body_ratio = body_size / total_range
-
-                # 2. Comparación con ATR
-                atr_ratio = total_range / atr[i] if atr[i] > 0 else 0
-
-                # 3. Tipo de vela
-                upper_wick = high_price - max(open_price, close_price)
-                lower_wick = min(open_price, close_price) - low_price
-                wick_ratio = (upper_wick + lower_wick) / total_range if total_range > 0 else 0
-
-                # 4. Calcular score de la vela (0-100)
-                score = 0
-
-                # Score por cuerpo (0-40 puntos)
-                if body_ratio >= 0.8:      # Marubozu
-                    score += 40
-                elif body_ratio >= 0.6:    # Cuerpo fuerte
-                    score += 30
-                elif body_ratio >= 0.4:    # Cuerpo moderado
-                    score += 20
-                else:                      # Cuerpo débil
-                    score += 10
-
-                # Score por ATR (0-30 puntos)
-                if atr_ratio >= 3.0:       # Extremo
-                    score += 30
-                elif atr_ratio >= 2.0:     # Fuerte
-                    score += 20
-                elif atr_ratio >= 1.5:     # Moderado
-                    score += 10
-
-                # Score por estructura (0-30 puntos)
-                if wick_ratio <= 0.2:      # Pocas mechas (institucional)
-                    score += 30
-                elif wick_ratio <= 0.4:    # Mechas moderadas
-                    score += 20
-                elif wick_ratio <= 0.6:    # Mechas normales
-                    score += 10
-
-                candle_scores[i] = min(100, score)
-
-            return candle_scores
+            return self._candle_strength(rates['open'], rates['high'], rates['low'], rates['close'])
         except:
             return np.zeros(len(rates))
 
@@ -185,37 +220,7 @@ class IVIIndicator:
         Compara volumen actual vs promedio
         """
         try:
-            volume_scores = np.zeros(len(rates))
-            period = self.config['volume_period']
-
-            volumes = rates['tick_volume']
-
-            for i in range(period, len(rates)):
-                current_volume = volumes[i]
-                avg_volume = np.mean(volumes[i-period:i])
-
-                if avg_volume == 0:
-                    continue
-
-                volume_ratio = current_volume / avg_volume
-
-                # Convertir ratio a score 0-100
-                if volume_ratio >= 3.0:       # Volumen extremo
-                    score = 100
-                elif volume_ratio >= 2.0:     # Volumen muy alto
-                    score = 80
-                elif volume_ratio >= 1.5:     # Volumen alto
-                    score = 60
-                elif volume_ratio >= 1.2:     # Volumen moderado
-                    score = 40
-                elif volume_ratio >= 1.0:     # Volumen normal
-                    score = 20
-                else:                          # Volumen bajo
-                    score = 10
-
-                volume_scores[i] = score
-
-            return volume_scores
+            return self._volume_factor(rates['tick_volume'])
         except:
             return np.zeros(len(rates))
 
@@ -225,38 +230,7 @@ class IVIIndicator:
         Velocidad = cambio de precio / tiempo
         """
         try:
-            velocity_scores = np.zeros(len(rates))
-            period = self.config['velocity_period']
-
-            close_prices = rates['close']
-
-            for i in range(period, len(rates)):
-                if i < period:
-                    continue
-
-                # Calcular velocidad como % cambio por período
-                price_change = close_prices[i] - close_prices[i-period]
-                velocity_pct = (price_change / close_prices[i-period]) * 100
-
-                # Convertir velocidad a score 0-100
-                abs_velocity = abs(velocity_pct)
-
-                if abs_velocity >= 2.0:       # Velocidad extrema (2%+)
-                    score = 100
-                elif abs_velocity >= 1.0:     # Velocidad muy alta (1%+)
-                    score = 80
-                elif abs_velocity >= 0.5:     # Velocidad alta (0.5%+)
-                    score = 60
-                elif abs_velocity >= 0.2:     # Velocidad moderada (0.2%+)
-                    score = 40
-                elif abs_velocity >= 0.1:     # Velocidad normal (0.1%+)
-                    score = 20
-                else:                          # Velocidad baja
-                    score = 10
-
-                velocity_scores[i] = score
-
-            return velocity_scores
+            return self._velocity_factor(rates['close'])
         except:
             return np.zeros(len(rates))
 
@@ -266,43 +240,31 @@ class IVIIndicator:
         Aceleración = cambio en la velocidad
         """
         try:
-            acceleration_scores = np.zeros(len(rates))
-            vel_period = self.config['velocity_period']
-            acc_period = self.config['acceleration_period']
-
-            close_prices = rates['close']
-
-            # Primero calcular velocidades
-            velocities = np.zeros(len(rates))
-            for i in range(vel_period, len(rates)):
-                price_change = close_prices[i] - close_prices[i-vel_period]
-                velocities[i] = (price_change / close_prices[i-vel_period]) * 100
-
-            # Luego calcular aceleraciones
-            for i in range(vel_period + acc_period, len(rates)):
-                velocity_change = velocities[i] - velocities[i-acc_period]
-                acceleration = abs(velocity_change)
-
-                # Convertir aceleración a score 0-100
-                if acceleration >= 1.0:       # Aceleración extrema
-                    score = 100
-                elif acceleration >= 0.5:     # Aceleración alta
-                    score = 80
-                elif acceleration >= 0.2:     # Aceleración moderada
-                    score = 60
-                elif acceleration >= 0.1:     # Aceleración normal
-                    score = 40
-                elif acceleration >= 0.05:    # Aceleración baja
-                    score = 20
-                else:                          # Sin aceleración
-                    score = 10
-
-                acceleration_scores[i] = score
-
-            return acceleration_scores
+            return self._acceleration_factor(rates['close'])
         except:
             return np.zeros(len(rates))
 
+    def _ivi_components(self, open_price, high, low, close, volumes):
+        """
+        Componentes e IVI sobre el último eje
+
+        Acepta arrays 1D de un símbolo o matrices símbolos x barras.
+        """
+        velocities = self._velocities(close)
+        candle_strength = self._candle_strength(open_price, high, low, close)
+        volume_factor = self._volume_factor(volumes)
+        velocity_factor = self._velocity_factor(close, velocities)
+        acceleration_factor = self._acceleration_factor(close, velocities)
+
+        # Calcular IVI usando pesos configurados
+        ivi_values = (
+            candle_strength * self.config['weight_candle'] +
+            volume_factor * self.config['weight_volume'] +
+            velocity_factor * self.config['weight_velocity'] +
+            acceleration_factor * self.config['weight_acceleration']
+        )
+        return ivi_values, candle_strength, volume_factor, velocity_factor, acceleration_factor
+
     def calculate_ivi(self, symbol, timeframe=mt5.TIMEFRAME_M1, count=100):
         """
         Calcular IVI - Institutional Velocity Index
@@ -314,65 +276,104 @@ class IVIIndicator:
             if rates is None:
                 return None, "Error obteniendo datos de mercado"
 
-            # Calcular componentes
-            candle_strength = self.calculate_candle_strength(rates)
-            volume_factor = self.calculate_volume_factor(rates)
-            velocity_factor = self.calculate_velocity_factor(rates)
-            acceleration_factor = self.calculate_acceleration_factor(rates)
-
-            # Calcular IVI usando pesos configurados
-            ivi_values = (
-                candle_strength * self.config['weight_candle'] +
-                volume_factor * self.config['weight_volume'] +
-                velocity_factor * self.config['weight_velocity'] +
-                acceleration_factor * self.config['weight_acceleration']
+            ivi_values, *components = self._ivi_components(
+                rates['open'], rates['high'], rates['low'], rates['close'], rates['tick_volume']
             )
-
-            # Preparar resultado detallado
-            latest_idx = len(rates) - 1
-            current_ivi = ivi_values[latest_idx]
-
-            # Clasificar señal
-            if current_ivi >= self.config['threshold_extreme']:
-                signal_strength = "EXTREMO"
-                signal_action = "ENTRADA INMEDIATA"
-            elif current_ivi >= self.config['threshold_strong']:
-                signal_strength = "FUERTE"
-                signal_action = "PREPARAR ENTRADA"
-            elif current_ivi >= self.config['threshold_moderate']:
-                signal_strength = "MODERADO"
-                signal_action = "VIGILAR"
-            else:
-                signal_strength = "NORMAL"
-                signal_action = "SIN SEÑAL"
-
-            # Determinar dirección
-            current_candle = rates[latest_idx]
-            direction = "ALCISTA" if current_candle['close'] > current_candle['open'] else "BAJISTA"
-
-            result = {
-                'symbol': symbol,
-                'timeframe': timeframe,
-                'timestamp': datetime.now(),
-                'ivi_value': current_ivi,
-                'signal_strength': signal_strength,
-                'signal_action': signal_action,
-                'direction': direction,
-                'components': {
-                    'candle_strength': candle_strength[latest_idx],
-                    'volume_factor': volume_factor[latest_idx],
-                    'velocity_factor': velocity_factor[latest_idx],
-                    'acceleration_factor': acceleration_factor[latest_idx]
-                },
-                'ivi_history': ivi_values,
-                'recommendation': self.get_trading_recommendation(current_ivi, direction, signal_strength)
-            }
+            result = self._build_result(symbol, timeframe, rates, ivi_values, components)
 
             return result, None
 
         except Exception as e:
             return None, f"Error calculando IVI: {str(e)}"
 
+    def calculate_ivi_many(self, symbols, timeframe=mt5.TIMEFRAME_M1, count=100):
+        """
+        Calcular IVI de varios símbolos en una sola pasada
+
+        Los datos de cada símbolo se piden a MT5 y los componentes se
+        calculan vectorizados sobre la matriz símbolos x barras.
+
+        Returns:
+            Dict {símbolo: (resultado, error)} con el mismo formato que calculate_ivi
+        """
+        results = {}
+        loaded = []
+        for symbol in symbols:
+            rates = self.get_market_data(symbol, timeframe, count)
+            if rates is None:
+                results[symbol] = (None, "Error obteniendo datos de mercado")
+            else:
+                loaded.append((symbol, rates))
+
+        if not loaded:
+            return results
+
+        try:
+            # Todas las series tienen `count` barras (get_market_data descarta las cortas)
+            fields = {
+                name: np.vstack([rates[name][-count:] for _, rates in loaded]).astype(float)
+                for name in ('open', 'high', 'low', 'close', 'tick_volume')
+            }
+            ivi_values, *components = self._ivi_components(
+                fields['open'], fields['high'], fields['low'], fields['close'], fields['tick_volume']
+            )
+
+            for row, (symbol, rates) in enumerate(loaded):
+                results[symbol] = (
+                    self._build_result(symbol, timeframe, rates[-count:], ivi_values[row],
+                                       [component[row] for component in components]),
+                    None
+                )
+        except Exception as e:
+            for symbol, _ in loaded:
+                results[symbol] = (None, f"Error calculando IVI: {str(e)}")
+
+        return results
+
+    def _build_result(self, symbol, timeframe, rates, ivi_values, components):
+        """Clasificar el último valor IVI y armar el resultado"""
+        candle_strength, volume_factor, velocity_factor, acceleration_factor = components
+
+        # Preparar resultado detallado
+        latest_idx = len(rates) - 1
+        current_ivi = ivi_values[latest_idx]
+
+        # Clasificar señal
+        if current_ivi >= self.config['threshold_extreme']:
+            signal_strength = "EXTREMO"
+            signal_action = "ENTRADA INMEDIATA"
+        elif current_ivi >= self.config['threshold_strong']:
+            signal_strength = "FUERTE"
+            signal_action = "PREPARAR ENTRADA"
+        elif current_ivi >= self.config['threshold_moderate']:
+            signal_strength = "MODERADO"
+            signal_action = "VIGILAR"
+        else:
+            signal_strength = "NORMAL"
+            signal_action = "SIN SEÑAL"
+
+        # Determinar dirección
+        current_candle = rates[latest_idx]
+        direction = "ALCISTA" if current_candle['close'] > current_candle['open'] else "BAJISTA"
+
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'timestamp': datetime.now(),
+            'ivi_value': current_ivi,
+            'signal_strength': signal_strength,
+            'signal_action': signal_action,
+            'direction': direction,
+            'components': {
+                'candle_strength': candle_strength[latest_idx],
+                'volume_factor': volume_factor[latest_idx],
+                'velocity_factor': velocity_factor[latest_idx],
+                'acceleration_factor': acceleration_factor[latest_idx]
+            },
+            'ivi_history': ivi_values,
+            'recommendation': self.get_trading_recommendation(current_ivi, direction, signal_strength)
+        }
+
     def get_trading_recommendation(self, ivi_value, direction, strength):
         """Generar recomendación de trading basada en IVI"""
 
@@ -445,10 +446,12 @@ def main():
     print(f"\nAnalizando {len(symbols)} símbolos con IVI...")
     print()
 
+    results = ivi.calculate_ivi_many(symbols)
+
     for symbol in symbols:
         print(f"Analizando {symbol}...")
 
-        result, error = ivi.calculate_ivi(symbol)
+        result, error = results[symbol]
 
         if error:
             print(f"Error en {symbol}: {error}")
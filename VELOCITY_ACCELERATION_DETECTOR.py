@@ -11,13 +11,168 @@ import time
 import numpy as np
 import MetaTrader5 as mt5
 from datetime import datetime, timedelta
-from collections import deque
 import math
+from scipy.signal import lfilter
 
 # Configurar encoding
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
+class TickRingBuffer:
+    """
+    Historial de ticks de un símbolo con capacidad fija
+
+    Precios float64 y timestamps int64 (epoch ms) en arrays NumPy circulares.
+    La velocidad (%/min entre ticks consecutivos), su suavizado EWMA y la
+    aceleración (diferencia de la velocidad suavizada, también EWMA) se
+    actualizan de forma incremental al añadir ticks, uno a uno o por lotes.
+    Para clasificar se usan window_velocity/window_acceleration, que miden
+    sobre una ventana de tiempo fija y no dependen del espaciado de ticks.
+    """
+
+    def __init__(self, capacity=1000, alpha=0.2):
+        self.capacity = capacity
+        self.alpha = alpha
+
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.velocities = np.zeros(capacity, dtype=np.float64)  # Velocidad suavizada por tick
+        self.pos = 0      # Próxima posición de escritura
+        self.count = 0    # Ticks almacenados (<= capacity)
+        self.total = 0    # Ticks recibidos
+
+        self.last_price = None
+        self.last_time = None
+        self.last_delta_ms = None
+        self.velocity_raw = 0.0
+        self.velocity = 0.0        # EWMA de la velocidad
+        self.acceleration_raw = 0.0
+        self.acceleration = 0.0    # EWMA de la aceleración
+
+    def _raw_velocities(self, prices, times, prev_price, prev_time):
+        """Velocidad %/min de cada tick respecto al anterior (0 si Δt = 0)"""
+        prev_prices = np.concatenate(([prev_price], prices[:-1]))
+        delta_ms = times - np.concatenate(([prev_time], times[:-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            velocity = (prices - prev_prices) / prev_prices * 100 / (delta_ms / 1000) * 60
+        return np.where(delta_ms > 0, velocity, 0.0), delta_ms
+
+    def _ewma(self, values, initial):
+        """EWMA de values continuando desde initial"""
+        smoothed, _ = lfilter([self.alpha], [1, self.alpha - 1], values, zi=[(1 - self.alpha) * initial])
+        return smoothed
+
+    def extend(self, prices, times_ms):
+        """
+        Añadir un lote de ticks en orden cronológico
+
+        Args:
+            prices: Precios (float)
+            times_ms: Timestamps epoch en milisegundos
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        times_ms = np.asarray(times_ms, dtype=np.int64)
+        if len(prices) == 0:
+            return
+
+        if self.last_price is None:
+            # El primer tick no tiene velocidad
+            self.last_price, self.last_time = prices[0], times_ms[0]
+            self._write(prices[:1], times_ms[:1], np.zeros(1))
+            self.total += 1
+            prices, times_ms = prices[1:], times_ms[1:]
+            if len(prices) == 0:
+                return
+
+        raw, delta_ms = self._raw_velocities(prices, times_ms, self.last_price, self.last_time)
+        velocity = self._ewma(raw, self.velocity)
+        raw_acceleration = np.diff(np.concatenate(([self.velocity], velocity)))
+        acceleration = self._ewma(raw_acceleration, self.acceleration)
+
+        self._write(prices, times_ms, velocity)
+        self.total += len(prices)
+
+        self.last_price, self.last_time = prices[-1], times_ms[-1]
+        self.last_delta_ms = int(delta_ms[-1])
+        self.velocity_raw, self.velocity = float(raw[-1]), float(velocity[-1])
+        self.acceleration_raw, self.acceleration = float(raw_acceleration[-1]), float(acceleration[-1])
+
+    def append(self, price, time_ms):
+        """Añadir un tick (O(1))"""
+        if self.last_price is None:
+            self.extend([price], [time_ms])
+            return
+
+        delta_ms = time_ms - self.last_time
+        raw = (price - self.last_price) / self.last_price * 100 / (delta_ms / 1000) * 60 if delta_ms > 0 else 0.0
+        velocity = self.velocity + self.alpha * (raw - self.velocity)
+        raw_acceleration = velocity - self.velocity
+        self.acceleration += self.alpha * (raw_acceleration - self.acceleration)
+
+        self._write(np.array([price]), np.array([time_ms]), np.array([velocity]))
+        self.total += 1
+        self.last_price, self.last_time, self.last_delta_ms = price, time_ms, delta_ms
+        self.velocity_raw, self.velocity, self.acceleration_raw = raw, velocity, raw_acceleration
+
+    def _write(self, prices, times_ms, velocities):
+        n = len(prices)
+        if n >= self.capacity:
+            prices, times_ms, velocities = prices[-self.capacity:], times_ms[-self.capacity:], velocities[-self.capacity:]
+            n = self.capacity
+        idx = (self.pos + np.arange(n)) % self.capacity
+        self.prices[idx] = prices
+        self.times[idx] = times_ms
+        self.velocities[idx] = velocities
+        self.pos = (self.pos + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def _last(self, array, n):
+        n = min(n, self.count)
+        return array[(self.pos - n + np.arange(n)) % self.capacity]
+
+    def price_at(self, time_ms):
+        """(precio, tiempo) del último tick en o antes de time_ms (el más antiguo si no hay)"""
+        times = self._last(self.times, self.count)
+        i = max(int(np.searchsorted(times, time_ms, side='right')) - 1, 0)
+        return float(self._last(self.prices, self.count)[i]), int(times[i])
+
+    def window_velocity(self, window_ms, end_ms=None):
+        """
+        Velocidad %/min sobre una ventana de tiempo
+
+        Cambio entre el precio vigente al inicio de la ventana y el de
+        end_ms (por defecto el último tick), dividido por el tiempo
+        transcurrido. No depende del espaciado entre ticks.
+        """
+        if self.count < 2:
+            return 0.0
+        end_ms = self.last_time if end_ms is None else end_ms
+        end_price, _ = self.price_at(end_ms)
+        start_price, start_time = self.price_at(end_ms - window_ms)
+        if end_ms <= start_time or start_price <= 0:
+            return 0.0
+        return (end_price - start_price) / start_price * 100 / ((end_ms - start_time) / 60000)
+
+    def window_acceleration(self, window_ms):
+        """Aceleración %/min²: cambio de window_velocity respecto a una ventana antes"""
+        if self.count < 3:
+            return 0.0
+        current = self.window_velocity(window_ms)
+        previous = self.window_velocity(window_ms, self.last_time - window_ms)
+        return (current - previous) / (window_ms / 60000)
+
+    def last_prices(self, n):
+        """Últimos n precios en orden cronológico"""
+        return self._last(self.prices, n)
+
+    def last_velocities(self, n):
+        """Últimas n velocidades suavizadas en orden cronológico"""
+        return self._last(self.velocities, n)
+
+    def __len__(self):
+        return self.count
+
+
 class VelocityAccelerationDetector:
     """Detector de Velocidad y Aceleración del Precio"""
 
@@ -25,11 +180,6 @@ class VelocityAccelerationDetector:
         self.mt5_connected = False
         self.symbols = ['BTCUSDm', 'XAUUSDm', 'EURUSD', 'GBPUSD']
 
-        # Almacenamiento de datos históricos
-        self.price_history = {symbol: deque(maxlen=100) for symbol in self.symbols}
-        self.time_history = {symbol: deque(maxlen=100) for symbol in self.symbols}
-        self.velocity_history = {symbol: deque(maxlen=50) for symbol in self.symbols}
-
         # Configuración de detección
         self.detection_config = {
             'min_velocity_threshold': 0.001,  # 0.1% por minuto
@@ -37,8 +187,14 @@ class VelocityAccelerationDetector:
             'spike_velocity': 0.005,          # 0.5% por minuto = movimiento rápido
             'extreme_velocity': 0.01,         # 1% por minuto = movimiento extremo
             'time_window_seconds': 60,        # Ventana de análisis
+            'buffer_capacity': 1000,          # Ticks guardados por símbolo
+            'ewma_alpha': 0.2,                # Suavizado de velocidad/aceleración
+            'max_ticks_per_fetch': 5000,      # Límite de copy_ticks_from por ciclo
         }
 
+        # Historial de ticks por símbolo (memoria acotada)
+        self.buffers = {symbol: self._new_buffer() for symbol in self.symbols}
+
         self.connect_mt5()
         print("=" * 80)
         print("    VELOCITY & ACCELERATION DETECTOR")
@@ -66,6 +222,75 @@ class VelocityAccelerationDetector:
             print(f"[ERROR] Conectando MT5: {e}")
         return False
 
+    def _new_buffer(self):
+        return TickRingBuffer(self.detection_config['buffer_capacity'], self.detection_config['ewma_alpha'])
+
+    def add_symbol(self, symbol):
+        """Añadir un símbolo al monitoreo"""
+        if symbol not in self.buffers:
+            self.symbols.append(symbol)
+            self.buffers[symbol] = self._new_buffer()
+
+    def ingest_ticks(self, symbol, ticks):
+        """
+        Añadir un lote de ticks de copy_ticks_from al historial
+
+        Args:
+            symbol: Símbolo
+            ticks: Array estructurado de MT5 (campos time_msc, bid)
+
+        Returns:
+            Número de ticks nuevos añadidos
+        """
+        if ticks is None or len(ticks) == 0:
+            return 0
+
+        buffer = self.buffers.setdefault(symbol, self._new_buffer())
+        times_ms = ticks['time_msc'].astype(np.int64)
+        prices = ticks['bid'].astype(np.float64)
+
+        # Descartar ticks sin bid (solo last) y los ya procesados
+        mask = prices > 0
+        if buffer.last_time is not None:
+            mask &= times_ms > buffer.last_time
+        buffer.extend(prices[mask], times_ms[mask])
+        return int(mask.sum())
+
+    def update_symbol(self, symbol):
+        """
+        Traer de MT5 los ticks posteriores al último procesado
+
+        Returns:
+            Número de ticks nuevos
+        """
+        if not self.mt5_connected:
+            return 0
+
+        buffer = self.buffers.setdefault(symbol, self._new_buffer())
+        try:
+            if buffer.last_time is not None:
+                date_from = int(buffer.last_time // 1000)
+            else:
+                tick = mt5.symbol_info_tick(symbol)
+                if not tick:
+                    return 0
+                # Dos ventanas: la aceleración compara con la ventana anterior
+                date_from = int(tick.time) - 2 * self.detection_config['time_window_seconds']
+
+            ticks = mt5.copy_ticks_from(symbol, date_from, self.detection_config['max_ticks_per_fetch'],
+                                        mt5.COPY_TICKS_INFO)
+            if ticks is not None:
+                return self.ingest_ticks(symbol, ticks)
+        except Exception as e:
+            print(f"[ERROR] Obteniendo ticks {symbol}: {e}")
+
+        # Sin historial de ticks: usar el tick actual
+        tick_data = self.get_tick_data(symbol)
+        if tick_data and (buffer.last_time is None or tick_data['timestamp_ms'] > buffer.last_time):
+            buffer.append(tick_data['bid'], tick_data['timestamp_ms'])
+            return 1
+        return 0
+
     def get_tick_data(self, symbol):
         """Obtener datos de tick en tiempo real"""
         try:
@@ -93,25 +318,14 @@ class VelocityAccelerationDetector:
         Velocidad = Δprecio / Δtiempo
         """
         try:
-            if len(self.price_history[symbol]) < 2:
+            buffer = self.buffers[symbol]
+            if buffer.total < 2:
                 return 0, "INSUFICIENTE_DATA"
 
-            # Últimos dos puntos
-            price_current = self.price_history[symbol][-1]
-            price_prev = self.price_history[symbol][-2]
-            time_current = self.time_history[symbol][-1]
-            time_prev = self.time_history[symbol][-2]
-
-            # Calcular delta tiempo en segundos
-            delta_time = (time_current - time_prev).total_seconds()
-            if delta_time == 0:
-                return 0, "TIEMPO_CERO"
-
-            # Calcular delta precio (en porcentaje)
-            delta_price = ((price_current - price_prev) / price_prev) * 100
-
-            # Velocidad en %/minuto
-            velocity = (delta_price / delta_time) * 60
+            # Velocidad en %/minuto sobre la ventana de análisis: los umbrales
+            # están calibrados para cambios por ventana, no entre ticks sueltos
+            window_ms = self.detection_config['time_window_seconds'] * 1000
+            velocity = buffer.window_velocity(window_ms)
 
             # Clasificar velocidad
             abs_velocity = abs(velocity)
@@ -136,18 +350,13 @@ class VelocityAccelerationDetector:
         Aceleración = Δvelocidad / Δtiempo
         """
         try:
-            if len(self.velocity_history[symbol]) < 2:
+            buffer = self.buffers[symbol]
+            if buffer.total < 3:
                 return 0, "INSUFICIENTE_VELOCIDAD"
 
-            # Últimas dos velocidades
-            vel_current = self.velocity_history[symbol][-1]
-            vel_prev = self.velocity_history[symbol][-2]
-
-            # Asumimos intervalos de tiempo constantes para simplicidad
-            delta_time = 1  # 1 unidad de tiempo
-
-            # Aceleración
-            acceleration = (vel_current - vel_prev) / delta_time
+            # Aceleración en %/minuto²: cambio de la velocidad de ventana
+            window_ms = self.detection_config['time_window_seconds'] * 1000
+            acceleration = buffer.window_acceleration(window_ms)
 
             # Clasificar aceleración
             abs_acceleration = abs(acceleration)
@@ -167,10 +376,10 @@ class VelocityAccelerationDetector:
     def calculate_momentum_metrics(self, symbol):
         """Calcular métricas avanzadas de momentum"""
         try:
-            if len(self.price_history[symbol]) < 10:
+            if len(self.buffers[symbol]) < 10:
                 return {}
 
-            prices = list(self.price_history[symbol])[-20:]
+            prices = self.buffers[symbol].last_prices(20)
 
             # 1. Rate of Change (ROC)
             if len(prices) >= 10:
@@ -179,12 +388,10 @@ class VelocityAccelerationDetector:
                 roc_10 = 0
 
             # 2. Velocidad promedio últimos 5 puntos
-            velocities = []
-            for i in range(1, min(5, len(prices))):
-                delta_price = ((prices[-i] - prices[-i-1]) / prices[-i-1]) * 100
-                velocities.append(delta_price)
+            recent = prices[-5:]
+            velocities = np.diff(recent) / recent[:-1] * 100
 
-            avg_velocity = np.mean(velocities) if velocities else 0
+            avg_velocity = velocities.mean() if len(velocities) else 0
 
             # 3. Volatilidad (desviación estándar)
             volatility = np.std(prices) if len(prices) > 1 else 0
@@ -200,8 +407,8 @@ class VelocityAccelerationDetector:
                 trend_direction = "NEUTRAL"
 
             # 5. Impulso (magnitud del movimiento)
-            price_range = max(prices) - min(prices)
-            impulse = price_range / np.mean(prices) * 100 if prices else 0
+            price_range = prices.max() - prices.min()
+            impulse = price_range / prices.mean() * 100 if len(prices) else 0
 
             return {
                 'roc_10': roc_10,
@@ -221,10 +428,10 @@ class VelocityAccelerationDetector:
         patterns = []
 
         try:
-            if len(self.velocity_history[symbol]) < 5:
+            if len(self.buffers[symbol]) < 5:
                 return patterns
 
-            velocities = list(self.velocity_history[symbol])[-10:]
+            velocities = self.buffers[symbol].last_velocities(10)
 
             # 1. Aceleración sostenida
             if len(velocities) >= 3:
@@ -234,9 +441,9 @@ class VelocityAccelerationDetector:
                     patterns.append("DESACELERACION_SOSTENIDA")
 
             # 2. Spike de velocidad
-            if velocities:
+            if len(velocities):
                 current_vel = abs(velocities[-1])
-                avg_vel = np.mean([abs(v) for v in velocities[:-1]]) if len(velocities) > 1 else 0
+                avg_vel = np.abs(velocities[:-1]).mean() if len(velocities) > 1 else 0
 
                 if avg_vel > 0 and current_vel > avg_vel * 3:
                     patterns.append("SPIKE_VELOCIDAD")
@@ -249,7 +456,7 @@ class VelocityAccelerationDetector:
                     patterns.append("REVERSA_ALCISTA")
 
             # 4. Momentum extremo
-            if velocities and abs(velocities[-1]) > self.detection_config['extreme_velocity'] * 100:
+            if len(velocities) and abs(velocities[-1]) > self.detection_config['extreme_velocity'] * 100:
                 patterns.append("MOMENTUM_EXTREMO")
 
             return patterns
@@ -261,21 +468,17 @@ class VelocityAccelerationDetector:
     def analyze_symbol(self, symbol):
         """Análisis completo de un símbolo"""
         try:
-            # Obtener tick actual
-            tick_data = self.get_tick_data(symbol)
-            if not tick_data:
+            # Traer los ticks nuevos
+            new_ticks = self.update_symbol(symbol)
+            buffer = self.buffers[symbol]
+            if buffer.last_price is None:
                 return None
 
-            # Actualizar historial
-            current_price = tick_data['bid']
-            current_time = tick_data['time']
-
-            self.price_history[symbol].append(current_price)
-            self.time_history[symbol].append(current_time)
+            current_price = buffer.last_price
+            current_time = datetime.now()
 
             # Calcular velocidad
             velocity, vel_class = self.calculate_velocity(symbol)
-            self.velocity_history[symbol].append(velocity)
 
             # Calcular aceleración
             acceleration, acc_class = self.calculate_acceleration(symbol)
@@ -319,13 +522,16 @@ class VelocityAccelerationDetector:
                 'symbol': symbol,
                 'price': current_price,
                 'velocity': velocity,
+                'velocity_raw': buffer.velocity_raw,
                 'velocity_class': vel_class,
                 'acceleration': acceleration,
                 'acceleration_class': acc_class,
                 'momentum_metrics': momentum_metrics,
                 'patterns': patterns,
                 'intensity_score': intensity_score,
-                'timestamp': current_time
+                'timestamp': current_time,
+                'tick_time_msc': int(buffer.last_time),
+                'new_ticks': new_ticks
             }
 
         except Exception as e:
@@ -393,7 +599,7 @@ class VelocityAccelerationDetector:
         else:
             print("   ✅ Movimiento normal del mercado")
 
-    def run_continuous_monitoring(self, interval=5):
+    def run_continuous_monitoring(self, interval=1):
         """Monitoreo continuo de velocidad y aceleración"""
         print(f"\n🚀 INICIANDO MONITOREO DE VELOCIDAD Y ACELERACIÓN")
         print(f"⏰ Actualización cada {interval} segundos")
@@ -491,7 +697,7 @@ def main():
 
     try:
         input()
-        detector.run_continuous_monitoring(interval=5)
+        detector.run_continuous_monitoring(interval=1)
     except KeyboardInterrupt:
         print("\n🛑 Sistema cancelado")
 
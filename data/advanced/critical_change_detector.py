@@ -11,6 +11,8 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
 
+from data.levels import classic_pivots, cluster_levels, level_engine
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -558,9 +560,10 @@ class CriticalChangeDetector:
             
             # 3. Ruptura de niveles (calcular dinámicamente)
             if '15min' in market_data or '5min' in market_data:
-                df = market_data.get('15min', market_data.get('5min'))
+                level_tf = '15min' if '15min' in market_data else '5min'
+                df = market_data[level_tf]
                 if len(df) > 20:
-                    key_levels = self._calculate_key_levels(df)
+                    key_levels = self._calculate_key_levels(df, level_tf)
                     
                     support_break = self.detect_support_break(df, key_levels)
                     if support_break:
@@ -630,7 +633,7 @@ class CriticalChangeDetector:
         
         return alerts
     
-    def _calculate_key_levels(self, df: pd.DataFrame) -> List[float]:
+    def _calculate_key_levels(self, df: pd.DataFrame, timeframe: str = '15min') -> List[float]:
         """Calcula niveles clave de soporte y resistencia"""
         if len(df) < 20:
             return []
@@ -643,23 +646,14 @@ class CriticalChangeDetector:
         levels.extend([period_high, period_low])
         
         # Pivotes clásicos
-        last_high = df['high'].iloc[-1]
-        last_low = df['low'].iloc[-1]
-        last_close = df['close'].iloc[-1]
-        
-        pivot = (last_high + last_low + last_close) / 3
-        r1 = 2 * pivot - last_low
-        r2 = pivot + (last_high - last_low)
-        s1 = 2 * pivot - last_high
-        s2 = pivot - (last_high - last_low)
-        
-        levels.extend([pivot, r1, r2, s1, s2])
+        pivots = classic_pivots(df['high'].iloc[-1], df['low'].iloc[-1], df['close'].iloc[-1])
+        levels.extend(pivots.values())
         
-        # Máximos y mínimos locales
-        for i in range(5, len(df) - 5, 5):
-            local_high = df['high'].iloc[i-5:i+5].max()
-            local_low = df['low'].iloc[i-5:i+5].min()
-            levels.extend([local_high, local_low])
+        # Pivotes fractales (máximos y mínimos locales) del motor de niveles
+        level_engine.update(self.symbol, timeframe, df)
+        recent = level_engine.pivots(self.symbol, timeframe, lookback=len(df))
+        levels.extend(p[1] for p in recent['highs'])
+        levels.extend(p[1] for p in recent['lows'])
         
         # Niveles psicológicos (números redondos)
         current_price = df['close'].iloc[-1]
@@ -672,16 +666,9 @@ class CriticalChangeDetector:
             round_level + round_factor
         ])
         
-        # Limpiar y ordenar
-        levels = sorted(list(set([round(l, 2) for l in levels if l > 0])))
-        
-        # Filtrar niveles muy cercanos (menos del 0.1% de diferencia)
-        filtered_levels = []
-        for level in levels:
-            if not filtered_levels or abs(level - filtered_levels[-1]) / filtered_levels[-1] > 0.001:
-                filtered_levels.append(level)
-        
-        return filtered_levels
+        # Limpiar y filtrar niveles muy cercanos (menos del 0.1% de diferencia)
+        levels = [round(l, 2) for l in levels if l > 0]
+        return [cluster['first'] for cluster in cluster_levels(levels, tolerance=0.001)]
     
     def _severity_score(self, alert: CriticalAlert) -> int:
         """Convierte severidad a score numérico"""
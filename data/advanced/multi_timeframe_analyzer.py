@@ -10,6 +10,8 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import logging
 
+from data.levels import classic_pivots, cluster_levels, level_engine
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -134,7 +136,7 @@ class MultiTimeframeAnalyzer:
         structure = self._analyze_market_structure(df)
         
         # Niveles clave
-        key_levels = self._find_key_levels(df)
+        key_levels = self._find_key_levels(df, timeframe=timeframe)
         
         # Calidad de la tendencia
         trend_quality = self._calculate_trend_quality(df, trend, momentum)
@@ -590,7 +592,8 @@ class MultiTimeframeAnalyzer:
         
         return min(100, max(0, quality))
     
-    def _find_key_levels(self, df: pd.DataFrame, num_levels: int = 5) -> List[float]:
+    def _find_key_levels(self, df: pd.DataFrame, num_levels: int = 5,
+                         timeframe: Optional[str] = None) -> List[float]:
         """
         Encuentra niveles clave de precio mejorados
         """
@@ -601,17 +604,8 @@ class MultiTimeframeAnalyzer:
         current_price = df['close'].iloc[-1]
         
         # 1. Pivotes diarios
-        last_high = df['high'].iloc[-1]
-        last_low = df['low'].iloc[-1]
-        last_close = df['close'].iloc[-1]
-        
-        pivot = (last_high + last_low + last_close) / 3
-        r1 = 2 * pivot - last_low
-        r2 = pivot + (last_high - last_low)
-        s1 = 2 * pivot - last_high
-        s2 = pivot - (last_high - last_low)
-        
-        levels.extend([s2, s1, pivot, r1, r2])
+        pivots = classic_pivots(df['high'].iloc[-1], df['low'].iloc[-1], df['close'].iloc[-1])
+        levels.extend(pivots.values())
         
         # 2. Máximos y mínimos significativos
         for period in [20, 50, 100]:
@@ -620,6 +614,13 @@ class MultiTimeframeAnalyzer:
                 period_low = df['low'].iloc[-period:].min()
                 levels.extend([period_high, period_low])
         
+        # Pivotes fractales recientes (motor de niveles compartido)
+        if timeframe is not None:
+            level_engine.update(self.symbol, timeframe, df)
+            recent = level_engine.pivots(self.symbol, timeframe, lookback=len(df))
+            levels.extend(p[1] for p in recent['highs'][-3:])
+            levels.extend(p[1] for p in recent['lows'][-3:])
+        
         # 3. Niveles de Fibonacci del último swing
         if len(df) >= 50:
             recent_high = df['high'].iloc[-50:].max()
@@ -651,14 +652,9 @@ class MultiTimeframeAnalyzer:
             vwap = (df['close'] * df['volume']).sum() / df['volume'].sum()
             levels.append(vwap)
         
-        # Limpiar y ordenar
-        levels = list(set([round(l, 2) for l in levels if l > 0]))
-        
-        # Filtrar niveles muy cercanos
-        filtered_levels = []
-        for level in sorted(levels):
-            if not filtered_levels or abs(level - filtered_levels[-1]) / filtered_levels[-1] > 0.002:
-                filtered_levels.append(level)
+        # Limpiar y filtrar niveles muy cercanos
+        levels = [round(l, 2) for l in levels if l > 0]
+        filtered_levels = [cluster['first'] for cluster in cluster_levels(levels, tolerance=0.002)]
         
         # Retornar los más cercanos al precio actual
         return sorted(filtered_levels, key=lambda x: abs(x - current_price))[:num_levels]
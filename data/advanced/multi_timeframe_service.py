@@ -0,0 +1,230 @@
+"""
+Servicio de Análisis Multi-Temporal para toda la watchlist
+Deriva las temporalidades de las mismas barras base (M1 → M5/M15/H1/H4)
+y analiza grupos de símbolos en un pool de procesos.
+"""
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from data.advanced.multi_timeframe_analyzer import MultiTimeframeAnalyzer, TimeframeSignal
+
+logger = logging.getLogger(__name__)
+
+# Temporalidad del analizador -> regla de pandas
+RESAMPLE_RULES = {
+    '1min': '1min',
+    '5min': '5min',
+    '15min': '15min',
+    '30min': '30min',
+    '1h': '1h',
+    '4h': '4h',
+    '1d': '1D',
+}
+
+OHLCV_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+
+def resample_bars(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """
+    Agrega barras OHLCV a una temporalidad mayor
+
+    Args:
+        df: Barras base con DatetimeIndex o columna 'time'
+        rule: Regla de pandas ('5min', '1h'...)
+
+    Returns:
+        Barras agregadas (la última puede estar en formación)
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df = df.set_index(pd.to_datetime(df['time']))
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in df.columns}
+    bars = df.resample(rule, label='left', closed='left').agg(agg)
+    return bars.dropna(subset=['close'])
+
+
+def _signature(df: pd.DataFrame) -> Tuple:
+    """Identifica el estado de una serie (cambia con cada barra nueva o actualizada)"""
+    last = df.iloc[-1]
+    return (len(df), df.index[-1], last['high'], last['low'], last['close'])
+
+
+def analyze_timeframes(symbol: str, frames: Dict[str, pd.DataFrame]) -> Dict[str, TimeframeSignal]:
+    """Analiza las temporalidades de un símbolo (ejecutado en el worker)"""
+    return MultiTimeframeAnalyzer(symbol).analyze_all_timeframes(frames)
+
+
+def _analyze_group(tasks: List[Tuple[str, Dict[str, pd.DataFrame]]]) -> Dict[str, Dict[str, TimeframeSignal]]:
+    """Analiza un grupo de símbolos en un mismo proceso"""
+    results = {}
+    for symbol, frames in tasks:
+        try:
+            results[symbol] = analyze_timeframes(symbol, frames)
+        except Exception as e:
+            logger.error(f"Error analizando {symbol}: {e}")
+            results[symbol] = {}
+    return results
+
+
+class MultiTimeframeService:
+    """
+    Análisis multi-temporal de una watchlist completa
+
+    Las temporalidades se derivan de las barras base de cada símbolo en lugar
+    de descargarse por separado. Solo se reanalizan las temporalidades cuya
+    serie cambió desde la llamada anterior; el resto reutiliza la señal
+    guardada. Los símbolos se reparten en grupos, uno por tarea del pool.
+    """
+
+    def __init__(self,
+                 timeframes: Optional[List[str]] = None,
+                 max_workers: Optional[int] = None,
+                 max_bars: int = 500,
+                 min_bars: int = 20):
+        """
+        Args:
+            timeframes: Temporalidades a analizar (por defecto 1min, 5min, 15min, 1h y 4h)
+            max_workers: Procesos del pool; 0 analiza en el proceso actual
+            max_bars: Barras por temporalidad enviadas al análisis
+            min_bars: Barras mínimas para analizar una temporalidad
+        """
+        self.timeframes = list(timeframes or ['1min', '5min', '15min', '1h', '4h'])
+        unknown = [tf for tf in self.timeframes if tf not in RESAMPLE_RULES]
+        if unknown:
+            raise ValueError(f"Temporalidades no soportadas: {unknown}")
+
+        self.max_workers = max_workers
+        self.max_bars = max_bars
+        self.min_bars = min_bars
+
+        self.analyzers: Dict[str, MultiTimeframeAnalyzer] = {}
+        self.signals: Dict[str, Dict[str, TimeframeSignal]] = {}
+        self.signatures: Dict[Tuple[str, str], Tuple] = {}
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {'runs': 0, 'analyzed': 0, 'reused': 0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def build_frames(self, data: Union[pd.DataFrame, Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+        """
+        Series por temporalidad de un símbolo
+
+        Args:
+            data: Barras base (DataFrame) o {temporalidad: DataFrame}; las
+                temporalidades que falten se derivan de la más fina disponible
+        """
+        if isinstance(data, pd.DataFrame):
+            data = {'1min': data}
+        data = {MultiTimeframeAnalyzer.TIMEFRAME_MAPPING.get(tf, tf): df
+                for tf, df in data.items() if df is not None and not df.empty}
+        if not data:
+            return {}
+
+        finest = min(data, key=lambda tf: pd.Timedelta(RESAMPLE_RULES.get(tf, '1D')))
+        base = data[finest]
+
+        frames = {}
+        for tf in self.timeframes:
+            if tf in data:
+                df = data[tf]
+            elif pd.Timedelta(RESAMPLE_RULES[tf]) > pd.Timedelta(RESAMPLE_RULES.get(finest, '1D')):
+                df = resample_bars(base, RESAMPLE_RULES[tf])
+            else:
+                continue
+            if len(df) >= self.min_bars:
+                frames[tf] = df.iloc[-self.max_bars:].copy()
+        return frames
+
+    def analyze_watchlist(self,
+                          watchlist: Dict[str, Union[pd.DataFrame, Dict[str, pd.DataFrame]]]
+                          ) -> Dict[str, Dict]:
+        """
+        Consenso multi-temporal de todos los símbolos en una llamada
+
+        Args:
+            watchlist: {símbolo: barras base o {temporalidad: DataFrame}}
+
+        Returns:
+            {símbolo: resultado de get_consensus_signal}
+        """
+        self.stats['runs'] += 1
+        pending: List[Tuple[str, Dict[str, pd.DataFrame]]] = []
+
+        for symbol, data in watchlist.items():
+            frames = self.build_frames(data)
+            cached = self.signals.setdefault(symbol, {})
+            for tf in list(cached):
+                if tf not in frames:
+                    del cached[tf]
+
+            changed = {}
+            for tf, df in frames.items():
+                signature = _signature(df)
+                if tf in cached and self.signatures.get((symbol, tf)) == signature:
+                    self.stats['reused'] += 1
+                    continue
+                self.signatures[(symbol, tf)] = signature
+                changed[tf] = df
+            if changed:
+                pending.append((symbol, changed))
+
+        for symbol, signals in self._run(pending).items():
+            self.signals[symbol].update(signals)
+            self.stats['analyzed'] += len(signals)
+
+        results = {}
+        for symbol in watchlist:
+            if symbol not in self.analyzers:
+                self.analyzers[symbol] = MultiTimeframeAnalyzer(symbol)
+            results[symbol] = self.analyzers[symbol].get_consensus_signal(self.signals.get(symbol, {}))
+        return results
+
+    def _run(self, tasks: List[Tuple[str, Dict[str, pd.DataFrame]]]) -> Dict[str, Dict[str, TimeframeSignal]]:
+        if not tasks:
+            return {}
+        if self.max_workers == 0 or len(tasks) == 1:
+            return _analyze_group(tasks)
+
+        executor = self._pool()
+        group_size = math.ceil(len(tasks) / (self.max_workers or os.cpu_count() or 1))
+        groups = [tasks[i:i + group_size] for i in range(0, len(tasks), group_size)]
+
+        results = {}
+        for future in [executor.submit(_analyze_group, group) for group in groups]:
+            try:
+                results.update(future.result())
+            except Exception as e:
+                logger.error(f"Error en grupo de análisis: {e}")
+        return results
+
+    def get_signals(self, symbol: str) -> Dict[str, TimeframeSignal]:
+        """Últimas señales por temporalidad de un símbolo"""
+        return dict(self.signals.get(symbol, {}))
+
+    def shutdown(self):
+        """Cierra el pool de procesos"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def get_status(self) -> Dict:
+        """Estado del servicio"""
+        return {
+            'timeframes': self.timeframes,
+            'symbols': len(self.signals),
+            'pool_active': self.executor is not None,
+            **self.stats,
+        }
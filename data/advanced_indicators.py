@@ -9,6 +9,8 @@ from scipy import stats
 from dataclasses import dataclass
 import logging
 
+from data.levels import fractal_pivots
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -358,25 +360,23 @@ class AdvancedIndicators:
         if len(prices) < window:
             return {'support': [], 'resistance': []}
         
-        # Find local maxima and minima
-        from scipy.signal import argrelextrema
-        
-        local_max = argrelextrema(prices, np.greater, order=window//2)[0]
-        local_min = argrelextrema(prices, np.less, order=window//2)[0]
+        # Find local maxima and minima (shared fractal pivot engine)
+        local_max, local_min = fractal_pivots(prices, prices, order=window//2)
         
         # Weight by volume
+        mean_volume = np.mean(volumes)
         resistance_levels = []
         for idx in local_max:
             if idx < len(volumes):
                 level = prices[idx]
-                volume_weight = volumes[idx] / np.mean(volumes)
+                volume_weight = volumes[idx] / mean_volume
                 resistance_levels.append((level, volume_weight))
         
         support_levels = []
         for idx in local_min:
             if idx < len(volumes):
                 level = prices[idx]
-                volume_weight = volumes[idx] / np.mean(volumes)
+                volume_weight = volumes[idx] / mean_volume
                 support_levels.append((level, volume_weight))
         
         # Sort by volume weight and get top levels
@@ -0,0 +1,362 @@
+"""
+Motor de Niveles - Soportes, resistencias y pivotes fractales
+Detección de pivotes en O(n) con máximos/mínimos móviles (deque monotónica)
+y agrupación de niveles con un barrido sobre el array ordenado.
+"""
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+
+class RollingExtreme:
+    """
+    Máximo (o mínimo) de los últimos `window` valores en O(1) amortizado
+
+    Deque monotónica: cada valor entra y sale una sola vez.
+    """
+
+    def __init__(self, window: int, mode: str = 'max'):
+        self.window = window
+        self.sign = 1.0 if mode == 'max' else -1.0
+        self.items: deque = deque()  # (índice, valor con signo), valores decrecientes
+        self.count = 0
+
+    def push(self, value: float) -> float:
+        """Añadir un valor y devolver el extremo de la ventana actual"""
+        signed = self.sign * value
+        while self.items and self.items[-1][1] <= signed:
+            self.items.pop()
+        self.items.append((self.count, signed))
+        self.count += 1
+        if self.items[0][0] <= self.count - 1 - self.window:
+            self.items.popleft()
+        return self.sign * self.items[0][1]
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Máximo de la ventana que termina en cada índice (parcial al inicio)"""
+    values = np.asarray(values, dtype=np.float64)
+    return maximum_filter1d(values, size=window, mode='nearest', origin=(window - 1) // 2)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """Mínimo de la ventana que termina en cada índice (parcial al inicio)"""
+    values = np.asarray(values, dtype=np.float64)
+    return minimum_filter1d(values, size=window, mode='nearest', origin=(window - 1) // 2)
+
+
+def fractal_pivots(highs: np.ndarray, lows: np.ndarray, order: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pivotes fractales: máximo (mínimo) estricto frente a `order` barras a cada lado
+
+    Returns:
+        (índices de pivotes altos, índices de pivotes bajos) en orden ascendente
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    n = len(highs)
+    if n < 2 * order + 1:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    trailing_max = rolling_max(highs, order)
+    trailing_min = rolling_min(lows, order)
+    candidates = np.arange(order, n - order)
+
+    # Ventana izquierda termina en i-1, la derecha en i+order
+    is_high = (highs[candidates] > trailing_max[candidates - 1]) & (highs[candidates] > trailing_max[candidates + order])
+    is_low = (lows[candidates] < trailing_min[candidates - 1]) & (lows[candidates] < trailing_min[candidates + order])
+    return candidates[is_high], candidates[is_low]
+
+
+def last_pivots(highs, lows, order: int = 5) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Último pivote bajo (soporte) y alto (resistencia) confirmados
+
+    Returns:
+        (soporte, resistencia); None si no hay pivote
+    """
+    pivot_highs, pivot_lows = fractal_pivots(highs, lows, order)
+    resistance = float(highs[pivot_highs[-1]]) if len(pivot_highs) else None
+    support = float(lows[pivot_lows[-1]]) if len(pivot_lows) else None
+    return support, resistance
+
+
+def cluster_levels(levels, tolerance: float = 0.002, weights=None) -> List[Dict]:
+    """
+    Agrupar niveles cercanos con un barrido sobre el array ordenado
+
+    Un nivel abre un grupo nuevo cuando se separa más de `tolerance`
+    (relativo) del primer nivel del grupo.
+
+    Args:
+        levels: Precios de los niveles
+        tolerance: Distancia relativa máxima dentro de un grupo
+        weights: Peso de cada nivel (volumen, toques...); 1 por defecto
+
+    Returns:
+        Grupos ordenados por precio: {'level' (media ponderada), 'first',
+        'weight', 'touches'}
+    """
+    levels = np.asarray(levels, dtype=np.float64)
+    if len(levels) == 0:
+        return []
+    weights = np.ones(len(levels)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    order = np.argsort(levels, kind='stable')
+    levels, weights = levels[order], weights[order]
+
+    starts = [0]
+    anchor = levels[0]
+    for i in range(1, len(levels)):
+        if anchor != 0 and abs(levels[i] - anchor) / abs(anchor) > tolerance:
+            starts.append(i)
+            anchor = levels[i]
+    starts = np.array(starts)
+
+    touches = np.diff(np.r_[starts, len(levels)])
+    total_weight = np.add.reduceat(weights, starts)
+    weighted = np.add.reduceat(levels * weights, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centers = np.where(total_weight > 0, weighted / total_weight, levels[starts])
+
+    return [
+        {
+            'level': float(centers[k]),
+            'first': float(levels[starts[k]]),
+            'weight': float(total_weight[k]),
+            'touches': int(touches[k])
+        }
+        for k in range(len(starts))
+    ]
+
+
+def classic_pivots(high: float, low: float, close: float) -> Dict[str, float]:
+    """Pivotes clásicos (P, R1, R2, S1, S2) de una barra"""
+    pivot = (high + low + close) / 3
+    return {
+        'pivot': pivot,
+        'r1': 2 * pivot - low,
+        'r2': pivot + (high - low),
+        's1': 2 * pivot - high,
+        's2': pivot - (high - low)
+    }
+
+
+class _LevelState:
+    """Barras retenidas y pivotes de un símbolo/timeframe"""
+
+    def __init__(self, order: int, max_bars: int):
+        self.order = order
+        self.max_bars = max_bars
+        self.highs: List[float] = []
+        self.lows: List[float] = []
+        self.closes: List[float] = []
+        self.volumes: List[float] = []
+        self.offset = 0              # Índice absoluto de highs[0]
+        self.trailing_max: List[float] = []
+        self.trailing_min: List[float] = []
+        self.max_window = RollingExtreme(order, 'max')
+        self.min_window = RollingExtreme(order, 'min')
+        self.pivot_highs: deque = deque()  # (índice absoluto, precio, volumen)
+        self.pivot_lows: deque = deque()
+        self.last_time = None
+        self.cached: Optional[Dict] = None
+
+    @property
+    def total(self) -> int:
+        return self.offset + len(self.highs)
+
+    def append(self, high: float, low: float, close: float, volume: float):
+        self.highs.append(high)
+        self.lows.append(low)
+        self.closes.append(close)
+        self.volumes.append(volume)
+        self.trailing_max.append(self.max_window.push(high))
+        self.trailing_min.append(self.min_window.push(low))
+
+        # Confirmar el candidato que ya tiene `order` barras a su derecha
+        t = len(self.highs) - 1
+        c = t - self.order
+        if c >= 1 and self.offset + c >= self.order:
+            if self.highs[c] > self.trailing_max[c - 1] and self.highs[c] > self.trailing_max[t]:
+                self.pivot_highs.append((self.offset + c, self.highs[c], self.volumes[c]))
+            if self.lows[c] < self.trailing_min[c - 1] and self.lows[c] < self.trailing_min[t]:
+                self.pivot_lows.append((self.offset + c, self.lows[c], self.volumes[c]))
+
+        if len(self.highs) >= self.max_bars * 2:
+            self._compact()
+        self.cached = None
+
+    def pop(self):
+        """Deshacer el último append (barra en formación que se va a sustituir)"""
+        # Solo el candidato de la última barra pudo confirmarse en ese append
+        candidate = self.total - 1 - self.order
+        for pivots in (self.pivot_highs, self.pivot_lows):
+            if pivots and pivots[-1][0] == candidate:
+                pivots.pop()
+        for series in (self.highs, self.lows, self.closes, self.volumes, self.trailing_max, self.trailing_min):
+            series.pop()
+
+        # Las deques solo dependen de las últimas `order` barras: se reconstruyen
+        recent = len(self.highs) - min(self.order, len(self.highs))
+        self.max_window = RollingExtreme(self.order, 'max')
+        self.min_window = RollingExtreme(self.order, 'min')
+        for high, low in zip(self.highs[recent:], self.lows[recent:]):
+            self.max_window.push(high)
+            self.min_window.push(low)
+        self.cached = None
+
+    def _compact(self):
+        drop = len(self.highs) - self.max_bars
+        for series in (self.highs, self.lows, self.closes, self.volumes, self.trailing_max, self.trailing_min):
+            del series[:drop]
+        self.offset += drop
+        for pivots in (self.pivot_highs, self.pivot_lows):
+            while pivots and pivots[0][0] < self.offset:
+                pivots.popleft()
+
+
+class LevelEngine:
+    """
+    Niveles de soporte/resistencia por (símbolo, timeframe)
+
+    Las barras nuevas actualizan los pivotes fractales de forma incremental
+    (deque monotónica, O(1) por barra); los niveles agrupados se recalculan
+    solo cuando llegan barras y quedan en caché hasta la siguiente.
+    """
+
+    def __init__(self, order: int = 5, max_bars: int = 500, tolerance: float = 0.002):
+        """
+        Args:
+            order: Barras a cada lado para confirmar un pivote
+            max_bars: Barras retenidas por símbolo/timeframe
+            tolerance: Distancia relativa para agrupar niveles
+        """
+        self.order = order
+        self.max_bars = max_bars
+        self.tolerance = tolerance
+        self.states: Dict[Tuple[str, str], _LevelState] = {}
+
+    def _state(self, symbol: str, timeframe: str) -> _LevelState:
+        key = (symbol, timeframe)
+        if key not in self.states:
+            self.states[key] = _LevelState(self.order, self.max_bars)
+        return self.states[key]
+
+    def update(self, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        Añadir las barras de df posteriores a la última procesada
+
+        Usa la columna 'time' o un índice de fechas; sin tiempos, se reinicia el
+        estado con las barras de df. Si df vuelve a traer la última barra
+        procesada (la barra en formación), se sustituye por la versión nueva.
+
+        Returns:
+            Número de barras añadidas o sustituidas
+        """
+        state = self._state(symbol, timeframe)
+        if 'time' in df.columns:
+            times = df['time']
+        elif isinstance(df.index, pd.DatetimeIndex):
+            times = df.index.to_series()
+        else:
+            times = None
+            state = self.states[(symbol, timeframe)] = _LevelState(self.order, self.max_bars)
+
+        if times is not None and state.last_time is not None:
+            fresh = (times >= state.last_time).to_numpy()
+            df, times = df[fresh], times[fresh]
+            if len(times) and times.iloc[0] == state.last_time and state.highs:
+                state.pop()
+        if len(df) == 0:
+            return 0
+
+        df = df.tail(self.max_bars)
+        volumes = df['volume'].to_numpy(dtype=np.float64) if 'volume' in df.columns else np.zeros(len(df))
+        for high, low, close, volume in zip(df['high'].to_numpy(dtype=np.float64),
+                                            df['low'].to_numpy(dtype=np.float64),
+                                            df['close'].to_numpy(dtype=np.float64),
+                                            volumes):
+            state.append(high, low, close, volume)
+
+        if times is not None:
+            state.last_time = times.iloc[-1]
+        return len(df)
+
+    def add_bar(self, symbol: str, timeframe: str, bar: Dict):
+        """Añadir una barra cerrada (compatible con TickBarAggregator.subscribe)"""
+        state = self._state(symbol, timeframe)
+        if state.highs and state.last_time is not None and bar.get('time') == state.last_time:
+            state.pop()
+        volume = bar.get('volume', bar.get('tick_volume', 0))
+        state.append(bar['high'], bar['low'], bar['close'], volume)
+        state.last_time = bar.get('time', state.last_time)
+
+    def pivots(self, symbol: str, timeframe: str,
+               lookback: Optional[int] = None) -> Dict[str, List[Tuple[int, float, float]]]:
+        """
+        Pivotes confirmados: {'highs': [(índice, precio, volumen)], 'lows': [...]}
+
+        Args:
+            lookback: Solo pivotes de las últimas `lookback` barras
+        """
+        state = self._state(symbol, timeframe)
+        since = state.total - lookback if lookback else 0
+        return {
+            'highs': [p for p in state.pivot_highs if p[0] >= since],
+            'lows': [p for p in state.pivot_lows if p[0] >= since]
+        }
+
+    def last_pivots(self, symbol: str, timeframe: str) -> Tuple[Optional[float], Optional[float]]:
+        """(último pivote bajo, último pivote alto)"""
+        state = self._state(symbol, timeframe)
+        support = state.pivot_lows[-1][1] if state.pivot_lows else None
+        resistance = state.pivot_highs[-1][1] if state.pivot_highs else None
+        return support, resistance
+
+    def levels(self, symbol: str, timeframe: str) -> Dict:
+        """
+        Niveles agrupados de los pivotes retenidos
+
+        Returns:
+            {'support': [...], 'resistance': [...], 'current_price'}; cada nivel
+            es un grupo de cluster_levels ponderado por volumen. Soportes de
+            mayor a menor precio, resistencias de menor a mayor.
+        """
+        state = self._state(symbol, timeframe)
+        if state.cached is not None:
+            return state.cached
+        if not state.closes:
+            return {'support': [], 'resistance': [], 'current_price': None}
+
+        pivots = list(state.pivot_highs) + list(state.pivot_lows)
+        prices = [p[1] for p in pivots]
+        weights = [max(p[2], 1.0) for p in pivots]
+        clusters = cluster_levels(prices, self.tolerance, weights)
+
+        current_price = state.closes[-1]
+        state.cached = {
+            'support': sorted((c for c in clusters if c['level'] < current_price),
+                              key=lambda c: c['level'], reverse=True),
+            'resistance': [c for c in clusters if c['level'] >= current_price],
+            'current_price': current_price
+        }
+        return state.cached
+
+    def bars(self, symbol: str, timeframe: str) -> Dict[str, np.ndarray]:
+        """Barras retenidas como arrays"""
+        state = self._state(symbol, timeframe)
+        return {
+            'high': np.array(state.highs),
+            'low': np.array(state.lows),
+            'close': np.array(state.closes),
+            'volume': np.array(state.volumes)
+        }
+
+
+# Motor compartido por los módulos de análisis
+level_engine = LevelEngine()
@@ -2,6 +2,8 @@
 import os, requests, logging, re
 from typing import Dict, Any, Optional
 
+from src.core.http_client import http_get
+
 # ====== Carga automática del .env (si está disponible) ======
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -97,7 +99,7 @@ def _request(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
     url = f"{BASE_URL}/{endpoint}"
     q = {**params, "apikey": api_key}
 
-    r = requests.get(url, params=q, timeout=15)
+    r = http_get("twelvedata", url, params=q, timeout=15)
     try:
         r.raise_for_status()
     except requests.HTTPError as e:
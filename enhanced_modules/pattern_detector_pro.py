@@ -5,12 +5,184 @@ Detecta Head & Shoulders, Triángulos, Banderas, Doble Techo/Piso, etc.
 import numpy as np
 import pandas as pd
 from scipy.signal import find_peaks
-from scipy import stats
 from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _linear_fit(x: np.ndarray, y: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Regresión lineal por mínimos cuadrados (pendiente, intercepto, r)
+
+    Equivale a stats.linregress sin su sobrecarga por llamada, que domina
+    cuando se escanean muchos símbolos/timeframes por minuto.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    dx = x - x.mean()
+    dy = y - y.mean()
+    sxx = np.dot(dx, dx)
+    syy = np.dot(dy, dy)
+    sxy = np.dot(dx, dy)
+    slope = sxy / sxx
+    intercept = y.mean() - slope * x.mean()
+    r = sxy / np.sqrt(sxx * syy) if syy > 0 else 0.0
+    return slope, intercept, r
+
+
+class SwingPointIndex:
+    """
+    Índice incremental de barras y puntos swing de un símbolo/timeframe
+
+    Guarda las últimas barras en arrays NumPy; cada barra nueva cuesta O(1).
+    Los swings (máximos/mínimos locales) de una ventana se calculan con
+    find_peaks(distance=min_distance) sobre las últimas barras, igual que
+    antes hacía cada detector, y se cachean hasta la siguiente barra: los
+    detectores que piden la misma ventana comparten un único cálculo.
+    """
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, max_bars: int = 500, min_distance: int = 5):
+        """
+        Args:
+            max_bars: Barras retenidas (ventana máxima consultable)
+            min_distance: Separación mínima entre swings del mismo tipo
+        """
+        self.max_bars = max_bars
+        self.min_distance = min_distance
+        self.reset()
+
+    def reset(self):
+        capacity = self.max_bars * 2
+        self.data = {field: np.zeros(capacity) for field in self.FIELDS}
+        self.size = 0          # Barras en el buffer
+        self.offset = 0        # Índice absoluto de la posición 0 del buffer
+        self.last_time = None
+        # (tipo, ventana, prominencia) -> índices de swings; se vacía con cada barra
+        self._swings: Dict[Tuple[str, int, Optional[float]], np.ndarray] = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def total(self) -> int:
+        """Barras recibidas (índice absoluto de la próxima barra)"""
+        return self.offset + self.size
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, max_bars: int = 500, min_distance: int = 5) -> 'SwingPointIndex':
+        """Índice construido con las últimas max_bars barras de un DataFrame"""
+        index = cls(max_bars, min_distance)
+        index.update(df.tail(max_bars))
+        return index
+
+    def sync(self, df: pd.DataFrame) -> int:
+        """
+        Añadir solo las barras de df posteriores a la última indexada
+
+        Usa la columna 'time' (o un índice de fechas); sin tiempos, reconstruye
+        el índice completo.
+
+        Returns:
+            Número de barras nuevas
+        """
+        if 'time' in df.columns:
+            times = df['time']
+        elif isinstance(df.index, pd.DatetimeIndex):
+            times = df.index.to_series()
+        else:
+            self.reset()
+            return self.update(df.tail(self.max_bars))
+
+        if self.last_time is not None:
+            fresh = (times > self.last_time).to_numpy()
+            df, times = df[fresh], times[fresh]
+        new_bars = self.update(df.tail(self.max_bars))
+        if len(times):
+            self.last_time = times.iloc[-1]
+        return new_bars
+
+    def update(self, bars) -> int:
+        """
+        Añadir barras cerradas en orden cronológico
+
+        Args:
+            bars: DataFrame, dict de arrays o dict de una barra con open, high,
+                low, close y volume (o tick_volume)
+
+        Returns:
+            Número de barras añadidas
+        """
+        if isinstance(bars, pd.DataFrame):
+            columns = {field: bars[field].to_numpy(dtype=np.float64)
+                       for field in self.FIELDS if field in bars.columns}
+            if 'volume' not in columns and 'tick_volume' in bars.columns:
+                columns['volume'] = bars['tick_volume'].to_numpy(dtype=np.float64)
+            if 'time' in bars.columns and len(bars):
+                self.last_time = bars['time'].iloc[-1]
+        else:
+            bars = dict(bars)
+            if 'volume' not in bars and 'tick_volume' in bars:
+                bars['volume'] = bars['tick_volume']
+            columns = {field: np.atleast_1d(np.asarray(bars[field], dtype=np.float64))
+                       for field in self.FIELDS if field in bars}
+            if 'time' in bars and np.ndim(bars['time']) == 0:
+                self.last_time = bars['time']
+
+        count = len(columns['close'])
+        if count == 0:
+            return 0
+        for field in self.FIELDS:
+            if field not in columns:
+                columns[field] = columns['close'] if field == 'open' else np.zeros(count)
+
+        for i in range(count):
+            self._append({field: columns[field][i] for field in self.FIELDS})
+        return count
+
+    def _append(self, bar: Dict):
+        if self.size == len(self.data['close']):
+            # Compactar: conservar las últimas max_bars barras
+            drop = self.size - self.max_bars
+            for field in self.FIELDS:
+                self.data[field][:self.max_bars] = self.data[field][drop:self.size]
+            self.offset += drop
+            self.size = self.max_bars
+
+        for field in self.FIELDS:
+            self.data[field][self.size] = bar[field]
+        self.size += 1
+        self._swings.clear()
+
+    def window(self, length: int, *fields: str) -> List[np.ndarray]:
+        """Arrays de las últimas `length` barras para cada campo"""
+        start = max(0, self.size - length)
+        return [self.data[field][start:self.size] for field in fields]
+
+    def _window_swings(self, kind: str, length: int, prominence: Optional[float]) -> np.ndarray:
+        key = (kind, length, prominence)
+        if key not in self._swings:
+            if kind == 'high':
+                values, = self.window(length, 'high')
+            else:
+                values = -self.window(length, 'low')[0]
+            self._swings[key] = find_peaks(values, distance=self.min_distance, prominence=prominence)[0]
+        return self._swings[key]
+
+    def peaks(self, length: int, prominence: Optional[float] = None) -> np.ndarray:
+        """
+        Swing highs dentro de la ventana, como índices relativos a ella
+
+        Args:
+            prominence: Prominencia mínima dentro de la ventana (opcional)
+        """
+        return self._window_swings('high', length, prominence)
+
+    def valleys(self, length: int, prominence: Optional[float] = None) -> np.ndarray:
+        """Swing lows dentro de la ventana, como índices relativos a ella"""
+        return self._window_swings('low', length, prominence)
+
 class AdvancedPatternDetector:
     """
     Detecta patrones técnicos complejos usando algoritmos matemáticos
@@ -24,13 +196,62 @@ class AdvancedPatternDetector:
         self.sensitivity = sensitivity
         self.detected_patterns = []
         
-    def detect_all_patterns(self, df: pd.DataFrame) -> List[Dict]:
+        # Índices de swings por (símbolo, timeframe) y últimos patrones detectados
+        self.indexes: Dict[Tuple[str, str], SwingPointIndex] = {}
+        self.last_patterns: Dict[Tuple[str, str], List[Dict]] = {}
+        
+    def get_index(self, symbol: str, timeframe: str) -> SwingPointIndex:
+        """Índice de swings compartido de un símbolo/timeframe"""
+        key = (symbol, timeframe)
+        if key not in self.indexes:
+            self.indexes[key] = SwingPointIndex()
+        return self.indexes[key]
+    
+    def update(self, symbol: str, timeframe: str, bars) -> List[Dict]:
+        """
+        Añade barras cerradas al índice y vuelve a escanear patrones
+        
+        Solo se escanea si hay barras nuevas; si no, devuelve los últimos
+        patrones detectados. El coste es O(barras nuevas) más los detectores
+        sobre su ventana fija, sin depender del histórico.
+        
+        Args:
+            bars: DataFrame con las barras (se añaden solo las posteriores a la
+                última indexada) o dict de una barra cerrada
+        """
+        key = (symbol, timeframe)
+        index = self.get_index(symbol, timeframe)
+        if isinstance(bars, pd.DataFrame):
+            new_bars = index.sync(bars)
+        else:
+            new_bars = index.update(bars)
+        
+        if new_bars or key not in self.last_patterns:
+            self.last_patterns[key] = self._run_detectors(None, index)
+        return self.last_patterns[key]
+    
+    def on_bar(self, symbol: str, timeframe: str, bar: Dict):
+        """Consumidor de cierres de vela (compatible con TickBarAggregator.subscribe)"""
+        self.update(symbol, timeframe, bar)
+        
+    def detect_all_patterns(self, df: pd.DataFrame, symbol: Optional[str] = None,
+                            timeframe: Optional[str] = None) -> List[Dict]:
         """
         Detecta todos los patrones posibles en los datos
         
+        Con symbol y timeframe se reutiliza el índice de swings incremental;
+        sin ellos se construye uno temporal desde df.
+        
         Returns:
             Lista de patrones detectados con su información
         """
+        if symbol is not None and timeframe is not None:
+            return self.update(symbol, timeframe, df)
+        
+        return self._run_detectors(df, SwingPointIndex.from_frame(df))
+    
+    def _run_detectors(self, df: Optional[pd.DataFrame], index: SwingPointIndex) -> List[Dict]:
+        """Ejecuta todos los detectores sobre el mismo índice de swings"""
         patterns = []
         
         # Ejecutar todos los detectores
@@ -46,7 +267,7 @@ class AdvancedPatternDetector:
         
         for detector in detectors:
             try:
-                pattern = detector(df)
+                pattern = detector(df, index=index)
                 if pattern:
                     patterns.append(pattern)
             except Exception as e:
@@ -54,7 +275,8 @@ class AdvancedPatternDetector:
         
         return patterns
     
-    def detect_head_and_shoulders(self, df: pd.DataFrame, window: int = 50) -> Optional[Dict]:
+    def detect_head_and_shoulders(self, df: pd.DataFrame, window: int = 50,
+                                  index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta patrón Head & Shoulders (normal o invertido)
         
@@ -68,17 +290,17 @@ class AdvancedPatternDetector:
         ----------------  ← Línea de cuello
         """
         
-        if len(df) < window:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window:
             return None
         
         try:
-            prices = df['close'].values[-window:]
-            highs = df['high'].values[-window:]
-            lows = df['low'].values[-window:]
+            prices, highs, lows = index.window(window, 'close', 'high', 'low')
             
-            # Encontrar picos y valles
-            peaks, peak_props = find_peaks(highs, distance=5, prominence=prices.mean()*0.001)
-            valleys, valley_props = find_peaks(-lows, distance=5, prominence=prices.mean()*0.001)
+            # Picos y valles del índice de swings
+            peaks = index.peaks(window, prominence=prices.mean()*0.001)
+            valleys = index.valleys(window, prominence=prices.mean()*0.001)
             
             # Necesitamos al menos 3 picos y 2 valles
             if len(peaks) >= 3 and len(valleys) >= 2:
@@ -108,7 +330,7 @@ class AdvancedPatternDetector:
                         neckline = np.mean(neckline_points)
                         
                         # Verificar si el precio rompió la línea de cuello
-                        current_price = df['close'].iloc[-1]
+                        current_price = prices[-1]
                         pattern_height = head - neckline
                         
                         if current_price < neckline:
@@ -145,7 +367,7 @@ class AdvancedPatternDetector:
                         neckline_points = highs[last_valleys]
                         neckline = np.mean(neckline_points)
                         
-                        current_price = df['close'].iloc[-1]
+                        current_price = prices[-1]
                         pattern_height = neckline - head
                         
                         if current_price > neckline:
@@ -168,21 +390,22 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando H&S: {e}")
             return None
     
-    def detect_double_top_bottom(self, df: pd.DataFrame, window: int = 30) -> Optional[Dict]:
+    def detect_double_top_bottom(self, df: pd.DataFrame, window: int = 30,
+                                 index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta doble techo o doble piso
         """
         
-        if len(df) < window:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window:
             return None
         
         try:
-            highs = df['high'].values[-window:]
-            lows = df['low'].values[-window:]
-            closes = df['close'].values[-window:]
+            highs, lows, closes = index.window(window, 'high', 'low', 'close')
             
             # Buscar picos para doble techo
-            peaks, _ = find_peaks(highs, distance=5)
+            peaks = index.peaks(window)
             
             if len(peaks) >= 2:
                 last_two_peaks = peaks[-2:]
@@ -218,7 +441,7 @@ class AdvancedPatternDetector:
                             }
             
             # Buscar valles para doble piso
-            valleys, _ = find_peaks(-lows, distance=5)
+            valleys = index.valleys(window)
             
             if len(valleys) >= 2:
                 last_two_valleys = valleys[-2:]
@@ -257,25 +480,26 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando doble techo/piso: {e}")
             return None
     
-    def detect_triangle_patterns(self, df: pd.DataFrame, window: int = 30) -> Optional[Dict]:
+    def detect_triangle_patterns(self, df: pd.DataFrame, window: int = 30,
+                                 index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta triángulos: ascendente, descendente, simétrico
         """
         
-        if len(df) < window:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window:
             return None
         
         try:
-            highs = df['high'].values[-window:]
-            lows = df['low'].values[-window:]
-            closes = df['close'].values[-window:]
+            highs, lows, closes = index.window(window, 'high', 'low', 'close')
             
             # Crear índices para regresión
             x = np.arange(len(highs))
             
             # Calcular líneas de tendencia
-            high_slope, high_intercept, _, _, _ = stats.linregress(x, highs)
-            low_slope, low_intercept, _, _, _ = stats.linregress(x, lows)
+            high_slope, high_intercept, _ = _linear_fit(x, highs)
+            low_slope, low_intercept, _ = _linear_fit(x, lows)
             
             # Calcular líneas proyectadas
             high_line = high_slope * x + high_intercept
@@ -361,18 +585,20 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando triángulos: {e}")
             return None
     
-    def detect_flag_pennant(self, df: pd.DataFrame, window: int = 20) -> Optional[Dict]:
+    def detect_flag_pennant(self, df: pd.DataFrame, window: int = 20,
+                            index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta banderas y banderines (patrones de continuación)
         """
         
-        if len(df) < window * 2:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window * 2:
             return None
         
         try:
             # Necesitamos el movimiento previo (mástil) y la consolidación (bandera)
-            prices = df['close'].values[-(window*2):]
-            volumes = df['volume'].values[-(window*2):]
+            prices, volumes = index.window(window * 2, 'close', 'volume')
             
             # Dividir en mástil y bandera
             pole_prices = prices[:window]
@@ -395,7 +621,7 @@ class AdvancedPatternDetector:
                     
                     # Calcular pendiente de la bandera
                     x = np.arange(len(flag_prices))
-                    flag_slope, _, _, _, _ = stats.linregress(x, flag_prices)
+                    flag_slope, _, _ = _linear_fit(x, flag_prices)
                     
                     # Bandera alcista: mástil alcista, consolidación con ligera pendiente bajista
                     if pole_change > 0 and flag_slope <= 0:
@@ -433,23 +659,24 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando bandera/banderín: {e}")
             return None
     
-    def detect_wedge_pattern(self, df: pd.DataFrame, window: int = 30) -> Optional[Dict]:
+    def detect_wedge_pattern(self, df: pd.DataFrame, window: int = 30,
+                             index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta cuñas ascendentes y descendentes
         """
         
-        if len(df) < window:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window:
             return None
         
         try:
-            highs = df['high'].values[-window:]
-            lows = df['low'].values[-window:]
-            closes = df['close'].values[-window:]
+            highs, lows, closes = index.window(window, 'high', 'low', 'close')
             
             # Calcular líneas de tendencia
             x = np.arange(len(highs))
-            high_slope, high_intercept, _, _, _ = stats.linregress(x, highs)
-            low_slope, low_intercept, _, _, _ = stats.linregress(x, lows)
+            high_slope, high_intercept, _ = _linear_fit(x, highs)
+            low_slope, low_intercept, _ = _linear_fit(x, lows)
             
             # Ambas líneas deben tener pendiente del mismo signo
             if high_slope > 0 and low_slope > 0:
@@ -494,22 +721,23 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando cuñas: {e}")
             return None
     
-    def detect_channel_pattern(self, df: pd.DataFrame, window: int = 40) -> Optional[Dict]:
+    def detect_channel_pattern(self, df: pd.DataFrame, window: int = 40,
+                               index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta canales de precio (paralelos)
         """
         
-        if len(df) < window:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < window:
             return None
         
         try:
-            highs = df['high'].values[-window:]
-            lows = df['low'].values[-window:]
-            closes = df['close'].values[-window:]
+            highs, lows, closes = index.window(window, 'high', 'low', 'close')
             
-            # Encontrar picos y valles
-            peaks, _ = find_peaks(highs, distance=5)
-            valleys, _ = find_peaks(-lows, distance=5)
+            # Picos y valles del índice de swings
+            peaks = index.peaks(window)
+            valleys = index.valleys(window)
             
             if len(peaks) >= 2 and len(valleys) >= 2:
                 # Calcular líneas de tendencia para picos y valles
@@ -519,10 +747,10 @@ class AdvancedPatternDetector:
                 valley_y = lows[valleys]
                 
                 # Regresión para línea de resistencia (picos)
-                res_slope, res_intercept, res_r, _, _ = stats.linregress(peak_x, peak_y)
+                res_slope, res_intercept, res_r = _linear_fit(peak_x, peak_y)
                 
                 # Regresión para línea de soporte (valles)
-                sup_slope, sup_intercept, sup_r, _, _ = stats.linregress(valley_x, valley_y)
+                sup_slope, sup_intercept, sup_r = _linear_fit(valley_x, valley_y)
                 
                 # Verificar si las líneas son paralelas (pendientes similares)
                 slope_diff = abs(res_slope - sup_slope)
@@ -573,31 +801,36 @@ class AdvancedPatternDetector:
             logger.error(f"Error detectando canal: {e}")
             return None
     
-    def detect_gap_patterns(self, df: pd.DataFrame) -> Optional[Dict]:
+    def detect_gap_patterns(self, df: pd.DataFrame,
+                            index: Optional[SwingPointIndex] = None) -> Optional[Dict]:
         """
         Detecta gaps (huecos de precio)
         """
         
-        if len(df) < 2:
+        if index is None:
+            index = SwingPointIndex.from_frame(df)
+        if len(index) < 2:
             return None
         
         try:
+            opens, closes = index.window(2, 'open', 'close')
+            
             # Gap entre el cierre anterior y la apertura actual
-            gap = df['open'].iloc[-1] - df['close'].iloc[-2]
-            gap_pct = gap / df['close'].iloc[-2]
+            gap = opens[-1] - closes[-2]
+            gap_pct = gap / closes[-2]
             
             # Considerar gap significativo si es > 0.5%
             if abs(gap_pct) > 0.005:
                 
-                current_price = df['close'].iloc[-1]
+                current_price = closes[-1]
                 gap_filled = False
                 
                 # Verificar si el gap se ha llenado
                 if gap > 0:  # Gap alcista
-                    gap_filled = current_price <= df['close'].iloc[-2]
+                    gap_filled = current_price <= closes[-2]
                     gap_type = 'BULLISH_GAP'
                 else:  # Gap bajista
-                    gap_filled = current_price >= df['close'].iloc[-2]
+                    gap_filled = current_price >= closes[-2]
                     gap_type = 'BEARISH_GAP'
                 
                 return {
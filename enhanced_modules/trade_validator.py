@@ -8,7 +8,7 @@ import asyncio
 import json
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import MetaTrader5 as mt5
 from dataclasses import dataclass
 
@@ -27,21 +27,27 @@ class TradeAnalysis:
     suggested_tp: Optional[float]
     market_conditions: Dict
     recommendation: str  # 'KEEP', 'MODIFY', 'CLOSE'
+    account: Optional[str] = None  # Cuenta dueña de la posición (multi-cuenta)
 
 class TradeValidator:
     """
     Validador avanzado de operaciones con IA
     """
     
-    def __init__(self, twelvedata_api_key: str = None, telegram_notifier = None):
+    def __init__(self, twelvedata_api_key: str = None, telegram_notifier = None,
+                 order_executor: Optional[Callable[[str, str, Dict], Dict]] = None):
         """
         Inicializa el validador
         Args:
             twelvedata_api_key: API key de TwelveData
             telegram_notifier: Instancia del notificador de Telegram
+            order_executor: Ejecuta órdenes en el proceso que tiene la sesión MT5
+                de la cuenta, como AccountSupervisor.send_order(cuenta, 'modify'/'close',
+                payload). Sin él, las órdenes usan la sesión MT5 de este proceso.
         """
         self.twelvedata_api_key = twelvedata_api_key
         self.telegram_notifier = telegram_notifier
+        self.order_executor = order_executor
         self.pending_validations = {}
         
         logger.info("TradeValidator inicializado")
@@ -76,16 +82,18 @@ class TradeValidator:
         
         return analyses
     
-    async def _analyze_position(self, position) -> TradeAnalysis:
+    async def _analyze_position(self, position, mt5_market_data: Optional[Dict] = None) -> TradeAnalysis:
         """
         Analiza una posición específica
         Args:
             position: Posición de MT5
+            mt5_market_data: Datos MT5 ya leídos (p. ej. por un worker de cuenta);
+                se usan como fallback en lugar de consultar MT5 en este proceso
         Returns:
             TradeAnalysis con el análisis completo
         """
         # Obtener datos de mercado
-        market_data = await self._get_market_data(position.symbol)
+        market_data = await self._get_market_data(position.symbol, mt5_market_data)
         
         # Verificar SL/TP
         has_sl = position.sl != 0
@@ -129,17 +137,21 @@ class TradeValidator:
             recommendation=recommendation
         )
     
-    async def _get_market_data(self, symbol: str) -> Dict:
+    async def _get_market_data(self, symbol: str, mt5_market_data: Optional[Dict] = None) -> Dict:
         """
         Obtiene datos de mercado de TwelveData
         Args:
             symbol: Símbolo a consultar
+            mt5_market_data: Fallback MT5 ya disponible (evita llamar a MT5 aquí)
         Returns:
             Dict con datos de mercado
         """
+        def mt5_fallback() -> Dict:
+            return mt5_market_data if mt5_market_data else self._get_mt5_market_data(symbol)
+        
         if not self.twelvedata_api_key:
             logger.warning("No hay API key de TwelveData configurada")
-            return self._get_mt5_market_data(symbol)
+            return mt5_fallback()
         
         try:
             # Mapear símbolo MT5 a TwelveData
@@ -166,11 +178,11 @@ class TradeValidator:
                 }
             else:
                 logger.warning(f"Error TwelveData: {response.status_code}")
-                return self._get_mt5_market_data(symbol)
+                return mt5_fallback()
                 
         except Exception as e:
             logger.error(f"Error obteniendo datos TwelveData: {e}")
-            return self._get_mt5_market_data(symbol)
+            return mt5_fallback()
     
     def _get_mt5_market_data(self, symbol: str) -> Dict:
         """
@@ -488,7 +500,7 @@ class TradeValidator:
                 success = await self._apply_sl_tp(analysis)
                 action = "Aplicados SL/TP automáticamente" if success else "Error aplicando SL/TP"
             elif analysis.recommendation == 'CLOSE':
-                success = await self._close_position(analysis.ticket)
+                success = await self._close_position(analysis.ticket, analysis.account)
                 action = "Posición cerrada automáticamente" if success else "Error cerrando posición"
             else:
                 action = "Mantenida sin cambios"
@@ -523,13 +535,13 @@ class TradeValidator:
                     success = await self._apply_sl_tp(analysis)
                     result = f"✅ SL/TP aplicados a #{analysis.ticket}" if success else f"❌ Error aplicando SL/TP"
                 elif analysis.recommendation == 'CLOSE':
-                    success = await self._close_position(analysis.ticket)
+                    success = await self._close_position(analysis.ticket, analysis.account)
                     result = f"✅ Posición #{analysis.ticket} cerrada" if success else f"❌ Error cerrando posición"
                 else:
                     result = f"✅ Posición #{analysis.ticket} mantenida"
                     
             elif action == "CLOSE":
-                success = await self._close_position(analysis.ticket)
+                success = await self._close_position(analysis.ticket, analysis.account)
                 result = f"✅ Posición #{analysis.ticket} cerrada" if success else f"❌ Error cerrando posición"
                 
             elif action == "IGNORE":
@@ -545,6 +557,23 @@ class TradeValidator:
             logger.error(f"Error procesando comando Telegram: {e}")
             return f"❌ Error procesando comando: {str(e)}"
     
+    async def _send_order(self, account: Optional[str], command: str, payload: Dict) -> bool:
+        """
+        Envía una orden al order_executor (worker de la cuenta) y espera su resultado
+        """
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, self.order_executor, account, command, payload)
+        
+        if response.get('status') == 'DONE':
+            return True
+        
+        result = response.get('result') or {}
+        logger.error(
+            f"Orden {command} #{payload['ticket']} en {account}: {response.get('status')} - "
+            f"{result.get('retcode', '')} {result.get('comment', response.get('error', ''))}"
+        )
+        return False
+    
     async def _apply_sl_tp(self, analysis: TradeAnalysis) -> bool:
         """
         Aplica SL y TP a la posición
@@ -554,6 +583,16 @@ class TradeValidator:
                 logger.error("No hay niveles sugeridos para aplicar")
                 return False
             
+            if self.order_executor:
+                success = await self._send_order(analysis.account, 'modify', {
+                    'ticket': analysis.ticket,
+                    'sl': analysis.suggested_sl,
+                    'tp': analysis.suggested_tp,
+                })
+                if success:
+                    logger.info(f"SL/TP aplicados a posición {analysis.ticket}")
+                return success
+            
             # Modificar posición
             request = {
                 "action": mt5.TRADE_ACTION_SLTP,
@@ -575,11 +614,20 @@ class TradeValidator:
             logger.error(f"Error aplicando SL/TP: {e}")
             return False
     
-    async def _close_position(self, ticket: int) -> bool:
+    async def _close_position(self, ticket: int, account: Optional[str] = None) -> bool:
         """
         Cierra una posición específica
         """
         try:
+            if self.order_executor:
+                success = await self._send_order(account, 'close', {
+                    'ticket': ticket,
+                    'comment': "Cerrado por validador IA",
+                })
+                if success:
+                    logger.info(f"Posición {ticket} cerrada exitosamente")
+                return success
+            
             position = None
             positions = mt5.positions_get(ticket=ticket)
             if positions:
@@ -10,6 +10,193 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+
+def value_area(volumes: np.ndarray, poc_index: int, value_area_pct: float = 0.7) -> Tuple[int, int]:
+    """
+    Expande el área de valor desde el POC hacia afuera
+
+    En cada paso se añade el nivel adyacente (arriba o abajo) con más volumen
+    hasta cubrir value_area_pct del volumen total.
+
+    Returns:
+        (índice bajo, índice alto) del área de valor, inclusivos
+    """
+    target = volumes.sum() * value_area_pct
+    low = high = poc_index
+    accumulated = volumes[poc_index]
+    last = len(volumes) - 1
+
+    while accumulated < target and (low > 0 or high < last):
+        below = volumes[low - 1] if low > 0 else -1.0
+        above = volumes[high + 1] if high < last else -1.0
+        if above >= below:
+            high += 1
+            accumulated += above
+        else:
+            low -= 1
+            accumulated += below
+
+    return low, high
+
+
+def profile_levels(centers: np.ndarray, volumes: np.ndarray, current_price: float,
+                   value_area_pct: float = 0.7) -> Dict:
+    """
+    POC, VAH/VAL, posición y niveles HVN/LVN de un perfil de volumen
+
+    Args:
+        centers: Precio central de cada nivel (ascendente)
+        volumes: Volumen por nivel
+        current_price: Precio actual
+        value_area_pct: Fracción del volumen en el área de valor
+    """
+    poc_index = int(np.argmax(volumes))
+    low, high = value_area(volumes, poc_index, value_area_pct)
+    poc, val, vah = centers[poc_index], centers[low], centers[high]
+
+    if current_price > vah:
+        position_in_profile = 'ABOVE_VALUE'
+    elif current_price < val:
+        position_in_profile = 'BELOW_VALUE'
+    else:
+        position_in_profile = 'IN_VALUE'
+
+    # Niveles de alto volumen (HVN) y bajo volumen (LVN) entre los niveles con actividad
+    active = volumes > 0
+    avg_volume = volumes[active].mean() if active.any() else 0
+    hvn_levels = centers[active & (volumes > avg_volume * 1.5)]
+    lvn_levels = centers[active & (volumes < avg_volume * 0.5)]
+
+    top = np.argsort(-volumes, kind='stable')[:10]
+
+    return {
+        'poc': float(poc),
+        'vah': float(vah),
+        'val': float(val),
+        'value_area_range': float(vah - val),
+        'position': position_in_profile,
+        'current_price': float(current_price),
+        'hvn_levels': hvn_levels.tolist(),
+        'lvn_levels': lvn_levels.tolist(),
+        'profile': {float(centers[i]): float(volumes[i]) for i in top if volumes[i] > 0}  # Top 10 niveles
+    }
+
+
+class IncrementalVolumeProfile:
+    """
+    Perfil de volumen y VWAP con bandas actualizados barra a barra
+
+    Los niveles tienen un tamaño fijo (bin_size) y el array crece cuando el
+    precio sale del rango, así añadir una barra no recalcula el perfil. Sirve
+    para perfiles de sesión (reset() al inicio de cada sesión) o compuestos
+    de meses de M1.
+    """
+
+    def __init__(self, bin_size: float, distribute: bool = False):
+        """
+        Args:
+            bin_size: Tamaño de cada nivel de precio
+            distribute: Repartir el volumen de la barra entre low y high
+                (si False, todo el volumen va al nivel del cierre)
+        """
+        self.bin_size = bin_size
+        self.distribute = distribute
+        self.reset()
+
+    def reset(self):
+        """Vaciar el perfil (inicio de sesión)"""
+        self.origin = None           # Índice absoluto del primer nivel
+        self.volumes = np.zeros(0)
+        self.bars = 0
+        self.last_price = None
+
+        # Sumas acumuladas del VWAP
+        self.cum_volume = 0.0
+        self.cum_tpv = 0.0
+        self.cum_squared = 0.0
+        self.vwap = None
+
+    def _ensure_range(self, first: int, last: int):
+        if self.origin is None:
+            self.origin = first
+            self.volumes = np.zeros(last - first + 1)
+            return
+        end = self.origin + len(self.volumes) - 1
+        if first < self.origin or last > end:
+            before = max(0, self.origin - first)
+            after = max(0, last - end)
+            self.volumes = np.pad(self.volumes, (before, after))
+            self.origin -= before
+
+    def add_bars(self, high, low, close, volume):
+        """
+        Añadir barras en orden cronológico (escalares o arrays)
+        """
+        high = np.atleast_1d(np.asarray(high, dtype=np.float64))
+        low = np.atleast_1d(np.asarray(low, dtype=np.float64))
+        close = np.atleast_1d(np.asarray(close, dtype=np.float64))
+        volume = np.atleast_1d(np.asarray(volume, dtype=np.float64))
+        if len(close) == 0:
+            return
+
+        if self.distribute:
+            first_bin = np.floor(low / self.bin_size).astype(np.int64)
+            last_bin = np.floor(high / self.bin_size).astype(np.int64)
+        else:
+            first_bin = last_bin = np.floor(close / self.bin_size).astype(np.int64)
+
+        self._ensure_range(int(first_bin.min()), int(last_bin.max()))
+        start = first_bin - self.origin
+        stop = last_bin - self.origin + 1
+
+        # Reparto uniforme con un array de diferencias: O(barras + niveles)
+        share = volume / (stop - start)
+        diff = np.zeros(len(self.volumes) + 1)
+        np.add.at(diff, start, share)
+        np.add.at(diff, stop, -share)
+        self.volumes += np.cumsum(diff[:-1])
+
+        # VWAP y varianza acumulada (misma definición que calculate_vwap_analysis)
+        typical_price = (high + low + close) / 3
+        cum_volume = self.cum_volume + np.cumsum(volume)
+        cum_tpv = self.cum_tpv + np.cumsum(typical_price * volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = cum_tpv / cum_volume
+        squared = np.nan_to_num((typical_price - vwap) ** 2 * volume)
+
+        self.cum_volume = float(cum_volume[-1])
+        self.cum_tpv = float(cum_tpv[-1])
+        self.cum_squared += float(squared.sum())
+        self.vwap = float(vwap[-1]) if self.cum_volume > 0 else None
+        self.bars += len(close)
+        self.last_price = float(close[-1])
+
+    def add_bar(self, high: float, low: float, close: float, volume: float):
+        """Añadir una barra"""
+        self.add_bars(high, low, close, volume)
+
+    @property
+    def centers(self) -> np.ndarray:
+        return (self.origin + np.arange(len(self.volumes)) + 0.5) * self.bin_size
+
+    def levels(self, value_area_pct: float = 0.7) -> Dict:
+        """POC, área de valor y niveles HVN/LVN (vacío si no hay volumen)"""
+        if self.origin is None or self.volumes.sum() <= 0:
+            return {}
+        return profile_levels(self.centers, self.volumes, self.last_price, value_area_pct)
+
+    def vwap_bands(self) -> Dict:
+        """VWAP y bandas de 1, 2 y 3 desviaciones"""
+        if self.vwap is None:
+            return {}
+        std_dev = float(np.sqrt(self.cum_squared / self.cum_volume))
+        bands = {'vwap': self.vwap, 'std_dev': std_dev}
+        for k in (1, 2, 3):
+            bands[f'upper_band_{k}'] = self.vwap + std_dev * k
+            bands[f'lower_band_{k}'] = self.vwap - std_dev * k
+        return bands
+
+
 class VolumeFlowAnalyzer:
     """
     Análisis profesional de flujo de órdenes y volumen
@@ -31,6 +218,10 @@ class VolumeFlowAnalyzer:
         # Configuración
         self.volume_profile_bins = 50
         self.significant_volume_multiplier = 2.0
+        self.profile_bin_size = None  # Tamaño de nivel del perfil incremental (auto si None)
+        
+        # Perfil de sesión actualizado barra a barra
+        self.session_profile: Optional[IncrementalVolumeProfile] = None
         
         logger.info(f"Volume Flow Analyzer inicializado para {symbol}")
     
@@ -66,43 +257,27 @@ class VolumeFlowAnalyzer:
             return {'delta': 0, 'cumulative': 0, 'trend': 'NEUTRAL'}
         
         try:
-            delta_values = []
+            close = df['close'].to_numpy(dtype=np.float64)
+            volume = df['volume'].to_numpy(dtype=np.float64)[1:]
+            change = np.diff(close)
+            close = close[1:]
             
-            for i in range(1, len(df)):
-                close = df.iloc[i]['close']
-                prev_close = df.iloc[i-1]['close']
-                volume = df.iloc[i]['volume']
-                
-                # Método 1: Basado en dirección del precio
-                if close > prev_close:
-                    # Precio subió - estimar más volumen comprador
-                    buy_volume = volume * 0.65
-                    sell_volume = volume * 0.35
-                elif close < prev_close:
-                    # Precio bajó - estimar más volumen vendedor
-                    buy_volume = volume * 0.35
-                    sell_volume = volume * 0.65
-                else:
-                    # Sin cambio - 50/50
-                    buy_volume = volume * 0.5
-                    sell_volume = volume * 0.5
-                
-                # Método 2: Usar high, low, close para mejor estimación
-                if 'high' in df.columns and 'low' in df.columns:
-                    high = df.iloc[i]['high']
-                    low = df.iloc[i]['low']
-                    
-                    if high != low:
-                        # Calcular presión compradora/vendedora
-                        buy_pressure = (close - low) / (high - low)
-                        sell_pressure = (high - close) / (high - low)
-                        
-                        # Ajustar estimaciones
-                        buy_volume = volume * buy_pressure
-                        sell_volume = volume * sell_pressure
-                
-                delta = buy_volume - sell_volume
-                delta_values.append(delta)
+            # Método 1: Basado en dirección del precio (65/35 o 50/50)
+            buy_share = np.where(change > 0, 0.65, np.where(change < 0, 0.35, 0.5))
+            buy_volume = volume * buy_share
+            sell_volume = volume * (1 - buy_share)
+            
+            # Método 2: Usar high, low, close para mejor estimación
+            if 'high' in df.columns and 'low' in df.columns:
+                high = df['high'].to_numpy(dtype=np.float64)[1:]
+                low = df['low'].to_numpy(dtype=np.float64)[1:]
+                bar_range = high - low
+                has_range = bar_range != 0
+                safe_range = np.where(has_range, bar_range, 1.0)
+                buy_volume = np.where(has_range, volume * (close - low) / safe_range, buy_volume)
+                sell_volume = np.where(has_range, volume * (high - close) / safe_range, sell_volume)
+            
+            delta_values = (buy_volume - sell_volume).tolist()
             
             # Calcular métricas
             current_delta = delta_values[-1] if delta_values else 0
@@ -151,87 +326,46 @@ class VolumeFlowAnalyzer:
             bins = self.volume_profile_bins
         
         try:
-            prices = df['close'].values
-            volumes = df['volume'].values
-            
-            # Crear bins de precio
-            price_min = prices.min()
-            price_max = prices.max()
-            price_bins = np.linspace(price_min, price_max, bins)
-            
-            # Acumular volumen por nivel de precio
-            volume_profile = {}
-            
-            for i, price in enumerate(prices):
-                # Encontrar el bin correspondiente
-                bin_index = np.digitize(price, price_bins) - 1
-                bin_index = max(0, min(bin_index, len(price_bins) - 2))
-                
-                bin_price = (price_bins[bin_index] + price_bins[bin_index + 1]) / 2
-                
-                if bin_price not in volume_profile:
-                    volume_profile[bin_price] = 0
-                
-                volume_profile[bin_price] += volumes[i]
-            
-            if not volume_profile:
-                return {}
-            
-            # Ordenar por volumen
-            sorted_profile = sorted(volume_profile.items(), key=lambda x: x[1], reverse=True)
-            
-            # Calcular POC (Point of Control) - precio con más volumen
-            poc = sorted_profile[0][0] if sorted_profile else 0
-            
-            # Calcular Value Area (70% del volumen)
-            total_volume = sum(v for _, v in sorted_profile)
-            value_area_volume = total_volume * 0.7
-            
-            accumulated_volume = 0
-            value_area_prices = []
-            
-            for price, vol in sorted_profile:
-                accumulated_volume += vol
-                value_area_prices.append(price)
-                if accumulated_volume >= value_area_volume:
-                    break
+            prices = df['close'].to_numpy(dtype=np.float64)
+            volumes = df['volume'].to_numpy(dtype=np.float64)
             
-            # VAH (Value Area High) y VAL (Value Area Low)
-            vah = max(value_area_prices) if value_area_prices else price_max
-            val = min(value_area_prices) if value_area_prices else price_min
+            # Crear bins de precio y acumular volumen por nivel en una pasada
+            price_bins = np.linspace(prices.min(), prices.max(), bins)
+            bin_index = np.clip(np.digitize(prices, price_bins) - 1, 0, len(price_bins) - 2)
+            profile = np.bincount(bin_index, weights=volumes, minlength=len(price_bins) - 1)
+            centers = (price_bins[:-1] + price_bins[1:]) / 2
             
-            # Calcular nivel de balance
-            current_price = prices[-1]
-            position_in_profile = 'NEUTRAL'
-            
-            if current_price > vah:
-                position_in_profile = 'ABOVE_VALUE'
-            elif current_price < val:
-                position_in_profile = 'BELOW_VALUE'
-            else:
-                position_in_profile = 'IN_VALUE'
-            
-            # Identificar niveles de alto volumen (HVN) y bajo volumen (LVN)
-            avg_volume = total_volume / len(volume_profile)
-            hvn_levels = [p for p, v in volume_profile.items() if v > avg_volume * 1.5]
-            lvn_levels = [p for p, v in volume_profile.items() if v < avg_volume * 0.5]
-            
-            return {
-                'poc': poc,
-                'vah': vah,
-                'val': val,
-                'value_area_range': vah - val,
-                'position': position_in_profile,
-                'current_price': current_price,
-                'hvn_levels': sorted(hvn_levels),
-                'lvn_levels': sorted(lvn_levels),
-                'profile': dict(sorted_profile[:10])  # Top 10 niveles
-            }
+            return profile_levels(centers, profile, prices[-1])
             
         except Exception as e:
             logger.error(f"Error calculando volume profile: {e}")
             return {}
     
+    def update_session_profile(self, bar: Dict, new_session: bool = False) -> Dict:
+        """
+        Añade una barra al perfil de sesión incremental
+        
+        Args:
+            bar: Dict con high, low, close y volume (o tick_volume)
+            new_session: Reiniciar el perfil antes de añadir la barra
+            
+        Returns:
+            Niveles del perfil (POC, VAH, VAL...) con VWAP y bandas
+        """
+        if self.session_profile is None:
+            bin_size = self.profile_bin_size or bar['close'] * 0.0005
+            self.session_profile = IncrementalVolumeProfile(bin_size)
+        elif new_session:
+            self.session_profile.reset()
+        
+        volume = bar.get('volume', bar.get('tick_volume', 0))
+        self.session_profile.add_bar(bar['high'], bar['low'], bar['close'], volume)
+        
+        return {
+            **self.session_profile.levels(),
+            'vwap_bands': self.session_profile.vwap_bands()
+        }
+    
     def calculate_vwap_analysis(self, df: pd.DataFrame) -> Dict:
         """
         Análisis completo de VWAP con bandas de desviación
@@ -241,30 +375,22 @@ class VolumeFlowAnalyzer:
             return {}
         
         try:
-            # VWAP básico
-            typical_price = (df['high'] + df['low'] + df['close']) / 3
-            cumulative_tpv = (typical_price * df['volume']).cumsum()
-            cumulative_volume = df['volume'].cumsum()
-            
-            vwap = cumulative_tpv / cumulative_volume
+            high = df['high'].to_numpy(dtype=np.float64)
+            low = df['low'].to_numpy(dtype=np.float64)
+            close = df['close'].to_numpy(dtype=np.float64)
+            volume = df['volume'].to_numpy(dtype=np.float64)
             
-            # Calcular desviación estándar para bandas
-            squared_diff = ((typical_price - vwap) ** 2 * df['volume'])
-            variance = squared_diff.cumsum() / cumulative_volume
-            std_dev = np.sqrt(variance)
-            
-            # Bandas VWAP (1, 2, 3 desviaciones estándar)
-            upper_band_1 = vwap + std_dev
-            upper_band_2 = vwap + (std_dev * 2)
-            upper_band_3 = vwap + (std_dev * 3)
+            # VWAP básico
+            typical_price = (high + low + close) / 3
+            cumulative_volume = np.cumsum(volume)
+            vwap = np.cumsum(typical_price * volume) / cumulative_volume
             
-            lower_band_1 = vwap - std_dev
-            lower_band_2 = vwap - (std_dev * 2)
-            lower_band_3 = vwap - (std_dev * 3)
+            # Desviación estándar para bandas (solo se necesita el último valor)
+            squared_diff = (typical_price - vwap) ** 2 * volume
+            current_std = np.sqrt(np.nansum(squared_diff) / cumulative_volume[-1])
             
-            current_price = df['close'].iloc[-1]
-            current_vwap = vwap.iloc[-1]
-            current_std = std_dev.iloc[-1]
+            current_price = close[-1]
+            current_vwap = vwap[-1]
             
             # Determinar posición relativa a VWAP
             distance_from_vwap = current_price - current_vwap
@@ -284,7 +410,7 @@ class VolumeFlowAnalyzer:
             
             # Calcular pendiente de VWAP para tendencia
             if len(vwap) >= 10:
-                vwap_slope = (vwap.iloc[-1] - vwap.iloc[-10]) / vwap.iloc[-10]
+                vwap_slope = (vwap[-1] - vwap[-10]) / vwap[-10]
                 trend = 'BULLISH' if vwap_slope > 0.001 else 'BEARISH' if vwap_slope < -0.001 else 'NEUTRAL'
             else:
                 trend = 'NEUTRAL'
@@ -296,12 +422,12 @@ class VolumeFlowAnalyzer:
                 'stds_from_vwap': stds_from_vwap,
                 'signal': signal,
                 'trend': trend,
-                'upper_band_1': upper_band_1.iloc[-1],
-                'upper_band_2': upper_band_2.iloc[-1],
-                'upper_band_3': upper_band_3.iloc[-1],
-                'lower_band_1': lower_band_1.iloc[-1],
-                'lower_band_2': lower_band_2.iloc[-1],
-                'lower_band_3': lower_band_3.iloc[-1]
+                'upper_band_1': current_vwap + current_std,
+                'upper_band_2': current_vwap + current_std * 2,
+                'upper_band_3': current_vwap + current_std * 3,
+                'lower_band_1': current_vwap - current_std,
+                'lower_band_2': current_vwap - current_std * 2,
+                'lower_band_3': current_vwap - current_std * 3
             }
             
         except Exception as e:
@@ -317,32 +443,18 @@ class VolumeFlowAnalyzer:
             return {}
         
         try:
-            # Calcular Order Flow Imbalance
-            imbalances = []
-            
-            for i in range(1, len(df)):
-                # Calcular desequilibrio entre compras y ventas
-                close = df.iloc[i]['close']
-                open_price = df.iloc[i]['open']
-                high = df.iloc[i]['high']
-                low = df.iloc[i]['low']
-                volume = df.iloc[i]['volume']
-                
-                # Estimar agresividad compradora vs vendedora
-                if close > open_price:
-                    # Vela alcista - más agresividad compradora
-                    buy_aggression = (close - open_price) / (high - low + 0.0001)
-                    imbalance = buy_aggression * volume
-                else:
-                    # Vela bajista - más agresividad vendedora
-                    sell_aggression = (open_price - close) / (high - low + 0.0001)
-                    imbalance = -sell_aggression * volume
-                
-                imbalances.append(imbalance)
+            # Calcular Order Flow Imbalance: agresividad (cuerpo / rango) por volumen,
+            # positiva en velas alcistas y negativa en bajistas
+            close = df['close'].to_numpy(dtype=np.float64)[1:]
+            open_price = df['open'].to_numpy(dtype=np.float64)[1:]
+            high = df['high'].to_numpy(dtype=np.float64)[1:]
+            low = df['low'].to_numpy(dtype=np.float64)[1:]
+            volume = df['volume'].to_numpy(dtype=np.float64)[1:]
+            imbalances = (close - open_price) / (high - low + 0.0001) * volume
             
             # Calcular métricas de flujo
-            recent_flow = sum(imbalances[-5:]) if len(imbalances) >= 5 else 0
-            total_flow = sum(imbalances)
+            recent_flow = float(imbalances[-5:].sum()) if len(imbalances) >= 5 else 0
+            total_flow = float(imbalances.sum())
             
             # Detectar absorción (volumen alto sin movimiento de precio)
             recent_volume = df['volume'].iloc[-5:].mean()
@@ -357,8 +469,8 @@ class VolumeFlowAnalyzer:
             
             # Detectar momentum del flujo
             if len(imbalances) >= 10:
-                recent_momentum = sum(imbalances[-5:])
-                older_momentum = sum(imbalances[-10:-5])
+                recent_momentum = imbalances[-5:].sum()
+                older_momentum = imbalances[-10:-5].sum()
                 
                 if recent_momentum > older_momentum * 1.5:
                     flow_momentum = 'ACCELERATING_UP'
@@ -374,8 +486,8 @@ class VolumeFlowAnalyzer:
                 'total_flow': total_flow,
                 'flow_momentum': flow_momentum,
                 'absorption_detected': absorption_detected,
-                'buy_pressure': sum(i for i in imbalances if i > 0),
-                'sell_pressure': abs(sum(i for i in imbalances if i < 0)),
+                'buy_pressure': float(imbalances[imbalances > 0].sum()),
+                'sell_pressure': float(abs(imbalances[imbalances < 0].sum())),
                 'flow_direction': 'BULLISH' if recent_flow > 0 else 'BEARISH' if recent_flow < 0 else 'NEUTRAL'
             }
             
@@ -527,15 +639,15 @@ class VolumeFlowAnalyzer:
             institutional_threshold = avg_volume + (std_volume * 2)
             
             # Encontrar velas con volumen institucional
-            institutional_bars = []
-            for i in range(len(volumes)):
-                if volumes[i] > institutional_threshold:
-                    institutional_bars.append({
-                        'index': i,
-                        'volume': volumes[i],
-                        'price': prices[i],
-                        'ratio': volumes[i] / avg_volume
-                    })
+            institutional_bars = [
+                {
+                    'index': int(i),
+                    'volume': volumes[i],
+                    'price': prices[i],
+                    'ratio': volumes[i] / avg_volume
+                }
+                for i in np.flatnonzero(volumes > institutional_threshold)
+            ]
             
             # Analizar patrones de acumulación/distribución
             recent_institutional = [b for b in institutional_bars if b['index'] >= len(volumes) - 10]
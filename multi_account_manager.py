@@ -9,9 +9,9 @@ import asyncio
 import logging
 from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
-import MetaTrader5 as mt5
 
 # Configurar path del proyecto
 PROJECT_ROOT = Path(__file__).parent.absolute()
@@ -19,6 +19,7 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 from enhanced_modules.trade_validator import TradeValidator
 from notifiers.telegram_notifier import TelegramNotifier
+from multi_account_supervisor import AccountSupervisor, aggregate_snapshots
 
 # Configurar logging
 logging.basicConfig(
@@ -54,11 +55,16 @@ class MultiAccountManager:
             }
         }
         
-        # Inicializar componentes
+        # Un proceso MT5 persistente por cuenta
+        self.supervisor = AccountSupervisor(self.accounts)
+        
+        # Inicializar componentes; las órdenes del validador (SL/TP, cierres)
+        # se ejecutan en el worker de la cuenta
         self.telegram_notifier = self._initialize_telegram()
         self.trade_validator = TradeValidator(
             twelvedata_api_key=os.getenv('TWELVEDATA_API_KEY'),
-            telegram_notifier=self.telegram_notifier
+            telegram_notifier=self.telegram_notifier,
+            order_executor=self.supervisor.send_order
         )
         
         # Estado
@@ -86,6 +92,7 @@ class MultiAccountManager:
         logger.info("=" * 60)
         
         self.running = True
+        self.supervisor.start()
         
         # Notificar inicio
         if self.telegram_notifier:
@@ -111,141 +118,69 @@ class MultiAccountManager:
             await self.stop_monitoring()
     
     async def _monitoring_cycle(self):
-        """Ejecuta un ciclo de monitoreo de todas las cuentas"""
+        """
+        Ejecuta un ciclo de monitoreo de todas las cuentas
+        
+        Los snapshots llegan en paralelo desde los workers del supervisor
+        (un proceso con sesión MT5 persistente por cuenta), sin relogins.
+        """
         try:
             logger.info(f"Iniciando ciclo de monitoreo - {datetime.now().strftime('%H:%M:%S')}")
             
-            total_positions = 0
-            total_problems = 0
-            account_summary = []
+            loop = asyncio.get_running_loop()
+            snapshots = await loop.run_in_executor(None, self.supervisor.collect_snapshots)
+            summary = aggregate_snapshots(snapshots)
             
-            # Verificar cada cuenta
-            for account_name, account_config in self.accounts.items():
-                if not account_config['active']:
-                    continue
-                
-                try:
-                    logger.info(f"Verificando cuenta: {account_name}")
-                    
-                    # Conectar a la cuenta
-                    connected = await self._connect_to_account(account_config)
-                    
-                    if connected:
-                        # Analizar posiciones
-                        positions = mt5.positions_get()
-                        account_info = mt5.account_info()
-                        
-                        if account_info and positions is not None:
-                            position_count = len(positions)
-                            total_positions += position_count
-                            
-                            problems_found = 0
-                            
-                            # Verificar cada posición
-                            for pos in positions:
-                                if pos.sl == 0 or pos.tp == 0:
-                                    problems_found += 1
-                                    total_problems += 1
-                                    
-                                    # Validar con IA
-                                    logger.warning(f"Posición sin protección: #{pos.ticket} en {account_name}")
-                                    
-                                    try:
-                                        analysis = await self.trade_validator._analyze_position(pos)
-                                        await self.trade_validator._send_validation_notification(analysis)
-                                        logger.info(f"Notificación enviada para #{pos.ticket}")
-                                    except Exception as e:
-                                        logger.error(f"Error validando posición #{pos.ticket}: {e}")
-                            
-                            # Resumen de cuenta
-                            account_summary.append({
-                                'name': account_name,
-                                'login': account_info.login,
-                                'balance': account_info.balance,
-                                'equity': account_info.equity,
-                                'positions': position_count,
-                                'problems': problems_found,
-                                'status': 'CONNECTED'
-                            })
-                            
-                            logger.info(f"Cuenta {account_name}: {position_count} posiciones, {problems_found} problemas")
-                        
-                        else:
-                            logger.error(f"Error obteniendo datos de {account_name}")
-                            account_summary.append({
-                                'name': account_name,
-                                'login': account_config['login'],
-                                'status': 'ERROR'
-                            })
-                    
-                    else:
-                        logger.error(f"No se pudo conectar a {account_name}")
-                        account_summary.append({
-                            'name': account_name,
-                            'login': account_config['login'],
-                            'status': 'DISCONNECTED'
-                        })
-                
-                except Exception as e:
-                    logger.error(f"Error procesando cuenta {account_name}: {e}")
-                    account_summary.append({
-                        'name': account_name,
-                        'login': account_config.get('login', 'Unknown'),
-                        'status': 'ERROR'
-                    })
+            for account in summary['account_summary']:
+                self.account_status[account['name']] = account
+                if account['status'] == 'CONNECTED':
+                    logger.info(f"Cuenta {account['name']}: {account['positions']} posiciones, {account['problems']} problemas")
+                else:
+                    logger.error(f"Cuenta {account['name']}: {account['status']}")
+            
+            # Validar con IA todas las posiciones sin protección en paralelo,
+            # con los datos de mercado que leyó el worker de cada cuenta
+            if summary['unprotected']:
+                await asyncio.gather(*[
+                    self._validate_unprotected(
+                        account_name, position,
+                        snapshots[account_name].get('market', {}).get(position['symbol'])
+                    )
+                    for account_name, position in summary['unprotected']
+                ])
             
             # Enviar resumen por Telegram
-            if total_problems > 0:
-                await self._send_summary_notification(account_summary, total_positions, total_problems)
+            if summary['total_problems'] > 0:
+                await self._send_summary_notification(
+                    summary['account_summary'],
+                    summary['total_positions'],
+                    summary['total_problems']
+                )
             
-            logger.info(f"Ciclo completado - {total_positions} posiciones, {total_problems} problemas")
+            logger.info(f"Ciclo completado - {summary['total_positions']} posiciones, {summary['total_problems']} problemas")
             
         except Exception as e:
             logger.error(f"Error en ciclo de monitoreo: {e}")
     
-    async def _connect_to_account(self, account_config: Dict) -> bool:
+    async def _validate_unprotected(self, account_name: str, position: Dict,
+                                    market_data: Optional[Dict] = None):
         """
-        Conecta a una cuenta específica de MT5
-        Args:
-            account_config: Configuración de la cuenta
-        Returns:
-            True si la conexión fue exitosa
+        Valida con IA una posición sin SL/TP recibida de un worker
+        
+        market_data viene del snapshot del worker: este proceso no tiene
+        sesión MT5, así que el validador no debe consultarla aquí.
         """
+        logger.warning(f"Posición sin protección: #{position['ticket']} en {account_name}")
+        
         try:
-            # Cerrar conexión anterior
-            mt5.shutdown()
-            
-            # Inicializar MT5 con path específico si está configurado
-            mt5_path = account_config.get('path')
-            if mt5_path and os.path.exists(mt5_path):
-                if not mt5.initialize(path=mt5_path):
-                    logger.warning(f"Error inicializando con path específico, usando default")
-                    if not mt5.initialize():
-                        return False
-            else:
-                if not mt5.initialize():
-                    return False
-            
-            # Intentar login si hay credenciales
-            login = account_config.get('login')
-            password = account_config.get('password')
-            server = account_config.get('server')
-            
-            if login and password and server:
-                if not mt5.login(login, password, server):
-                    logger.warning(f"Login fallido para cuenta {login}, usando conexión actual")
-            
-            # Verificar conexión
-            account_info = mt5.account_info()
-            if account_info:
-                logger.info(f"Conectado a cuenta {account_info.login} - Balance: ${account_info.balance:.2f}")
-                return True
-            else:
-                return False
-                
+            analysis = await self.trade_validator._analyze_position(
+                SimpleNamespace(**position), mt5_market_data=market_data
+            )
+            analysis.account = account_name
+            await self.trade_validator._send_validation_notification(analysis)
+            logger.info(f"Notificación enviada para #{position['ticket']}")
         except Exception as e:
-            logger.error(f"Error conectando a cuenta: {e}")
-            return False
+            logger.error(f"Error validando posición #{position['ticket']}: {e}")
     
     async def _send_summary_notification(self, account_summary: List[Dict], total_positions: int, total_problems: int):
         """
@@ -307,7 +242,7 @@ class MultiAccountManager:
                 "<i>Monitoreo de cuenta desactivado</i>"
             )
         
-        mt5.shutdown()
+        self.supervisor.stop()
         logger.info("Exness Account Manager detenido")
     
     def get_status(self) -> Dict:
@@ -316,6 +251,7 @@ class MultiAccountManager:
             'running': self.running,
             'accounts': len(self.accounts),
             'account_status': self.account_status,
+            'workers': self.supervisor.get_status(),
             'telegram_enabled': self.telegram_notifier is not None
         }
 
@@ -0,0 +1,445 @@
+"""
+Multi Account Supervisor - Un proceso persistente por cuenta MT5
+La API de MT5 mantiene una única sesión por proceso: en lugar de hacer
+shutdown/initialize/login de cada cuenta en cada ciclo, cada cuenta vive en su
+propio proceso (conectado una sola vez) y responde snapshots por IPC.
+Las órdenes (modificar SL/TP, cerrar) también se ejecutan en el worker dueño
+de la cuenta: el proceso principal no tiene sesión MT5.
+Version: 3.0.0
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import importlib
+import multiprocessing as mp
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CMD_SNAPSHOT = 'snapshot'
+CMD_MODIFY = 'modify'
+CMD_CLOSE = 'close'
+CMD_STOP = 'stop'
+
+ORDER_COMMANDS = (CMD_MODIFY, CMD_CLOSE)
+
+# Barras H1 enviadas con los datos de mercado de posiciones sin protección
+MARKET_BARS = 50
+
+def _record_to_dict(record) -> Dict[str, Any]:
+    """Convierte un namedtuple de MT5 (TradePosition, AccountInfo...) en dict serializable"""
+    if record is None:
+        return {}
+    if hasattr(record, '_asdict'):
+        return dict(record._asdict())
+    return {k: v for k, v in vars(record).items() if not k.startswith('_')}
+
+def _connect(mt5, account_config: Dict) -> bool:
+    """Inicializa MT5 y hace login en la cuenta del worker"""
+    mt5_path = account_config.get('path')
+    if mt5_path and os.path.exists(mt5_path):
+        if not mt5.initialize(path=mt5_path):
+            if not mt5.initialize():
+                return False
+    elif not mt5.initialize():
+        return False
+
+    login = account_config.get('login')
+    password = account_config.get('password')
+    server = account_config.get('server')
+    if login and password and server:
+        if not mt5.login(login, password=password, server=server):
+            return False
+
+    return mt5.account_info() is not None
+
+def _market_data(mt5, symbol: str, tick) -> Dict[str, Any]:
+    """Datos de mercado en el formato de TradeValidator._get_mt5_market_data"""
+    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_H1, 0, MARKET_BARS)
+    if tick is None or rates is None:
+        return {'source': 'error', 'symbol': symbol}
+    return {
+        'source': 'mt5',
+        'symbol': symbol,
+        'current_price': tick.bid,
+        'spread': tick.ask - tick.bid,
+        'rates': rates.tolist() if hasattr(rates, 'tolist') else list(rates),
+        'timestamp': datetime.now().isoformat(),
+    }
+
+def _take_snapshot(mt5) -> Dict[str, Any]:
+    """
+    Lee cuenta, posiciones y ticks de los símbolos con posición
+
+    Para los símbolos con posiciones sin SL/TP incluye también los datos de
+    mercado que necesita la validación: el proceso principal no tiene sesión MT5.
+    """
+    account_info = mt5.account_info()
+    positions = mt5.positions_get()
+    if account_info is None or positions is None:
+        return {'status': 'ERROR', 'error': str(mt5.last_error())}
+
+    positions = [_record_to_dict(p) for p in positions]
+    unprotected = [p for p in positions if p['sl'] == 0 or p['tp'] == 0]
+    unprotected_symbols = {p['symbol'] for p in unprotected}
+    ticks, market = {}, {}
+    for symbol in {p['symbol'] for p in positions}:
+        tick = mt5.symbol_info_tick(symbol)
+        if tick is not None:
+            ticks[symbol] = {'bid': tick.bid, 'ask': tick.ask, 'time': tick.time}
+        if symbol in unprotected_symbols:
+            market[symbol] = _market_data(mt5, symbol, tick)
+
+    return {
+        'status': 'CONNECTED',
+        'account_info': _record_to_dict(account_info),
+        'positions': positions,
+        'ticks': ticks,
+        'market': market,
+        'unprotected': [p['ticket'] for p in unprotected],
+    }
+
+def _execute_order(mt5, command: str, payload: Dict) -> Dict[str, Any]:
+    """
+    Ejecuta CMD_MODIFY (sl/tp) o CMD_CLOSE sobre una posición de la cuenta
+
+    Returns:
+        Dict con status ('DONE', 'REJECTED', 'NOT_FOUND' o 'ERROR') y el
+        resultado de order_send
+    """
+    ticket = payload['ticket']
+    positions = mt5.positions_get(ticket=ticket)
+    if not positions:
+        return {'status': 'NOT_FOUND', 'error': f"Posición {ticket} no encontrada"}
+    position = positions[0]
+
+    if command == CMD_MODIFY:
+        request = {
+            'action': mt5.TRADE_ACTION_SLTP,
+            'symbol': position.symbol,
+            'position': ticket,
+            'sl': payload['sl'],
+            'tp': payload['tp'],
+        }
+    else:
+        tick = mt5.symbol_info_tick(position.symbol)
+        if tick is None:
+            return {'status': 'ERROR', 'error': str(mt5.last_error())}
+        request = {
+            'action': mt5.TRADE_ACTION_DEAL,
+            'position': ticket,
+            'symbol': position.symbol,
+            'volume': position.volume,
+            'type': mt5.ORDER_TYPE_SELL if position.type == 0 else mt5.ORDER_TYPE_BUY,
+            'price': tick.bid if position.type == 0 else tick.ask,
+            'magic': 0,
+            'comment': payload.get('comment', ''),
+        }
+
+    result = mt5.order_send(request)
+    if result is None:
+        return {'status': 'ERROR', 'error': str(mt5.last_error())}
+    result = _record_to_dict(result)
+    # El TradeRequest anidado no hace falta en el proceso principal
+    result.pop('request', None)
+    return {
+        'status': 'DONE' if result['retcode'] == mt5.TRADE_RETCODE_DONE else 'REJECTED',
+        'result': result,
+    }
+
+def account_worker(account_name: str, account_config: Dict, mt5_module: str,
+                   commands, results, replies=None):
+    """
+    Proceso worker de una cuenta
+
+    Se conecta una vez y atiende comandos hasta recibir CMD_STOP. Si la
+    sesión se pierde, reconecta antes de responder.
+
+    Args:
+        account_name: Nombre de la cuenta
+        account_config: login/password/server/path
+        mt5_module: Nombre del módulo MT5 a importar ('MetaTrader5' o un fake)
+        commands: Cola de comandos (id, comando, payload)
+        results: Cola compartida de snapshots al supervisor
+        replies: Cola compartida de resultados de órdenes (por defecto results)
+    """
+    mt5 = importlib.import_module(mt5_module)
+    connects = 0
+    connected = False
+
+    while True:
+        try:
+            cycle_id, command, payload = commands.get()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if command == CMD_STOP:
+            break
+
+        response = {
+            'account': account_name,
+            'login': account_config.get('login'),
+            'cycle': cycle_id,
+            'pid': os.getpid(),
+            'timestamp': datetime.now().isoformat(),
+        }
+        try:
+            if not connected or mt5.account_info() is None:
+                connects += 1
+                connected = _connect(mt5, account_config)
+            if not connected:
+                response.update({'status': 'DISCONNECTED', 'error': str(mt5.last_error())})
+            elif command in ORDER_COMMANDS:
+                response.update(_execute_order(mt5, command, payload))
+            else:
+                response.update(_take_snapshot(mt5))
+                connected = response['status'] == 'CONNECTED'
+        except Exception as e:
+            connected = False
+            response.update({'status': 'ERROR', 'error': str(e)})
+
+        response['connects'] = connects
+        if command in ORDER_COMMANDS and replies is not None:
+            replies.put(response)
+        else:
+            results.put(response)
+
+    try:
+        mt5.shutdown()
+    except Exception:
+        pass
+
+class AccountSupervisor:
+    """
+    Supervisor de workers por cuenta
+
+    Lanza un proceso persistente por cuenta activa, pide snapshots a todas en
+    paralelo, enruta las órdenes al worker de cada cuenta y reinicia los
+    workers que mueran.
+    """
+
+    def __init__(self,
+                 accounts: Dict[str, Dict],
+                 mt5_module: str = 'MetaTrader5',
+                 snapshot_timeout: float = 30.0,
+                 context: Optional[Any] = None):
+        """
+        Args:
+            accounts: {nombre: configuración} como en MultiAccountManager.accounts
+            mt5_module: Módulo MT5 que importan los workers (permite un fake en tests)
+            snapshot_timeout: Segundos máximos de espera por ciclo
+            context: Contexto de multiprocessing (por defecto 'spawn', igual que Windows)
+        """
+        self.accounts = {name: cfg for name, cfg in accounts.items() if cfg.get('active', True)}
+        self.mt5_module = mt5_module
+        self.snapshot_timeout = snapshot_timeout
+        self.ctx = context or mp.get_context('spawn')
+
+        self.workers: Dict[str, Any] = {}
+        self.commands: Dict[str, Any] = {}
+        self.results = None
+        self.replies = None
+        self.cycle_id = 0
+        self.order_id = 0
+        # Una orden en vuelo a la vez: las respuestas comparten cola
+        self.order_lock = threading.Lock()
+        self.restarts = {name: 0 for name in self.accounts}
+        self.last_snapshots: Dict[str, Dict] = {}
+
+    def _spawn(self, name: str):
+        commands = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=account_worker,
+            args=(name, self.accounts[name], self.mt5_module, commands, self.results, self.replies),
+            name=f"mt5-{name}",
+            daemon=True
+        )
+        process.start()
+        self.workers[name] = process
+        self.commands[name] = commands
+        logger.info(f"Worker de {name} iniciado (pid {process.pid})")
+
+    def start(self):
+        """Inicia un worker por cuenta activa"""
+        if self.results is None:
+            self.results = self.ctx.Queue()
+            self.replies = self.ctx.Queue()
+        for name in self.accounts:
+            if name not in self.workers:
+                self._spawn(name)
+
+    def _ensure_alive(self):
+        for name, process in list(self.workers.items()):
+            if not process.is_alive():
+                logger.warning(f"Worker de {name} terminó (exitcode {process.exitcode}), reiniciando")
+                self.restarts[name] += 1
+                self._spawn(name)
+
+    def collect_snapshots(self, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Pide un snapshot a todas las cuentas y espera las respuestas
+
+        Returns:
+            {cuenta: snapshot}; las cuentas que no respondan a tiempo quedan
+            con status 'TIMEOUT'
+        """
+        self.start()
+        self._ensure_alive()
+
+        self.cycle_id += 1
+        cycle_id = self.cycle_id
+        for commands in self.commands.values():
+            commands.put((cycle_id, CMD_SNAPSHOT, None))
+
+        snapshots = {}
+        deadline = time.monotonic() + (timeout if timeout is not None else self.snapshot_timeout)
+        while len(snapshots) < len(self.workers):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = self.results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # Respuestas tardías de ciclos anteriores se descartan
+            if response.get('cycle') == cycle_id:
+                snapshots[response['account']] = response
+
+        for name in self.workers:
+            if name not in snapshots:
+                logger.warning(f"Cuenta {name} sin respuesta en el ciclo {cycle_id}")
+                snapshots[name] = {
+                    'account': name,
+                    'login': self.accounts[name].get('login'),
+                    'cycle': cycle_id,
+                    'status': 'TIMEOUT',
+                }
+
+        self.last_snapshots = snapshots
+        return snapshots
+
+    def send_order(self, account: str, command: str, payload: Dict,
+                   timeout: Optional[float] = None) -> Dict:
+        """
+        Ejecuta una orden en el worker que tiene la sesión de la cuenta
+
+        Args:
+            account: Nombre de la cuenta dueña de la posición
+            command: CMD_MODIFY (payload con ticket, sl, tp) o CMD_CLOSE
+                (payload con ticket y comment opcional)
+            payload: Parámetros de la orden
+            timeout: Segundos máximos de espera (por defecto snapshot_timeout)
+
+        Returns:
+            Respuesta del worker con status 'DONE' si order_send devolvió
+            TRADE_RETCODE_DONE; 'TIMEOUT' si no respondió a tiempo
+        """
+        if command not in ORDER_COMMANDS:
+            raise ValueError(f"Comando de orden no válido: {command}")
+        if account not in self.accounts:
+            return {'account': account, 'status': 'UNKNOWN_ACCOUNT'}
+
+        with self.order_lock:
+            self.start()
+            self._ensure_alive()
+
+            self.order_id += 1
+            order_id = self.order_id
+            self.commands[account].put((order_id, command, payload))
+
+            deadline = time.monotonic() + (timeout if timeout is not None else self.snapshot_timeout)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    response = self.replies.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                # Respuestas de órdenes anteriores que expiraron se descartan
+                if response.get('cycle') == order_id:
+                    return response
+
+        logger.warning(f"Cuenta {account} sin respuesta a la orden {order_id} ({command})")
+        return {'account': account, 'cycle': order_id, 'status': 'TIMEOUT'}
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene todos los workers"""
+        for commands in self.commands.values():
+            try:
+                commands.put((self.cycle_id, CMD_STOP, None))
+            except Exception:
+                pass
+        for name, process in self.workers.items():
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Worker de {name} no terminó, forzando cierre")
+                process.terminate()
+                process.join(1)
+        self.workers.clear()
+        self.commands.clear()
+
+    def get_status(self) -> Dict:
+        """Estado de los workers"""
+        return {
+            name: {
+                'pid': process.pid,
+                'alive': process.is_alive(),
+                'restarts': self.restarts.get(name, 0),
+                'last_status': self.last_snapshots.get(name, {}).get('status'),
+            }
+            for name, process in self.workers.items()
+        }
+
+def aggregate_snapshots(snapshots: Dict[str, Dict]) -> Dict[str, Any]:
+    """
+    Agrega los snapshots de todas las cuentas
+
+    Returns:
+        Dict con total_positions, total_problems, account_summary (formato de
+        MultiAccountManager._send_summary_notification) y unprotected
+        [(cuenta, posición)]
+    """
+    total_positions = 0
+    total_problems = 0
+    account_summary: List[Dict] = []
+    unprotected = []
+
+    for name, snapshot in snapshots.items():
+        if snapshot.get('status') != 'CONNECTED':
+            account_summary.append({
+                'name': name,
+                'login': snapshot.get('login', 'Unknown'),
+                'status': snapshot.get('status', 'ERROR')
+            })
+            continue
+
+        account_info = snapshot['account_info']
+        positions = snapshot['positions']
+        unprotected_tickets = set(snapshot.get('unprotected', []))
+
+        total_positions += len(positions)
+        total_problems += len(unprotected_tickets)
+        unprotected.extend(
+            (name, position) for position in positions
+            if position['ticket'] in unprotected_tickets
+        )
+
+        account_summary.append({
+            'name': name,
+            'login': account_info.get('login'),
+            'balance': account_info.get('balance', 0.0),
+            'equity': account_info.get('equity', 0.0),
+            'positions': len(positions),
+            'problems': len(unprotected_tickets),
+            'status': 'CONNECTED'
+        })
+
+    return {
+        'total_positions': total_positions,
+        'total_problems': total_problems,
+        'account_summary': account_summary,
+        'unprotected': unprotected,
+    }
@@ -20,6 +20,7 @@ from signals.llm_validator import validate_signal
 from notifiers.telegram import TelegramNotifier
 from data.twelvedata import price as td_price, indicator as td_indicator
 from data.features import rvol_from_series
+from data.levels import last_pivots
 from risk.advanced_risk import AdvancedRiskManager
 from ai.agent import AIAgent
 
@@ -528,14 +529,8 @@ def compute_atr_from_series(highs: List[float], lows: List[float], closes: List[
 
 def compute_sr_from_series(highs: List[float], lows: List[float], window: int = 5) -> tuple:
     support, resistance = None, None
-    n = len(highs)
     try:
-        for i in range(n-1-window, window, -1):
-            if all(highs[i] > highs[i-k] for k in range(1, window+1)) and all(highs[i] > highs[i+k] for k in range(1, window+1)):
-                resistance = highs[i]; break
-        for i in range(n-1-window, window, -1):
-            if all(lows[i] < lows[i-k] for k in range(1, window+1)) and all(lows[i] < lows[i+k] for k in range(1, window+1)):
-                support = lows[i]; break
+        support, resistance = last_pivots(highs, lows, order=window)
     except Exception:
         pass
     if resistance is None and highs:
@@ -0,0 +1,334 @@
+"""
+LLM Decision Cache - Caché semántica de decisiones de IA
+Clave por snapshot de indicadores cuantizado, TTL + LRU y fusión de
+peticiones idénticas en vuelo (hilos y asyncio)
+"""
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Paso de cuantización por nombre de campo (último componente de la ruta).
+# Valores absolutos: RSI en bloques de 5, ADX de 5, BB de 0.1...
+DEFAULT_STEPS: Dict[str, float] = {
+    'rsi': 5.0,
+    'adx': 5.0,
+    'bb_position': 0.1,
+    'atr_percent': 0.25,
+    'volume_ratio': 0.25,
+    'rvol': 0.25,
+    'confidence': 5.0,
+    'confianza': 0.05,
+    'dist_atr': 0.25,
+}
+
+# Campos relativos al precio: se cuantizan en escala logarítmica con este
+# paso relativo (0.1%) para que la clave no dependa del nivel absoluto
+DEFAULT_RELATIVE: Dict[str, float] = {
+    'price': 0.001,
+    'precio': 0.001,
+    'current_price': 0.001,
+    'price_open': 0.001,
+    'sl': 0.001,
+    'tp': 0.001,
+}
+
+# Componentes de nombre que indican un nivel de precio (ema_20, bb_upper,
+# support, va_high...): sin regla propia usan el paso relativo del precio
+PRICE_LIKE_TOKENS = frozenset(('ema', 'sma', 'wma', 'vwap', 'poc', 'level', 'support', 'resistance',
+                               'pivot', 'upper', 'lower', 'middle', 'high', 'low', 'open', 'close',
+                               'entry', 'stop'))
+
+# Campos tipo MACD: signo y orden de magnitud (dos cifras significativas en log2)
+SIGNED_LOG_FIELDS = ('macd', 'macd_signal', 'macd_hist', 'histogram', 'momentum', 'profit')
+
+# Textos más largos (análisis libres, razonamientos) entran en la clave como huella
+MAX_TEXT_LENGTH = 32
+
+
+def is_price_like(name: str) -> bool:
+    """Si el nombre de un campo corresponde a un nivel de precio"""
+    return any(token.rstrip('0123456789') in PRICE_LIKE_TOKENS for token in name.lower().split('_'))
+
+
+class FeatureQuantizer:
+    """
+    Convierte un snapshot de mercado en una clave estable y hashable
+
+    Los números se agrupan en cubetas por campo; los textos cortos se
+    mantienen tal cual y los largos se sustituyen por una huella del texto
+    normalizado (mayúsculas, espacios colapsados), ya que el modelo los
+    lee. Snapshots que solo difieren dentro de una cubeta producen la
+    misma clave.
+    """
+
+    def __init__(self,
+                 steps: Optional[Mapping[str, float]] = None,
+                 relative: Optional[Mapping[str, float]] = None,
+                 default_step: float = 0.05,
+                 price_step: float = 0.001,
+                 ignore: Iterable[str] = ('timestamp', 'time', 'ticket')):
+        """
+        Args:
+            steps: Paso absoluto por campo (se combina con DEFAULT_STEPS)
+            relative: Paso relativo (log) por campo de precio
+            default_step: Paso relativo para números sin regla propia
+            price_step: Paso relativo para niveles de precio sin regla propia (is_price_like)
+            ignore: Campos que no forman parte de la clave
+        """
+        self.steps = {**DEFAULT_STEPS, **(steps or {})}
+        self.relative = {**DEFAULT_RELATIVE, **(relative or {})}
+        self.default_step = default_step
+        self.price_step = price_step
+        self.ignore = set(ignore)
+
+    def quantize(self, features: Any) -> Tuple:
+        """Clave cuantizada de un dict (anidado) de características"""
+        items = []
+        self._flatten(features, (), items)
+        return tuple(sorted(items, key=lambda item: item[0]))
+
+    def bucket(self, name: str, value: float):
+        """Cubeta de un valor numérico según el nombre del campo"""
+        if value is None or not math.isfinite(value):
+            return None
+        if name in self.steps:
+            return int(math.floor(value / self.steps[name]))
+        step = self.relative.get(name)
+        if step is None:
+            step = self.price_step if is_price_like(name) else self.default_step
+        return self._log_bucket(value, step, name in SIGNED_LOG_FIELDS)
+
+    def _log_bucket(self, value: float, step: float, coarse: bool):
+        if value == 0:
+            return 0
+        sign = 1 if value > 0 else -1
+        if coarse:
+            # Signo y magnitud: ~19% de ancho por cubeta
+            return sign, int(math.floor(math.log2(abs(value)) * 4))
+        return sign, int(math.floor(math.log(abs(value)) / math.log1p(step)))
+
+    def _flatten(self, value: Any, path: Tuple, items: list):
+        if path and path[-1] in self.ignore:
+            return
+        if isinstance(value, Mapping):
+            for key, item in value.items():
+                self._flatten(item, path + (str(key),), items)
+        elif isinstance(value, (list, tuple)):
+            for i, item in enumerate(value):
+                # Listas de dicts con 'tf' (tablas por temporalidad) se indexan por tf
+                label = item.get('tf', i) if isinstance(item, Mapping) else i
+                self._flatten(item, path + (str(label),), items)
+        elif isinstance(value, bool) or value is None:
+            items.append(('.'.join(path), value))
+        elif isinstance(value, (int, float)):
+            items.append(('.'.join(path), self.bucket(path[-1] if path else '', float(value))))
+        elif isinstance(value, str):
+            items.append(('.'.join(path), self._text_key(value)))
+        else:
+            items.append(('.'.join(path), self._text_key(str(value))))
+
+    def _text_key(self, text: str) -> str:
+        text = ' '.join(text.split()).upper()
+        if len(text) <= MAX_TEXT_LENGTH:
+            return text
+        return 'sha1:' + hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class LLMDecisionCache:
+    """
+    Caché LRU con TTL para respuestas de LLM y fusión de peticiones en vuelo
+
+    Mientras una clave se está calculando, las demás peticiones con la
+    misma clave esperan el mismo resultado en lugar de lanzar otra llamada
+    al modelo (desde hilos o desde corrutinas).
+    """
+
+    def __init__(self, name: str = 'llm', max_entries: int = 512, ttl: float = 120.0,
+                 quantizer: Optional[FeatureQuantizer] = None):
+        """
+        Args:
+            name: Nombre para estadísticas
+            max_entries: Entradas máximas (se expulsa la menos usada)
+            ttl: Segundos de validez de una respuesta
+            quantizer: Cuantizador para make_key
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantizer = quantizer or FeatureQuantizer()
+
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.lock = threading.RLock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'errors': 0
+        }
+
+    def make_key(self, namespace: str, features: Any) -> Tuple:
+        """Clave de caché: espacio de nombres + características cuantizadas"""
+        return (namespace, self.quantizer.quantize(features))
+
+    # Acceso directo
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self.lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            self.stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Eliminar una clave (o todas)"""
+        with self.lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    # Cálculo con fusión
+
+    def _claim(self, key: Hashable):
+        """(encontrado, valor, future, es_líder)"""
+        with self.lock:
+            missing = object()
+            value = self.get(key, missing)
+            if value is not missing:
+                self.stats['hits'] += 1
+                return True, value, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return False, None, future, False
+            self.stats['misses'] += 1
+            future = Future()
+            self._inflight[key] = future
+            return False, None, future, True
+
+    def _settle(self, key: Hashable, future: Future, value: Any = None,
+                error: Optional[BaseException] = None, store: bool = False):
+        with self.lock:
+            if store:
+                self.put(key, value)
+            self._inflight.pop(key, None)
+        if error is not None:
+            self.stats['errors'] += 1
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        """
+        Valor cacheado o calculado una sola vez para todas las peticiones en vuelo
+
+        Args:
+            key: Clave (ver make_key)
+            compute: Llamada al modelo
+            cacheable: Si el resultado se guarda (por defecto, si no es None)
+        """
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if not leader:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value, store=cacheable(value))
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                              cacheable: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        """Versión asíncrona de get_or_compute (compute devuelve una corrutina)"""
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value, store=cacheable(value))
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas y tasa de aciertos (hits + fusionadas sobre el total)"""
+        with self.lock:
+            stats = dict(self.stats)
+            entries, inflight = len(self._entries), len(self._inflight)
+        requests = stats['hits'] + stats['misses'] + stats['coalesced']
+        return {
+            'name': self.name,
+            **stats,
+            'requests': requests,
+            'hit_rate': (stats['hits'] + stats['coalesced']) / requests if requests else 0.0,
+            'entries': entries,
+            'inflight': inflight,
+            'ttl': self.ttl
+        }
+
+
+def level_distances(price: float, levels: Mapping[str, Optional[float]], scale: float) -> Dict[str, Dict[str, float]]:
+    """
+    Distancia del precio a cada nivel en unidades de `scale` (normalmente ATR)
+
+    Returns:
+        {nivel: {'dist_atr': distancia}} listo para cuantizar
+    """
+    distances = {}
+    if not price or not scale or scale <= 0:
+        return distances
+    for name, level in levels.items():
+        if level:
+            distances[name] = {'dist_atr': (price - level) / scale}
+    return distances
+
+
+# Registro de cachés para reportar tasas de acierto desde un solo sitio
+_caches: Dict[str, LLMDecisionCache] = {}
+_registry_lock = threading.Lock()
+
+def get_llm_cache(name: str, **kwargs) -> LLMDecisionCache:
+    """Caché compartida por nombre (se crea en la primera llamada)"""
+    with _registry_lock:
+        if name not in _caches:
+            _caches[name] = LLMDecisionCache(name=name, **kwargs)
+        return _caches[name]
+
+def get_llm_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todas las cachés registradas"""
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_stats() for cache in caches}
@@ -9,8 +9,9 @@ Análisis avanzado con múltiples modelos y estrategias de consenso
 import json
 import logging
 import asyncio
+import threading
+import time
 import aiohttp
-from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -19,6 +20,10 @@ import pandas as pd
 from concurrent.futures import ThreadPoolExecutor
 import re
 
+from src.ai.llm_cache import LLMDecisionCache, level_distances
+from src.ai.prompt_builder import (CompactPrompt, PromptBuilder, PromptMetrics, compact_number,
+                                   ollama_options, summarize_series)
+
 try:
     from openai import OpenAI
     OPENAI_AVAILABLE = True
@@ -27,6 +32,53 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Ningún modelo respondió: no se cachea (a diferencia de "sin consenso")
+_NO_RESULTS = object()
+
+# La decisión está completa cuando termina la línea POSITION_SIZE o empieza
+# REASONING: el resto de la generación es texto libre que no se usa
+_DECISION_END = re.compile(r'^\s*(?:POSITION_SIZE:[^\n]*\n|REASONING:)', re.MULTILINE)
+_ACTION_LINE = re.compile(r'ACTION:\s*[A-Z_]+\s*\n')
+
+# Instrucciones estáticas del ensemble: mismo texto en cada petición para que
+# Ollama reutilice el prefijo evaluado; los datos de mercado van aparte
+ADVANCED_PREAMBLE = """
+You are an elite quantitative trader with 20 years of experience.
+Analyze the market snapshot in the user message and provide a professional trading signal.
+
+DATA FORMAT:
+- One line per timeframe: [tf] rsi macd signal hist bb_pos (0-1 in bands) atr atr% adx vol_ratio, plus flags
+- Price series: n=bars last chg=change rng=min-max pos=position in range vol=per-bar volatility
+  trend=regression slope in per-bar deviations tail=latest closes
+- Patterns: +1 bullish, -1 bearish
+
+REQUIRED OUTPUT FORMAT:
+----------------------
+ACTION: [BUY/SELL/NO_TRADE]
+ENTRY: [exact price]
+SL: [stop loss price]
+TP1: [first take profit - 30% position]
+TP2: [second take profit - 50% position]
+TP3: [third take profit - 20% position]
+CONFIDENCE: [0-100]%
+RRR: [risk reward ratio]
+POSITION_SIZE: [0.01-0.10] lots
+REASONING: [detailed explanation in one line]
+STRATEGY: [strategy name]
+TIMEFRAME: [recommended timeframe]
+DURATION: [expected trade duration]
+
+IMPORTANT RULES:
+1. Only trade if confidence > 65%
+2. Risk Reward Ratio must be > 1.5
+3. Consider market volatility for SL/TP
+4. Use ATR for dynamic stop loss
+5. Consider support/resistance levels
+6. Account for market sentiment
+7. Be precise with all numeric values
+8. Think step by step before deciding
+"""
+
 class SignalStrength(Enum):
     """Fuerza de la señal de trading"""
     VERY_STRONG_BUY = 5
@@ -73,6 +125,74 @@ class TradingSignal:
             'market_conditions': self.market_conditions
         }
 
+class LatencyHistogram:
+    """Histograma de latencias (segundos) y tasa de respuesta de un modelo"""
+
+    BUCKETS = (1, 2, 5, 10, 15, 20, 30, 60, float('inf'))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.requests = 0
+        self.answered = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Respuesta válida recibida tras `seconds`"""
+        with self.lock:
+            self.requests += 1
+            self.answered += 1
+            self.total_latency += seconds
+            self.counts[next(i for i, edge in enumerate(self.BUCKETS) if seconds <= edge)] += 1
+
+    def record_failure(self, kind: str):
+        """Petición sin respuesta: 'timeouts', 'cancelled' o 'errors'"""
+        with self.lock:
+            self.requests += 1
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Límite superior de la cubeta que contiene el percentil q (0-1)"""
+        with self.lock:
+            if not self.answered:
+                return None
+            target, cumulative = q * self.answered, 0
+            for edge, count in zip(self.BUCKETS, self.counts):
+                cumulative += count
+                if cumulative >= target:
+                    return edge
+            return self.BUCKETS[-1]
+
+    def reliability(self) -> float:
+        """Fracción de peticiones respondidas a tiempo (suavizada)
+
+        Las cancelaciones por quórum no penalizan: el modelo no falló.
+        """
+        with self.lock:
+            attempts = self.requests - self.cancelled
+            return (self.answered + 1) / (attempts + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            histogram = {('inf' if edge == float('inf') else f'<={edge}s'): count
+                         for edge, count in zip(self.BUCKETS, self.counts)}
+            stats = {
+                'requests': self.requests,
+                'answered': self.answered,
+                'timeouts': self.timeouts,
+                'cancelled': self.cancelled,
+                'errors': self.errors,
+                'avg_latency': self.total_latency / self.answered if self.answered else None,
+                'histogram': histogram
+            }
+        stats['p50'] = self.percentile(0.5)
+        stats['p90'] = self.percentile(0.9)
+        stats['reliability'] = round(self.reliability(), 3)
+        return stats
+
 class OllamaAdvanced:
     """Sistema avanzado de IA para trading con múltiples modelos"""
     
@@ -87,6 +207,18 @@ class OllamaAdvanced:
                 'timeout': 20
             }
         }
+
+        # Ensemble: plazo global y fracción del peso total que, de acuerdo
+        # en la misma acción, permite cerrar sin esperar al resto
+        self.ensemble_deadline = 30.0
+        self.quorum = 0.6
+        self.latency = {name: LatencyHistogram() for name in self.models}
+        
+        # Prompts compactos con presupuesto de tokens y métricas por llamada
+        self.keep_alive = '30m'
+        self.prompt_metrics = PromptMetrics('ollama_advanced')
+        self.prompt_builder = PromptBuilder(ADVANCED_PREAMBLE, budget_tokens=1200,
+                                            estimator=self.prompt_metrics.estimator)
         
         # Cliente OpenAI para Ollama
         if OPENAI_AVAILABLE:
@@ -97,9 +229,9 @@ class OllamaAdvanced:
         # Executor para análisis paralelo
         self.executor = ThreadPoolExecutor(max_workers=5)
         
-        # Cache de análisis recientes
-        self.analysis_cache = {}
+        # Cache de análisis recientes (clave: indicadores cuantizados)
         self.cache_ttl = 60  # segundos
+        self.analysis_cache = LLMDecisionCache(name='ollama_ensemble', max_entries=256, ttl=self.cache_ttl)
         
         # Estrategias de trading
         self.strategies = {
@@ -120,150 +252,178 @@ class OllamaAdvanced:
                               market_data: Dict[str, Any],
                               strategy_type: str = 'auto') -> str:
         """Crea un prompt avanzado para análisis de trading"""
-        
-        prompt = f"""
-ELITE TRADER AI ANALYSIS - {symbol}
-=====================================
-Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Strategy Mode: {strategy_type}
-
-MARKET DATA:
-------------
-Current Price: {market_data.get('current_price', 0):.5f}
-24h Change: {market_data.get('change_24h', 0):.2f}%
-Volume: {market_data.get('volume', 0):,.0f}
-Market Cap Rank: {market_data.get('market_cap_rank', 'N/A')}
-
-TECHNICAL INDICATORS:
---------------------
-"""
-        
-        # Agregar indicadores técnicos
+        return self.build_prompt(symbol, market_data, strategy_type).text
+    
+    def build_prompt(self,
+                     symbol: str,
+                     market_data: Dict[str, Any],
+                     strategy_type: str = 'auto',
+                     budget_tokens: Optional[int] = None) -> CompactPrompt:
+        """
+        Prompt compacto: preámbulo fijo + snapshot de mercado dentro del presupuesto
+        
+        Args:
+            symbol: Símbolo
+            market_data: Datos de mercado (indicators por timeframe, closes opcionales...)
+            strategy_type: Modo de estrategia
+            budget_tokens: Tokens máximos (por defecto el del builder)
+        """
+        price = market_data.get('current_price', 0)
+        header = f"SYMBOL: {symbol} | MODE: {strategy_type}\nPRICE: {price:.5f}"
+        if 'change_24h' in market_data:
+            header += f" 24h: {market_data['change_24h']:+.2f}%"
+        if market_data.get('volume'):
+            header += f" VOLUME: {market_data['volume']:,.0f}"
+        if market_data.get('market_cap_rank'):
+            header += f" CAP_RANK: {market_data['market_cap_rank']}"
+        sections = [('header', header, 0)]
+        
+        # Indicadores por timeframe: el primero es el más relevante
         indicators = market_data.get('indicators', {})
-        for timeframe, tf_indicators in indicators.items():
-            prompt += f"\n[{timeframe}]:\n"
-            
-            # RSI
-            rsi = tf_indicators.get('rsi', 50)
-            prompt += f"  RSI: {rsi:.2f} {'(Oversold)' if rsi < 30 else '(Overbought)' if rsi > 70 else ''}\n"
-            
-            # MACD
-            macd = tf_indicators.get('macd', 0)
-            macd_signal = tf_indicators.get('macd_signal', 0)
-            prompt += f"  MACD: {macd:.4f} | Signal: {macd_signal:.4f} | Histogram: {(macd-macd_signal):.4f}\n"
-            
-            # Bollinger Bands
-            bb_position = tf_indicators.get('bb_position', 0.5)
-            prompt += f"  BB Position: {bb_position:.2%} {'(Upper Band)' if bb_position > 0.8 else '(Lower Band)' if bb_position < 0.2 else ''}\n"
-            
-            # ATR
-            atr = tf_indicators.get('atr', 0)
-            atr_percent = tf_indicators.get('atr_percent', 0)
-            prompt += f"  ATR: {atr:.5f} ({atr_percent:.2f}% volatility)\n"
-            
-            # ADX
-            adx = tf_indicators.get('adx', 0)
-            prompt += f"  ADX: {adx:.2f} {'(Strong Trend)' if adx > 25 else '(No Trend)'}\n"
-            
-            # Volume
-            volume_ratio = tf_indicators.get('volume_ratio', 1)
-            prompt += f"  Volume Ratio: {volume_ratio:.2f}x average\n"
-        
-        # Agregar patrones detectados
-        prompt += """
-PATTERN ANALYSIS:
-----------------
-"""
-        patterns = market_data.get('patterns', {})
+        n_timeframes = len(indicators)
+        for rank, (timeframe, tf) in enumerate(indicators.items()):
+            rsi = tf.get('rsi', 50)
+            macd, macd_signal = tf.get('macd', 0), tf.get('macd_signal', 0)
+            bb_position = tf.get('bb_position', 0.5)
+            adx = tf.get('adx', 0)
+            flags = [flag for flag, active in (
+                ('OVERSOLD', rsi < 30), ('OVERBOUGHT', rsi > 70),
+                ('UPPER_BAND', bb_position > 0.8), ('LOWER_BAND', bb_position < 0.2),
+                ('STRONG_TREND', adx > 25)) if active]
+            line = (f"[{timeframe}] rsi={rsi:.1f} macd={compact_number(macd)} signal={compact_number(macd_signal)} "
+                    f"hist={compact_number(macd - macd_signal)} bb_pos={bb_position:.2f} "
+                    f"atr={compact_number(tf.get('atr', 0))} atr%={tf.get('atr_percent', 0):.2f} "
+                    f"adx={adx:.1f} vol_ratio={tf.get('volume_ratio', 1):.2f}")
+            if flags:
+                line += ' ' + ','.join(flags)
+            sections.append((f"tf_{timeframe}", line, 2 * (n_timeframes - rank) + 3))
+        
+        # Series de cierres (opcionales) resumidas
+        for rank, (timeframe, closes) in enumerate(market_data.get('closes', {}).items()):
+            if closes:
+                sections.append((f"closes_{timeframe}", f"closes {timeframe}: {summarize_series(closes)}",
+                                 2 * (n_timeframes - rank) + 2))
+        
+        patterns = {name: value for name, value in market_data.get('patterns', {}).items() if value != 0}
         if patterns:
-            for pattern_name, pattern_value in patterns.items():
-                if pattern_value != 0:
-                    prompt += f"  {pattern_name}: {'Bullish' if pattern_value > 0 else 'Bearish'}\n"
-        
-        # Agregar análisis de sentimiento
-        sentiment = market_data.get('sentiment', 'NEUTRAL')
-        prompt += f"""
-MARKET SENTIMENT: {sentiment}
-CORRELATION ANALYSIS: {market_data.get('correlations', {})}
-
-MARKET PROFILE:
---------------
-VWAP: {market_data.get('vwap', 0):.5f}
-POC (Point of Control): {market_data.get('poc', 0):.5f}
-Value Area High: {market_data.get('va_high', 0):.5f}
-Value Area Low: {market_data.get('va_low', 0):.5f}
-
-VOLATILITY METRICS:
-------------------
-14-day Volatility: {market_data.get('vol_14d', 0):.2f}%
-30-day Volatility: {market_data.get('vol_30d', 0):.2f}%
-Sharpe Ratio: {market_data.get('sharpe', 0):.2f}
-
-TRADING TASK:
-============
-Analyze all data and provide a professional trading signal.
-
-REQUIRED OUTPUT FORMAT:
-----------------------
-ACTION: [BUY/SELL/NO_TRADE]
-ENTRY: [exact price]
-SL: [stop loss price]
-TP1: [first take profit - 30% position]
-TP2: [second take profit - 50% position]
-TP3: [third take profit - 20% position]
-CONFIDENCE: [0-100]%
-RRR: [risk reward ratio]
-POSITION_SIZE: [0.01-0.10] lots
-REASONING: [detailed explanation in one line]
-STRATEGY: [strategy name]
-TIMEFRAME: [recommended timeframe]
-DURATION: [expected trade duration]
-
-IMPORTANT RULES:
-1. Only trade if confidence > 65%
-2. Risk Reward Ratio must be > 1.5
-3. Consider market volatility for SL/TP
-4. Use ATR for dynamic stop loss
-5. Consider support/resistance levels
-6. Account for market sentiment
-7. Be precise with all numeric values
-8. Think step by step before deciding
-"""
-        
-        return prompt
+            sections.append(('patterns', 'PATTERNS: ' + ' '.join(
+                f"{name}={'+1' if value > 0 else '-1'}" for name, value in patterns.items()), 2))
+        
+        context = f"SENTIMENT: {market_data.get('sentiment', 'NEUTRAL')}"
+        correlations = market_data.get('correlations')
+        if correlations:
+            context += ' CORRELATIONS: ' + ' '.join(
+                f"{name}={compact_number(value, 2)}" for name, value in correlations.items())
+        sections.append(('context', context, 1))
+        
+        sections.append(('profile', ' '.join(
+            f"{label}={market_data.get(key, 0):.5f}"
+            for label, key in (('VWAP', 'vwap'), ('POC', 'poc'), ('VAH', 'va_high'), ('VAL', 'va_low'))), 3))
+        sections.append(('volatility', f"VOL14D={market_data.get('vol_14d', 0):.2f}% "
+                                       f"VOL30D={market_data.get('vol_30d', 0):.2f}% "
+                                       f"SHARPE={market_data.get('sharpe', 0):.2f}", 2))
+        
+        return self.prompt_builder.build(sections, budget_tokens)
     
     async def analyze_with_model_async(self, 
                                       model_name: str,
-                                      prompt: str,
-                                      timeout: int = 30) -> Optional[Dict]:
-        """Analiza con un modelo específico de forma asíncrona"""
+                                      prompt: Any,
+                                      timeout: int = 30,
+                                      stop: Optional[threading.Event] = None) -> Optional[Dict]:
+        """
+        Analiza con un modelo específico de forma asíncrona
+
+        La respuesta se lee en streaming y se corta en cuanto contiene la
+        decisión completa (ver decision_ready).
+
+        Args:
+            model_name: Modelo de Ollama
+            prompt: CompactPrompt (o texto, que se envía tras el preámbulo)
+            timeout: Segundos máximos para este modelo
+            stop: Evento para abandonar la lectura (plazo o quórum del ensemble)
+        """
+        if not self.client:
+            return None
+        if not isinstance(prompt, CompactPrompt):
+            prompt = CompactPrompt(ADVANCED_PREAMBLE.strip(), prompt,
+                                   self.prompt_metrics.estimator.count(ADVANCED_PREAMBLE + prompt))
+
+        histogram = self.latency.setdefault(model_name, LatencyHistogram())
+        stop = stop or threading.Event()
+        start = time.perf_counter()
         try:
-            if not self.client:
-                return None
-                
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    self.client.chat.completions.create,
-                    model=model_name,
-                    messages=[
-                        {"role": "system", "content": "You are an elite quantitative trader with 20 years of experience."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=500
-                ),
+            content = await asyncio.wait_for(
+                asyncio.to_thread(self._stream_completion, model_name, prompt, stop),
                 timeout=timeout
             )
-            
-            return self.parse_ai_response(response.choices[0].message.content)
-            
         except asyncio.TimeoutError:
+            stop.set()
+            histogram.record_failure('timeouts')
             logger.warning(f"Timeout analyzing with {model_name}")
             return None
+        except asyncio.CancelledError:
+            stop.set()
+            # Cortado por el plazo global cuenta como timeout; por quórum, no
+            histogram.record_failure(getattr(stop, 'reason', 'cancelled'))
+            raise
         except Exception as e:
+            histogram.record_failure('errors')
             logger.error(f"Error with {model_name}: {e}")
             return None
-    
+
+        result = self.parse_ai_response(self.visible_text(content)) if content else None
+        if result:
+            histogram.record(time.perf_counter() - start)
+        else:
+            histogram.record_failure('errors')
+        return result
+
+    def _stream_completion(self, model_name: str, prompt: CompactPrompt, stop: threading.Event) -> str:
+        """Leer la respuesta en streaming hasta tener la decisión (en un hilo)"""
+        record = self.prompt_metrics.start(prompt)
+        stream = self.client.chat.completions.create(
+            model=model_name,
+            messages=prompt.messages(),
+            temperature=0.3,
+            max_tokens=500,
+            **ollama_options(self.keep_alive)
+        )
+        parts, usage = [], None
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                usage = getattr(chunk, 'usage', None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                record.first_token()
+                parts.append(delta)
+                # Solo re-evaluar al cerrar una línea
+                if '\n' in delta and self.decision_ready(''.join(parts)):
+                    break
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+            # Cortando antes del final no llega el uso: se registra la estimación
+            record.finish(usage, ok=bool(parts))
+        return ''.join(parts)
+
+    @staticmethod
+    def visible_text(text: str) -> str:
+        """Texto tras el bloque <think> de los modelos de razonamiento ('' si sigue abierto)"""
+        if '<think>' not in text:
+            return text
+        _, closed, after = text.rpartition('</think>')
+        return after if closed else ''
+
+    def decision_ready(self, text: str) -> bool:
+        """Si el texto parcial ya contiene ACTION y todos los niveles de la decisión"""
+        visible = self.visible_text(text).upper()
+        action = _ACTION_LINE.search(visible)
+        return bool(action and _DECISION_END.search(visible, action.end()))
+
     def parse_ai_response(self, response: str) -> Optional[Dict]:
         """Parsea la respuesta de la IA con manejo robusto de errores"""
         try:
@@ -384,59 +544,150 @@ IMPORTANT RULES:
                                market_data: Dict[str, Any]) -> Optional[TradingSignal]:
         """Análisis ensemble usando múltiples modelos y estrategias"""
         
-        # Verificar cache
-        cache_key = f"{symbol}_{market_data.get('current_price', 0)}"
-        if cache_key in self.analysis_cache:
-            cached_time, cached_signal = self.analysis_cache[cache_key]
-            if (datetime.now() - cached_time).seconds < self.cache_ttl:
-                logger.info("Using cached analysis")
-                return cached_signal
-        
+        # Verificar cache: mismas cubetas de indicadores y distancias a
+        # niveles reutilizan la decisión; peticiones iguales en vuelo se fusionan
+        cache_key = self.analysis_cache.make_key(symbol, self.decision_features(market_data))
+        result = await self.analysis_cache.aget_or_compute(
+            cache_key,
+            lambda: self._run_ensemble(symbol, market_data),
+            cacheable=lambda value: value is not _NO_RESULTS
+        )
+        return None if result is _NO_RESULTS else result
+
+    def decision_features(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Snapshot de lo que decide la señal, listo para cuantizar"""
+        price = market_data.get('current_price', 0)
+        indicators = market_data.get('indicators', {})
+
+        timeframes = {}
+        for timeframe, tf_indicators in indicators.items():
+            timeframes[timeframe] = {
+                'rsi': tf_indicators.get('rsi', 50),
+                'macd_hist': tf_indicators.get('macd', 0) - tf_indicators.get('macd_signal', 0),
+                'bb_position': tf_indicators.get('bb_position', 0.5),
+                'atr_percent': tf_indicators.get('atr_percent', 0),
+                'adx': tf_indicators.get('adx', 0),
+                'volume_ratio': tf_indicators.get('volume_ratio', 1)
+            }
+
+        # Distancia a VWAP/POC/área de valor en ATR de la temporalidad más lenta disponible
+        atr = next((tf.get('atr') for tf in reversed(list(indicators.values())) if tf.get('atr')), None)
+        levels = {name: market_data.get(name) for name in ('vwap', 'poc', 'va_high', 'va_low')}
+
+        return {
+            'current_price': price,
+            'timeframes': timeframes,
+            'levels': level_distances(price, levels, atr or price * 0.005),
+            'patterns': {name: (value > 0) - (value < 0)
+                         for name, value in market_data.get('patterns', {}).items()},
+            'sentiment': market_data.get('sentiment', 'NEUTRAL'),
+            'volatility': {'vol_14d': market_data.get('vol_14d', 0)}
+        }
+
+    async def _run_ensemble(self, symbol: str, market_data: Dict[str, Any]):
+        """Consultar los modelos y calcular el consenso (sin caché)"""
         # Crear prompt
-        prompt = self.create_advanced_prompt(symbol, market_data)
+        prompt = self.build_prompt(symbol, market_data)
         
-        # Analizar con múltiples modelos en paralelo
-        tasks = []
+        # Todos los modelos en paralelo con un plazo global; el evento corta
+        # las lecturas en curso al vencer el plazo o alcanzar el quórum
+        stop = threading.Event()
+        tasks = {}
         for model_name, model_config in self.models.items():
-            task = self.analyze_with_model_async(
-                model_name, 
-                prompt, 
-                model_config['timeout']
-            )
-            tasks.append((model_name, model_config['weight'], task))
-        
-        # Recopilar resultados
+            task = asyncio.ensure_future(self.analyze_with_model_async(
+                model_name,
+                prompt,
+                min(model_config['timeout'], self.ensemble_deadline),
+                stop
+            ))
+            tasks[task] = model_name
+        
+        # Recopilar resultados según llegan
         results = []
-        weights = []
-        
-        for model_name, weight, task in tasks:
-            try:
-                result = await task
-                if result:
-                    results.append(result)
-                    weights.append(weight)
-                    logger.info(f"{model_name}: {result.get('action', 'NO_TRADE')} @ {result.get('confidence', 0)}%")
-            except Exception as e:
-                logger.error(f"Error getting result from {model_name}: {e}")
+        models = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.ensemble_deadline
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"Ensemble deadline reached, {len(pending)} models pending")
+                    stop.reason = 'timeouts'
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model_name = tasks[task]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.error(f"Error getting result from {model_name}: {e}")
+                        continue
+                    if result:
+                        results.append(result)
+                        models.append(model_name)
+                        logger.info(f"{model_name}: {result.get('action', 'NO_TRADE')} @ {result.get('confidence', 0)}%")
+                if pending and self.quorum_reached(results, models):
+                    logger.info(f"Ensemble quorum reached, skipping {len(pending)} models")
+                    break
+        finally:
+            stop.set()
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
         
         if not results:
-            return None
+            return _NO_RESULTS
         
         # Calcular consenso ponderado
-        final_signal = self.calculate_weighted_consensus(results, weights, symbol, market_data)
-        
-        # Guardar en cache
-        if final_signal:
-            self.analysis_cache[cache_key] = (datetime.now(), final_signal)
+        weights = [self.models.get(name, {}).get('weight', 1.0) for name in models]
+        final_signal = self.calculate_weighted_consensus(results, weights, symbol, market_data, models)
         
         return final_signal
+
+    def effective_weight(self, model_name: str, weight: float) -> float:
+        """Peso configurado escalado por la fiabilidad observada del modelo"""
+        histogram = self.latency.get(model_name)
+        return weight * histogram.reliability() if histogram else weight
+
+    def quorum_reached(self, results: List[Dict], models: List[str]) -> bool:
+        """Si los modelos que coinciden en una acción suman el quórum del peso total"""
+        total = sum(self.effective_weight(name, config['weight']) for name, config in self.models.items())
+        if not results or total <= 0:
+            return False
+        agreement = {}
+        for result, name in zip(results, models):
+            action = result.get('action', 'NO_TRADE')
+            weight = self.effective_weight(name, self.models.get(name, {}).get('weight', 1.0))
+            agreement[action] = agreement.get(action, 0) + weight
+        return max(agreement.values()) >= self.quorum * total
+
+    def get_model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latencias y fiabilidad por modelo"""
+        return {name: histogram.to_dict() for name, histogram in self.latency.items()}
+
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Tokens de prompt y tiempo al primer token de las últimas llamadas"""
+        return self.prompt_metrics.get_stats()
     
     def calculate_weighted_consensus(self, 
                                     results: List[Dict],
                                     weights: List[float],
                                     symbol: str,
-                                    market_data: Dict) -> Optional[TradingSignal]:
-        """Calcula consenso ponderado de múltiples análisis"""
+                                    market_data: Dict,
+                                    models: Optional[List[str]] = None) -> Optional[TradingSignal]:
+        """
+        Calcula consenso ponderado de múltiples análisis
+
+        Si se indican los modelos de cada resultado, su peso se escala por
+        la fiabilidad de su histograma de latencias (respuestas a tiempo).
+        """
+        
+        if models:
+            weights = [self.effective_weight(name, w) for name, w in zip(models, weights)]
         
         # Normalizar pesos
         total_weight = sum(weights)
@@ -448,7 +699,7 @@ IMPORTANT RULES:
         for result, weight in zip(results, weights):
             action = result.get('action', 'NO_TRADE')
             confidence = result.get('confidence', 50) / 100
-            action_scores[action] += weight * confidence
+            action_scores[action if action in action_scores else 'NO_TRADE'] += weight * confidence
         
         # Determinar acción final
         final_action = max(action_scores, key=action_scores.get)
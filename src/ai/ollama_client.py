@@ -16,54 +16,15 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from src.ai.prompt_builder import (CompactPrompt, PromptBuilder, PromptMetrics, format_indicators,
+                                   stream_chat, summarize_series)
+
 logger = logging.getLogger(__name__)
 
-class OllamaClient:
-    """Cliente para análisis de trading con Ollama"""
-    
-    def __init__(self, 
-                 api_base: str = "http://localhost:11434/v1",
-                 model: str = "deepseek-r1:14b"):
-        """
-        Inicializa el cliente Ollama
-        Args:
-            api_base: URL base de la API de Ollama
-            model: Modelo a usar (deepseek-r1:14b)
-        """
-        self.api_base = api_base
-        self.model = "deepseek-r1:8b"  # Usar modelo más rápido
-        
-        # Configurar cliente OpenAI para Ollama
-        if OPENAI_VERSION == "new":
-            self.client = OpenAI(
-                api_key="none",
-                base_url=api_base
-            )
-        else:
-            openai.api_key = "none"
-            openai.api_base = api_base
-            self.client = None
-        
-        logger.info(f"Ollama client iniciado: {api_base} - Modelo: {model}")
-    
-    def generar_prompt_trading(self, 
-                              symbol: str,
-                              indicadores_multi: Dict[str, Dict],
-                              cierres_multi: Dict[str, List],
-                              precio_actual: float) -> str:
-        """
-        Genera prompt especializado para análisis de trading
-        Args:
-            symbol: Símbolo a analizar
-            indicadores_multi: Indicadores por timeframe
-            cierres_multi: Precios de cierre históricos
-            precio_actual: Precio actual del activo
-        Returns:
-            Prompt completo para IA
-        """
-        
-        PROMPT = f"""
-Eres un trader profesional especializado en {symbol}. Analiza los datos técnicos y genera señales de trading.
+# Instrucciones estáticas: idénticas en cada petición para que Ollama
+# reutilice su evaluación (el símbolo y el precio van en el mensaje de datos)
+PREAMBULO_TRADING = """
+Eres un trader profesional. Analiza los datos técnicos del símbolo indicado y genera señales de trading.
 
 IMPORTANTE: Busca activamente oportunidades de trading. Si hay tendencias claras, divergencias, 
 soporte/resistencia, o patrones técnicos, GENERA LA SEÑAL.
@@ -90,8 +51,6 @@ SL: [precio numérico]
 TP: [precio numérico]
 Confianza: [porcentaje]%
 
-Precio actual: {precio_actual:.5f}
-
 ESTRATEGIAS ESPECÍFICAS POR ASSET:
 
 XAU/USD (ORO):
@@ -107,31 +66,97 @@ BTC/USD:
 - Patrones de triple toque en soporte/resistencia
 
 NOTA: Sé agresivo en buscar oportunidades. Es mejor entrar con 60-70% confianza que perder oportunidades reales.
+
+Formato de los datos: una línea 'clave=valor' de indicadores por timeframe y un resumen
+de cierres (n=barras last=último chg=cambio rng=mínimo-máximo pos=posición en el rango
+vol=volatilidad por barra trend=pendiente en desviaciones tail=últimos cierres).
+
+Recuerda: Solo envía el análisis en el formato solicitado y en español. Sé preciso con los números.
 """
+
+class OllamaClient:
+    """Cliente para análisis de trading con Ollama"""
+    
+    def __init__(self, 
+                 api_base: str = "http://localhost:11434/v1",
+                 model: str = "deepseek-r1:14b",
+                 prompt_budget: int = 900):
+        """
+        Inicializa el cliente Ollama
+        Args:
+            api_base: URL base de la API de Ollama
+            model: Modelo a usar (deepseek-r1:14b)
+            prompt_budget: Tokens máximos del prompt por petición
+        """
+        self.api_base = api_base
+        self.model = "deepseek-r1:8b"  # Usar modelo más rápido
+        
+        # Prompts compactos y medición de tokens / tiempo al primer token
+        self.prompt_metrics = PromptMetrics('ollama_client')
+        self.prompt_builder = PromptBuilder(PREAMBULO_TRADING, prompt_budget, self.prompt_metrics.estimator)
+        
+        # Configurar cliente OpenAI para Ollama
+        if OPENAI_VERSION == "new":
+            self.client = OpenAI(
+                api_key="none",
+                base_url=api_base
+            )
+        else:
+            openai.api_key = "none"
+            openai.api_base = api_base
+            self.client = None
+        
+        logger.info(f"Ollama client iniciado: {api_base} - Modelo: {model}")
+    
+    def generar_prompt_trading(self, 
+                              symbol: str,
+                              indicadores_multi: Dict[str, Dict],
+                              cierres_multi: Dict[str, List],
+                              precio_actual: float) -> str:
+        """
+        Genera prompt especializado para análisis de trading
+        Args:
+            symbol: Símbolo a analizar
+            indicadores_multi: Indicadores por timeframe
+            cierres_multi: Precios de cierre históricos
+            precio_actual: Precio actual del activo
+        Returns:
+            Prompt completo para IA
+        """
+        return self.construir_prompt(symbol, indicadores_multi, cierres_multi, precio_actual).text
+    
+    def construir_prompt(self,
+                         symbol: str,
+                         indicadores_multi: Dict[str, Dict],
+                         cierres_multi: Dict[str, List],
+                         precio_actual: float,
+                         presupuesto: Optional[int] = None) -> CompactPrompt:
+        """
+        Prompt compacto: preámbulo fijo + datos resumidos dentro del presupuesto
+        Args:
+            symbol: Símbolo a analizar
+            indicadores_multi: Indicadores por timeframe
+            cierres_multi: Cierres en orden cronológico por timeframe
+            precio_actual: Precio actual del activo
+            presupuesto: Tokens máximos (por defecto el del cliente)
+        Returns:
+            CompactPrompt (system + user)
+        """
+        sections = [('mercado', f"Símbolo: {symbol}\nPrecio actual: {precio_actual:.5f}", 0)]
         
-        # Agregar indicadores por timeframe
-        for tf, indicadores in indicadores_multi.items():
+        # Primer timeframe con más prioridad; los cierres se descartan antes que los indicadores
+        n_timeframes = len(indicadores_multi)
+        for rank, (tf, indicadores) in enumerate(indicadores_multi.items()):
             if not indicadores:
                 continue
-                
-            PROMPT += f"\n--- TIMEFRAME {tf} ---\n"
-            
-            # Formatear indicadores de manera clara
-            for indicador, valor in indicadores.items():
-                if isinstance(valor, dict):
-                    for sub_key, sub_val in valor.items():
-                        PROMPT += f"{indicador}_{sub_key}: {sub_val}\n"
-                else:
-                    PROMPT += f"{indicador}: {valor}\n"
+            lines = [f"--- {tf} ---", format_indicators(indicadores, digits=6, skip=('current_price',))]
+            sections.append((f"ind_{tf}", '\n'.join(lines), 2 * (n_timeframes - rank) + 1))
             
-            # Agregar cierres históricos
-            if tf in cierres_multi and cierres_multi[tf]:
-                cierres_str = ", ".join([str(c) for c in cierres_multi[tf][:10]])
-                PROMPT += f"Últimos 10 cierres: {cierres_str}\n"
-        
-        PROMPT += "\nRecuerda: Solo envía el análisis en el formato solicitado y en español. Sé preciso con los números."
+            if cierres_multi.get(tf):
+                sections.append((f"cierres_{tf}", f"cierres {tf}: {summarize_series(cierres_multi[tf])}",
+                                 2 * (n_timeframes - rank)))
         
-        return PROMPT
+        return self.prompt_builder.build(sections, presupuesto)
     
     def analizar_mercado(self, 
                         symbol: str,
@@ -150,25 +175,23 @@ NOTA: Sé agresivo en buscar oportunidades. Es mejor entrar con 60-70% confianza
         """
         try:
             # Generar prompt
-            prompt = self.generar_prompt_trading(
+            prompt = self.construir_prompt(
                 symbol, indicadores_multi, cierres_multi, precio_actual
             )
             
-            logger.info(f"Enviando análisis a Ollama para {symbol}")
+            logger.info(f"Enviando análisis a Ollama para {symbol} (~{prompt.estimated_tokens} tokens)")
             
             # Llamar a Ollama
             if OPENAI_VERSION == "new":
-                respuesta = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                respuesta_texto = stream_chat(
+                    self.client, self.model, prompt, self.prompt_metrics,
                     temperature=0.3,
                     max_tokens=200
                 )
-                respuesta_texto = respuesta.choices[0].message.content
             else:
                 respuesta = openai.ChatCompletion.create(
                     model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=prompt.messages(),
                     temperature=0.3,
                     max_tokens=200
                 )
@@ -255,6 +278,10 @@ NOTA: Sé agresivo en buscar oportunidades. Es mejor entrar con 60-70% confianza
         
         return resultado
     
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Tokens de prompt y tiempo al primer token de las últimas llamadas"""
+        return self.prompt_metrics.get_stats()
+    
     def test_connection(self) -> bool:
         """
         Prueba la conexión con Ollama
@@ -9,6 +9,9 @@ import os
 import logging
 from typing import Dict, Optional, Any
 
+from src.core.http_client import http_get, http_post
+from src.ai.llm_cache import get_llm_cache
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,8 @@ class OllamaValidator:
     def __init__(self):
         self.host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
         self.model = os.getenv('OLLAMA_MODEL', 'deepseek-r1:14b')
+        # Decisiones cacheadas por snapshot cuantizado (RSI, MACD, precio...)
+        self.cache = get_llm_cache('ollama_validator', ttl=float(os.getenv('LLM_CACHE_TTL', '120')))
         
     def validate_signal(self, snapshot: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -28,23 +33,29 @@ class OllamaValidator:
             Dict con signal, confidence, reason o None si error
         """
         try:
-            # Preparar prompt para IA
-            prompt = self._create_analysis_prompt(snapshot)
-            
-            # Enviar a Ollama
-            response = self._call_ollama(prompt)
-            
-            if response:
-                # Parsear respuesta de IA
-                return self._parse_ai_response(response)
-            else:
-                logger.error("No hay respuesta de Ollama")
-                return None
+            # Snapshots equivalentes (misma cubeta de indicadores y mismo
+            # texto de análisis) comparten respuesta
+            key = self.cache.make_key(self.model, snapshot)
+            return self.cache.get_or_compute(key, lambda: self._validate_uncached(snapshot))
                 
         except Exception as e:
             logger.error(f"Error en validación IA: {e}")
             return None
     
+    def _validate_uncached(self, snapshot: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Preparar prompt para IA
+        prompt = self._create_analysis_prompt(snapshot)
+        
+        # Enviar a Ollama
+        response = self._call_ollama(prompt)
+        
+        if response:
+            # Parsear respuesta de IA
+            return self._parse_ai_response(response)
+        else:
+            logger.error("No hay respuesta de Ollama")
+            return None
+    
     def _create_analysis_prompt(self, snapshot: Dict[str, Any]) -> str:
         """Crear prompt estructurado para análisis de IA"""
         
@@ -97,7 +108,7 @@ Responde EXACTAMENTE en este formato JSON:
                 }
             }
             
-            response = requests.post(url, json=payload, timeout=180)
+            response = http_post('ollama', url, json=payload, timeout=180)
             
             if response.status_code == 200:
                 result = response.json()
@@ -221,7 +232,7 @@ def test_ollama_connection() -> bool:
     """Probar conexión con Ollama"""
     try:
         host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
-        response = requests.get(f"{host}/api/tags", timeout=5)
+        response = http_get('ollama', f"{host}/api/tags", timeout=5)
         return response.status_code == 200
     except:
         return False
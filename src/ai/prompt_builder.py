@@ -0,0 +1,310 @@
+"""
+Prompt Builder - Prompts compactos para Ollama con presupuesto de tokens
+Preámbulo estático como prefijo reutilizable (caché KV del modelo),
+series resumidas en estadísticas y métricas de tokens y latencia por llamada
+"""
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Mantener el modelo cargado entre llamadas: Ollama reutiliza el prefijo ya
+# procesado (preámbulo idéntico) en lugar de volver a evaluarlo
+DEFAULT_KEEP_ALIVE = '30m'
+
+# Caracteres por token iniciales; se calibran con el prompt_tokens real
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+
+class TokenEstimator:
+    """Estimación de tokens por longitud, calibrada con el uso real reportado"""
+
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN, alpha: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+
+    def count(self, text: str) -> int:
+        return int(math.ceil(len(text) / self.chars_per_token)) if text else 0
+
+    def calibrate(self, chars: int, tokens: int):
+        """Ajustar la relación con (caracteres enviados, prompt_tokens del servidor)"""
+        if chars > 0 and tokens > 0:
+            observed = chars / tokens
+            self.chars_per_token += self.alpha * (observed - self.chars_per_token)
+
+
+def compact_number(value: Any, digits: int = 4) -> str:
+    """Número con `digits` cifras significativas (sin ceros sobrantes)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if not math.isfinite(value):
+        return 'na'
+    if value == 0:
+        return '0'
+    magnitude = int(math.floor(math.log10(abs(value))))
+    decimals = max(digits - 1 - magnitude, 0)
+    text = f"{value:.{decimals}f}"
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def format_indicators(indicators: Mapping[str, Any], digits: int = 4,
+                      skip: Iterable[str] = ()) -> str:
+    """Indicadores en una línea 'clave=valor' (dicts anidados como clave.sub)"""
+    skip = set(skip)
+    parts = []
+    for name, value in indicators.items():
+        if name in skip or value is None:
+            continue
+        if isinstance(value, Mapping):
+            for sub_name, sub_value in value.items():
+                if sub_value is not None:
+                    parts.append(f"{name}.{sub_name}={compact_number(sub_value, digits)}")
+        elif isinstance(value, (list, tuple)):
+            continue  # las series van por summarize_series
+        else:
+            parts.append(f"{name}={compact_number(value, digits)}")
+    return ' '.join(parts)
+
+
+def summarize_series(values: Sequence[float], digits: int = 6, tail: int = 3) -> str:
+    """
+    Resumen de una serie de precios en orden cronológico
+
+    Returns:
+        'n=30 last=1.1023 chg=+0.45% rng=1.099-1.104 pos=0.62 vol=0.08% trend=+1.3σ tail=...'
+    """
+    series = [float(v) for v in values if v is not None and math.isfinite(float(v))]
+    n = len(series)
+    if n == 0:
+        return 'n=0'
+    last = series[-1]
+    if n == 1:
+        return f"n=1 last={compact_number(last, digits)}"
+
+    low, high = min(series), max(series)
+    position = (last - low) / (high - low) if high > low else 0.5
+    change = (last / series[0] - 1) * 100 if series[0] else 0.0
+
+    returns = [series[i] / series[i - 1] - 1 for i in range(1, n) if series[i - 1]]
+    mean = sum(returns) / len(returns) if returns else 0.0
+    vol = math.sqrt(sum((r - mean) ** 2 for r in returns) / len(returns)) if returns else 0.0
+
+    # Pendiente de regresión lineal por barra, en desviaciones de retorno
+    x_mean = (n - 1) / 2
+    sxx = sum((i - x_mean) ** 2 for i in range(n))
+    slope = sum((i - x_mean) * v for i, v in enumerate(series)) / sxx
+    trend = slope / last / vol if last and vol > 0 else 0.0
+
+    tail_values = ','.join(compact_number(v, digits) for v in series[-tail:])
+    return (f"n={n} last={compact_number(last, digits)} chg={change:+.2f}% "
+            f"rng={compact_number(low, digits)}-{compact_number(high, digits)} pos={position:.2f} "
+            f"vol={vol * 100:.2f}% trend={trend:+.1f}σ tail={tail_values}")
+
+
+@dataclass
+class CompactPrompt:
+    """Prompt ensamblado: preámbulo estático (system) + datos del momento (user)"""
+    system: str
+    user: str
+    estimated_tokens: int
+    budget: Optional[int] = None
+    dropped: List[str] = field(default_factory=list)
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = [{'role': 'system', 'content': self.system}] if self.system else []
+        messages.append({'role': 'user', 'content': self.user})
+        return messages
+
+    @property
+    def text(self) -> str:
+        """Prompt en un solo bloque (preámbulo primero, para conservar el prefijo)"""
+        return f"{self.system}\n\n{self.user}" if self.system else self.user
+
+    @property
+    def chars(self) -> int:
+        return len(self.system) + len(self.user)
+
+
+class PromptBuilder:
+    """
+    Ensambla prompts dentro de un presupuesto de tokens
+
+    El preámbulo es fijo (no depende del símbolo ni del momento) para que el
+    servidor reutilice su evaluación entre llamadas. Las secciones dinámicas
+    se añaden con prioridad; si el total supera el presupuesto se descartan
+    las de menor prioridad y, si aún no cabe, se recorta la última incluida.
+    """
+
+    def __init__(self, preamble: str, budget_tokens: Optional[int] = None,
+                 estimator: Optional[TokenEstimator] = None):
+        """
+        Args:
+            preamble: Instrucciones estáticas (system)
+            budget_tokens: Tokens máximos de la petición completa (None = sin límite)
+            estimator: Estimador de tokens compartido
+        """
+        self.preamble = preamble.strip()
+        self.budget_tokens = budget_tokens
+        self.estimator = estimator or TokenEstimator()
+
+    def build(self, sections: Sequence[Tuple[str, str, int]],
+              budget_tokens: Optional[int] = None) -> CompactPrompt:
+        """
+        Args:
+            sections: (nombre, texto, prioridad) en orden de aparición; prioridad
+                mayor = más importante (0 = obligatoria, nunca se descarta)
+            budget_tokens: Presupuesto de esta petición (por defecto el del builder)
+        """
+        budget = budget_tokens if budget_tokens is not None else self.budget_tokens
+        count = self.estimator.count
+        preamble_tokens = count(self.preamble)
+
+        kept = [(name, text.strip(), priority) for name, text, priority in sections if text and text.strip()]
+        dropped = []
+
+        def total(items):
+            return preamble_tokens + sum(count(text) + 1 for _, text, _ in items)
+
+        if budget is not None:
+            # Descartar de menor a mayor prioridad (las obligatorias se quedan)
+            for name, _, priority in sorted(kept, key=lambda item: item[2] if item[2] > 0 else math.inf):
+                if total(kept) <= budget or priority <= 0:
+                    break
+                kept = [item for item in kept if item[0] != name]
+                dropped.append(name)
+
+            overflow = total(kept) - budget
+            if overflow > 0 and kept:
+                name, text, priority = kept[-1]
+                keep_chars = max(len(text) - int(overflow * self.estimator.chars_per_token) - 1, 0)
+                kept[-1] = (name, text[:keep_chars].rstrip(), priority)
+                dropped.append(f"{name}(truncated)")
+
+        user = '\n'.join(text for _, text, _ in kept if text)
+        prompt = CompactPrompt(self.preamble, user, total(kept), budget, dropped)
+        if dropped:
+            logger.debug(f"Prompt sobre presupuesto ({budget} tokens): {dropped}")
+        return prompt
+
+
+class CallRecord:
+    """Medición de una llamada: tokens de prompt, tiempo al primer token y total"""
+
+    def __init__(self, metrics: 'PromptMetrics', prompt: CompactPrompt):
+        self.metrics = metrics
+        self.prompt = prompt
+        self.start = time.perf_counter()
+        self.ttft: Optional[float] = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def finish(self, usage: Any = None, ok: bool = True) -> Dict[str, Any]:
+        """Cerrar la medición con el `usage` de la respuesta (si lo hay)"""
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) if usage is not None else None
+        completion_tokens = getattr(usage, 'completion_tokens', None) if usage is not None else None
+        if prompt_tokens:
+            self.metrics.estimator.calibrate(self.prompt.chars, prompt_tokens)
+        record = {
+            'prompt_tokens': prompt_tokens or self.prompt.estimated_tokens,
+            'prompt_tokens_reported': bool(prompt_tokens),
+            'completion_tokens': completion_tokens,
+            'ttft': self.ttft,
+            'latency': time.perf_counter() - self.start,
+            'dropped': list(self.prompt.dropped),
+            'ok': ok
+        }
+        self.metrics.add(record)
+        return record
+
+
+class PromptMetrics:
+    """Histórico reciente de tokens de prompt y tiempo al primer token"""
+
+    def __init__(self, name: str = 'prompt', maxlen: int = 200,
+                 estimator: Optional[TokenEstimator] = None):
+        self.name = name
+        self.estimator = estimator or TokenEstimator()
+        self.records = deque(maxlen=maxlen)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def start(self, prompt: CompactPrompt) -> CallRecord:
+        return CallRecord(self, prompt)
+
+    def add(self, record: Dict[str, Any]):
+        with self.lock:
+            self.records.append(record)
+            self.calls += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            records = list(self.records)
+            calls = self.calls
+
+        def average(key):
+            values = [r[key] for r in records if r.get(key) is not None]
+            return sum(values) / len(values) if values else None
+
+        ttfts = sorted(r['ttft'] for r in records if r.get('ttft') is not None)
+        return {
+            'name': self.name,
+            'calls': calls,
+            'avg_prompt_tokens': average('prompt_tokens'),
+            'avg_completion_tokens': average('completion_tokens'),
+            'avg_ttft': average('ttft'),
+            'p90_ttft': ttfts[int(0.9 * (len(ttfts) - 1))] if ttfts else None,
+            'avg_latency': average('latency'),
+            'truncated_calls': sum(1 for r in records if r['dropped']),
+            'chars_per_token': round(self.estimator.chars_per_token, 2),
+            'last': records[-1] if records else None
+        }
+
+
+def ollama_options(keep_alive: str = DEFAULT_KEEP_ALIVE, stream: bool = True) -> Dict[str, Any]:
+    """Argumentos extra de chat.completions.create para Ollama (modelo residente y uso en streaming)"""
+    # En extra_body: SDKs antiguos rechazan stream_options como argumento
+    body = {'keep_alive': keep_alive}
+    if stream:
+        body['stream_options'] = {'include_usage': True}
+    options = {'extra_body': body}
+    if stream:
+        options['stream'] = True
+    return options
+
+
+def stream_chat(client: Any, model: str, prompt: CompactPrompt, metrics: PromptMetrics,
+                keep_alive: str = DEFAULT_KEEP_ALIVE, **kwargs) -> str:
+    """
+    Llamada en streaming midiendo tiempo al primer token y tokens de prompt
+
+    Args:
+        client: Cliente OpenAI apuntando a Ollama
+        model: Modelo
+        prompt: Prompt compacto (system + user)
+        metrics: Destino de la medición
+        **kwargs: temperature, max_tokens...
+    """
+    record = metrics.start(prompt)
+    parts, usage = [], None
+    try:
+        stream = client.chat.completions.create(
+            model=model, messages=prompt.messages(), **ollama_options(keep_alive), **kwargs
+        )
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                record.first_token()
+                parts.append(delta)
+    except Exception:
+        record.finish(usage, ok=False)
+        raise
+    record.finish(usage)
+    return ''.join(parts)
@@ -0,0 +1,1315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SIMULADOR MT5 - ALGO TRADER V3
+==============================
+Módulo compatible con `MetaTrader5` que reproduce barras/ticks grabados en
+ficheros locales y ejecuta órdenes con latencia y slippage configurables.
+
+El reloj simulado avanza a mano (advance/step/sleep) o acelerado respecto al
+reloj real (speed=600 → 1 s real = 10 min de mercado), de modo que los bucles
+en vivo pueden ejecutarse y perfilarse sin terminal MT5.
+
+Uso:
+    from src.broker import mt5_simulator
+    sim = mt5_simulator.install(data_dir='data/replay', speed=600)
+    import MetaTrader5 as mt5   # → este módulo
+
+    python -m src.broker.mt5_simulator --data data/replay --speed 600 main.py
+"""
+
+import argparse
+import fnmatch
+import functools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Constantes de la API (mismos valores que MetaTrader5)
+
+TIMEFRAME_M1, TIMEFRAME_M2, TIMEFRAME_M3, TIMEFRAME_M4, TIMEFRAME_M5 = 1, 2, 3, 4, 5
+TIMEFRAME_M6, TIMEFRAME_M10, TIMEFRAME_M12, TIMEFRAME_M15 = 6, 10, 12, 15
+TIMEFRAME_M20, TIMEFRAME_M30 = 20, 30
+TIMEFRAME_H1, TIMEFRAME_H2, TIMEFRAME_H3, TIMEFRAME_H4 = 16385, 16386, 16387, 16388
+TIMEFRAME_H6, TIMEFRAME_H8, TIMEFRAME_H12 = 16390, 16392, 16396
+TIMEFRAME_D1, TIMEFRAME_W1, TIMEFRAME_MN1 = 16408, 32769, 49153
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M2: 120, TIMEFRAME_M3: 180, TIMEFRAME_M4: 240,
+    TIMEFRAME_M5: 300, TIMEFRAME_M6: 360, TIMEFRAME_M10: 600, TIMEFRAME_M12: 720,
+    TIMEFRAME_M15: 900, TIMEFRAME_M20: 1200, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H2: 7200, TIMEFRAME_H3: 10800, TIMEFRAME_H4: 14400,
+    TIMEFRAME_H6: 21600, TIMEFRAME_H8: 28800, TIMEFRAME_H12: 43200,
+    TIMEFRAME_D1: 86400, TIMEFRAME_W1: 604800, TIMEFRAME_MN1: 2592000,
+}
+TIMEFRAME_NAMES = {name[len('TIMEFRAME_'):]: value for name, value in globals().items()
+                   if name.startswith('TIMEFRAME_') and isinstance(value, int)}
+
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT = 2, 3
+ORDER_TYPE_BUY_STOP, ORDER_TYPE_SELL_STOP = 4, 5
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+DEAL_TYPE_BUY, DEAL_TYPE_SELL = 0, 1
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+DEAL_REASON_CLIENT, DEAL_REASON_EXPERT, DEAL_REASON_SL, DEAL_REASON_TP = 0, 3, 4, 5
+
+TRADE_ACTION_DEAL, TRADE_ACTION_PENDING, TRADE_ACTION_SLTP = 1, 5, 6
+TRADE_ACTION_MODIFY, TRADE_ACTION_REMOVE, TRADE_ACTION_CLOSE_BY = 7, 8, 10
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+ORDER_TIME_GTC, ORDER_TIME_DAY, ORDER_TIME_SPECIFIED = 0, 1, 2
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_PLACED = 10008
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_NO_CHANGES = 10025
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+COPY_TICKS_ALL, COPY_TICKS_INFO, COPY_TICKS_TRADE = -1, 1, 2
+TICK_FLAG_BID, TICK_FLAG_ASK, TICK_FLAG_LAST, TICK_FLAG_VOLUME = 2, 4, 8, 16
+ACCOUNT_TRADE_MODE_DEMO = 0
+SYMBOL_TRADE_MODE_FULL = 4
+
+RES_S_OK = (1, 'Success')
+RES_E_FAIL = (-1, 'Generic fail')
+RES_E_INVALID_PARAMS = (-2, 'Invalid arguments')
+RES_E_NOT_FOUND = (-4, 'No history')
+RES_E_NO_CONNECTION = (-10004, 'No IPC connection')
+
+# Estructuras devueltas (mismos nombres de campo que MetaTrader5)
+
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+SymbolInfo = namedtuple('SymbolInfo', 'name description path currency_base currency_profit visible select '
+                        'digits point spread trade_mode trade_stops_level trade_contract_size '
+                        'trade_tick_size trade_tick_value volume_min volume_max volume_step bid ask time')
+AccountInfo = namedtuple('AccountInfo', 'login trade_mode leverage limit_orders trade_allowed trade_expert '
+                         'balance credit profit equity margin margin_free margin_level name server currency company')
+TerminalInfo = namedtuple('TerminalInfo', 'connected trade_allowed tradeapi_disabled build name company path')
+TradePosition = namedtuple('TradePosition', 'ticket time time_msc time_update time_update_msc type magic '
+                           'identifier reason volume price_open sl tp price_current swap profit symbol '
+                           'comment external_id')
+TradeOrder = namedtuple('TradeOrder', 'ticket time_setup time_setup_msc time_done time_done_msc type '
+                        'type_time type_filling state magic position_id volume_initial volume_current '
+                        'price_open sl tp price_current symbol comment')
+TradeDeal = namedtuple('TradeDeal', 'ticket order time time_msc type entry magic position_id reason volume '
+                       'price commission swap profit fee symbol comment external_id')
+TradeRequest = namedtuple('TradeRequest', 'action magic order symbol volume price stoplimit sl tp deviation '
+                          'type type_filling type_time expiration comment position position_by')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment '
+                             'request_id retcode_external request')
+OrderCheckResult = namedtuple('OrderCheckResult', 'retcode balance equity profit margin margin_free '
+                              'margin_level comment request')
+
+RATES_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+TICKS_DTYPE = np.dtype([('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+                        ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')])
+
+_REQUEST_DEFAULTS = dict(action=0, magic=0, order=0, symbol='', volume=0.0, price=0.0, stoplimit=0.0, sl=0.0,
+                         tp=0.0, deviation=0, type=0, type_filling=0, type_time=0, expiration=0, comment='',
+                         position=0, position_by=0)
+
+
+@dataclass
+class SymbolSpec:
+    """Especificación de contrato de un símbolo simulado"""
+    name: str
+    digits: int = 5
+    point: float = 0.00001
+    contract_size: float = 100000.0
+    tick_value: Optional[float] = None  # en divisa de la cuenta; None = contract_size * point
+    volume_min: float = 0.01
+    volume_max: float = 100.0
+    volume_step: float = 0.01
+    spread: int = 10  # puntos, cuando los datos no traen ask/spread
+    stops_level: int = 0
+    currency_profit: str = 'USD'
+    description: str = ''
+
+    @property
+    def value_per_point(self) -> float:
+        return self.tick_value if self.tick_value is not None else self.contract_size * self.point
+
+    @classmethod
+    def guess(cls, symbol: str, prices: Optional[np.ndarray] = None, **overrides) -> 'SymbolSpec':
+        """Especificación por convención de nombre y decimales de los precios"""
+        name = symbol.upper()
+        if name.startswith('XAU'):
+            spec = dict(digits=2, point=0.01, contract_size=100.0, spread=30)
+        elif name.startswith('XAG'):
+            spec = dict(digits=3, point=0.001, contract_size=5000.0, spread=30)
+        elif re.fullmatch(r'[A-Z]{6}', name) and not name.startswith(('BTC', 'ETH')):
+            digits = 3 if 'JPY' in name else 5
+            spec = dict(digits=digits, point=10.0 ** -digits, contract_size=100000.0, spread=10)
+        else:
+            digits = _infer_digits(prices) if prices is not None else 2
+            spec = dict(digits=digits, point=10.0 ** -digits, contract_size=1.0, spread=100)
+        spec['currency_profit'] = name[3:6] if len(name) >= 6 else 'USD'
+        spec.update(overrides)
+        return cls(name=symbol, **spec)
+
+
+def _infer_digits(prices: np.ndarray, max_digits: int = 8) -> int:
+    sample = np.asarray(prices, dtype=float)[:1000]
+    sample = sample[np.isfinite(sample)]
+    for digits in range(max_digits + 1):
+        if np.allclose(sample, np.round(sample, digits), atol=10.0 ** -(max_digits + 2)):
+            return digits
+    return max_digits
+
+
+def _to_seconds(value: Union[datetime, int, float, str, np.datetime64]) -> float:
+    """Fecha de la API (datetime, epoch o texto) a segundos epoch"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    stamp = pd.Timestamp(value)
+    return (stamp if stamp.tzinfo else stamp.tz_localize('UTC')).timestamp()
+
+
+def _bucket_start(times: np.ndarray, timeframe: int) -> np.ndarray:
+    """Apertura de la barra de `timeframe` que contiene cada tiempo (segundos)"""
+    times = np.asarray(times, dtype=np.int64)
+    if timeframe == TIMEFRAME_MN1:
+        months = times.astype('datetime64[s]').astype('datetime64[M]')
+        return months.astype('datetime64[s]').astype(np.int64)
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    # Las semanas de MT5 empiezan en domingo (el epoch fue jueves)
+    offset = 3 * 86400 if timeframe == TIMEFRAME_W1 else 0
+    return (times - offset) // seconds * seconds + offset
+
+
+def _aggregate(times: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+               tick_volume: np.ndarray, spread: np.ndarray, real_volume: np.ndarray, timeframe: int) -> np.ndarray:
+    """Agrupar barras o ticks (en orden) en barras de `timeframe`"""
+    out = np.zeros(0, dtype=RATES_DTYPE)
+    if len(times) == 0:
+        return out
+    buckets = _bucket_start(times, timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    out = np.zeros(len(starts), dtype=RATES_DTYPE)
+    out['time'] = buckets[starts]
+    out['open'] = open_[starts]
+    out['high'] = np.maximum.reduceat(high, starts)
+    out['low'] = np.minimum.reduceat(low, starts)
+    out['close'] = close[ends]
+    out['tick_volume'] = np.add.reduceat(tick_volume.astype(np.uint64), starts)
+    out['spread'] = spread[starts]
+    out['real_volume'] = np.add.reduceat(real_volume.astype(np.uint64), starts)
+    return out
+
+
+def _read_table(source: Union[str, Path, pd.DataFrame, np.ndarray]) -> pd.DataFrame:
+    """CSV/TSV (incluido el export de MT5 con <DATE> <TIME>), parquet, npy o DataFrame"""
+    if isinstance(source, pd.DataFrame):
+        df = source.copy()
+    elif isinstance(source, np.ndarray):
+        df = pd.DataFrame(source)
+    else:
+        path = Path(source)
+        if path.suffix == '.parquet':
+            df = pd.read_parquet(path)
+        elif path.suffix == '.npy':
+            df = pd.DataFrame(np.load(path))
+        else:
+            df = pd.read_csv(path, sep=None, engine='python')
+
+    df.columns = [str(c).strip().strip('<>').lower() for c in df.columns]
+    if 'time' not in df.columns or 'date' in df.columns:
+        if 'date' in df.columns and 'time' in df.columns:
+            df['time'] = df['date'].astype(str) + ' ' + df['time'].astype(str)
+        else:
+            column = next((c for c in ('datetime', 'date', 'timestamp') if c in df.columns), None)
+            if column is not None:
+                df['time'] = df[column]
+            elif 'time_msc' in df.columns:
+                df['time'] = df['time_msc'].astype(np.int64) // 1000
+            else:
+                raise ValueError(f"Tabla sin columna de tiempo (time, time_msc, date, datetime o "
+                                 f"timestamp): {list(df.columns)}")
+    if 'time_msc' in df.columns:
+        df['time_msc'] = df['time_msc'].astype(np.int64)
+    elif pd.api.types.is_numeric_dtype(df['time']):
+        df['time_msc'] = (df['time'].astype(float) * 1000).astype(np.int64)
+    elif pd.api.types.is_datetime64_any_dtype(df['time']):
+        df['time_msc'] = df['time'].astype('datetime64[ms]').astype(np.int64)
+    else:
+        stamps = pd.to_datetime(df['time'].astype(str).str.replace('.', '-', n=2, regex=False))
+        df['time_msc'] = stamps.astype('datetime64[ms]').astype(np.int64)
+    return df.sort_values('time_msc', kind='stable').reset_index(drop=True)
+
+
+class _SymbolData:
+    """Ticks (grabados o sintetizados desde barras) y barras base de un símbolo"""
+
+    def __init__(self, spec: SymbolSpec):
+        self.spec = spec
+        self.time_msc = np.zeros(0, dtype=np.int64)
+        self.bid = np.zeros(0)
+        self.ask = np.zeros(0)
+        self.last = np.zeros(0)
+        self.volume = np.zeros(0)
+        self.base_bars: Optional[np.ndarray] = None
+        self.base_timeframe: Optional[int] = None
+        self.bars_cache: Dict[int, np.ndarray] = {}
+        self.cursor = -1  # último tick procesado para SL/TP y pendientes
+        self.selected = True
+
+    def set_ticks(self, time_msc, bid, ask, last, volume):
+        self.time_msc = np.asarray(time_msc, dtype=np.int64)
+        self.bid = np.asarray(bid, dtype=float)
+        self.ask = np.asarray(ask, dtype=float)
+        self.last = np.asarray(last, dtype=float)
+        self.volume = np.asarray(volume, dtype=float)
+        self.bars_cache.clear()
+
+    def index_at(self, time_msc: int) -> int:
+        """Índice del último tick con tiempo <= time_msc (-1 si ninguno)"""
+        return int(np.searchsorted(self.time_msc, time_msc, side='right')) - 1
+
+    def bars(self, timeframe: int) -> np.ndarray:
+        """Todas las barras de `timeframe` (incluida la futura), cacheadas"""
+        if timeframe not in self.bars_cache:
+            base = self.base_bars
+            seconds = TIMEFRAME_SECONDS[timeframe]
+            if base is not None and timeframe == self.base_timeframe:
+                bars = base
+            elif base is not None and seconds % TIMEFRAME_SECONDS[self.base_timeframe] == 0:
+                bars = _aggregate(base['time'], base['open'], base['high'], base['low'], base['close'],
+                                  base['tick_volume'], base['spread'], base['real_volume'], timeframe)
+            else:
+                bars = self._bars_from_ticks(0, len(self.time_msc), timeframe)
+            self.bars_cache[timeframe] = bars
+        return self.bars_cache[timeframe]
+
+    def _bars_from_ticks(self, lo: int, hi: int, timeframe: int) -> np.ndarray:
+        bid = self.bid[lo:hi]
+        spread = np.rint((self.ask[lo:hi] - bid) / self.spec.point).astype(np.int32)
+        return _aggregate(self.time_msc[lo:hi] // 1000, bid, bid, bid, bid, np.ones(hi - lo, dtype=np.uint64),
+                          spread, self.volume[lo:hi], timeframe)
+
+    def forming_bar(self, timeframe: int, bar_start: int, now_index: int) -> np.ndarray:
+        """Barra en curso construida solo con los ticks ya ocurridos (sin mirar el futuro)"""
+        lo = int(np.searchsorted(self.time_msc, bar_start * 1000, side='left'))
+        if now_index < lo:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        return self._bars_from_ticks(lo, now_index + 1, timeframe)[-1:]
+
+
+@dataclass
+class _Position:
+    ticket: int
+    symbol: str
+    type: int
+    volume: float
+    price_open: float
+    sl: float
+    tp: float
+    magic: int
+    comment: str
+    time_msc: int
+    time_update_msc: int
+    identifier: int
+    reason: int = DEAL_REASON_EXPERT
+
+
+@dataclass
+class _Order:
+    ticket: int
+    symbol: str
+    type: int
+    volume: float
+    price: float
+    sl: float
+    tp: float
+    magic: int
+    comment: str
+    time_setup_msc: int
+    type_time: int = ORDER_TIME_GTC
+    type_filling: int = ORDER_FILLING_RETURN
+
+
+def _api(requires_init: bool = True):
+    """Método expuesto por el módulo: cuenta la llamada, toma el lock y procesa ticks pendientes"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.lock:
+                self.calls[method.__name__] += 1
+                if requires_init and not self.initialized:
+                    self._error = RES_E_NO_CONNECTION
+                    return None
+                self._sync()
+                return method(self, *args, **kwargs)
+        wrapper.api = True
+        return wrapper
+    return decorator
+
+
+class MT5Simulator:
+    """
+    Backend simulado de MetaTrader5
+
+    Los ticks de cada símbolo se reproducen según el reloj simulado; SL/TP
+    y órdenes pendientes se ejecutan en el primer tick que los toca. Las
+    órdenes a mercado se llenan al precio del tick `latency_ms` después,
+    más un slippage adverso (fijo + aleatorio) en puntos.
+    """
+
+    def __init__(self,
+                 balance: float = 10000.0,
+                 leverage: int = 100,
+                 currency: str = 'USD',
+                 speed: Optional[float] = None,
+                 start: Optional[Union[datetime, float]] = None,
+                 warmup: float = 0.0,
+                 latency_ms: float = 0.0,
+                 slippage_points: float = 0.0,
+                 slippage_random_points: float = 0.0,
+                 commission_per_lot: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            balance: Balance inicial de la cuenta
+            leverage: Apalancamiento para el margen
+            currency: Divisa de la cuenta
+            speed: Segundos de mercado por segundo real (None = reloj manual)
+            start: Inicio del reloj (por defecto el primer tick + warmup)
+            warmup: Segundos de historia disponibles antes del inicio por defecto
+            latency_ms: Retardo entre order_send y el tick de ejecución
+            slippage_points: Slippage adverso fijo en puntos
+            slippage_random_points: Slippage adverso aleatorio adicional (uniforme)
+            commission_per_lot: Comisión por lote y lado
+            seed: Semilla del slippage aleatorio
+        """
+        self.symbols: Dict[str, _SymbolData] = {}
+        self.balance = balance
+        self.leverage = leverage
+        self.currency = currency
+        self.speed = speed
+        self.warmup = warmup
+        self.latency_ms = latency_ms
+        self.slippage_points = slippage_points
+        self.slippage_random_points = slippage_random_points
+        self.commission_per_lot = commission_per_lot
+        self.rng = random.Random(seed)
+
+        self.initialized = False
+        self.login_id = 0
+        self.server = 'Simulator'
+        self._error = RES_S_OK
+
+        self.positions: Dict[int, _Position] = {}
+        self.orders: Dict[int, _Order] = {}
+        self.deals: List[TradeDeal] = []
+        self.history_orders: List[TradeOrder] = []
+        self._next_ticket = 1
+
+        self._start = _to_seconds(start) if start is not None else None
+        self._now_msc: Optional[int] = None
+        self._wall_anchor = time.monotonic()
+        self._sim_anchor_msc: Optional[int] = None
+
+        self.calls: Counter = Counter()
+        self.stats = Counter()
+        self.lock = threading.RLock()
+
+    # Carga de datos
+
+    def add_symbol(self, symbol: str, **spec) -> SymbolSpec:
+        """Registrar o ajustar la especificación de un símbolo"""
+        with self.lock:
+            data = self.symbols.get(symbol)
+            if data is None:
+                data = self.symbols[symbol] = _SymbolData(SymbolSpec.guess(symbol, **spec))
+            else:
+                for key, value in spec.items():
+                    setattr(data.spec, key, value)
+            return data.spec
+
+    def load_ticks(self, symbol: str, source, **spec) -> int:
+        """
+        Cargar ticks grabados (columnas time/time_msc, bid, ask y opcionales last, volume)
+
+        Returns:
+            Número de ticks cargados
+        """
+        df = _read_table(source)
+        with self.lock:
+            data = self._symbol_for_load(symbol, df['bid'].to_numpy(float), spec)
+            digits = data.spec.digits
+            bid = df['bid'].to_numpy(float).round(digits)
+            ask = df['ask'].to_numpy(float).round(digits) if 'ask' in df else (bid + data.spec.spread * data.spec.point).round(digits)
+            last = df['last'].to_numpy(float) if 'last' in df else np.zeros(len(df))
+            volume_column = _first(df, 'volume_real', 'volume')
+            volume = df[volume_column].to_numpy(float) if volume_column else np.zeros(len(df))
+            data.set_ticks(df['time_msc'].to_numpy(), bid, ask, last, volume)
+            data.base_bars, data.base_timeframe = None, None
+            self._reset_clock()
+        logger.info(f"Simulador: {len(df)} ticks cargados para {symbol}")
+        return len(df)
+
+    def load_bars(self, symbol: str, source, timeframe: int = TIMEFRAME_M1, **spec) -> int:
+        """
+        Cargar barras grabadas y sintetizar sus ticks (apertura, extremos, cierre)
+
+        Args:
+            symbol: Símbolo
+            source: Fichero (csv/parquet/npy), DataFrame o array estructurado
+            timeframe: Temporalidad de las barras (constante TIMEFRAME_*)
+            **spec: Campos de SymbolSpec a fijar (digits, contract_size...)
+        """
+        df = _read_table(source)
+        with self.lock:
+            data = self._symbol_for_load(symbol, df['close'].to_numpy(), spec)
+            bars = np.zeros(len(df), dtype=RATES_DTYPE)
+            bars['time'] = df['time_msc'].to_numpy() // 1000
+            for field_name in ('open', 'high', 'low', 'close'):
+                bars[field_name] = df[field_name].to_numpy(float).round(data.spec.digits)
+            volume_column = _first(df, 'tick_volume', 'tickvol', 'volume')
+            bars['tick_volume'] = df[volume_column].to_numpy() if volume_column else 1
+            bars['spread'] = df['spread'].to_numpy() if 'spread' in df else data.spec.spread
+            real_volume_column = _first(df, 'real_volume', 'vol')
+            bars['real_volume'] = df[real_volume_column].to_numpy() if real_volume_column else 0
+
+            data.base_bars, data.base_timeframe = bars, timeframe
+            data.set_ticks(*self._synthesize_ticks(bars, timeframe, data.spec))
+            self._reset_clock()
+        logger.info(f"Simulador: {len(bars)} barras cargadas para {symbol}")
+        return len(bars)
+
+    def load_directory(self, path: Union[str, Path], **spec) -> List[str]:
+        """
+        Cargar todos los ficheros de un directorio: SYMBOL_M1.csv (barras) o SYMBOL_ticks.csv
+
+        Returns:
+            Símbolos cargados
+        """
+        loaded = []
+        for file in sorted(Path(path).iterdir()):
+            match = re.fullmatch(r'([A-Za-z0-9.#]+)_([A-Za-z0-9]+)\.(csv|tsv|parquet|npy)', file.name)
+            if not match:
+                continue
+            symbol, kind = match.group(1), match.group(2).upper()
+            if kind == 'TICKS':
+                self.load_ticks(symbol, file, **spec)
+            elif kind in TIMEFRAME_NAMES:
+                self.load_bars(symbol, file, TIMEFRAME_NAMES[kind], **spec)
+            else:
+                continue
+            loaded.append(symbol)
+        return loaded
+
+    def _symbol_for_load(self, symbol: str, prices: np.ndarray, spec: Dict[str, Any]) -> _SymbolData:
+        if symbol not in self.symbols:
+            self.symbols[symbol] = _SymbolData(SymbolSpec.guess(symbol, prices, **spec))
+        elif spec:
+            self.add_symbol(symbol, **spec)
+        return self.symbols[symbol]
+
+    @staticmethod
+    def _synthesize_ticks(bars: np.ndarray, timeframe: int, spec: SymbolSpec):
+        """Cuatro ticks por barra: apertura, extremo cercano, extremo lejano y cierre"""
+        n = len(bars)
+        duration_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        bullish = bars['close'] >= bars['open']
+        path = np.empty((n, 4))
+        path[:, 0] = bars['open']
+        path[:, 1] = np.where(bullish, bars['low'], bars['high'])
+        path[:, 2] = np.where(bullish, bars['high'], bars['low'])
+        path[:, 3] = bars['close']
+        offsets = np.array([0, duration_ms // 4, duration_ms // 2, duration_ms - 1], dtype=np.int64)
+        time_msc = (bars['time'].astype(np.int64)[:, None] * 1000 + offsets).ravel()
+        bid = path.ravel()
+        ask = (bid + np.repeat(bars['spread'], 4) * spec.point).round(spec.digits)
+        volume = np.repeat(bars['real_volume'] / 4.0, 4)
+        return time_msc, bid, ask, np.zeros(4 * n), volume
+
+    # Reloj
+
+    def _data_bounds(self):
+        firsts = [int(d.time_msc[0]) for d in self.symbols.values() if len(d.time_msc)]
+        lasts = [int(d.time_msc[-1]) for d in self.symbols.values() if len(d.time_msc)]
+        return (min(firsts), max(lasts)) if firsts else (0, 0)
+
+    def _reset_clock(self):
+        first, _ = self._data_bounds()
+        start_msc = int(self._start * 1000) if self._start is not None else first + int(self.warmup * 1000)
+        self._now_msc = start_msc
+        self._sim_anchor_msc = start_msc
+        self._wall_anchor = time.monotonic()
+        for data in self.symbols.values():
+            data.cursor = data.index_at(start_msc)
+
+    @property
+    def now_msc(self) -> int:
+        """Tiempo simulado actual en milisegundos (limitado al final de los datos)"""
+        if self._now_msc is None:
+            self._reset_clock()
+        if self.speed:
+            elapsed = (time.monotonic() - self._wall_anchor) * self.speed
+            self._now_msc = max(self._now_msc, self._sim_anchor_msc + int(elapsed * 1000))
+        return int(min(self._now_msc, self._data_bounds()[1]))
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.now_msc / 1000, tz=timezone.utc)
+
+    @property
+    def finished(self) -> bool:
+        """Si el reloj llegó al último tick de los datos"""
+        return self.now_msc >= self._data_bounds()[1]
+
+    def set_time(self, when: Union[datetime, float]):
+        """Mover el reloj a `when` (solo hacia delante; ejecuta lo ocurrido entre medias)"""
+        self._set_time_msc(int(round(_to_seconds(when) * 1000)))
+
+    def _set_time_msc(self, target_msc: int):
+        with self.lock:
+            self._now_msc = max(self.now_msc, target_msc)
+            self._sim_anchor_msc = self._now_msc
+            self._wall_anchor = time.monotonic()
+            self._sync()
+
+    def advance(self, seconds: float):
+        """Avanzar el reloj simulado `seconds`"""
+        with self.lock:
+            self._set_time_msc(self.now_msc + int(round(seconds * 1000)))
+
+    def step(self, ticks: int = 1) -> bool:
+        """
+        Avanzar hasta el siguiente tick de cualquier símbolo (`ticks` veces)
+
+        Returns:
+            False si ya no quedan ticks
+        """
+        with self.lock:
+            for _ in range(ticks):
+                now = self.now_msc
+                upcoming = [d.time_msc[i] for d in self.symbols.values()
+                            for i in [d.index_at(now) + 1] if i < len(d.time_msc)]
+                if not upcoming:
+                    return False
+                self._set_time_msc(int(min(upcoming)))
+            return True
+
+    def sleep(self, seconds: float):
+        """time.sleep en tiempo simulado: avanza el reloj manual o duerme seconds/speed"""
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        else:
+            self.advance(seconds)
+
+    # Procesamiento de eventos (SL/TP y pendientes)
+
+    def _sync(self):
+        now = self.now_msc
+        for symbol, data in self.symbols.items():
+            end = data.index_at(now)
+            if end > data.cursor:
+                self._process_ticks(symbol, data, data.cursor + 1, end)
+                self.stats['ticks_processed'] += end - data.cursor
+                data.cursor = end
+
+    def _process_ticks(self, symbol: str, data: _SymbolData, lo: int, hi: int):
+        bid, ask = data.bid[lo:hi + 1], data.ask[lo:hi + 1]
+
+        # Pendientes: primer tick que cruza el precio
+        opened_at = {}
+        for order in [o for o in self.orders.values() if o.symbol == symbol]:
+            if order.type == ORDER_TYPE_BUY_LIMIT:
+                hits = ask <= order.price
+            elif order.type == ORDER_TYPE_SELL_LIMIT:
+                hits = bid >= order.price
+            elif order.type == ORDER_TYPE_BUY_STOP:
+                hits = ask >= order.price
+            else:
+                hits = bid <= order.price
+            if hits.any():
+                i = int(np.argmax(hits))
+                is_buy = order.type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP)
+                market = float(ask[i] if is_buy else bid[i])
+                limit = order.type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT)
+                price = (min(order.price, market) if is_buy else max(order.price, market)) if limit else market
+                del self.orders[order.ticket]
+                position = self._open_position(symbol, ORDER_TYPE_BUY if is_buy else ORDER_TYPE_SELL, order.volume,
+                                               price, order.sl, order.tp, order.magic, order.comment,
+                                               int(data.time_msc[lo + i]), order.ticket)
+                self._archive_order(order, int(data.time_msc[lo + i]), position.ticket)
+                opened_at[position.ticket] = i + 1
+                self.stats['pending_filled'] += 1
+
+        # SL/TP: primer tick que los toca, al precio de ese tick. Con latencia
+        # la posición se abre después de ahora: solo cuentan ticks desde su apertura
+        times = data.time_msc[lo:hi + 1]
+        for position in [p for p in self.positions.values() if p.symbol == symbol]:
+            start = max(opened_at.get(position.ticket, 0),
+                        int(np.searchsorted(times, position.time_msc, side='left')))
+            if start >= len(bid):
+                continue
+            if position.type == POSITION_TYPE_BUY:
+                close_prices = bid[start:]
+                sl_hit = close_prices <= position.sl if position.sl else np.zeros(len(close_prices), bool)
+                tp_hit = close_prices >= position.tp if position.tp else np.zeros(len(close_prices), bool)
+            else:
+                close_prices = ask[start:]
+                sl_hit = close_prices >= position.sl if position.sl else np.zeros(len(close_prices), bool)
+                tp_hit = close_prices <= position.tp if position.tp else np.zeros(len(close_prices), bool)
+            hit = sl_hit | tp_hit
+            if hit.any():
+                i = int(np.argmax(hit))
+                reason = DEAL_REASON_SL if sl_hit[i] else DEAL_REASON_TP
+                self._close_position(position, position.volume, float(close_prices[i]),
+                                     int(data.time_msc[lo + start + i]), reason, position.magic,
+                                     'sl' if reason == DEAL_REASON_SL else 'tp')
+                self.stats['sl_hits' if reason == DEAL_REASON_SL else 'tp_hits'] += 1
+
+    # Contabilidad
+
+    def _ticket(self) -> int:
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def _profit(self, spec: SymbolSpec, position_type: int, volume: float, price_open: float, price_close: float) -> float:
+        direction = 1 if position_type == POSITION_TYPE_BUY else -1
+        return direction * (price_close - price_open) / spec.point * spec.value_per_point * volume
+
+    def _margin(self, spec: SymbolSpec, volume: float, price: float) -> float:
+        return volume * spec.contract_size * price / self.leverage
+
+    def _quote(self, data: _SymbolData, is_buy: bool) -> float:
+        """Precio actual para comprar (ask) o vender (bid)"""
+        i = data.index_at(self.now_msc)
+        if i < 0:
+            return float('nan')
+        return float(data.ask[i] if is_buy else data.bid[i])
+
+    def _current_price(self, data: _SymbolData, position_type: int) -> float:
+        """Precio de cierre de una posición: bid para compras, ask para ventas"""
+        return self._quote(data, is_buy=position_type != POSITION_TYPE_BUY)
+
+    def _floating(self):
+        profit = margin = 0.0
+        for position in self.positions.values():
+            data = self.symbols[position.symbol]
+            price = self._current_price(data, position.type)
+            if np.isfinite(price):
+                profit += self._profit(data.spec, position.type, position.volume, position.price_open, price)
+            margin += self._margin(data.spec, position.volume, position.price_open)
+        return profit, margin
+
+    def _open_position(self, symbol, position_type, volume, price, sl, tp, magic, comment, time_msc, order_ticket):
+        spec = self.symbols[symbol].spec
+        position = _Position(order_ticket, symbol, position_type, volume, price, sl or 0.0, tp or 0.0,
+                             magic, comment, time_msc, time_msc, order_ticket)
+        self.positions[position.ticket] = position
+        self._add_deal(order_ticket, symbol, position_type, DEAL_ENTRY_IN, magic, position.ticket,
+                       DEAL_REASON_EXPERT, volume, price, 0.0, comment, time_msc, spec)
+        return position
+
+    def _close_position(self, position: _Position, volume: float, price: float, time_msc: int,
+                        reason: int, magic: int, comment: str, order_ticket: Optional[int] = None):
+        spec = self.symbols[position.symbol].spec
+        profit = self._profit(spec, position.type, volume, position.price_open, price)
+        deal_type = DEAL_TYPE_SELL if position.type == POSITION_TYPE_BUY else DEAL_TYPE_BUY
+        self._add_deal(order_ticket or self._ticket(), position.symbol, deal_type, DEAL_ENTRY_OUT, magic,
+                       position.ticket, reason, volume, price, profit, comment, time_msc, spec)
+        position.volume = round(position.volume - volume, 8)
+        if position.volume <= 0:
+            del self.positions[position.ticket]
+        return profit
+
+    def _add_deal(self, order, symbol, deal_type, entry, magic, position_id, reason, volume, price, profit,
+                  comment, time_msc, spec):
+        commission = -self.commission_per_lot * volume
+        deal = TradeDeal(self._ticket(), order, time_msc // 1000, time_msc, deal_type, entry, magic, position_id,
+                         reason, volume, price, commission, 0.0, profit, 0.0, symbol, comment, '')
+        self.deals.append(deal)
+        self.balance += profit + commission
+        return deal
+
+    def _archive_order(self, order: _Order, done_msc: int, position_id: int, state: int = 4):
+        self.history_orders.append(TradeOrder(
+            order.ticket, order.time_setup_msc // 1000, order.time_setup_msc, done_msc // 1000, done_msc,
+            order.type, order.type_time, order.type_filling, state, order.magic, position_id,
+            order.volume, 0.0, order.price, order.sl, order.tp, order.price, order.symbol, order.comment))
+
+    # API de MetaTrader5
+
+    @_api(requires_init=False)
+    def initialize(self, path: Optional[str] = None, login: Optional[int] = None, password: Optional[str] = None,
+                   server: Optional[str] = None, timeout: Optional[int] = None, portable: bool = False, **kwargs) -> bool:
+        """Conectar al terminal simulado (carga MT5_SIM_DATA si no hay datos)"""
+        if not self.symbols and os.getenv('MT5_SIM_DATA'):
+            self.load_directory(os.getenv('MT5_SIM_DATA'))
+        self.initialized = True
+        if login:
+            self.login_id = int(login)
+            self.server = server or self.server
+        self._error = RES_S_OK
+        return True
+
+    @_api()
+    def login(self, login: int, password: Optional[str] = None, server: Optional[str] = None, **kwargs) -> bool:
+        self.login_id = int(login)
+        self.server = server or self.server
+        return True
+
+    @_api(requires_init=False)
+    def shutdown(self):
+        self.initialized = False
+        return True
+
+    @_api(requires_init=False)
+    def last_error(self):
+        return self._error
+
+    @_api(requires_init=False)
+    def version(self):
+        return (500, 4000, '01 Jan 2025')
+
+    @_api()
+    def terminal_info(self) -> TerminalInfo:
+        return TerminalInfo(True, True, False, 4000, 'MT5 Simulator', 'Algo Trader', '')
+
+    @_api()
+    def account_info(self) -> AccountInfo:
+        profit, margin = self._floating()
+        equity = self.balance + profit
+        margin_level = equity / margin * 100 if margin else 0.0
+        return AccountInfo(self.login_id, ACCOUNT_TRADE_MODE_DEMO, self.leverage, 200, True, True,
+                           round(self.balance, 2), 0.0, round(profit, 2), round(equity, 2), round(margin, 2),
+                           round(equity - margin, 2), round(margin_level, 2), 'Simulator', self.server,
+                           self.currency, 'Algo Trader')
+
+    @_api()
+    def symbols_total(self) -> int:
+        return len(self.symbols)
+
+    @_api()
+    def symbols_get(self, group: Optional[str] = None):
+        return tuple(self._symbol_info(name) for name in self.symbols if _match_group(name, group))
+
+    @_api()
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        data = self.symbols.get(symbol)
+        if data is None:
+            self._error = RES_E_NOT_FOUND
+            return False
+        data.selected = enable
+        return True
+
+    @_api()
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        return self._symbol_info(symbol)
+
+    def _symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        data = self.symbols.get(symbol)
+        if data is None:
+            self._error = RES_E_NOT_FOUND
+            return None
+        spec = data.spec
+        i = data.index_at(self.now_msc)
+        bid, ask = (float(data.bid[i]), float(data.ask[i])) if i >= 0 else (0.0, 0.0)
+        spread = int(round((ask - bid) / spec.point)) if i >= 0 else spec.spread
+        return SymbolInfo(symbol, spec.description or symbol, '', symbol[:3], spec.currency_profit, data.selected,
+                          data.selected, spec.digits, spec.point, spread, SYMBOL_TRADE_MODE_FULL, spec.stops_level,
+                          spec.contract_size, spec.point, spec.value_per_point, spec.volume_min, spec.volume_max,
+                          spec.volume_step, bid, ask, int(data.time_msc[i] // 1000) if i >= 0 else 0)
+
+    @_api()
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        data = self.symbols.get(symbol)
+        i = data.index_at(self.now_msc) if data is not None else -1
+        if i < 0:
+            self._error = RES_E_NOT_FOUND
+            return None
+        time_msc = int(data.time_msc[i])
+        return Tick(time_msc // 1000, float(data.bid[i]), float(data.ask[i]), float(data.last[i]),
+                    int(data.volume[i]), time_msc, TICK_FLAG_BID | TICK_FLAG_ASK, float(data.volume[i]))
+
+    # Históricos
+
+    @_api()
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+        """Barras desde la posición `start_pos` (0 = barra en curso) hacia atrás, en orden cronológico"""
+        view = self._rates_view(symbol, timeframe)
+        if view is None:
+            return None
+        end = view[0] + len(view[2]) - start_pos
+        return self._rates_window(view, end - count, end)
+
+    @_api()
+    def copy_rates_from(self, symbol: str, timeframe: int, date_from, count: int) -> Optional[np.ndarray]:
+        view = self._rates_view(symbol, timeframe)
+        if view is None:
+            return None
+        end = self._rates_index(view, _to_seconds(date_from), 'right')
+        return self._rates_window(view, end - count, end)
+
+    @_api()
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from, date_to) -> Optional[np.ndarray]:
+        view = self._rates_view(symbol, timeframe)
+        if view is None:
+            return None
+        return self._rates_window(view, self._rates_index(view, _to_seconds(date_from), 'left'),
+                                  self._rates_index(view, _to_seconds(date_to), 'right'))
+
+    def _rates_view(self, symbol: str, timeframe: int):
+        """(nº de barras cerradas, todas las barras, barra en curso) hasta ahora, sin copiar"""
+        data = self.symbols.get(symbol)
+        if data is None or timeframe not in TIMEFRAME_SECONDS:
+            self._error = RES_E_NOT_FOUND if data is None else RES_E_INVALID_PARAMS
+            return None
+        now_msc = self.now_msc
+        bars = data.bars(timeframe)
+        current_start = int(_bucket_start(np.array([now_msc // 1000]), timeframe)[0])
+        completed = int(np.searchsorted(bars['time'], current_start, side='left'))
+        forming = data.forming_bar(timeframe, current_start, data.index_at(now_msc))
+        return completed, bars, forming
+
+    @staticmethod
+    def _rates_index(view, seconds: float, side: str) -> int:
+        completed, bars, forming = view
+        index = min(int(np.searchsorted(bars['time'], seconds, side=side)), completed)
+        if len(forming) and (forming['time'][0] < seconds or (side == 'right' and forming['time'][0] == seconds)):
+            index = completed + 1
+        return index
+
+    def _rates_window(self, view, lo: int, hi: int) -> np.ndarray:
+        """Barras [lo, hi) de la serie cerradas + en curso (copia solo la ventana)"""
+        completed, bars, forming = view
+        lo = max(lo, 0)
+        window = bars[lo:max(min(hi, completed), lo)]
+        self.stats['rates_served'] += 1
+        if len(forming) and hi > completed >= lo:
+            return np.concatenate([window, forming])
+        return window.copy()
+
+    @_api()
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int = COPY_TICKS_ALL) -> Optional[np.ndarray]:
+        data = self.symbols.get(symbol)
+        if data is None:
+            self._error = RES_E_NOT_FOUND
+            return None
+        lo = int(np.searchsorted(data.time_msc, int(_to_seconds(date_from) * 1000), side='left'))
+        hi = min(data.index_at(self.now_msc) + 1, lo + count)
+        return self._ticks(data, lo, hi)
+
+    @_api()
+    def copy_ticks_range(self, symbol: str, date_from, date_to, flags: int = COPY_TICKS_ALL) -> Optional[np.ndarray]:
+        data = self.symbols.get(symbol)
+        if data is None:
+            self._error = RES_E_NOT_FOUND
+            return None
+        lo = int(np.searchsorted(data.time_msc, int(_to_seconds(date_from) * 1000), side='left'))
+        hi = min(data.index_at(self.now_msc), data.index_at(int(_to_seconds(date_to) * 1000))) + 1
+        return self._ticks(data, lo, hi)
+
+    @_api()
+    def copy_ticks_from_pos(self, symbol: str, start_pos: int, count: int) -> Optional[np.ndarray]:
+        """Extensión usada por el analizador de ticks: últimos `count` ticks hasta `start_pos`"""
+        data = self.symbols.get(symbol)
+        if data is None:
+            self._error = RES_E_NOT_FOUND
+            return None
+        hi = data.index_at(self.now_msc) + 1 - start_pos
+        return self._ticks(data, max(hi - count, 0), max(hi, 0))
+
+    def _ticks(self, data: _SymbolData, lo: int, hi: int) -> np.ndarray:
+        hi = max(hi, lo)
+        ticks = np.zeros(hi - lo, dtype=TICKS_DTYPE)
+        ticks['time_msc'] = data.time_msc[lo:hi]
+        ticks['time'] = ticks['time_msc'] // 1000
+        ticks['bid'] = data.bid[lo:hi]
+        ticks['ask'] = data.ask[lo:hi]
+        ticks['last'] = data.last[lo:hi]
+        ticks['volume'] = data.volume[lo:hi].astype(np.uint64)
+        ticks['volume_real'] = data.volume[lo:hi]
+        ticks['flags'] = TICK_FLAG_BID | TICK_FLAG_ASK
+        self.stats['ticks_served'] += hi - lo
+        return ticks
+
+    # Posiciones y órdenes
+
+    @_api()
+    def positions_total(self) -> int:
+        return len(self.positions)
+
+    @_api()
+    def positions_get(self, symbol: Optional[str] = None, group: Optional[str] = None,
+                      ticket: Optional[int] = None):
+        selected = [p for p in self.positions.values()
+                    if (symbol is None or p.symbol == symbol) and (ticket is None or p.ticket == ticket)
+                    and _match_group(p.symbol, group)]
+        return tuple(self._trade_position(p) for p in selected)
+
+    def _trade_position(self, position: _Position) -> TradePosition:
+        data = self.symbols[position.symbol]
+        price = self._current_price(data, position.type)
+        profit = self._profit(data.spec, position.type, position.volume, position.price_open, price)
+        return TradePosition(position.ticket, position.time_msc // 1000, position.time_msc,
+                             position.time_update_msc // 1000, position.time_update_msc, position.type,
+                             position.magic, position.identifier, position.reason, position.volume,
+                             position.price_open, position.sl, position.tp, price, 0.0, round(profit, 2),
+                             position.symbol, position.comment, '')
+
+    @_api()
+    def orders_total(self) -> int:
+        return len(self.orders)
+
+    @_api()
+    def orders_get(self, symbol: Optional[str] = None, group: Optional[str] = None,
+                   ticket: Optional[int] = None):
+        selected = [o for o in self.orders.values()
+                    if (symbol is None or o.symbol == symbol) and (ticket is None or o.ticket == ticket)
+                    and _match_group(o.symbol, group)]
+        return tuple(TradeOrder(o.ticket, o.time_setup_msc // 1000, o.time_setup_msc, 0, 0, o.type, o.type_time,
+                                o.type_filling, 1, o.magic, 0, o.volume, o.volume, o.price, o.sl, o.tp,
+                                self._quote(self.symbols[o.symbol], o.type % 2 == 0), o.symbol, o.comment)
+                     for o in selected)
+
+    @_api()
+    def history_deals_get(self, date_from=None, date_to=None, group: Optional[str] = None,
+                          ticket: Optional[int] = None, position: Optional[int] = None):
+        return tuple(self._history(self.deals, 'time', 'order', date_from, date_to, group, ticket, position))
+
+    @_api()
+    def history_deals_total(self, date_from, date_to) -> int:
+        return len(self._history(self.deals, 'time', 'order', date_from, date_to))
+
+    @_api()
+    def history_orders_get(self, date_from=None, date_to=None, group: Optional[str] = None,
+                           ticket: Optional[int] = None, position: Optional[int] = None):
+        return tuple(self._history(self.history_orders, 'time_setup', 'ticket', date_from, date_to, group,
+                                   ticket, position))
+
+    @_api()
+    def history_orders_total(self, date_from, date_to) -> int:
+        return len(self._history(self.history_orders, 'time_setup', 'ticket', date_from, date_to))
+
+    @staticmethod
+    def _history(records, time_field: str, ticket_field: str, date_from=None, date_to=None, group=None,
+                 ticket=None, position=None):
+        if ticket is not None:
+            return [r for r in records if getattr(r, ticket_field) == ticket]
+        if position is not None:
+            return [r for r in records if r.position_id == position]
+        lo = _to_seconds(date_from) if date_from is not None else float('-inf')
+        hi = _to_seconds(date_to) if date_to is not None else float('inf')
+        return [r for r in records if lo <= getattr(r, time_field) <= hi and _match_group(r.symbol, group)]
+
+    @_api()
+    def order_calc_margin(self, action: int, symbol: str, volume: float, price: float) -> Optional[float]:
+        data = self.symbols.get(symbol)
+        return round(self._margin(data.spec, volume, price), 2) if data else None
+
+    @_api()
+    def order_calc_profit(self, action: int, symbol: str, volume: float, price_open: float,
+                          price_close: float) -> Optional[float]:
+        data = self.symbols.get(symbol)
+        return round(self._profit(data.spec, action % 2, volume, price_open, price_close), 2) if data else None
+
+    @_api()
+    def order_check(self, request: Dict[str, Any]) -> OrderCheckResult:
+        retcode, comment, _ = self._validate(request)
+        profit, margin = self._floating()
+        equity = self.balance + profit
+        return OrderCheckResult(0 if retcode == TRADE_RETCODE_DONE else retcode, self.balance, equity, profit,
+                                margin, equity - margin, equity / margin * 100 if margin else 0.0,
+                                'Done' if retcode == TRADE_RETCODE_DONE else comment, _trade_request(request))
+
+    @_api()
+    def order_send(self, request: Dict[str, Any]) -> OrderSendResult:
+        """Ejecutar una petición de trading (mercado, pendiente, SL/TP, cancelación)"""
+        action = request.get('action')
+        self.stats['orders_sent'] += 1
+        if action == TRADE_ACTION_DEAL:
+            result = self._send_deal(request)
+        elif action == TRADE_ACTION_SLTP:
+            result = self._send_sltp(request)
+        elif action == TRADE_ACTION_PENDING:
+            result = self._send_pending(request)
+        elif action in (TRADE_ACTION_MODIFY, TRADE_ACTION_REMOVE):
+            result = self._send_order_change(request)
+        else:
+            result = self._result(TRADE_RETCODE_INVALID, request, comment='Unsupported action')
+        if result.retcode not in (TRADE_RETCODE_DONE, TRADE_RETCODE_PLACED):
+            self.stats['orders_rejected'] += 1
+        return result
+
+    def _result(self, retcode: int, request: Dict[str, Any], deal: int = 0, order: int = 0, volume: float = 0.0,
+                price: float = 0.0, comment: str = '') -> OrderSendResult:
+        data = self.symbols.get(request.get('symbol', ''))
+        i = data.index_at(self.now_msc) if data is not None else -1
+        bid, ask = (float(data.bid[i]), float(data.ask[i])) if i >= 0 else (0.0, 0.0)
+        if not comment:
+            comment = 'Request executed' if retcode in (TRADE_RETCODE_DONE, TRADE_RETCODE_PLACED) else 'Rejected'
+        return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, self.stats['orders_sent'],
+                               0, _trade_request(request))
+
+    def _validate(self, request: Dict[str, Any]):
+        """(retcode, comentario, datos del símbolo) de una petición antes de ejecutarla"""
+        data = self.symbols.get(request.get('symbol', ''))
+        if data is None:
+            return TRADE_RETCODE_INVALID, 'Unknown symbol', None
+        if data.index_at(self.now_msc) < 0:
+            return TRADE_RETCODE_MARKET_CLOSED, 'Market closed', data
+        spec = data.spec
+        volume = float(request.get('volume', 0) or 0)
+        if request.get('action') in (TRADE_ACTION_DEAL, TRADE_ACTION_PENDING):
+            steps = (volume - spec.volume_min) / spec.volume_step
+            if volume < spec.volume_min - 1e-9 or volume > spec.volume_max + 1e-9 or abs(steps - round(steps)) > 1e-6:
+                return TRADE_RETCODE_INVALID_VOLUME, 'Invalid volume', data
+        if request.get('action') == TRADE_ACTION_DEAL and not request.get('position'):
+            order_type = request.get('type')
+            if order_type not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+                return TRADE_RETCODE_INVALID, 'Invalid order type', data
+            price = self._quote(data, order_type == ORDER_TYPE_BUY)
+            if not self._stops_valid(spec, order_type, price, request.get('sl', 0.0), request.get('tp', 0.0)):
+                return TRADE_RETCODE_INVALID_STOPS, 'Invalid stops', data
+            profit, margin = self._floating()
+            if self._margin(spec, volume, price) > self.balance + profit - margin:
+                return TRADE_RETCODE_NO_MONEY, 'No money', data
+        return TRADE_RETCODE_DONE, '', data
+
+    def _stops_valid(self, spec: SymbolSpec, order_type: int, price: float, sl: float, tp: float) -> bool:
+        min_distance = spec.stops_level * spec.point
+        is_buy = order_type % 2 == 0
+        if sl and (sl >= price - min_distance if is_buy else sl <= price + min_distance):
+            return False
+        if tp and (tp <= price + min_distance if is_buy else tp >= price - min_distance):
+            return False
+        return True
+
+    def _fill_price(self, data: _SymbolData, is_buy: bool) -> float:
+        """Precio del tick `latency_ms` después de ahora más slippage adverso"""
+        i = data.index_at(self.now_msc + int(self.latency_ms))
+        price = float(data.ask[i] if is_buy else data.bid[i])
+        slippage = self.slippage_points + (self.rng.uniform(0, self.slippage_random_points)
+                                           if self.slippage_random_points else 0.0)
+        price += (slippage if is_buy else -slippage) * data.spec.point
+        return round(price, data.spec.digits)
+
+    def _send_deal(self, request: Dict[str, Any]) -> OrderSendResult:
+        retcode, comment, data = self._validate(request)
+        if retcode != TRADE_RETCODE_DONE:
+            return self._result(retcode, request, comment=comment)
+
+        order_type = request.get('type')
+        volume = float(request['volume'])
+        position = self.positions.get(request.get('position') or 0)
+        if request.get('position') and position is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position doesn\'t exist')
+        if position is not None and (order_type == position.type or volume > position.volume + 1e-9):
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Invalid close request')
+
+        price = self._fill_price(data, order_type == ORDER_TYPE_BUY)
+        requested = request.get('price') or 0.0
+        deviation = request.get('deviation')
+        if requested and deviation is not None and abs(price - requested) > deviation * data.spec.point + 1e-12:
+            self.stats['requotes'] += 1
+            return self._result(TRADE_RETCODE_REQUOTE, request, comment='Requote')
+
+        time_msc = self.now_msc + int(self.latency_ms)
+        order_ticket = self._ticket()
+        if position is not None:
+            self._close_position(position, volume, price, time_msc, DEAL_REASON_EXPERT,
+                                 request.get('magic', 0), request.get('comment', ''), order_ticket)
+            self.stats['positions_closed'] += 1
+        else:
+            position = self._open_position(data.spec.name, order_type, volume, price, request.get('sl', 0.0),
+                                           request.get('tp', 0.0), request.get('magic', 0),
+                                           request.get('comment', ''), time_msc, order_ticket)
+            self.stats['positions_opened'] += 1
+        order = _Order(order_ticket, data.spec.name, order_type, volume, price, request.get('sl', 0.0),
+                       request.get('tp', 0.0), request.get('magic', 0), request.get('comment', ''), time_msc,
+                       type_filling=request.get('type_filling', ORDER_FILLING_FOK))
+        self._archive_order(order, time_msc, position.ticket)
+        return self._result(TRADE_RETCODE_DONE, request, deal=self.deals[-1].ticket, order=order_ticket,
+                            volume=volume, price=price)
+
+    def _send_sltp(self, request: Dict[str, Any]) -> OrderSendResult:
+        position = self.positions.get(request.get('position') or 0)
+        if position is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position doesn\'t exist')
+        sl, tp = request.get('sl', position.sl) or 0.0, request.get('tp', position.tp) or 0.0
+        if sl == position.sl and tp == position.tp:
+            return self._result(TRADE_RETCODE_NO_CHANGES, request, comment='No changes')
+        data = self.symbols[position.symbol]
+        if not self._stops_valid(data.spec, position.type, self._current_price(data, position.type), sl, tp):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, comment='Invalid stops')
+        position.sl, position.tp = sl, tp
+        position.time_update_msc = self.now_msc
+        self.stats['sltp_modified'] += 1
+        return self._result(TRADE_RETCODE_DONE, request)
+
+    def _send_pending(self, request: Dict[str, Any]) -> OrderSendResult:
+        retcode, comment, data = self._validate(request)
+        if retcode != TRADE_RETCODE_DONE:
+            return self._result(retcode, request, comment=comment)
+        order_type = request.get('type')
+        if order_type not in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT, ORDER_TYPE_BUY_STOP, ORDER_TYPE_SELL_STOP):
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Invalid order type')
+        order = _Order(self._ticket(), data.spec.name, order_type, float(request['volume']),
+                       float(request.get('price', 0.0)), request.get('sl', 0.0), request.get('tp', 0.0),
+                       request.get('magic', 0), request.get('comment', ''), self.now_msc,
+                       request.get('type_time', ORDER_TIME_GTC), request.get('type_filling', ORDER_FILLING_RETURN))
+        self.orders[order.ticket] = order
+        return self._result(TRADE_RETCODE_PLACED, request, order=order.ticket, volume=order.volume, price=order.price)
+
+    def _send_order_change(self, request: Dict[str, Any]) -> OrderSendResult:
+        order = self.orders.get(request.get('order') or 0)
+        if order is None:
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Order doesn\'t exist')
+        if request['action'] == TRADE_ACTION_REMOVE:
+            del self.orders[order.ticket]
+            self._archive_order(order, self.now_msc, 0, state=2)
+        else:
+            order.price = request.get('price', order.price)
+            order.sl = request.get('sl', order.sl)
+            order.tp = request.get('tp', order.tp)
+        return self._result(TRADE_RETCODE_DONE, request, order=order.ticket)
+
+    # Estadísticas
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Llamadas por función, actividad de trading y velocidad frente al reloj real"""
+        with self.lock:
+            first, last = self._data_bounds()
+            now = self.now_msc
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                **dict(self.stats),
+                'symbols': len(self.symbols),
+                'open_positions': len(self.positions),
+                'pending_orders': len(self.orders),
+                'deals': len(self.deals),
+                'balance': round(self.balance, 2),
+                'sim_time': datetime.fromtimestamp(now / 1000, tz=timezone.utc).isoformat() if now else None,
+                'progress': (now - first) / (last - first) if last > first else 1.0,
+                'speed': self.speed
+            }
+
+
+def _first(df: pd.DataFrame, *columns: str) -> Optional[str]:
+    return next((c for c in columns if c in df.columns), None)
+
+
+def _match_group(symbol: str, group: Optional[str]) -> bool:
+    """Filtro de grupo de MT5: patrones separados por comas, '!' excluye"""
+    if not group:
+        return True
+    matched = False
+    for pattern in (p.strip() for p in group.split(',') if p.strip()):
+        if pattern.startswith('!'):
+            if fnmatch.fnmatchcase(symbol, pattern[1:]):
+                return False
+        elif fnmatch.fnmatchcase(symbol, pattern):
+            matched = True
+    return matched
+
+
+def _trade_request(request: Dict[str, Any]) -> TradeRequest:
+    return TradeRequest(**{key: request.get(key, default) for key, default in _REQUEST_DEFAULTS.items()})
+
+
+# Funciones de módulo: delegan en el simulador activo, como la API de MetaTrader5
+
+_simulator = MT5Simulator()
+
+def _delegate(name: str):
+    method = getattr(MT5Simulator, name)
+
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        return getattr(_simulator, name)(*args, **kwargs)
+    return call
+
+_API = [name for name, member in vars(MT5Simulator).items() if getattr(member, 'api', False)]
+for _name in _API:
+    globals()[_name] = _delegate(_name)
+
+
+def get_simulator() -> MT5Simulator:
+    """Simulador que atienden las funciones del módulo"""
+    return _simulator
+
+
+def set_simulator(simulator: MT5Simulator) -> MT5Simulator:
+    global _simulator
+    _simulator = simulator
+    return simulator
+
+
+def install(simulator: Optional[MT5Simulator] = None, data_dir: Optional[Union[str, Path]] = None,
+            **kwargs) -> MT5Simulator:
+    """
+    Registrar este módulo como `MetaTrader5` (antes de importar los subsistemas)
+
+    Args:
+        simulator: Simulador a usar (por defecto uno nuevo con **kwargs)
+        data_dir: Directorio con ficheros SYMBOL_TF.csv / SYMBOL_ticks.csv
+    """
+    simulator = set_simulator(simulator or MT5Simulator(**kwargs))
+    if data_dir:
+        simulator.load_directory(data_dir)
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    logger.info(f"MetaTrader5 simulado: {len(simulator.symbols)} símbolos, speed={simulator.speed}")
+    return simulator
+
+
+def main(argv: Optional[List[str]] = None):
+    """Ejecutar un script con MetaTrader5 sustituido por el simulador"""
+    import runpy
+
+    parser = argparse.ArgumentParser(description='Ejecuta un script contra el simulador MT5')
+    parser.add_argument('--data', default=os.getenv('MT5_SIM_DATA'), help='Directorio de barras/ticks')
+    parser.add_argument('--speed', type=float, default=float(os.getenv('MT5_SIM_SPEED', '60')),
+                        help='Segundos de mercado por segundo real')
+    parser.add_argument('--warmup', type=float, default=0.0, help='Segundos de historia previos al inicio')
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--slippage', type=float, default=0.0, help='Slippage adverso fijo en puntos')
+    parser.add_argument('script', help='Script a ejecutar')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+
+    # Con `python -m` este fichero es __main__: instalar la copia del paquete
+    # para que el script y MetaTrader5 compartan el mismo simulador
+    from src.broker import mt5_simulator
+    mt5_simulator.install(data_dir=options.data, speed=options.speed, warmup=options.warmup,
+                          balance=options.balance, latency_ms=options.latency_ms,
+                          slippage_points=options.slippage)
+    sys.argv = [options.script] + options.args
+    runpy.run_path(options.script, run_name='__main__')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,21 @@
 """
 Core Package - Módulos principales del sistema
+Las clases se importan al primer acceso: los submódulos ligeros
+(http_client, circuit_breaker...) no arrastran BotManager ni MetaTrader5
 """
-from .bot_manager import BotManager
-from .state_manager import StateManager
-from .mt5_connection import MT5ConnectionManager
+import importlib
 
-__all__ = ['BotManager', 'StateManager', 'MT5ConnectionManager']
+_EXPORTS = {
+    'BotManager': '.bot_manager',
+    'StateManager': '.state_manager',
+    'MT5ConnectionManager': '.mt5_connection',
+    'MT5Snapshot': '.mt5_snapshot',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
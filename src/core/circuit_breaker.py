@@ -72,6 +72,29 @@ class CircuitBreaker:
             CircuitOpenException: Si el circuito está abierto
             Exception: Si la función falla
         """
+        self.before_call()
+        
+        # Intentar ejecutar la función
+        try:
+            result = func(*args, **kwargs)
+            self._on_success()
+            return result
+            
+        except self.expected_exception as e:
+            self._on_failure()
+            raise e
+    
+    def before_call(self):
+        """
+        Registrar una llamada y verificar el estado del circuito
+        
+        Permite usar el breaker en código que no se puede envolver con
+        call() (p. ej. corrutinas); el resultado se informa después con
+        record_success() / record_failure().
+        
+        Raises:
+            CircuitOpenException: Si el circuito está abierto
+        """
         with self.lock:
             self.total_calls += 1
             
@@ -84,16 +107,14 @@ class CircuitBreaker:
                     raise CircuitOpenException(
                         f"Circuit {self.name} está ABIERTO"
                     )
-        
-        # Intentar ejecutar la función
-        try:
-            result = func(*args, **kwargs)
-            self._on_success()
-            return result
-            
-        except self.expected_exception as e:
-            self._on_failure()
-            raise e
+    
+    def record_success(self):
+        """Informar una llamada exitosa iniciada con before_call()"""
+        self._on_success()
+    
+    def record_failure(self):
+        """Informar una llamada fallida iniciada con before_call()"""
+        self._on_failure()
     
     def _should_attempt_reset(self) -> bool:
         """Verificar si deberíamos intentar recuperación"""
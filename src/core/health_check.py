@@ -6,7 +6,8 @@ import os
 import time
 import psutil
 import threading
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
@@ -14,60 +15,92 @@ import requests
 
 # Importaciones locales
 import MetaTrader5 as mt5
+from .circuit_breaker import circuit_manager
+from .http_client import get_http_stats
 
 logger = logging.getLogger(__name__)
 
 class HealthCheck:
     """Health check individual para un componente"""
     
-    def __init__(self, name: str, check_function, critical: bool = False):
+    def __init__(self, name: str, check_function, critical: bool = False,
+                 ttl: float = 60.0, timeout: float = 5.0,
+                 passive_function: Optional[Callable[[], Optional[Tuple[bool, str]]]] = None):
         """
         Args:
             name: Nombre del componente
             check_function: Función que retorna (bool, mensaje)
             critical: Si es crítico para el funcionamiento
+            ttl: Segundos que el último resultado se considera vigente
+            timeout: Segundos máximos de ejecución antes de darlo por fallido
+            passive_function: Función sin coste de red que retorna (bool, mensaje)
+                o None si no hay evidencia suficiente (entonces se usa check_function)
         """
         self.name = name
         self.check_function = check_function
         self.critical = critical
+        self.ttl = ttl
+        self.timeout = timeout
+        self.passive_function = passive_function
         self.last_check = None
         self.last_status = None
         self.last_message = None
+        self.last_source = None  # 'active', 'passive' o 'timeout'
+        self.last_duration = 0.0
+        self.checked_at = None  # time.monotonic() del último resultado
         self.consecutive_failures = 0
     
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        """Si el último resultado ya caducó"""
+        if self.checked_at is None:
+            return True
+        return (now if now is not None else time.monotonic()) - self.checked_at >= self.ttl
+    
     def check(self) -> Tuple[bool, str]:
         """Ejecutar health check"""
+        start = time.monotonic()
         try:
-            status, message = self.check_function()
-            
-            # Actualizar estado
-            self.last_check = datetime.now()
-            self.last_status = status
-            self.last_message = message
-            
-            if status:
-                self.consecutive_failures = 0
+            result = self.passive_function() if self.passive_function else None
+            if result is not None:
+                status, message = result
+                source = 'passive'
             else:
-                self.consecutive_failures += 1
-            
-            return status, message
-            
+                status, message = self.check_function()
+                source = 'active'
         except Exception as e:
+            status, message, source = False, f"Error en check: {str(e)}", 'active'
+        
+        self.last_duration = time.monotonic() - start
+        self.record(status, message, source)
+        return status, message
+    
+    def record(self, status: bool, message: str, source: str):
+        """Actualizar el último resultado"""
+        self.last_check = datetime.now()
+        self.checked_at = time.monotonic()
+        self.last_status = status
+        self.last_message = message
+        self.last_source = source
+        
+        if status:
+            self.consecutive_failures = 0
+        else:
             self.consecutive_failures += 1
-            message = f"Error en check: {str(e)}"
-            self.last_status = False
-            self.last_message = message
-            return False, message
 
 class HealthMonitor:
     """Monitor de salud del sistema completo"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 8):
         self.checks = {}
         self.monitoring_thread = None
         self.stop_monitoring = threading.Event()
         self.monitoring_interval = 60  # segundos
         
+        # Checks en paralelo; cada uno con su TTL y timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='health')
+        self.in_flight: Dict[str, Tuple] = {}  # nombre -> (future, inicio)
+        self.lock = threading.Lock()
+        
         # Registrar checks por defecto
         self._register_default_checks()
     
@@ -78,57 +111,126 @@ class HealthMonitor:
         self.add_check(
             'system_resources',
             self._check_system_resources,
-            critical=True
+            critical=True,
+            ttl=15
         )
         
         # MT5
         self.add_check(
             'mt5_connection',
             self._check_mt5,
-            critical=True
+            critical=True,
+            ttl=10,
+            timeout=3
         )
         
         # APIs
         self.add_check(
             'twelvedata_api',
             self._check_twelvedata,
-            critical=False
+            critical=False,
+            ttl=300,
+            passive_function=lambda: self._passive_api_check('twelvedata')
         )
         
         # Ollama/IA
         self.add_check(
             'ollama_service',
             self._check_ollama,
-            critical=False
+            critical=False,
+            ttl=60,
+            passive_function=lambda: self._passive_api_check('ollama')
         )
         
         # Telegram
         self.add_check(
             'telegram_bot',
             self._check_telegram,
-            critical=False
+            critical=False,
+            ttl=300,
+            passive_function=lambda: self._passive_api_check('telegram')
         )
         
         # Base de datos
         self.add_check(
             'database',
             self._check_database,
-            critical=False
+            critical=False,
+            ttl=300
         )
         
         # Archivos de log
         self.add_check(
             'log_files',
             self._check_log_files,
-            critical=False
+            critical=False,
+            ttl=600
         )
     
-    def add_check(self, name: str, check_function, critical: bool = False):
+    def add_check(self, name: str, check_function, critical: bool = False,
+                  ttl: float = 60.0, timeout: float = 5.0, passive_function=None):
         """Añadir un health check"""
-        self.checks[name] = HealthCheck(name, check_function, critical)
+        self.checks[name] = HealthCheck(name, check_function, critical, ttl, timeout, passive_function)
+    
+    def refresh(self, force: bool = False, wait: bool = False) -> Dict[str, Tuple]:
+        """
+        Lanzar en paralelo los checks caducados
+        
+        Args:
+            force: Ignorar el TTL
+            wait: Esperar a cada check como máximo su timeout
+            
+        Returns:
+            {nombre: (future, inicio)} de los checks en curso
+        """
+        now = time.monotonic()
+        running = {}
+        with self.lock:
+            for name, check in self.checks.items():
+                entry = self.in_flight.get(name)
+                if entry and not entry[0].done():
+                    running[name] = entry
+                elif force or check.is_stale(now):
+                    entry = (self.executor.submit(check.check), now)
+                    self.in_flight[name] = entry
+                    running[name] = entry
+        
+        if wait:
+            for name, (future, started) in running.items():
+                remaining = started + self.checks[name].timeout - time.monotonic()
+                try:
+                    future.result(timeout=max(0.0, remaining))
+                except FutureTimeoutError:
+                    pass
+            self._expire_timeouts()
+        return running
     
-    def check_all(self) -> Dict:
-        """Ejecutar todos los health checks"""
+    def _expire_timeouts(self):
+        """Marcar como fallidos los checks que superan su timeout"""
+        now = time.monotonic()
+        with self.lock:
+            for name, (future, started) in list(self.in_flight.items()):
+                check = self.checks[name]
+                if future.done():
+                    del self.in_flight[name]
+                elif now - started > check.timeout and (check.checked_at is None or check.checked_at < started):
+                    check.record(False, f"Timeout (>{check.timeout:g}s)", 'timeout')
+    
+    def check_all(self, wait: bool = False) -> Dict:
+        """
+        Estado de salud de todos los componentes
+        
+        Devuelve los últimos resultados sin bloquear y relanza en segundo plano
+        los checks caducados. Los checks que aún no tienen resultado aparecen
+        como 'pending' (y un crítico pendiente marca el sistema como no saludable).
+        
+        Args:
+            wait: Esperar a los checks caducados (como máximo su timeout)
+        """
+        self.refresh(wait=wait)
+        self._expire_timeouts()
+        
+        now = time.monotonic()
         results = {
             'timestamp': datetime.now().isoformat(),
             'healthy': True,
@@ -138,13 +240,28 @@ class HealthMonitor:
         }
         
         for name, check in self.checks.items():
-            status, message = check.check()
+            status, message = check.last_status, check.last_message
+            
+            if status is None:
+                results['checks'][name] = {
+                    'status': 'pending',
+                    'message': 'Sin resultado todavía',
+                    'critical': check.critical,
+                    'consecutive_failures': 0
+                }
+                if check.critical:
+                    results['healthy'] = False
+                    results['issues'].append(f"{name}: pendiente")
+                continue
             
             results['checks'][name] = {
                 'status': 'healthy' if status else 'unhealthy',
                 'message': message,
                 'critical': check.critical,
-                'consecutive_failures': check.consecutive_failures
+                'consecutive_failures': check.consecutive_failures,
+                'source': check.last_source,
+                'age_seconds': round(now - check.checked_at, 1),
+                'duration_ms': round(check.last_duration * 1000, 1)
             }
             
             if not status:
@@ -183,7 +300,7 @@ class HealthMonitor:
         """Loop de monitoreo continuo"""
         while not self.stop_monitoring.is_set():
             try:
-                results = self.check_all()
+                results = self.check_all(wait=True)
                 
                 # Log de resultados
                 if not results['healthy']:
@@ -199,8 +316,9 @@ class HealthMonitor:
             except Exception as e:
                 logger.error(f"Error en monitoreo de salud: {e}")
             
-            # Esperar hasta el siguiente check
-            self.stop_monitoring.wait(self.monitoring_interval)
+            # Esperar hasta el siguiente check (o antes si algún TTL es menor)
+            min_ttl = min((check.ttl for check in self.checks.values()), default=self.monitoring_interval)
+            self.stop_monitoring.wait(min(self.monitoring_interval, min_ttl))
     
     def _save_health_status(self, results: Dict):
         """Guardar estado de salud a archivo"""
@@ -217,11 +335,36 @@ class HealthMonitor:
     
     # Health checks específicos
     
+    def _passive_api_check(self, service: str, max_age: float = 300.0) -> Optional[Tuple[bool, str]]:
+        """
+        Salud de una API a partir del tráfico real (sin ping)
+        
+        Usa el estado del circuit breaker y la última llamada correcta del
+        cliente HTTP compartido. Retorna None si no hay evidencia reciente.
+        """
+        breaker = circuit_manager.get_breaker(service)
+        if breaker is not None and breaker.get_status()['state'] == 'open':
+            return False, f"Circuito abierto ({service})"
+        
+        stats = get_http_stats().get(service, {})
+        last_success = stats.get('last_success')
+        if not last_success:
+            return None
+        last_failure = stats.get('last_failure')
+        if last_failure and last_failure > last_success:
+            return None
+        
+        age = (datetime.now() - datetime.fromisoformat(last_success)).total_seconds()
+        if age > max_age:
+            return None
+        return True, f"Última llamada OK hace {age:.0f}s (p95 {stats.get('latency_p95_ms', 0):.0f}ms)"
+    
     def _check_system_resources(self) -> Tuple[bool, str]:
         """Verificar recursos del sistema"""
         try:
             # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Sin intervalo: uso desde la llamada anterior (no bloquea 1s)
+            cpu_percent = psutil.cpu_percent(interval=None)
             if cpu_percent > 90:
                 return False, f"CPU muy alta: {cpu_percent}%"
             
@@ -0,0 +1,436 @@
+"""
+Cliente HTTP compartido para APIs externas
+Pools keep-alive por servicio, timeouts, reintentos con backoff y circuit breaker
+"""
+import time
+import json
+import random
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from .circuit_breaker import circuit_manager
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+@dataclass
+class HTTPClientConfig:
+    """Configuración de conexión y reintentos para un servicio"""
+    timeout: Union[float, Tuple[float, float]] = (5.0, 15.0)  # (connect, read)
+    max_retries: int = 2
+    backoff_base: float = 0.5  # Segundos, se duplica en cada intento
+    backoff_max: float = 8.0
+    pool_connections: int = 4  # Hosts distintos con pool propio
+    pool_maxsize: int = 10  # Conexiones keep-alive por host
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    retry_non_idempotent: bool = False  # Reintentar POST tras enviar el body
+    breaker: Optional[str] = None  # Nombre en circuit_manager
+
+DEFAULT_CONFIGS = {
+    'twelvedata': HTTPClientConfig(timeout=(5.0, 15.0), max_retries=2, breaker='twelvedata'),
+    # Las llamadas al LLM son largas: no repetir una generación ya enviada
+    'ollama': HTTPClientConfig(timeout=(5.0, 180.0), max_retries=1, pool_maxsize=4, breaker='ollama'),
+    'telegram': HTTPClientConfig(timeout=(5.0, 10.0), max_retries=2, breaker='telegram'),
+    'default': HTTPClientConfig(),
+}
+
+class HTTPStats:
+    """Estadísticas de latencia y reintentos de un servicio"""
+
+    def __init__(self, window: int = 500):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=window)  # ms de las últimas llamadas
+        self.last_success = None
+        self.last_failure = None
+
+    def record(self, latency_ms: float, ok: bool):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency_ms)
+            if ok:
+                self.last_success = time.time()
+            else:
+                self.failures += 1
+                self.last_failure = time.time()
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            samples = sorted(self.latencies)
+            last_success = self.last_success
+            last_failure = self.last_failure
+            result = {
+                'requests': self.requests,
+                'failures': self.failures,
+                'retries': self.retries,
+            }
+
+        def pct(q: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        result.update({
+            'latency_avg_ms': sum(samples) / len(samples) if samples else 0.0,
+            'latency_p50_ms': pct(0.50),
+            'latency_p95_ms': pct(0.95),
+            'latency_max_ms': samples[-1] if samples else 0.0,
+            'last_success': (
+                datetime.fromtimestamp(last_success).isoformat()
+                if last_success else None
+            ),
+            'last_failure': (
+                datetime.fromtimestamp(last_failure).isoformat()
+                if last_failure else None
+            ),
+        })
+        return result
+
+class _RetryableResponse(Exception):
+    """Respuesta HTTP con status reintentable (uso interno)"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+def _backoff_delay(config: HTTPClientConfig, attempt: int, retry_after: Optional[str] = None) -> float:
+    """Backoff exponencial con jitter completo; respeta Retry-After si es razonable"""
+    if retry_after:
+        try:
+            wait = float(retry_after)
+            if 0 <= wait <= config.backoff_max:
+                return wait
+        except ValueError:
+            pass
+    ceiling = min(config.backoff_max, config.backoff_base * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+class HTTPClientManager:
+    """
+    Gestor centralizado de sesiones HTTP
+
+    Mantiene una requests.Session por servicio (con pool keep-alive por host)
+    para no abrir una conexión TCP/TLS nueva en cada llamada.
+    """
+
+    def __init__(self, configs: Optional[Dict[str, HTTPClientConfig]] = None):
+        self.configs = dict(DEFAULT_CONFIGS)
+        if configs:
+            self.configs.update(configs)
+
+        self.sessions: Dict[str, requests.Session] = {}
+        self.stats: Dict[str, HTTPStats] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, service: str, **overrides) -> HTTPClientConfig:
+        """Ajustar la configuración de un servicio (se aplica a sesiones nuevas)"""
+        with self.lock:
+            base = self.configs.get(service, self.configs['default'])
+            self.configs[service] = replace(base, **overrides)
+            # El pool se recrea con el nuevo tamaño en la próxima llamada
+            session = self.sessions.pop(service, None)
+        if session:
+            session.close()
+        return self.configs[service]
+
+    def get_config(self, service: str) -> HTTPClientConfig:
+        return self.configs.get(service, self.configs['default'])
+
+    def get_session(self, service: str) -> requests.Session:
+        """Obtener (o crear) la sesión persistente del servicio"""
+        with self.lock:
+            session = self.sessions.get(service)
+            if session is None:
+                config = self.get_config(service)
+                session = requests.Session()
+                # Los reintentos los gestionamos nosotros (con jitter y breaker)
+                adapter = HTTPAdapter(
+                    pool_connections=config.pool_connections,
+                    pool_maxsize=config.pool_maxsize,
+                    max_retries=0
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.sessions[service] = session
+            return session
+
+    def _get_stats(self, service: str) -> HTTPStats:
+        with self.lock:
+            if service not in self.stats:
+                self.stats[service] = HTTPStats()
+            return self.stats[service]
+
+    def request(self, service: str, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Ejecutar una petición HTTP a través del pool del servicio
+
+        Args:
+            service: Nombre del servicio ('twelvedata', 'ollama', 'telegram', ...)
+            method: Método HTTP
+            url: URL completa
+            **kwargs: Argumentos de requests (params, json, headers, timeout...)
+
+        Returns:
+            requests.Response (también para status de error, como requests.get)
+
+        Raises:
+            CircuitOpenException: Si el circuito del servicio está abierto
+            requests.RequestException: Si fallan todos los intentos
+        """
+        config = self.get_config(service)
+        kwargs.setdefault('timeout', config.timeout)
+        breaker = circuit_manager.get_breaker(config.breaker) if config.breaker else None
+
+        if breaker:
+            breaker.before_call()
+        try:
+            response = self._send_with_retries(service, config, method.upper(), url, kwargs)
+        except _RetryableResponse as e:
+            if breaker:
+                if e.response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            return e.response
+        except Exception:
+            if breaker:
+                breaker.record_failure()
+            raise
+
+        if breaker:
+            breaker.record_success()
+        return response
+
+    def _send_with_retries(self, service: str, config: HTTPClientConfig,
+                           method: str, url: str, kwargs: Dict) -> requests.Response:
+        session = self.get_session(service)
+        stats = self._get_stats(service)
+        can_retry_sent = method in IDEMPOTENT_METHODS or config.retry_non_idempotent
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                stats.record((time.perf_counter() - start) * 1000, ok=False)
+                # ConnectTimeout/fallo de conexión: la petición no llegó a enviarse
+                retryable = can_retry_sent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= config.max_retries:
+                    raise
+                delay = _backoff_delay(config, attempt)
+            except requests.exceptions.Timeout:
+                stats.record((time.perf_counter() - start) * 1000, ok=False)
+                if not can_retry_sent or attempt >= config.max_retries:
+                    raise
+                delay = _backoff_delay(config, attempt)
+            else:
+                latency_ms = (time.perf_counter() - start) * 1000
+                if response.status_code not in config.retry_statuses:
+                    stats.record(latency_ms, ok=True)
+                    return response
+                stats.record(latency_ms, ok=False)
+                if not can_retry_sent or attempt >= config.max_retries:
+                    raise _RetryableResponse(response)
+                delay = _backoff_delay(config, attempt, response.headers.get('Retry-After'))
+                response.close()
+
+            attempt += 1
+            stats.record_retry()
+            logger.debug(f"HTTP {service}: reintento {attempt}/{config.max_retries} en {delay:.2f}s")
+            time.sleep(delay)
+
+    def get(self, service: str, url: str, **kwargs) -> requests.Response:
+        return self.request(service, 'GET', url, **kwargs)
+
+    def post(self, service: str, url: str, **kwargs) -> requests.Response:
+        return self.request(service, 'POST', url, **kwargs)
+
+    def _pool_stats(self, session: requests.Session) -> Dict:
+        """Conexiones nuevas vs reutilizadas según los pools de urllib3"""
+        new_connections = 0
+        pooled_requests = 0
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                new_connections += pool.num_connections
+                pooled_requests += pool.num_requests
+        return {
+            'new_connections': new_connections,
+            'pooled_requests': pooled_requests,
+            'connection_reuse_ratio': (
+                1 - new_connections / pooled_requests if pooled_requests else 0.0
+            ),
+        }
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Estadísticas de latencia, reintentos y reutilización por servicio"""
+        with self.lock:
+            services = set(self.stats) | set(self.sessions)
+            sessions = dict(self.sessions)
+            stats = dict(self.stats)
+
+        result = {}
+        for service in sorted(services):
+            entry = stats[service].snapshot() if service in stats else {}
+            if service in sessions:
+                entry.update(self._pool_stats(sessions[service]))
+            result[service] = entry
+        return result
+
+    def close(self):
+        """Cerrar todas las sesiones y sus conexiones"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+@dataclass
+class AsyncHTTPResponse:
+    """Respuesta leída completamente de una petición asíncrona"""
+    status_code: int
+    text: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+class AsyncHTTPClient:
+    """
+    Cliente HTTP asíncrono con la misma política que HTTPClientManager
+
+    Usa una aiohttp.ClientSession por servicio (TCPConnector keep-alive
+    limitado por host). Las sesiones pertenecen al event loop en que se
+    crean: llamar a close() antes de cerrar el loop.
+    """
+
+    def __init__(self, manager: 'HTTPClientManager'):
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("aiohttp no está instalado")
+        self.manager = manager
+        self.sessions: Dict[str, 'aiohttp.ClientSession'] = {}
+
+    def _get_session(self, service: str) -> 'aiohttp.ClientSession':
+        session = self.sessions.get(service)
+        if session is None or session.closed:
+            config = self.manager.get_config(service)
+            connector = aiohttp.TCPConnector(
+                limit=config.pool_maxsize * config.pool_connections,
+                limit_per_host=config.pool_maxsize,
+                keepalive_timeout=30
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self.sessions[service] = session
+        return session
+
+    def _timeout(self, config: HTTPClientConfig, timeout=None) -> 'aiohttp.ClientTimeout':
+        timeout = config.timeout if timeout is None else timeout
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(total=connect + read, sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def request(self, service: str, method: str, url: str, **kwargs) -> AsyncHTTPResponse:
+        """Versión asíncrona de HTTPClientManager.request"""
+        config = self.manager.get_config(service)
+        timeout = self._timeout(config, kwargs.pop('timeout', None))
+        method = method.upper()
+        can_retry_sent = method in IDEMPOTENT_METHODS or config.retry_non_idempotent
+        stats = self.manager._get_stats(service)
+        breaker = circuit_manager.get_breaker(config.breaker) if config.breaker else None
+
+        if breaker:
+            breaker.before_call()
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                session = self._get_session(service)
+                async with session.request(method, url, timeout=timeout, **kwargs) as resp:
+                    response = AsyncHTTPResponse(
+                        status_code=resp.status,
+                        text=await resp.text(),
+                        headers=dict(resp.headers)
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                stats.record((time.perf_counter() - start) * 1000, ok=False)
+                not_sent = isinstance(e, aiohttp.ClientConnectorError)
+                if not (can_retry_sent or not_sent) or attempt >= config.max_retries:
+                    if breaker:
+                        breaker.record_failure()
+                    raise
+                delay = _backoff_delay(config, attempt)
+            else:
+                latency_ms = (time.perf_counter() - start) * 1000
+                ok = response.status_code not in config.retry_statuses
+                stats.record(latency_ms, ok=ok)
+                if ok or not can_retry_sent or attempt >= config.max_retries:
+                    if breaker:
+                        if response.status_code >= 500:
+                            breaker.record_failure()
+                        else:
+                            breaker.record_success()
+                    return response
+                delay = _backoff_delay(config, attempt, response.headers.get('Retry-After'))
+
+            attempt += 1
+            stats.record_retry()
+            await asyncio.sleep(delay)
+
+    async def get(self, service: str, url: str, **kwargs) -> AsyncHTTPResponse:
+        return await self.request(service, 'GET', url, **kwargs)
+
+    async def post(self, service: str, url: str, **kwargs) -> AsyncHTTPResponse:
+        return await self.request(service, 'POST', url, **kwargs)
+
+    async def close(self):
+        for session in self.sessions.values():
+            if not session.closed:
+                await session.close()
+        self.sessions.clear()
+
+# Manager global
+http_manager = HTTPClientManager()
+
+# Funciones de conveniencia
+def http_get(service: str, url: str, **kwargs) -> requests.Response:
+    """GET con pool keep-alive, reintentos y circuit breaker del servicio"""
+    return http_manager.get(service, url, **kwargs)
+
+def http_post(service: str, url: str, **kwargs) -> requests.Response:
+    """POST con pool keep-alive, reintentos y circuit breaker del servicio"""
+    return http_manager.post(service, url, **kwargs)
+
+def get_http_stats() -> Dict[str, Dict]:
+    """Obtener estadísticas de conexiones HTTP"""
+    return http_manager.get_stats()
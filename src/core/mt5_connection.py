@@ -12,28 +12,39 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Códigos de last_error de pérdida del IPC con el terminal (-10001 a -10005)
+IPC_ERROR_CODES = range(-10005, -10000)
+
 class MT5ConnectionManager:
     """Gestor de conexión con reconexión automática para MT5"""
     
     def __init__(self, 
                  max_retries: int = 5,
                  retry_delay: int = 30,
-                 heartbeat_interval: int = 60):
+                 heartbeat_interval: int = 60,
+                 liveness_ttl: float = 1.0):
         """
         Args:
             max_retries: Número máximo de intentos de reconexión
             retry_delay: Segundos entre intentos de reconexión
             heartbeat_interval: Segundos entre verificaciones de conexión
+            liveness_ttl: Segundos tras una llamada correcta (resultado distinto
+                de None y sin error de IPC) en los que no se vuelve a consultar
+                terminal_info (0 = verificar siempre; el heartbeat siempre consulta)
         """
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.heartbeat_interval = heartbeat_interval
+        self.liveness_ttl = liveness_ttl
         
         # Estado de conexión
         self.connected = False
         self.connecting = False
         self.last_connection = None
         self.connection_failures = 0
+        self.last_alive = 0.0
+        self.liveness_checks = 0
+        self.liveness_skips = 0
         
         # Configuración MT5
         self.mt5_config = {
@@ -146,6 +157,7 @@ class MT5ConnectionManager:
                 logger.error(f"Error al cerrar MT5: {e}")
             
             self.connected = False
+            self.last_alive = 0.0
             
             # Ejecutar callback
             if self.on_disconnect:
@@ -190,20 +202,50 @@ class MT5ConnectionManager:
         logger.warning("No hay conexión con MT5, intentando reconectar...")
         return self.reconnect()
     
-    def is_connected(self) -> bool:
-        """Verificar si estamos conectados"""
+    def is_connected(self, force: bool = False) -> bool:
+        """
+        Verificar si estamos conectados
+        
+        Args:
+            force: Consultar terminal_info aunque haya una llamada correcta reciente
+        """
         with self.lock:
             if not self.connected:
                 return False
             
+            # Una llamada correcta reciente ya demuestra que el terminal responde
+            if not force and time.monotonic() - self.last_alive < self.liveness_ttl:
+                self.liveness_skips += 1
+                return True
+            
             # Verificar que MT5 responde
             try:
+                self.liveness_checks += 1
                 terminal_info = mt5.terminal_info()
+                if terminal_info is not None:
+                    self.last_alive = time.monotonic()
                 return terminal_info is not None
             except Exception:
                 self.connected = False
                 return False
     
+    def _mark_result(self, result: Any):
+        """
+        Actualizar last_alive según el resultado de una llamada
+        
+        Las funciones de MT5 no lanzan excepción al perder el IPC: devuelven
+        None y dejan el código en last_error. Solo un resultado válido sin
+        error de IPC cuenta como prueba de vida; en otro caso la siguiente
+        verificación vuelve a consultar terminal_info.
+        """
+        alive = result is not None
+        if alive:
+            try:
+                alive = mt5.last_error()[0] not in IPC_ERROR_CODES
+            except Exception:
+                pass
+        self.last_alive = time.monotonic() if alive else 0.0
+    
     def execute_with_reconnect(self, func: Callable, *args, **kwargs) -> Any:
         """
         Ejecutar una función con reconexión automática si falla
@@ -218,8 +260,11 @@ class MT5ConnectionManager:
         # Primer intento
         if self.ensure_connected():
             try:
-                return func(*args, **kwargs)
+                result = func(*args, **kwargs)
+                self._mark_result(result)
+                return result
             except Exception as e:
+                self.last_alive = 0.0
                 logger.error(f"Error ejecutando {func.__name__}: {e}")
                 
                 # Verificar si es un error de conexión
@@ -228,7 +273,9 @@ class MT5ConnectionManager:
                     if self.reconnect():
                         # Segundo intento después de reconectar
                         try:
-                            return func(*args, **kwargs)
+                            result = func(*args, **kwargs)
+                            self._mark_result(result)
+                            return result
                         except Exception as e2:
                             logger.error(f"Fallo después de reconexión: {e2}")
         
@@ -269,7 +316,8 @@ class MT5ConnectionManager:
         """Loop de heartbeat para verificar conexión"""
         while not self.stop_heartbeat.is_set():
             try:
-                if not self.is_connected():
+                # El heartbeat siempre consulta el terminal (sin atajo de liveness_ttl)
+                if not self.is_connected(force=True):
                     logger.warning("Heartbeat detectó desconexión")
                     
                     # Intentar reconectar
@@ -296,6 +344,8 @@ class MT5ConnectionManager:
                 'connecting': self.connecting,
                 'last_connection': self.last_connection,
                 'connection_failures': self.connection_failures,
+                'liveness_checks': self.liveness_checks,
+                'liveness_skips': self.liveness_skips,
                 'server': self.mt5_config['server'],
                 'login': self.mt5_config['login']
             }
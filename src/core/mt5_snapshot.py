@@ -0,0 +1,275 @@
+"""
+MT5 Snapshot - Caché por ciclo de cuenta, posiciones y precios
+Las consultas repetidas dentro del TTL se sirven desde memoria; al caducar
+se refresca todo en una sola pasada bajo el gestor de reconexión
+"""
+import sys
+import time
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import MetaTrader5 as mt5
+import logging
+
+from .mt5_connection import MT5ConnectionManager, mt5_connection
+
+logger = logging.getLogger(__name__)
+
+# Clave de caché: (función MT5, símbolo o None)
+SnapshotKey = Tuple[str, Optional[str]]
+
+ACCOUNT = ('account_info', None)
+POSITIONS = ('positions_get', None)
+
+# Datos que cambian con una orden ejecutada
+ORDER_SENSITIVE = (ACCOUNT, POSITIONS)
+
+
+class MT5Snapshot:
+    """
+    Vista cacheada del terminal MT5 compartida entre módulos
+
+    Cada consulta cuenta para su llamador. Si el dato sigue dentro del TTL
+    se devuelve sin llamar al terminal; si no, una única pasada refresca
+    cuenta, posiciones y los ticks/símbolos pedidos recientemente, de modo
+    que el resto de módulos del mismo ciclo encuentran el dato ya fresco.
+    Las órdenes enviadas por aquí y las reconexiones invalidan la caché.
+    """
+
+    def __init__(self,
+                 manager: Optional[MT5ConnectionManager] = None,
+                 ttl: float = 0.5,
+                 info_ttl: Optional[float] = None,
+                 watch_ttl: float = 60.0,
+                 mt5_module: Any = None):
+        """
+        Args:
+            manager: Gestor de conexión (por defecto la instancia global)
+            ttl: Segundos de validez de cuenta, posiciones y ticks
+            info_ttl: Segundos de validez de symbol_info (por defecto ttl)
+            watch_ttl: Segundos que un símbolo sigue en la pasada tras su última consulta
+            mt5_module: Módulo MT5 (un simulador o fake en tests)
+        """
+        self.manager = manager or mt5_connection
+        self.ttl = ttl
+        self.info_ttl = ttl if info_ttl is None else info_ttl
+        self.watch_ttl = watch_ttl
+        self.mt5 = mt5_module or mt5
+
+        self._data: Dict[SnapshotKey, Tuple[float, Any]] = {}
+        self._watched: Dict[SnapshotKey, float] = {}
+        self._connection_marker = getattr(self.manager, 'last_connection', None)
+
+        self.callers: Dict[str, Counter] = defaultdict(Counter)
+        self.ipc_calls: Counter = Counter()
+        self.stats = Counter()
+        self.lock = threading.RLock()
+
+    # Consultas
+
+    def account_info(self, caller: Optional[str] = None) -> Any:
+        """account_info() cacheado"""
+        return self._get(ACCOUNT, self._caller(caller))
+
+    def positions_get(self, symbol: Optional[str] = None, ticket: Optional[int] = None,
+                      group: Optional[str] = None, caller: Optional[str] = None) -> Optional[tuple]:
+        """
+        positions_get() cacheado; los filtros symbol/ticket se aplican en memoria
+
+        Args:
+            symbol: Solo posiciones de este símbolo
+            ticket: Solo la posición con este ticket
+            group: Filtro de grupo de MT5 (no se cachea, va directo al terminal)
+        """
+        caller = self._caller(caller)
+        if group is not None:
+            return self._direct('positions_get', caller, group=group)
+
+        positions = self._get(POSITIONS, caller)
+        if positions is None:
+            return None
+        return tuple(p for p in positions
+                     if (symbol is None or p.symbol == symbol) and (ticket is None or p.ticket == ticket))
+
+    def symbol_info_tick(self, symbol: str, caller: Optional[str] = None) -> Any:
+        """symbol_info_tick() cacheado; el símbolo entra en las siguientes pasadas"""
+        return self._get(('symbol_info_tick', symbol), self._caller(caller))
+
+    def symbol_info(self, symbol: str, caller: Optional[str] = None) -> Any:
+        """symbol_info() cacheado con info_ttl"""
+        return self._get(('symbol_info', symbol), self._caller(caller))
+
+    def order_send(self, request: Dict[str, Any], caller: Optional[str] = None) -> Any:
+        """Enviar una orden e invalidar cuenta y posiciones"""
+        try:
+            return self._direct('order_send', self._caller(caller), request)
+        finally:
+            self.invalidate(ORDER_SENSITIVE)
+
+    # Control de la caché
+
+    def watch(self, symbols: Iterable[str], info: bool = False):
+        """Incluir símbolos en las pasadas sin esperar a su primera consulta"""
+        now = time.monotonic()
+        with self.lock:
+            for symbol in symbols:
+                self._watched[('symbol_info_tick', symbol)] = now
+                if info:
+                    self._watched[('symbol_info', symbol)] = now
+
+    def refresh(self, caller: Optional[str] = None) -> bool:
+        """Forzar una pasada completa (p. ej. al inicio de cada ciclo)"""
+        with self.lock:
+            self.callers[self._caller(caller)]['refresh'] += 1
+            return self._sweep((), force=True)
+
+    def invalidate(self, keys: Optional[Iterable[SnapshotKey]] = None):
+        """
+        Descartar datos cacheados (todos por defecto)
+
+        Llamar tras eventos de órdenes ajenos a order_send (cierres por SL/TP,
+        órdenes desde otro proceso) para que la siguiente consulta vaya al terminal.
+        """
+        with self.lock:
+            if keys is None:
+                self._data.clear()
+            else:
+                for key in keys:
+                    self._data.pop(key, None)
+            self.stats['invalidations'] += 1
+
+    # Internos
+
+    def _caller(self, caller: Optional[str]) -> str:
+        if caller:
+            return caller
+        # Módulo que llamó al método público
+        return sys._getframe(2).f_globals.get('__name__', '?')
+
+    def _ttl_for(self, key: SnapshotKey) -> float:
+        return self.info_ttl if key[0] == 'symbol_info' else self.ttl
+
+    def _check_connection(self):
+        """Tras una reconexión los datos cacheados pueden ser de otra sesión"""
+        marker = getattr(self.manager, 'last_connection', None)
+        if marker != self._connection_marker:
+            self._connection_marker = marker
+            if self._data:
+                self._data.clear()
+                self.stats['reconnect_invalidations'] += 1
+
+    def _get(self, key: SnapshotKey, caller: str) -> Any:
+        with self.lock:
+            now = time.monotonic()
+            counts = self.callers[caller]
+            counts[key[0]] += 1
+            if key[1] is not None:
+                self._watched[key] = now
+
+            self._check_connection()
+            entry = self._data.get(key)
+            if entry is not None and now - entry[0] <= self._ttl_for(key):
+                counts['hits'] += 1
+                self.stats['hits'] += 1
+                return entry[1]
+
+            # Los hilos que llegan durante la pasada esperan el lock y leen el resultado
+            counts['misses'] += 1
+            self.stats['misses'] += 1
+            self._sweep((key,))
+            entry = self._data.get(key)
+            return entry[1] if entry is not None else None
+
+    def _sweep(self, required: Tuple[SnapshotKey, ...], force: bool = False) -> bool:
+        """
+        Refrescar cuenta, posiciones y símbolos vigilados en una sola ejecución
+
+        Se incluyen los datos ausentes o que han consumido la mitad de su TTL,
+        así caducan juntos y el siguiente ciclo vuelve a necesitar una sola pasada.
+        """
+        now = time.monotonic()
+        for key, last in list(self._watched.items()):
+            if now - last > self.watch_ttl:
+                del self._watched[key]
+
+        keys: List[SnapshotKey] = list(required)
+        for key in list(ORDER_SENSITIVE) + list(self._watched):
+            if key in keys:
+                continue
+            entry = self._data.get(key)
+            if force or entry is None or now - entry[0] >= self._ttl_for(key) / 2:
+                keys.append(key)
+
+        start = time.perf_counter()
+        values = self.manager.execute_with_reconnect(self._fetch, keys)
+        self.stats['sweeps'] += 1
+        self.stats['sweep_time'] += time.perf_counter() - start
+
+        # Si la pasada provocó una reconexión, los datos ya son de la nueva sesión
+        self._connection_marker = getattr(self.manager, 'last_connection', None)
+        if values is None:
+            self.stats['sweep_failures'] += 1
+            logger.warning(f"Pasada MT5 fallida ({len(keys)} consultas), la caché queda vacía")
+            for key in keys:
+                self._data.pop(key, None)
+            return False
+
+        stamp = time.monotonic()
+        for key in keys:
+            value = values.get(key)
+            if value is None:
+                # Error o símbolo desconocido: no se cachea, se reintenta en la próxima consulta
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (stamp, value)
+        return True
+
+    def _fetch(self, keys: List[SnapshotKey]) -> Dict[SnapshotKey, Any]:
+        values = {}
+        for name, symbol in keys:
+            function = getattr(self.mt5, name)
+            values[(name, symbol)] = function(symbol) if symbol is not None else function()
+            self.ipc_calls[name] += 1
+        return values
+
+    def _direct(self, name: str, caller: str, *args, **kwargs) -> Any:
+        """Llamada sin caché (contada igualmente)"""
+        function: Callable = getattr(self.mt5, name)
+        with self.lock:
+            self.callers[caller][name] += 1
+            self.callers[caller]['direct'] += 1
+            self.ipc_calls[name] += 1
+        return self.manager.execute_with_reconnect(function, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aciertos, llamadas al terminal y consultas por llamador"""
+        with self.lock:
+            stats = dict(self.stats)
+            callers = {name: dict(counts) for name, counts in self.callers.items()}
+            ipc_calls = dict(self.ipc_calls)
+            watched = sorted({symbol for _, symbol in self._watched})
+            entries = len(self._data)
+
+        requests = stats.get('hits', 0) + stats.get('misses', 0)
+        sweeps = stats.get('sweeps', 0)
+        return {
+            'ttl': self.ttl,
+            'requests': requests,
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'hit_rate': stats.get('hits', 0) / requests if requests else 0.0,
+            'sweeps': sweeps,
+            'sweep_failures': stats.get('sweep_failures', 0),
+            'avg_sweep_time': stats.get('sweep_time', 0.0) / sweeps if sweeps else None,
+            'invalidations': stats.get('invalidations', 0),
+            'reconnect_invalidations': stats.get('reconnect_invalidations', 0),
+            'ipc_calls': ipc_calls,
+            'total_ipc_calls': sum(ipc_calls.values()),
+            'callers': callers,
+            'watched_symbols': watched,
+            'entries': entries
+        }
+
+
+# Instancia global sobre el gestor de conexión global
+mt5_snapshot = MT5Snapshot(mt5_connection)
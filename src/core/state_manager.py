@@ -2,7 +2,6 @@
 State Manager - Gestión unificada del estado del sistema
 Maneja el estado global del bot, posiciones y configuración
 """
-import json
 import threading
 import time
 from datetime import datetime
@@ -11,6 +10,8 @@ from typing import Dict, Any, Optional, List
 from enum import Enum
 import logging
 
+from utils.state_persistence import StatePersistence, TimedLock
+
 logger = logging.getLogger(__name__)
 
 class BotState(Enum):
@@ -30,7 +31,7 @@ class StateManager:
     """
     
     _instance = None
-    _lock = threading.Lock()
+    _lock = TimedLock(threading.Lock())
     
     def __new__(cls):
         """Singleton pattern para instancia única"""
@@ -49,6 +50,7 @@ class StateManager:
         self._initialized = True
         self.state_file = Path("data/bot_state.json")
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.persistence = StatePersistence(self.state_file)
         
         # Estado en memoria
         self._state = {
@@ -101,7 +103,7 @@ class StateManager:
         self._autosave_thread.start()
     
     def _autosave_loop(self):
-        """Guardar estado cada 30 segundos"""
+        """Guardar cambios cada 30 segundos (no escribe si no hubo cambios)"""
         while not self._stop_autosave.wait(30):
             self.save_state()
     
@@ -127,6 +129,8 @@ class StateManager:
                 target = target[k]
             target[keys[-1]] = value
             self._state['last_update'] = datetime.now().isoformat()
+            self.persistence.record_set(keys, value)
+            self.persistence.record_set(['last_update'], self._state['last_update'])
     
     def update_bot_state(self, state: BotState):
         """Actualizar estado del bot"""
@@ -150,6 +154,7 @@ class StateManager:
                 'opened_at': datetime.now().isoformat(),
                 'updated_at': datetime.now().isoformat()
             }
+            self.persistence.record_set(['positions', ticket], self._state['positions'][ticket])
     
     def update_position(self, ticket: str, updates: Dict[str, Any]):
         """Actualizar posición existente"""
@@ -157,12 +162,14 @@ class StateManager:
             if ticket in self._state['positions']:
                 self._state['positions'][ticket].update(updates)
                 self._state['positions'][ticket]['updated_at'] = datetime.now().isoformat()
+                self.persistence.record_set(['positions', ticket], self._state['positions'][ticket])
     
     def remove_position(self, ticket: str):
         """Eliminar posición"""
         with self._lock:
             if ticket in self._state['positions']:
                 del self._state['positions'][ticket]
+                self.persistence.record_delete(['positions', ticket])
     
     def get_positions(self) -> Dict[str, Any]:
         """Obtener todas las posiciones"""
@@ -173,6 +180,7 @@ class StateManager:
         """Actualizar estadísticas"""
         with self._lock:
             self._state['statistics'].update(stats)
+            self.persistence.record_set(['statistics'], self._state['statistics'])
     
     def add_error(self, error: str, severity: str = "warning"):
         """Registrar error"""
@@ -187,6 +195,7 @@ class StateManager:
             # Mantener solo últimos 100 errores
             if len(self._state['errors']) > 100:
                 self._state['errors'] = self._state['errors'][-100:]
+            self.persistence.record_append(['errors'], error_entry, max_len=100)
     
     def update_health(self, component: str, status: bool):
         """Actualizar estado de salud de componente"""
@@ -200,24 +209,27 @@ class StateManager:
             if api in self._state['performance']['api_calls']:
                 self._state['performance']['api_calls'][api]['count'] += 1
                 self._state['performance']['api_calls'][api]['last_call'] = datetime.now().isoformat()
+                self.persistence.record_set(['performance', 'api_calls', api],
+                                            self._state['performance']['api_calls'][api])
     
-    def save_state(self):
-        """Guardar estado a disco"""
+    def save_state(self, force: bool = False):
+        """
+        Guardar cambios a disco
+        
+        El estado se copia bajo el lock y se escribe fuera de él; sin cambios
+        pendientes no se escribe nada (salvo force).
+        """
         try:
-            with self._lock:
-                with open(self.state_file, 'w') as f:
-                    json.dump(self._state, f, indent=2)
-            logger.debug("Estado guardado correctamente")
+            if self.persistence.save(self._state, self._lock, force=force):
+                logger.debug("Estado guardado correctamente")
         except Exception as e:
             logger.error(f"Error guardando estado: {e}")
     
     def load_state(self):
-        """Cargar estado desde disco"""
+        """Cargar estado desde disco (snapshot más diario de cambios)"""
         try:
-            if self.state_file.exists():
-                with open(self.state_file, 'r') as f:
-                    loaded_state = json.load(f)
-                
+            loaded_state = self.persistence.load()
+            if loaded_state is not None:
                 # Merge con estado actual (preservar estructura)
                 with self._lock:
                     self._merge_states(self._state, loaded_state)
@@ -241,12 +253,15 @@ class StateManager:
             self._state['errors'] = []
             for api in self._state['performance']['api_calls']:
                 self._state['performance']['api_calls'][api]['count'] = 0
+            self.persistence.record_set(['statistics', 'daily_pnl'], 0.0)
+            self.persistence.record_set(['errors'], [])
+            self.persistence.record_set(['performance', 'api_calls'], self._state['performance']['api_calls'])
     
     def stop(self):
         """Detener el gestor de estado"""
         self.update_bot_state(BotState.STOPPED)
         self._stop_autosave.set()
-        self.save_state()
+        self.save_state(force=True)
     
     def get_summary(self) -> Dict[str, Any]:
         """Obtener resumen del estado"""
@@ -264,6 +279,13 @@ class StateManager:
                 'errors': len(self._state['errors'])
             }
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas del lock de estado y de la persistencia"""
+        return {
+            'lock': self._lock.get_stats(),
+            'persistence': self.persistence.get_stats()
+        }
+    
     def _calculate_uptime(self) -> str:
         """Calcular tiempo de ejecución"""
         if self._state['start_time']:
@@ -11,16 +11,20 @@ from datetime import datetime
 from pathlib import Path
 import logging
 
-# Añadir path del proyecto
+# Añadir path del proyecto (src/ y raíz, para los módulos compartidos src.core.*)
 sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(1, str(Path(__file__).parent.parent.parent))
 
 # Importaciones del sistema
 from dotenv import load_dotenv
 from core.state_manager import state_manager
 from core.mt5_connection import mt5_connection
+from core.mt5_snapshot import mt5_snapshot
 from core.rate_limiter import acquire_limit, get_rate_limit_stats
-from core.circuit_breaker import circuit_manager
-from core.health_check import health_monitor
+# Misma ruta que los clientes HTTP: un solo registro de breakers y estadísticas
+from src.core.circuit_breaker import circuit_manager
+from src.core.http_client import get_http_stats
+from src.core.health_check import health_monitor
 from utils.logger import trading_logger, log_performance
 
 # Importaciones de módulos de trading
@@ -342,9 +346,7 @@ class SystemManager:
         try:
             # Obtener info de cuenta MT5
             if mt5_connection.is_connected():
-                account_info = mt5_connection.execute_with_reconnect(
-                    lambda: __import__('MetaTrader5').account_info()
-                )
+                account_info = mt5_snapshot.account_info()
                 
                 if account_info:
                     state_manager.update(
@@ -509,5 +511,7 @@ P&L: ${state_manager.get('daily_pnl', 0):.2f}
             'last_signals': state.get('last_signals', [])[-5:],
             'health': health_monitor.check_all(),
             'rate_limits': get_rate_limit_stats(),
-            'circuit_breakers': circuit_manager.get_all_status()
+            'circuit_breakers': circuit_manager.get_all_status(),
+            'http_clients': get_http_stats(),
+            'mt5_snapshot': mt5_snapshot.get_stats()
         }
@@ -20,6 +20,410 @@ try:
 except ImportError:
     MT5_AVAILABLE = False
 
+def _std(x, mean=None):
+    """Desviación estándar muestral (ddof=1, NaN con menos de 2 valores)"""
+    if len(x) < 2:
+        return float('nan')
+    if mean is None:
+        mean = x.mean()
+    return float(np.sqrt(np.dot(x - mean, x - mean) / (len(x) - 1)))
+
+
+def _autocorr(x):
+    """Autocorrelación lag 1 (Pearson entre x[1:] y x[:-1])"""
+    if len(x) < 3:
+        return float('nan')
+    a, b = x[1:], x[:-1]
+    a, b = a - a.mean(), b - b.mean()
+    denom = np.sqrt(np.dot(a, a) * np.dot(b, b))
+    return float(np.dot(a, b) / denom) if denom > 0 else float('nan')
+
+
+def _describe(x):
+    """min/max/mean/std/range en un solo bloque"""
+    low, high = float(x.min()), float(x.max())
+    mean = x.mean()
+    return {
+        'min': low,
+        'max': high,
+        'mean': float(mean),
+        'std': _std(x, mean),
+        'range': high - low
+    }
+
+
+def _digit_distribution(prices):
+    digits = ((prices * 100000) % 10).astype(np.int64)
+    values, counts = np.unique(digits, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    return digits, {int(values[i]): int(counts[i]) for i in order}
+
+
+def _run_lengths(direction):
+    """
+    Longitud de rachas de ticks en la misma dirección (> 1 tick)
+
+    La racha abierta al final de la serie no se cuenta.
+    """
+    if len(direction) < 2:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, direction[1:] != direction[:-1]])
+    lengths = np.diff(np.r_[starts, len(direction)])
+    valid = (direction[starts] != 0) & (lengths > 1)
+    valid[-1] = False
+    return lengths[valid]
+
+
+def compute_tick_statistics(bid, ask, volume=None, time_s=None):
+    """
+    Estadísticas de ticks en una pasada sobre arrays NumPy
+
+    Calcula a la vez todos los agregados de get_enhanced_tick_analysis
+    (precios, spread, volumen, flujo, microestructura, liquidez y volatilidad),
+    derivando mid, spread, diferencias y retornos una sola vez.
+
+    Args:
+        bid, ask: Precios por tick
+        volume: Volumen por tick (opcional)
+        time_s: Timestamps en segundos (opcional, para intervalos entre ticks)
+
+    Returns:
+        Dict con las mismas secciones que get_enhanced_tick_analysis
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    n = len(bid)
+    mid = (bid + ask) / 2
+    spread = ask - bid
+
+    # Derivadas tick a tick (una sola vez para todas las secciones)
+    mid_diff = np.diff(mid)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = mid_diff / mid[:-1]
+    spread_change = np.diff(spread)
+    direction = np.r_[0, np.sign(mid_diff)].astype(np.int8)
+
+    # Spread
+    spread_mean = float(spread.mean())
+    spread_std = _std(spread, spread_mean)
+    q25, median, q75, q90, q95 = (float(q) for q in np.quantile(spread, [0.25, 0.5, 0.75, 0.90, 0.95]))
+    spread_analysis = {
+        'statistics': {
+            'min_spread': float(spread.min()),
+            'max_spread': float(spread.max()),
+            'mean_spread': spread_mean,
+            'median_spread': median,
+            'std_spread': spread_std,
+            'spread_stability': float(spread_std / spread_mean) if spread_mean > 0 else 0
+        },
+        'percentiles': {'25th': q25, '75th': q75, '90th': q90, '95th': q95},
+        'distribution': {
+            'tight_spreads': int(np.count_nonzero(spread <= spread_mean)),
+            'wide_spreads': int(np.count_nonzero(spread > spread_mean)),
+            'extreme_spreads': int(np.count_nonzero(spread > q95))
+        }
+    }
+
+    # Volumen
+    has_volume = volume is not None and n > 0 and not np.isnan(np.asarray(volume, dtype=np.float64)).all()
+    if has_volume:
+        volume = np.asarray(volume, dtype=np.float64)
+        volume_total = float(volume.sum())
+        v25, v75 = np.quantile(volume, [0.25, 0.75])
+        volume_analysis = {
+            'total_volume': volume_total,
+            'mean_volume': float(volume_total / n),
+            'volume_distribution': {
+                'high_volume_ticks': int(np.count_nonzero(volume > v75)),
+                'low_volume_ticks': int(np.count_nonzero(volume <= v25)),
+                'zero_volume_ticks': int(np.count_nonzero(volume == 0))
+            }
+        }
+    else:
+        volume_analysis = {'note': 'Datos de volumen no disponibles'}
+
+    # Flujo de ticks
+    up_ticks = int(np.count_nonzero(direction == 1))
+    down_ticks = int(np.count_nonzero(direction == -1))
+    runs = _run_lengths(direction)
+    tick_flow_analysis = {
+        'up_ticks': up_ticks,
+        'down_ticks': down_ticks,
+        'unchanged_ticks': n - up_ticks - down_ticks,
+        'net_tick_flow': up_ticks - down_ticks,
+        'tick_flow_ratio': up_ticks / down_ticks if down_ticks > 0 else float('inf'),
+        'persistence_analysis': {
+            'average_run_length': float(runs.mean()) if len(runs) else 0,
+            'max_run_length': int(runs.max()) if len(runs) else 0,
+            'total_runs': len(runs)
+        }
+    }
+
+    # Microestructura
+    if time_s is not None and n > 1:
+        intervals = np.diff(np.asarray(time_s, dtype=np.float64))
+        tick_frequency = {
+            'mean_interval_seconds': float(intervals.mean()),
+            'median_interval_seconds': float(np.median(intervals)),
+            'min_interval_seconds': float(intervals.min()),
+            'max_interval_seconds': float(intervals.max())
+        }
+    else:
+        nan = float('nan')
+        tick_frequency = {
+            'mean_interval_seconds': nan,
+            'median_interval_seconds': nan,
+            'min_interval_seconds': nan,
+            'max_interval_seconds': nan
+        }
+
+    bid_digits, bid_distribution = _digit_distribution(bid)
+    ask_digits, ask_distribution = _digit_distribution(ask)
+    market_microstructure = {
+        'tick_frequency': tick_frequency,
+        'price_clustering': {
+            'bid_digit_distribution': bid_distribution,
+            'ask_digit_distribution': ask_distribution,
+            'round_number_bias': {
+                'bid_zeros': np.count_nonzero(bid_digits == 0) / n,
+                'ask_zeros': np.count_nonzero(ask_digits == 0) / n
+            }
+        },
+        'spread_dynamics': {
+            'spread_volatility': spread_std,
+            'spread_persistence': _autocorr(spread) if n > 1 else 0,
+            'spread_mean_reversion': {
+                'expanding_spreads': int(np.count_nonzero(spread_change > 0)),
+                'contracting_spreads': int(np.count_nonzero(spread_change < 0)),
+                'stable_spreads': int(np.count_nonzero(spread_change == 0))
+            }
+        }
+    }
+
+    # Liquidez
+    liquidity_metrics = {
+        'spread_based_liquidity': 1 / spread_mean if spread_mean > 0 else 0,
+        'effective_spread': spread_mean,
+        'quoted_spread': median,
+        'spread_impact': spread_std
+    }
+    if has_volume:
+        liquidity_metrics['volume_weighted_spread'] = float(
+            np.dot(spread, volume) / volume_total
+        ) if volume_total > 0 else 0
+
+    # Volatilidad
+    mid_describe = _describe(mid)
+    volatility_analysis = {
+        'realized_volatility': _std(returns),
+        'price_range_volatility': float((ask.max() - bid.min()) / mid_describe['mean']),
+        'tick_volatility': _std(mid_diff),
+        'volatility_clustering': _autocorr(np.abs(returns)) if n > 1 else 0
+    }
+
+    return {
+        'price_statistics': {
+            'bid_stats': _describe(bid),
+            'ask_stats': _describe(ask),
+            'mid_price_stats': mid_describe
+        },
+        'spread_analysis': spread_analysis,
+        'volume_analysis': volume_analysis,
+        'tick_flow_analysis': tick_flow_analysis,
+        'market_microstructure': market_microstructure,
+        'liquidity_metrics': liquidity_metrics,
+        'volatility_analysis': volatility_analysis
+    }
+
+
+class RollingTickStats:
+    """
+    Estadísticas de ticks en ventana móvil actualizadas de forma incremental
+
+    Cada tick guarda una fila de valores derivados (precios centrados, spread,
+    volumen, cambio de mid, retorno, dirección); las sumas y sumas de
+    cuadrados de la ventana se actualizan sumando las filas nuevas y restando
+    las que salen, así snapshot() es O(1) por consulta y update() O(lote).
+    El cambio del primer tick de la ventana se mide contra el tick anterior
+    (ya fuera de la ventana). analysis() aplica compute_tick_statistics sobre
+    la ventana completa.
+    """
+
+    # Columnas de la fila por tick
+    BID, ASK, MID, SPREAD, VOLUME, SPREAD_VOLUME, MID_DIFF, RETURN, UP, DOWN, HAS_DIFF = range(11)
+
+    def __init__(self, window=1000, rebuild_every=None):
+        """
+        Args:
+            window: Ticks de la ventana
+            rebuild_every: Ticks entre recálculos exactos de las sumas (evita deriva)
+        """
+        self.window = window
+        self.rebuild_every = rebuild_every or window * 10
+
+        self.values = np.zeros((window, 11))
+        self.times = np.zeros(window)
+        self.sums = np.zeros(11)
+        self.squares = np.zeros(11)
+        self.pos = 0
+        self.count = 0
+        self.total = 0
+        self._since_rebuild = 0
+
+        # Precio de referencia para centrar (evita cancelación en varianzas)
+        self.ref = None
+        self.last_mid = None
+
+    def update(self, ticks):
+        """
+        Añadir un lote de ticks en orden cronológico
+
+        Args:
+            ticks: Array estructurado de MT5 (o DataFrame) con bid, ask y
+                opcionalmente volume y time_msc/time
+        """
+        if ticks is None or len(ticks) == 0:
+            return
+
+        names = ticks.dtype.names if hasattr(ticks, 'dtype') and ticks.dtype.names else ticks.keys()
+        bid = np.asarray(ticks['bid'], dtype=np.float64)
+        ask = np.asarray(ticks['ask'], dtype=np.float64)
+        m = len(bid)
+        volume = np.asarray(ticks['volume'], dtype=np.float64) if 'volume' in names else np.zeros(m)
+        if 'time_msc' in names:
+            times = np.asarray(ticks['time_msc'], dtype=np.float64) / 1000
+        elif 'time' in names:
+            times = np.asarray(ticks['time'], dtype=np.float64)
+        else:
+            times = np.full(m, np.nan)
+
+        mid = (bid + ask) / 2
+        spread = ask - bid
+        if self.ref is None:
+            self.ref = mid[0]
+
+        prev_mid = np.r_[mid[0] if self.last_mid is None else self.last_mid, mid[:-1]]
+        mid_diff = mid - prev_mid
+        has_diff = np.ones(m)
+        if self.last_mid is None:
+            has_diff[0] = 0
+
+        rows = np.empty((m, 11))
+        rows[:, self.BID] = bid - self.ref
+        rows[:, self.ASK] = ask - self.ref
+        rows[:, self.MID] = mid - self.ref
+        rows[:, self.SPREAD] = spread
+        rows[:, self.VOLUME] = volume
+        rows[:, self.SPREAD_VOLUME] = spread * volume
+        rows[:, self.MID_DIFF] = mid_diff
+        rows[:, self.RETURN] = mid_diff / prev_mid
+        rows[:, self.UP] = mid_diff > 0
+        rows[:, self.DOWN] = mid_diff < 0
+        rows[:, self.HAS_DIFF] = has_diff
+
+        self.last_mid = mid[-1]
+        self.total += m
+        self._push(rows, times)
+
+    def _push(self, rows, times):
+        m = len(rows)
+        if m >= self.window:
+            self.values[:] = rows[-self.window:]
+            self.times[:] = times[-self.window:]
+            self.pos = 0
+            self.count = self.window
+            self._rebuild()
+            return
+
+        idx = (self.pos + np.arange(m)) % self.window
+        evicted = self.values[idx]
+        self.sums += rows.sum(axis=0) - evicted.sum(axis=0)
+        self.squares += (rows * rows).sum(axis=0) - (evicted * evicted).sum(axis=0)
+        self.values[idx] = rows
+        self.times[idx] = times
+        self.pos = (self.pos + m) % self.window
+        self.count = min(self.count + m, self.window)
+
+        self._since_rebuild += m
+        if self._since_rebuild >= self.rebuild_every:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recentrar precios en el último mid y recalcular sumas exactas"""
+        shift = self.last_mid - self.ref
+        self.values[:self.count, self.BID:self.MID + 1] -= shift
+        self.ref = self.last_mid
+        window = self.values[:self.count]
+        self.sums = window.sum(axis=0)
+        self.squares = (window * window).sum(axis=0)
+        self._since_rebuild = 0
+
+    def _ordered(self):
+        """Índices de la ventana en orden cronológico"""
+        return (self.pos - self.count + np.arange(self.count)) % self.window
+
+    def _mean_std(self, column, n):
+        if n == 0:
+            return float('nan'), float('nan')
+        mean = self.sums[column] / n
+        if n < 2:
+            return mean, float('nan')
+        variance = (self.squares[column] - self.sums[column] * mean) / (n - 1)
+        return mean, float(np.sqrt(max(variance, 0.0)))
+
+    def snapshot(self):
+        """Agregados de la ventana en O(1)"""
+        n = self.count
+        if n == 0:
+            return {'count': 0}
+
+        bid_mean, bid_std = self._mean_std(self.BID, n)
+        ask_mean, ask_std = self._mean_std(self.ASK, n)
+        mid_mean, mid_std = self._mean_std(self.MID, n)
+        spread_mean, spread_std = self._mean_std(self.SPREAD, n)
+        changes = int(round(self.sums[self.HAS_DIFF]))
+        _, tick_volatility = self._mean_std(self.MID_DIFF, changes)
+        _, realized_volatility = self._mean_std(self.RETURN, changes)
+        up_ticks = int(round(self.sums[self.UP]))
+        down_ticks = int(round(self.sums[self.DOWN]))
+        volume_total = float(self.sums[self.VOLUME])
+
+        first, last = self.times[self._ordered()[[0, -1]]]
+        return {
+            'count': n,
+            'bid_mean': float(bid_mean + self.ref),
+            'bid_std': bid_std,
+            'ask_mean': float(ask_mean + self.ref),
+            'ask_std': ask_std,
+            'mid_mean': float(mid_mean + self.ref),
+            'mid_std': mid_std,
+            'mean_spread': float(spread_mean),
+            'std_spread': spread_std,
+            'total_volume': volume_total,
+            'volume_weighted_spread': float(self.sums[self.SPREAD_VOLUME] / volume_total) if volume_total > 0 else 0,
+            'up_ticks': up_ticks,
+            'down_ticks': down_ticks,
+            'unchanged_ticks': n - up_ticks - down_ticks,
+            'net_tick_flow': up_ticks - down_ticks,
+            'tick_flow_ratio': up_ticks / down_ticks if down_ticks > 0 else float('inf'),
+            'tick_volatility': tick_volatility,
+            'realized_volatility': realized_volatility,
+            'mean_interval_seconds': float((last - first) / (n - 1)) if n > 1 else float('nan')
+        }
+
+    def analysis(self):
+        """Análisis completo (compute_tick_statistics) de la ventana actual"""
+        if self.count == 0:
+            return None
+        window = self.values[self._ordered()]
+        return compute_tick_statistics(
+            window[:, self.BID] + self.ref,
+            window[:, self.ASK] + self.ref,
+            window[:, self.VOLUME],
+            self.times[self._ordered()]
+        )
+
+
 class EnhancedTickSystem:
     def __init__(self):
         self.mt5_functions = self.load_scraped_functions()
@@ -92,29 +496,22 @@ class EnhancedTickSystem:
                 print(f"[WARNING] No hay ticks para {symbol}")
                 return None
             
-            # Convertir a DataFrame para análisis
-            df = pd.DataFrame(ticks)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df['mid_price'] = (df['bid'] + df['ask']) / 2
-            df['spread'] = df['ask'] - df['bid']
+            # Todas las estadísticas en una pasada sobre los arrays de ticks
+            time_s = ticks['time']
+            start = pd.to_datetime(time_s.min(), unit='s')
+            end = pd.to_datetime(time_s.max(), unit='s')
+            statistics = compute_tick_statistics(ticks['bid'], ticks['ask'], ticks['volume'], time_s)
             
-            # Análisis exhaustivo
             analysis = {
                 'symbol': symbol,
                 'timestamp': datetime.now(),
                 'tick_count': len(ticks),
                 'time_range': {
-                    'start': df['time'].min(),
-                    'end': df['time'].max(),
-                    'duration_minutes': (df['time'].max() - df['time'].min()).total_seconds() / 60
+                    'start': start,
+                    'end': end,
+                    'duration_minutes': (end - start).total_seconds() / 60
                 },
-                'price_statistics': self.calculate_price_statistics(df),
-                'spread_analysis': self.analyze_spread_patterns(df),
-                'volume_analysis': self.analyze_volume_patterns(df),
-                'tick_flow_analysis': self.analyze_tick_flow(df),
-                'market_microstructure': self.analyze_microstructure(df),
-                'liquidity_metrics': self.calculate_liquidity_metrics(df),
-                'volatility_analysis': self.analyze_volatility_patterns(df)
+                **statistics
             }
             
             # Guardar en caché
@@ -126,190 +523,87 @@ class EnhancedTickSystem:
             print(f"[ERROR] Error en análisis de {symbol}: {e}")
             return None
     
+    def update_tick_stream(self, symbol, window=1000):
+        """
+        Actualizar las estadísticas móviles de un símbolo con los ticks nuevos
+        
+        Solo se piden a MT5 los ticks posteriores al último procesado.
+        
+        Returns:
+            snapshot() de la ventana o None si no hay datos
+        """
+        try:
+            if not MT5_AVAILABLE:
+                return None
+            
+            stream = self.tick_data.get(symbol)
+            if stream is None:
+                stream = {'stats': RollingTickStats(window), 'last_time_msc': None}
+                self.tick_data[symbol] = stream
+            
+            if stream['last_time_msc'] is None:
+                ticks = mt5.copy_ticks_from_pos(symbol, 0, window)
+            else:
+                ticks = mt5.copy_ticks_from(symbol, stream['last_time_msc'] // 1000, 100000, mt5.COPY_TICKS_ALL)
+            
+            if ticks is not None and len(ticks) > 0:
+                if stream['last_time_msc'] is not None:
+                    ticks = ticks[ticks['time_msc'] > stream['last_time_msc']]
+                if len(ticks) > 0:
+                    stream['stats'].update(ticks)
+                    stream['last_time_msc'] = int(ticks['time_msc'][-1])
+            
+            if stream['stats'].count == 0:
+                return None
+            return stream['stats'].snapshot()
+            
+        except Exception as e:
+            print(f"[ERROR] Error actualizando ticks de {symbol}: {e}")
+            return None
+    
+    def _statistics(self, df):
+        """compute_tick_statistics sobre un DataFrame de ticks"""
+        volume = df['volume'].to_numpy() if 'volume' in df.columns else None
+        time_s = None
+        if 'time' in df.columns and len(df) > 0:
+            time_s = (df['time'] - df['time'].iloc[0]).dt.total_seconds().to_numpy()
+        return compute_tick_statistics(df['bid'].to_numpy(), df['ask'].to_numpy(), volume, time_s)
+    
     def calculate_price_statistics(self, df):
         """Calcular estadísticas detalladas de precios"""
-        return {
-            'bid_stats': {
-                'min': float(df['bid'].min()),
-                'max': float(df['bid'].max()),
-                'mean': float(df['bid'].mean()),
-                'std': float(df['bid'].std()),
-                'range': float(df['bid'].max() - df['bid'].min())
-            },
-            'ask_stats': {
-                'min': float(df['ask'].min()),
-                'max': float(df['ask'].max()),
-                'mean': float(df['ask'].mean()),
-                'std': float(df['ask'].std()),
-                'range': float(df['ask'].max() - df['ask'].min())
-            },
-            'mid_price_stats': {
-                'min': float(df['mid_price'].min()),
-                'max': float(df['mid_price'].max()),
-                'mean': float(df['mid_price'].mean()),
-                'std': float(df['mid_price'].std()),
-                'range': float(df['mid_price'].max() - df['mid_price'].min())
-            }
-        }
+        return self._statistics(df)['price_statistics']
     
     def analyze_spread_patterns(self, df):
         """Análisis detallado de patrones de spread"""
-        spread_stats = {
-            'min_spread': float(df['spread'].min()),
-            'max_spread': float(df['spread'].max()),
-            'mean_spread': float(df['spread'].mean()),
-            'median_spread': float(df['spread'].median()),
-            'std_spread': float(df['spread'].std()),
-            'spread_stability': float(df['spread'].std() / df['spread'].mean()) if df['spread'].mean() > 0 else 0
-        }
-        
-        # Análisis de distribución de spreads
-        spread_percentiles = {
-            '25th': float(df['spread'].quantile(0.25)),
-            '75th': float(df['spread'].quantile(0.75)),
-            '90th': float(df['spread'].quantile(0.90)),
-            '95th': float(df['spread'].quantile(0.95))
-        }
-        
-        # Contar spreads por rangos
-        spread_ranges = {
-            'tight_spreads': len(df[df['spread'] <= spread_stats['mean']]),
-            'wide_spreads': len(df[df['spread'] > spread_stats['mean']]),
-            'extreme_spreads': len(df[df['spread'] > spread_percentiles['95th']])
-        }
-        
-        return {
-            'statistics': spread_stats,
-            'percentiles': spread_percentiles,
-            'distribution': spread_ranges
-        }
+        return self._statistics(df)['spread_analysis']
     
     def analyze_volume_patterns(self, df):
         """Análisis de patrones de volumen"""
-        if 'volume' not in df.columns or df['volume'].isna().all():
-            return {'note': 'Datos de volumen no disponibles'}
-        
-        return {
-            'total_volume': float(df['volume'].sum()),
-            'mean_volume': float(df['volume'].mean()),
-            'volume_distribution': {
-                'high_volume_ticks': len(df[df['volume'] > df['volume'].quantile(0.75)]),
-                'low_volume_ticks': len(df[df['volume'] <= df['volume'].quantile(0.25)]),
-                'zero_volume_ticks': len(df[df['volume'] == 0])
-            }
-        }
+        return self._statistics(df)['volume_analysis']
     
     def analyze_tick_flow(self, df):
         """Análisis del flujo de ticks"""
-        # Calcular cambios de precio tick a tick
-        df['price_change'] = df['mid_price'].diff()
-        df['direction'] = np.where(df['price_change'] > 0, 1, 
-                                 np.where(df['price_change'] < 0, -1, 0))
-        
-        flow_analysis = {
-            'up_ticks': len(df[df['direction'] == 1]),
-            'down_ticks': len(df[df['direction'] == -1]),
-            'unchanged_ticks': len(df[df['direction'] == 0]),
-            'net_tick_flow': len(df[df['direction'] == 1]) - len(df[df['direction'] == -1]),
-            'tick_flow_ratio': len(df[df['direction'] == 1]) / len(df[df['direction'] == -1]) if len(df[df['direction'] == -1]) > 0 else float('inf')
-        }
-        
-        # Análisis de persistencia (runs)
-        runs = []
-        current_run = 1
-        for i in range(1, len(df)):
-            if df['direction'].iloc[i] == df['direction'].iloc[i-1] and df['direction'].iloc[i] != 0:
-                current_run += 1
-            else:
-                if current_run > 1:
-                    runs.append(current_run)
-                current_run = 1
-        
-        flow_analysis['persistence_analysis'] = {
-            'average_run_length': np.mean(runs) if runs else 0,
-            'max_run_length': max(runs) if runs else 0,
-            'total_runs': len(runs)
-        }
-        
-        return flow_analysis
+        return self._statistics(df)['tick_flow_analysis']
     
     def analyze_microstructure(self, df):
         """Análisis de microestructura del mercado"""
-        # Calcular intervalos entre ticks
-        df['time_diff'] = df['time'].diff().dt.total_seconds()
-        
-        microstructure = {
-            'tick_frequency': {
-                'mean_interval_seconds': float(df['time_diff'].mean()),
-                'median_interval_seconds': float(df['time_diff'].median()),
-                'min_interval_seconds': float(df['time_diff'].min()),
-                'max_interval_seconds': float(df['time_diff'].max())
-            },
-            'price_clustering': self.analyze_price_clustering(df),
-            'spread_dynamics': self.analyze_spread_dynamics(df)
-        }
-        
-        return microstructure
+        return self._statistics(df)['market_microstructure']
     
     def analyze_price_clustering(self, df):
         """Análisis de agrupación de precios"""
-        # Analizar dígitos finales de precios
-        bid_last_digits = df['bid'].apply(lambda x: int((x * 100000) % 10))
-        ask_last_digits = df['ask'].apply(lambda x: int((x * 100000) % 10))
-        
-        return {
-            'bid_digit_distribution': bid_last_digits.value_counts().to_dict(),
-            'ask_digit_distribution': ask_last_digits.value_counts().to_dict(),
-            'round_number_bias': {
-                'bid_zeros': len(bid_last_digits[bid_last_digits == 0]) / len(bid_last_digits),
-                'ask_zeros': len(ask_last_digits[ask_last_digits == 0]) / len(ask_last_digits)
-            }
-        }
+        return self._statistics(df)['market_microstructure']['price_clustering']
     
     def analyze_spread_dynamics(self, df):
         """Análisis de dinámicas del spread"""
-        df['spread_change'] = df['spread'].diff()
-        
-        return {
-            'spread_volatility': float(df['spread'].std()),
-            'spread_persistence': float(df['spread'].autocorr(lag=1)) if len(df) > 1 else 0,
-            'spread_mean_reversion': {
-                'expanding_spreads': len(df[df['spread_change'] > 0]),
-                'contracting_spreads': len(df[df['spread_change'] < 0]),
-                'stable_spreads': len(df[df['spread_change'] == 0])
-            }
-        }
+        return self._statistics(df)['market_microstructure']['spread_dynamics']
     
     def calculate_liquidity_metrics(self, df):
         """Calcular métricas de liquidez"""
-        # Métricas básicas de liquidez basadas en spreads y volumen
-        liquidity = {
-            'spread_based_liquidity': 1 / df['spread'].mean() if df['spread'].mean() > 0 else 0,
-            'effective_spread': float(df['spread'].mean()),
-            'quoted_spread': float(df['spread'].median()),
-            'spread_impact': float(df['spread'].std())
-        }
-        
-        if 'volume' in df.columns and not df['volume'].isna().all():
-            liquidity['volume_weighted_spread'] = float(
-                (df['spread'] * df['volume']).sum() / df['volume'].sum()
-            ) if df['volume'].sum() > 0 else 0
-        
-        return liquidity
+        return self._statistics(df)['liquidity_metrics']
     
     def analyze_volatility_patterns(self, df):
         """Análisis de patrones de volatilidad"""
-        # Volatilidad basada en returns
-        df['returns'] = df['mid_price'].pct_change()
-        
-        volatility = {
-            'realized_volatility': float(df['returns'].std()),
-            'price_range_volatility': float((df['ask'].max() - df['bid'].min()) / df['mid_price'].mean()),
-            'tick_volatility': float(df['mid_price'].diff().std()),
-            'volatility_clustering': float(df['returns'].abs().autocorr(lag=1)) if len(df) > 1 else 0
-        }
-        
-        return volatility
+        return self._statistics(df)['volatility_analysis']
     
     def generate_simulated_analysis(self, symbol, tick_count):
         """Generar análisis simulado cuando MT5 no está disponible"""
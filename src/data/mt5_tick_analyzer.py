@@ -14,6 +14,12 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    from src.data.tick_aggregator import TickBarAggregator
+except ImportError:
+    # Ejecución standalone desde src/data (tick_dashboard.py)
+    from tick_aggregator import TickBarAggregator
+
 try:
     import MetaTrader5 as mt5
     MT5_AVAILABLE = True
@@ -44,6 +50,9 @@ class MT5TickAnalyzer:
         self.twelvedata_data = {}
         self.comparison_data = {}
         
+        # Velas incrementales desde ticks (precio medio bid/ask)
+        self.bar_aggregator = TickBarAggregator(timeframes={}, price='mid')
+        
         self.initialize_connections()
     
     def initialize_connections(self):
@@ -326,33 +335,28 @@ class MT5TickAnalyzer:
             return None
         
         try:
-            # Obtener ticks del período
-            tick_count = period_seconds * 2  # 2 ticks por segundo aproximadamente
-            df = self.get_mt5_tick_data(symbol, tick_count)
+            timeframe = f'S{period_seconds}'
+            self.bar_aggregator.add_timeframe(timeframe, period_seconds)
             
-            if df is None or len(df) == 0:
-                return None
+            # Solo se piden los ticks posteriores al último agregado
+            last_time_msc = self.bar_aggregator.last_time_msc.get(symbol)
+            if last_time_msc is None:
+                tick_count = period_seconds * 2  # 2 ticks por segundo aproximadamente
+                ticks = mt5.copy_ticks_from_pos(symbol, 0, tick_count)
+            else:
+                ticks = mt5.copy_ticks_from(symbol, last_time_msc // 1000, 100000, mt5.COPY_TICKS_ALL)
             
-            # Agrupar por períodos de tiempo
-            df.set_index('time', inplace=True)
+            if ticks is not None and len(ticks) > 0:
+                self.bar_aggregator.on_ticks(symbol, ticks)
             
-            # Crear velas desde ticks
-            candles = df['mid_price'].resample(f'{period_seconds}S').agg({
-                'Open': 'first',
-                'High': 'max', 
-                'Low': 'min',
-                'Close': 'last'
-            }).dropna()
-            
-            # Agregar datos de spread
-            spreads = df['spread'].resample(f'{period_seconds}S').agg({
-                'avg_spread': 'mean',
-                'min_spread': 'min',
-                'max_spread': 'max'
-            })
+            bars = self.bar_aggregator.get_bars(symbol, timeframe, include_current=True)
+            if len(bars) == 0:
+                return None
             
-            # Combinar datos
-            result = pd.concat([candles, spreads], axis=1)
+            result = bars.set_index('time')[['open', 'high', 'low', 'close',
+                                            'avg_spread', 'min_spread', 'max_spread']]
+            result = result.rename(columns={'open': 'Open', 'high': 'High',
+                                            'low': 'Low', 'close': 'Close'})
             result['symbol'] = symbol
             result['period_seconds'] = period_seconds
             
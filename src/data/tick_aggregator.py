@@ -0,0 +1,306 @@
+"""
+Tick Aggregator - Velas OHLCV en streaming desde ticks MT5
+=========================================================
+
+Consume lotes de ticks (arrays estructurados de copy_ticks_from) y mantiene
+las velas de varios timeframes a la vez sin volver a descargar barras del
+broker. Al cerrarse una vela se notifica a los consumidores suscritos
+(indicadores, generadores de señales...).
+
+Ejemplo:
+    aggregator = TickBarAggregator()
+    aggregator.subscribe(lambda symbol, tf, bar: print(symbol, tf, bar['close']), timeframes=['M1'])
+    ticks = mt5.copy_ticks_from('EURUSD', desde, 10000, mt5.COPY_TICKS_ALL)
+    aggregator.on_ticks('EURUSD', ticks)
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Timeframes soportados por defecto (segundos)
+TIMEFRAMES = {
+    'S10': 10,
+    'M1': 60,
+    'M5': 300,
+    'M15': 900,
+    'H1': 3600,
+}
+
+BAR_FIELDS = ['time', 'open', 'high', 'low', 'close', 'tick_volume', 'real_volume',
+              'avg_spread', 'min_spread', 'max_spread']
+
+
+class _BarSeries:
+    """Vela en formación y velas cerradas de un símbolo/timeframe"""
+
+    def __init__(self, seconds: int, max_bars: int):
+        self.seconds = seconds
+        self.period_ms = seconds * 1000
+        self.closed = deque(maxlen=max_bars)
+        self.current: Optional[Dict] = None
+
+    def aggregate(self, times_ms, prices, spreads, volumes) -> List[Dict]:
+        """
+        Añadir ticks ordenados y devolver las velas que se cierran
+
+        Los ticks se agrupan por vela con reduceat en lugar de resamplear.
+        """
+        bucket = times_ms - times_ms % self.period_ms
+        n = len(bucket)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], n]
+
+        groups = {
+            'time': bucket[starts] // 1000,
+            'open': prices[starts],
+            'high': np.maximum.reduceat(prices, starts),
+            'low': np.minimum.reduceat(prices, starts),
+            'close': prices[ends - 1],
+            'tick_volume': ends - starts,
+            'real_volume': np.add.reduceat(volumes, starts),
+            'spread_sum': np.add.reduceat(spreads, starts),
+            'min_spread': np.minimum.reduceat(spreads, starts),
+            'max_spread': np.maximum.reduceat(spreads, starts),
+        }
+        bars = [{key: values[i].item() for key, values in groups.items()} for i in range(len(starts))]
+
+        closed = []
+        current = self.current
+        if current is not None:
+            first = bars[0]
+            if first['time'] == current['time']:
+                current['high'] = max(current['high'], first['high'])
+                current['low'] = min(current['low'], first['low'])
+                current['close'] = first['close']
+                for key in ('tick_volume', 'real_volume', 'spread_sum'):
+                    current[key] += first[key]
+                current['min_spread'] = min(current['min_spread'], first['min_spread'])
+                current['max_spread'] = max(current['max_spread'], first['max_spread'])
+                bars[0] = current
+            else:
+                closed.append(current)
+
+        closed.extend(bars[:-1])
+        self.current = bars[-1]
+
+        closed = [self._finish(bar) for bar in closed]
+        self.closed.extend(closed)
+        return closed
+
+    def close_until(self, now_ms: int) -> Optional[Dict]:
+        """Cerrar la vela en formación si su periodo ya terminó"""
+        if self.current is None or (self.current['time'] * 1000 + self.period_ms) > now_ms:
+            return None
+        bar = self._finish(self.current)
+        self.current = None
+        self.closed.append(bar)
+        return bar
+
+    @staticmethod
+    def _finish(bar: Dict) -> Dict:
+        bar = dict(bar)
+        bar['avg_spread'] = bar.pop('spread_sum') / bar['tick_volume']
+        return bar
+
+
+class TickBarAggregator:
+    """
+    Agregador de ticks a velas OHLCV multi-timeframe
+
+    Cada lote de ticks actualiza todas las series del símbolo en una pasada
+    vectorizada. Los ticks con time_msc igual o anterior al último procesado
+    se descartan, de modo que se puede volver a pedir copy_ticks_from desde el
+    segundo del último tick sin duplicar.
+    """
+
+    def __init__(self,
+                 timeframes: Optional[Dict[str, int]] = None,
+                 max_bars: int = 500,
+                 price: str = 'bid'):
+        """
+        Args:
+            timeframes: {nombre: segundos}; por defecto S10, M1, M5, M15 y H1
+            max_bars: Velas cerradas guardadas por símbolo/timeframe
+            price: Precio de la vela: 'bid', 'ask' o 'mid'
+        """
+        if price not in ('bid', 'ask', 'mid'):
+            raise ValueError(f"Precio no soportado: {price}")
+
+        self.timeframes = dict(TIMEFRAMES if timeframes is None else timeframes)
+        self.max_bars = max_bars
+        self.price = price
+
+        self.series: Dict[str, Dict[str, _BarSeries]] = {}
+        self.last_time_msc: Dict[str, int] = {}
+        self.listeners: List[tuple] = []
+        self.stats = {'ticks': 0, 'duplicates': 0, 'bars_closed': 0}
+
+        self.lock = threading.RLock()
+
+    def add_timeframe(self, name: str, seconds: int):
+        """Añadir un timeframe (las series existentes empiezan vacías)"""
+        with self.lock:
+            if name in self.timeframes:
+                return
+            self.timeframes[name] = seconds
+            for series in self.series.values():
+                series[name] = _BarSeries(seconds, self.max_bars)
+
+    def subscribe(self,
+                  callback: Callable[[str, str, Dict], None],
+                  timeframes: Optional[Iterable[str]] = None,
+                  symbols: Optional[Iterable[str]] = None):
+        """
+        Registrar un consumidor de cierres de vela
+
+        Args:
+            callback: Función (symbol, timeframe, bar)
+            timeframes: Timeframes a recibir (todos si None)
+            symbols: Símbolos a recibir (todos si None)
+        """
+        self.listeners.append((
+            callback,
+            set(timeframes) if timeframes is not None else None,
+            set(symbols) if symbols is not None else None,
+        ))
+
+    def _series(self, symbol: str) -> Dict[str, _BarSeries]:
+        if symbol not in self.series:
+            self.series[symbol] = {
+                name: _BarSeries(seconds, self.max_bars)
+                for name, seconds in self.timeframes.items()
+            }
+        return self.series[symbol]
+
+    def _prices(self, ticks):
+        bid = np.asarray(ticks['bid'], dtype=np.float64)
+        ask = np.asarray(ticks['ask'], dtype=np.float64)
+        if self.price == 'bid':
+            price, valid = bid, bid > 0
+        elif self.price == 'ask':
+            price, valid = ask, ask > 0
+        else:
+            price, valid = (bid + ask) / 2, (bid > 0) & (ask > 0)
+        return price, ask - bid, valid
+
+    def on_ticks(self, symbol: str, ticks) -> List[Dict]:
+        """
+        Procesar un lote de ticks
+
+        Args:
+            symbol: Símbolo
+            ticks: Array estructurado de copy_ticks_from (o DataFrame) con
+                time_msc, bid, ask y opcionalmente volume_real
+
+        Returns:
+            Eventos de cierre [{'symbol', 'timeframe', 'bar'}] en orden cronológico
+        """
+        if ticks is None or len(ticks) == 0:
+            return []
+
+        times_ms = np.asarray(ticks['time_msc'], dtype=np.int64)
+        price, spread, valid = self._prices(ticks)
+        names = ticks.dtype.names if hasattr(ticks, 'dtype') and ticks.dtype.names else ticks.keys()
+        if 'volume_real' in names:
+            volume = np.asarray(ticks['volume_real'], dtype=np.float64)
+        else:
+            volume = np.zeros(len(times_ms))
+
+        events = []
+        with self.lock:
+            last = self.last_time_msc.get(symbol)
+            if last is not None:
+                fresh = times_ms > last
+                self.stats['duplicates'] += int((~fresh).sum())
+                valid &= fresh
+            if not valid.any():
+                return []
+
+            times_ms, price, spread, volume = times_ms[valid], price[valid], spread[valid], volume[valid]
+            self.last_time_msc[symbol] = int(times_ms[-1])
+            self.stats['ticks'] += len(times_ms)
+
+            for name, series in self._series(symbol).items():
+                for bar in series.aggregate(times_ms, price, spread, volume):
+                    events.append({'symbol': symbol, 'timeframe': name, 'bar': bar})
+
+            self.stats['bars_closed'] += len(events)
+
+        return self._dispatch(events)
+
+    def close_bars(self, now_ms: int, symbols: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Cerrar las velas cuyo periodo terminó sin recibir un tick posterior
+
+        Útil en mercados con pocos ticks, llamándolo periódicamente con la hora
+        del servidor en milisegundos.
+        """
+        events = []
+        with self.lock:
+            for symbol in (symbols or list(self.series)):
+                for name, series in self.series.get(symbol, {}).items():
+                    bar = series.close_until(now_ms)
+                    if bar is not None:
+                        events.append({'symbol': symbol, 'timeframe': name, 'bar': bar})
+            self.stats['bars_closed'] += len(events)
+
+        return self._dispatch(events)
+
+    def _dispatch(self, events: List[Dict]) -> List[Dict]:
+        # Orden cronológico por cierre de vela; a igual cierre, timeframe menor primero
+        events.sort(key=lambda e: (e['bar']['time'] + self.timeframes[e['timeframe']], self.timeframes[e['timeframe']]))
+
+        for event in events:
+            for callback, timeframes, symbols in self.listeners:
+                if timeframes is not None and event['timeframe'] not in timeframes:
+                    continue
+                if symbols is not None and event['symbol'] not in symbols:
+                    continue
+                try:
+                    callback(event['symbol'], event['timeframe'], event['bar'])
+                except Exception as e:
+                    print(f"[ERROR] Consumidor de velas {event['symbol']} {event['timeframe']}: {e}")
+        return events
+
+    def get_bars(self, symbol: str, timeframe: str, include_current: bool = False) -> pd.DataFrame:
+        """
+        Velas de un símbolo/timeframe con las columnas de copy_rates
+
+        Args:
+            include_current: Incluir la vela en formación
+
+        Returns:
+            DataFrame con 'time' en datetime (vacío si no hay velas)
+        """
+        with self.lock:
+            series = self.series.get(symbol, {}).get(timeframe)
+            if series is None:
+                return pd.DataFrame(columns=BAR_FIELDS)
+            bars = list(series.closed)
+            if include_current and series.current is not None:
+                bars.append(series._finish(series.current))
+
+        df = pd.DataFrame(bars, columns=BAR_FIELDS)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
+
+    def current_bar(self, symbol: str, timeframe: str) -> Optional[Dict]:
+        """Vela en formación (None si no hay)"""
+        with self.lock:
+            series = self.series.get(symbol, {}).get(timeframe)
+            if series is None or series.current is None:
+                return None
+            return series._finish(series.current)
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del agregador"""
+        with self.lock:
+            return {
+                **self.stats,
+                'symbols': len(self.series),
+                'timeframes': list(self.timeframes),
+            }
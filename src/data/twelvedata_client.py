@@ -7,7 +7,6 @@ Obtiene datos reales del mercado desde TwelveData
 """
 
 import os
-import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -15,6 +14,8 @@ import time
 import json
 import logging
 
+from src.core.http_client import http_get, http_post
+
 class TwelveDataClient:
     def __init__(self):
         self.api_key = os.getenv('TWELVEDATA_API_KEY', '23d17ce5b7044ad5aef9766770a6252b')
@@ -62,7 +63,7 @@ class TwelveDataClient:
             url = f"{self.base_url}/api_usage"
             params = {'apikey': self.api_key}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 self.logger.info(f"TwelveData API conectada - Uso: {data.get('current_usage', 0)}/{data.get('plan_limit', 0)}")
@@ -113,7 +114,7 @@ class TwelveDataClient:
                 'apikey': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 return float(data.get('price', 0))
@@ -178,7 +179,7 @@ class TwelveDataClient:
                 'apikey': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -247,7 +248,7 @@ class TwelveDataClient:
                 'apikey': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=15)
+            response = http_get('twelvedata', url, params=params, timeout=15)
             if response.status_code == 200:
                 data = response.json()
                 
@@ -297,7 +298,7 @@ class TwelveDataClient:
                 'series_type': 'close',
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -311,7 +312,7 @@ class TwelveDataClient:
                 'series_type': 'close',
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -329,7 +330,7 @@ class TwelveDataClient:
                 'sd': 2,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -346,7 +347,7 @@ class TwelveDataClient:
                 'series_type': 'close',
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -361,7 +362,7 @@ class TwelveDataClient:
                 'series_type': 'close',
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -375,7 +376,7 @@ class TwelveDataClient:
                 'time_period': 14,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -388,7 +389,7 @@ class TwelveDataClient:
                 'interval': interval,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -402,7 +403,7 @@ class TwelveDataClient:
                 'interval': interval,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -416,7 +417,7 @@ class TwelveDataClient:
                 'time_period': 14,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -429,7 +430,7 @@ class TwelveDataClient:
                 'interval': interval,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -443,7 +444,7 @@ class TwelveDataClient:
                 'time_period': 14,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -456,7 +457,7 @@ class TwelveDataClient:
                 'interval': interval,
                 'apikey': self.api_key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'values' in data and len(data['values']) > 0:
@@ -499,7 +500,7 @@ class TwelveDataClient:
     def _make_request(self, url: str, params: dict) -> dict:
         """Método auxiliar para hacer requests a TwelveData"""
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -520,14 +521,13 @@ class TwelveDataClient:
             dict: Respuesta del batch con todas las consultas
         """
         try:
-            import requests as req
             url = f"{self.base_url}/batch"
             headers = {
                 'Content-Type': 'application/json',
                 'Authorization': f'apikey {self.api_key}'
             }
             
-            response = req.post(url, json=requests, headers=headers, timeout=30)
+            response = http_post('twelvedata', url, json=requests, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -621,7 +621,7 @@ class TwelveDataClient:
                 'apikey': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('twelvedata', url, params=params, timeout=10)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -23,6 +23,8 @@ from functools import lru_cache
 from threading import Lock
 import redis
 
+from src.core.http_client import http_get
+
 class TwelveDataClientOptimized:
     def __init__(self, use_cache=True, use_redis=False):
         """
@@ -197,7 +199,7 @@ class TwelveDataClientOptimized:
             
     def _make_request(self, endpoint: str, params: Dict, cache_ttl: int = 60) -> Optional[Dict]:
         """
-        Hace una petición a la API con caché y reintentos
+        Hace una petición a la API con caché y reintentos (pool HTTP compartido)
         """
         # Verificar caché
         cache_key = self._get_cache_key(endpoint, params)
@@ -208,48 +210,39 @@ class TwelveDataClientOptimized:
         # Rate limiting
         self._rate_limit()
         
-        # Hacer petición con reintentos
-        max_retries = 3
-        retry_delay = 1
-        
-        for attempt in range(max_retries):
-            try:
-                url = f"{self.base_url}/{endpoint}"
-                params['apikey'] = self.api_key
-                
-                response = requests.get(url, params=params, timeout=15)
+        # Petición por el pool keep-alive compartido; los reintentos con
+        # backoff (incluido 429) y el circuit breaker los aplica http_client
+        try:
+            url = f"{self.base_url}/{endpoint}"
+            params['apikey'] = self.api_key
+            
+            response = http_get('twelvedata', url, params=params, timeout=15)
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Verificar si hay error en la respuesta
-                    if 'status' in data and data['status'] == 'error':
-                        self.logger.error(f"API error: {data.get('message', 'Unknown error')}")
-                        return None
-                        
-                    # Guardar en caché
-                    self._save_to_cache(cache_key, data)
+                # Verificar si hay error en la respuesta
+                if 'status' in data and data['status'] == 'error':
+                    self.logger.error(f"API error: {data.get('message', 'Unknown error')}")
+                    return None
                     
-                    return data
-                    
-                elif response.status_code == 429:
-                    # Rate limit exceeded
-                    self.logger.warning("Rate limit excedido, esperando...")
-                    time.sleep(60)
-                    
-                else:
-                    self.logger.error(f"Error {response.status_code}: {response.text}")
-                    
-            except requests.exceptions.Timeout:
-                self.logger.warning(f"Timeout en intento {attempt + 1}")
+                # Guardar en caché
+                self._save_to_cache(cache_key, data)
+                
+                return data
                 
-            except Exception as e:
-                self.logger.error(f"Error en petición: {e}")
+            elif response.status_code == 429:
+                self.logger.warning("Rate limit excedido tras reintentos")
                 
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
+            else:
+                self.logger.error(f"Error {response.status_code}: {response.text}")
                 
+        except requests.exceptions.Timeout:
+            self.logger.warning("Timeout en petición a TwelveData")
+            
+        except Exception as e:
+            self.logger.error(f"Error en petición: {e}")
+            
         return None
         
     def verify_connection(self):
@@ -13,6 +13,7 @@ import time
 import json
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
@@ -27,6 +28,8 @@ from src.data.twelvedata_client import TwelveDataClient
 from src.ai.ollama_client import OllamaClient
 from src.broker.mt5_connection import MT5Connection
 from src.notifiers.telegram_notifier import TelegramNotifier
+from src.core.http_client import http_get
+from src.core.rate_limiter import acquire_limit
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +61,14 @@ class OperationsDirector:
         self.tp_extension_factor = 1.5  # Factor para extender TP
         self.tp_reduction_factor = 0.8  # Factor para reducir TP
         
+        # Concurrencia del ciclo
+        self.max_workers = 4  # Análisis de símbolos en paralelo (llamadas TwelveData)
+        self.max_concurrent_ai = 2  # Consultas simultáneas a Ollama
+        self.cycle_deadline = 25  # Segundos; análisis más lentos se descartan
+        self._ai_semaphore = threading.Semaphore(self.max_concurrent_ai)
+        self.last_cycle_timing = {}
+        self.cycle_count = 0
+        
         # Estadísticas
         self.total_adjustments = 0
         self.successful_extensions = 0
@@ -92,6 +103,16 @@ class OperationsDirector:
         except Exception as e:
             logger.error(f"Error inicializando clientes: {e}")
     
+    def _twelvedata_request(self, url: str, params: Dict) -> Optional[Dict]:
+        """
+        Request a TwelveData respetando el límite global de la API
+        
+        Los análisis de símbolos corren en paralelo (max_workers) y cada uno
+        hace varias llamadas: todas pasan por el rate limiter compartido.
+        """
+        acquire_limit('twelvedata')
+        return self.twelvedata_client._make_request(url, params)
+    
     def get_volume_indicators(self, symbol: str) -> Dict[str, Any]:
         """
         Obtiene indicadores de volumen para detectar actividad institucional
@@ -116,7 +137,7 @@ class OperationsDirector:
                     'interval': '5min',
                     'apikey': self.twelvedata_client.api_key
                 }
-                response = self.twelvedata_client._make_request(obv_url, params)
+                response = self._twelvedata_request(obv_url, params)
                 if response and 'values' in response:
                     obv_values = [float(v['obv']) for v in response['values'][:10]]
                     indicators['obv'] = obv_values[0] if obv_values else 0
@@ -133,7 +154,7 @@ class OperationsDirector:
                     'interval': '5min',
                     'apikey': self.twelvedata_client.api_key
                 }
-                response = self.twelvedata_client._make_request(vwap_url, params)
+                response = self._twelvedata_request(vwap_url, params)
                 if response and 'values' in response:
                     indicators['vwap'] = float(response['values'][0]['vwap'])
             except:
@@ -149,7 +170,7 @@ class OperationsDirector:
                     'outputsize': 50,
                     'apikey': self.twelvedata_client.api_key
                 }
-                response = self.twelvedata_client._make_request(ts_url, params)
+                response = self._twelvedata_request(ts_url, params)
                 
                 if response and 'values' in response:
                     volumes = [float(v['volume']) for v in response['values']]
@@ -270,7 +291,7 @@ class OperationsDirector:
                 'interval': '5min',
                 'apikey': self.twelvedata_client.api_key
             }
-            response = self.twelvedata_client._make_request(rsi_url, params)
+            response = self._twelvedata_request(rsi_url, params)
             
             momentum = {}
             if response and 'values' in response:
@@ -285,7 +306,7 @@ class OperationsDirector:
                 'interval': '5min',
                 'apikey': self.twelvedata_client.api_key
             }
-            response = self.twelvedata_client._make_request(macd_url, params)
+            response = self._twelvedata_request(macd_url, params)
             
             if response and 'values' in response:
                 macd = float(response['values'][0]['macd'])
@@ -313,7 +334,7 @@ class OperationsDirector:
                 'outputsize': 100,
                 'apikey': self.twelvedata_client.api_key
             }
-            response = self.twelvedata_client._make_request(ts_url, params)
+            response = self._twelvedata_request(ts_url, params)
             
             levels = {}
             if response and 'values' in response:
@@ -526,19 +547,99 @@ class OperationsDirector:
             logger.error(f"Error evaluando ajuste de TP: {e}")
             return False, trade_info['tp'], "Error en evaluación"
     
+    def _build_trade_info(self, position) -> Dict[str, Any]:
+        """Convierte una posición MT5 en el diccionario usado por el análisis"""
+        return {
+            'ticket': position.ticket,
+            'symbol': position.symbol,
+            'type': 'BUY' if position.type == 0 else 'SELL',
+            'volume': position.volume,
+            'entry_price': position.price_open,
+            'current_price': position.price_current,
+            'sl': position.sl,
+            'tp': position.tp,
+            'profit': position.profit,
+            'swap': position.swap,
+            'commission': getattr(position, 'commission', 0)
+        }
+    
+    def _decide_tp(self, trade_info: Dict, market_analysis: Dict,
+                   abandoned: Optional[threading.Event] = None) -> Tuple[bool, float, str]:
+        """
+        should_adjust_tp limitando las llamadas concurrentes a la IA
+        
+        Si el ciclo ya terminó (`abandoned`) mientras se esperaba turno para
+        la IA, no se lanza la llamada.
+        """
+        while not self._ai_semaphore.acquire(timeout=0.5):
+            if abandoned is not None and abandoned.is_set():
+                return False, trade_info['tp'], 'Ciclo terminado antes de consultar la IA'
+        try:
+            if abandoned is not None and abandoned.is_set():
+                return False, trade_info['tp'], 'Ciclo terminado antes de consultar la IA'
+            return self.should_adjust_tp(trade_info, market_analysis)
+        finally:
+            self._ai_semaphore.release()
+    
+    def _collect_until_deadline(self, futures: Dict, deadline: float) -> Tuple[Dict, List]:
+        """
+        Espera los futures hasta el deadline del ciclo
+        
+        Returns:
+            (resultados completados {key: result}, claves descartadas por tiempo)
+        """
+        remaining = max(0.0, deadline - time.monotonic())
+        done, not_done = wait(futures.keys(), timeout=remaining)
+        
+        completed = {}
+        for future in done:
+            key = futures[future]
+            try:
+                completed[key] = future.result()
+            except Exception as e:
+                logger.error(f"[DIRECTOR] Error en análisis de {key}: {e}")
+        
+        stale = []
+        for future in not_done:
+            future.cancel()
+            stale.append(futures[future])
+        return completed, stale
+    
     def analyze_single_cycle(self):
         """
         Análisis único de todas las posiciones activas - NO LOOP
+        
+        Las posiciones del mismo símbolo comparten un único análisis de
+        mercado; los análisis por símbolo y las consultas a la IA se ejecutan
+        en paralelo (acotados por max_workers / max_concurrent_ai) y lo que no
+        termina antes de cycle_deadline se descarta para no aplicar un TP
+        basado en datos viejos. Al cerrar el ciclo se cancelan las tareas
+        pendientes; las llamadas ya en curso (p. ej. una IA colgada) no se
+        pueden interrumpir: se abandonan, su resultado se ignora y su hilo
+        termina cuando vence el timeout HTTP. Las que aún esperaban turno
+        para la IA ya no la consultan. Las modificaciones en MT5 se envían
+        desde este hilo, ya que la API de MT5 no es thread-safe.
+        
         Retorna diccionario con resultados
         """
         logger.info(f"[DIRECTOR] Iniciando monitoreo de operaciones...")
         
+        cycle_start = time.monotonic()
+        deadline = cycle_start + self.cycle_deadline
+        
         results = {
             'total_positions': 0,
             'tp_adjustments': 0,
             'adjustments_details': [],
+            'symbols_analyzed': 0,
+            'skipped_stale': [],
             'errors': []
         }
+        timing = {
+            'started_at': datetime.now().isoformat(),
+            'market_analysis_ms': 0.0,
+            'decision_ms': 0.0,
+        }
         
         try:
             # Verificar conexión MT5
@@ -562,93 +663,87 @@ class OperationsDirector:
             results['total_positions'] = len(positions)
             logger.info(f"[DIRECTOR] Monitoreando {len(positions)} posiciones")
             
+            # Preparar trades y agrupar por símbolo
+            trades = []
             for position in positions:
                 try:
-                    # Preparar información del trade
-                    trade_info = {
-                        'ticket': position.ticket,
-                        'symbol': position.symbol,
-                        'type': 'BUY' if position.type == 0 else 'SELL',
-                        'volume': position.volume,
-                        'entry_price': position.price_open,
-                        'current_price': position.price_current,
-                        'sl': position.sl,
-                        'tp': position.tp,
-                        'profit': position.profit,
-                        'swap': position.swap,
-                        'commission': getattr(position, 'commission', 0)
-                    }
-                    
-                    # Solo monitorear trades con TP establecido
-                    if trade_info['tp'] == 0:
-                        logger.warning(f"[DIRECTOR] Trade {trade_info['ticket']} sin TP, saltando")
-                        continue
-                    
-                    # Analizar condiciones del mercado
-                    market_analysis = self.analyze_market_conditions(
-                        trade_info['symbol'],
-                        trade_info['current_price']
-                    )
-                    
-                    # Evaluar si ajustar TP
-                    should_adjust, new_tp, reason = self.should_adjust_tp(trade_info, market_analysis)
-                    
-                    if should_adjust and new_tp != trade_info['tp']:
-                        # Ejecutar ajuste
-                        success = self.mt5_connection.modify_position(
-                            trade_info['ticket'],
-                            sl=trade_info['sl'],
-                            tp=new_tp
-                        )
-                        
-                        if success:
-                            self.total_adjustments += 1
-                            results['tp_adjustments'] += 1
-                            
-                            # Determinar tipo de ajuste
-                            if new_tp > trade_info['tp'] and trade_info['type'] == 'BUY':
-                                self.successful_extensions += 1
-                                adjustment_type = "EXTENSION"
-                            elif new_tp < trade_info['tp'] and trade_info['type'] == 'SELL':
-                                self.successful_extensions += 1
-                                adjustment_type = "EXTENSION"
-                            else:
-                                self.protective_reductions += 1
-                                adjustment_type = "REDUCTION"
-                            
-                            # Registrar detalles del ajuste
-                            adjustment_detail = {
-                                'ticket': trade_info['ticket'],
-                                'symbol': trade_info['symbol'],
-                                'type': adjustment_type,
-                                'old_tp': trade_info['tp'],
-                                'new_tp': new_tp,
-                                'reason': reason,
-                                'current_price': trade_info['current_price'],
-                                'market_data': market_analysis
-                            }
-                            results['adjustments_details'].append(adjustment_detail)
-                            
-                            logger.info(f"[DIRECTOR] TP ajustado - {adjustment_type}")
-                            logger.info(f"  Ticket: {trade_info['ticket']}")
-                            logger.info(f"  Símbolo: {trade_info['symbol']}")
-                            logger.info(f"  TP anterior: {trade_info['tp']:.5f}")
-                            logger.info(f"  TP nuevo: {new_tp:.5f}")
-                            logger.info(f"  Razón: {reason}")
-                            
-                            # Notificar por Telegram
-                            self.send_adjustment_notification(
-                                trade_info, new_tp, reason, market_analysis
-                            )
-                        else:
-                            logger.error(f"[DIRECTOR] Error ajustando TP para {trade_info['ticket']}")
-                            results['errors'].append(f"Error ajustando TP para ticket {trade_info['ticket']}")
-                    
+                    trade_info = self._build_trade_info(position)
                 except Exception as e:
                     error_msg = f"Error procesando posición {getattr(position, 'ticket', 'N/A')}: {e}"
                     logger.error(f"[DIRECTOR] {error_msg}")
                     results['errors'].append(error_msg)
                     continue
+                
+                # Solo monitorear trades con TP establecido
+                if trade_info['tp'] == 0:
+                    logger.warning(f"[DIRECTOR] Trade {trade_info['ticket']} sin TP, saltando")
+                    continue
+                trades.append(trade_info)
+            
+            symbol_prices = {}
+            for trade_info in trades:
+                symbol_prices.setdefault(trade_info['symbol'], trade_info['current_price'])
+            
+            executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='director'
+            )
+            abandoned = threading.Event()
+            try:
+                # 1. Un análisis de mercado por símbolo, en paralelo
+                phase_start = time.monotonic()
+                futures = {
+                    executor.submit(self.analyze_market_conditions, symbol, price): symbol
+                    for symbol, price in symbol_prices.items()
+                }
+                market_analyses, stale_symbols = self._collect_until_deadline(futures, deadline)
+                timing['market_analysis_ms'] = (time.monotonic() - phase_start) * 1000
+                results['symbols_analyzed'] = len(market_analyses)
+                
+                for symbol in stale_symbols:
+                    logger.warning(f"[DIRECTOR] Análisis de {symbol} fuera de deadline, saltando")
+                
+                # 2. Decisión de TP (incluye IA) por posición, en paralelo
+                phase_start = time.monotonic()
+                futures = {}
+                for trade_info in trades:
+                    market_analysis = market_analyses.get(trade_info['symbol'])
+                    if not market_analysis:
+                        results['skipped_stale'].append(trade_info['ticket'])
+                        continue
+                    future = executor.submit(self._decide_tp, trade_info, market_analysis, abandoned)
+                    futures[future] = trade_info['ticket']
+                decisions, stale_tickets = self._collect_until_deadline(futures, deadline)
+                timing['decision_ms'] = (time.monotonic() - phase_start) * 1000
+                results['skipped_stale'].extend(stale_tickets)
+            finally:
+                # Pendientes canceladas; las que siguen en curso se abandonan
+                abandoned.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+            
+            # 3. Aplicar ajustes desde este hilo
+            for trade_info in trades:
+                decision = decisions.get(trade_info['ticket'])
+                if not decision:
+                    continue
+                
+                should_adjust, new_tp, reason = decision
+                if should_adjust and new_tp != trade_info['tp']:
+                    try:
+                        self._apply_tp_adjustment(
+                            trade_info, new_tp, reason,
+                            market_analyses[trade_info['symbol']], results
+                        )
+                    except Exception as e:
+                        error_msg = f"Error procesando posición {trade_info['ticket']}: {e}"
+                        logger.error(f"[DIRECTOR] {error_msg}")
+                        results['errors'].append(error_msg)
+            
+            if results['skipped_stale']:
+                logger.warning(
+                    f"[DIRECTOR] {len(results['skipped_stale'])} posiciones sin análisis "
+                    f"dentro del deadline de {self.cycle_deadline}s"
+                )
             
             return results
             
@@ -657,6 +752,69 @@ class OperationsDirector:
             logger.error(f"[DIRECTOR] {error_msg}")
             results['errors'].append(error_msg)
             return results
+        
+        finally:
+            timing['duration_ms'] = (time.monotonic() - cycle_start) * 1000
+            timing['positions'] = results['total_positions']
+            timing['symbols'] = results['symbols_analyzed']
+            timing['skipped_stale'] = len(results['skipped_stale'])
+            timing['deadline_exceeded'] = time.monotonic() > deadline
+            results['cycle_timing'] = timing
+            self.last_cycle_timing = timing
+            self.cycle_count += 1
+    
+    def _apply_tp_adjustment(self, trade_info: Dict, new_tp: float, reason: str,
+                             market_analysis: Dict, results: Dict):
+        """Envía la modificación de TP a MT5 y registra el resultado"""
+        success = self.mt5_connection.modify_position(
+            trade_info['ticket'],
+            sl=trade_info['sl'],
+            tp=new_tp
+        )
+        
+        if not success:
+            logger.error(f"[DIRECTOR] Error ajustando TP para {trade_info['ticket']}")
+            results['errors'].append(f"Error ajustando TP para ticket {trade_info['ticket']}")
+            return
+        
+        self.total_adjustments += 1
+        results['tp_adjustments'] += 1
+        
+        # Determinar tipo de ajuste
+        if new_tp > trade_info['tp'] and trade_info['type'] == 'BUY':
+            self.successful_extensions += 1
+            adjustment_type = "EXTENSION"
+        elif new_tp < trade_info['tp'] and trade_info['type'] == 'SELL':
+            self.successful_extensions += 1
+            adjustment_type = "EXTENSION"
+        else:
+            self.protective_reductions += 1
+            adjustment_type = "REDUCTION"
+        
+        # Registrar detalles del ajuste
+        adjustment_detail = {
+            'ticket': trade_info['ticket'],
+            'symbol': trade_info['symbol'],
+            'type': adjustment_type,
+            'old_tp': trade_info['tp'],
+            'new_tp': new_tp,
+            'reason': reason,
+            'current_price': trade_info['current_price'],
+            'market_data': market_analysis
+        }
+        results['adjustments_details'].append(adjustment_detail)
+        
+        logger.info(f"[DIRECTOR] TP ajustado - {adjustment_type}")
+        logger.info(f"  Ticket: {trade_info['ticket']}")
+        logger.info(f"  Símbolo: {trade_info['symbol']}")
+        logger.info(f"  TP anterior: {trade_info['tp']:.5f}")
+        logger.info(f"  TP nuevo: {new_tp:.5f}")
+        logger.info(f"  Razón: {reason}")
+        
+        # Notificar por Telegram
+        self.send_adjustment_notification(
+            trade_info, new_tp, reason, market_analysis
+        )
     
     def monitor_active_trades(self):
         """
@@ -775,6 +933,9 @@ class OperationsDirector:
             'protective_reductions': self.protective_reductions,
             'check_interval': self.check_interval,
             'volume_threshold': self.volume_threshold,
+            'cycle_deadline': self.cycle_deadline,
+            'cycle_count': self.cycle_count,
+            'last_cycle': self.last_cycle_timing,
             'last_analysis': datetime.now()
         }
 
@@ -783,8 +944,7 @@ class OperationsDirector:
 def _make_request(self, url: str, params: Dict) -> Optional[Dict]:
     """Método auxiliar para hacer requests a TwelveData"""
     try:
-        import requests
-        response = requests.get(url, params=params, timeout=10)
+        response = http_get('twelvedata', url, params=params, timeout=10)
         if response.status_code == 200:
             return response.json()
         return None
@@ -8,13 +8,14 @@ Sistema de notificaciones en tiempo real por Telegram
 
 import os
 import sys
-import requests
 import json
 from datetime import datetime
 from typing import Dict, Any, Optional
 import time
 import logging
 
+from src.core.http_client import http_get, http_post
+
 # Configurar encoding UTF-8
 if sys.platform == 'win32':
     import locale
@@ -44,7 +45,7 @@ class TelegramNotifier:
     def verify_connection(self):
         """Verifica la conexión con Telegram"""
         try:
-            response = requests.get(f"{self.base_url}/getMe", timeout=10)
+            response = http_get('telegram', f"{self.base_url}/getMe", timeout=10)
             if response.status_code == 200:
                 bot_info = response.json()
                 if bot_info.get('ok'):
@@ -79,7 +80,7 @@ class TelegramNotifier:
                 'disable_notification': disable_notification
             }
             
-            response = requests.post(url, json=data, timeout=10)
+            response = http_post('telegram', url, json=data, timeout=10)
             if response.status_code == 200:
                 return True
             else:
@@ -110,6 +110,173 @@ class PortfolioMetrics:
     current_leverage: float = 1.0
 
 
+def ledoit_wolf_shrinkage(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage towards a scaled identity (Ledoit & Wolf, 2004)
+
+    Args:
+        returns: T x N matrix of periodic returns
+
+    Returns:
+        Tuple of (shrunk covariance with sample normalization, shrinkage intensity)
+    """
+    n_obs, n_assets = returns.shape
+    if n_obs < 2 or n_assets == 0:
+        return np.zeros((n_assets, n_assets)), 0.0
+
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / n_obs
+    mu = np.trace(sample) / n_assets
+
+    # d² = ||S - mu*I||², b² = min(d², 1/T² * sum_t ||x_t x_t' - S||²)
+    # where sum_t ||x_t x_t' - S||² / T reduces to mean(||x_t||⁴) - ||S||²
+    d2 = np.sum((sample - mu * np.eye(n_assets)) ** 2)
+    row_norms = np.einsum('ij,ij->i', centered, centered)
+    pi = np.mean(row_norms ** 2) - np.sum(sample ** 2)
+    b2 = min(max(pi / n_obs, 0.0), d2)
+    shrinkage = b2 / d2 if d2 > 0 else 1.0
+
+    shrunk = shrinkage * mu * np.eye(n_assets) + (1 - shrinkage) * sample
+    return shrunk * n_obs / (n_obs - 1), float(shrinkage)
+
+
+class IncrementalCovariance:
+    """
+    Rolling-window and exponentially weighted return covariance
+
+    Each new price row costs O(n²): the new return is added to running
+    (plain and exponentially weighted) sums and cross-products and the one
+    leaving the window is subtracted, instead of recomputing the covariance
+    over the whole window. Sums are rebuilt exactly from the window
+    periodically to avoid numerical drift.
+    """
+
+    def __init__(self, symbols: List[str], window: int, alpha: Optional[float] = None,
+                 rebuild_every: Optional[int] = None):
+        """
+        Args:
+            symbols: Column order of the estimator
+            window: Number of returns in the rolling window
+            alpha: EW decay (defaults to 2 / (window + 1))
+            rebuild_every: Returns between exact rebuilds of the rolling sums
+        """
+        self.symbols = list(symbols)
+        self.window = max(int(window), 1)
+        self.alpha = alpha if alpha is not None else 2 / (self.window + 1)
+        self.rebuild_every = rebuild_every or self.window
+
+        n_assets = len(self.symbols)
+        self._buffer = np.zeros((self.window, n_assets))
+        self._sum = np.zeros(n_assets)
+        self._cross = np.zeros((n_assets, n_assets))
+        self._pos = 0
+        self.count = 0
+        self._since_rebuild = 0
+
+        # EW sums: weight (1 - alpha)^age, same as pandas ewm(adjust=True) over the window
+        self._decay = 1 - self.alpha
+        self._ew_weight = 0.0
+        self._ew_weight_sq = 0.0
+        self._ew_sum = np.zeros(n_assets)
+        self._ew_cross = np.zeros((n_assets, n_assets))
+
+        self.last_prices: Optional[np.ndarray] = None
+
+    def update_price(self, prices: np.ndarray) -> bool:
+        """
+        Add a price row (same column order as symbols)
+
+        Returns:
+            False if the row has missing prices and the estimator must be rebuilt
+        """
+        prices = np.asarray(prices, dtype=float)
+        if not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+            return False
+        if self.last_prices is not None:
+            self.add_return(prices / self.last_prices - 1)
+        self.last_prices = prices
+        return True
+
+    def add_return(self, row: np.ndarray):
+        """Add one return row to both estimators"""
+        row_cross = np.outer(row, row)
+        self._ew_weight *= self._decay
+        self._ew_weight_sq *= self._decay ** 2
+        self._ew_sum *= self._decay
+        self._ew_cross *= self._decay
+
+        old = self._buffer[self._pos]
+        if self.count >= self.window:
+            old_cross = np.outer(old, old)
+            old_weight = self._decay ** self.window
+            self._sum -= old
+            self._cross -= old_cross
+            self._ew_weight -= old_weight
+            self._ew_weight_sq -= old_weight ** 2
+            self._ew_sum -= old_weight * old
+            self._ew_cross -= old_weight * old_cross
+
+        self._sum += row
+        self._cross += row_cross
+        self._ew_weight += 1.0
+        self._ew_weight_sq += 1.0
+        self._ew_sum += row
+        self._ew_cross += row_cross
+
+        self._buffer[self._pos] = row
+        self._pos = (self._pos + 1) % self.window
+        self.count += 1
+
+        self._since_rebuild += 1
+        if self._since_rebuild >= self.rebuild_every:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recompute exact sums from the window"""
+        window_returns = self.window_returns()
+        weights = self._decay ** np.arange(len(window_returns) - 1, -1, -1)
+        self._sum = window_returns.sum(axis=0)
+        self._cross = window_returns.T @ window_returns
+        self._ew_weight = weights.sum()
+        self._ew_weight_sq = (weights ** 2).sum()
+        self._ew_sum = weights @ window_returns
+        self._ew_cross = (window_returns * weights[:, None]).T @ window_returns
+        self._since_rebuild = 0
+
+    @property
+    def n_obs(self) -> int:
+        return min(self.count, self.window)
+
+    def window_returns(self) -> np.ndarray:
+        """Returns in the rolling window, oldest first"""
+        if self.count < self.window:
+            return self._buffer[:self.count]
+        return np.roll(self._buffer, -self._pos, axis=0)
+
+    def mean(self) -> np.ndarray:
+        """Rolling mean of periodic returns"""
+        return self._sum / max(self.n_obs, 1)
+
+    def rolling_covariance(self) -> np.ndarray:
+        """Rolling sample covariance of periodic returns"""
+        n_obs = self.n_obs
+        if n_obs < 2:
+            return np.full_like(self._cross, np.nan)
+        return (self._cross - np.outer(self._sum, self._sum) / n_obs) / (n_obs - 1)
+
+    def ew_covariance(self) -> np.ndarray:
+        """Exponentially weighted covariance of periodic returns (bias corrected)"""
+        if self.n_obs < 2:
+            return np.full_like(self._ew_cross, np.nan)
+        mean = self._ew_sum / self._ew_weight
+        cov = self._ew_cross / self._ew_weight - np.outer(mean, mean)
+        return cov * self._ew_weight ** 2 / (self._ew_weight ** 2 - self._ew_weight_sq)
+
+    def shrunk_covariance(self) -> Tuple[np.ndarray, float]:
+        """Ledoit-Wolf covariance over the rolling window"""
+        return ledoit_wolf_shrinkage(self.window_returns())
+
+
 class PortfolioOptimizer(ABC):
     """Base class for portfolio optimization methods"""
 
@@ -129,6 +296,16 @@ class PortfolioOptimizer(ABC):
         """
         pass
 
+    @staticmethod
+    def _initial_guess(n_assets: int, constraints: PortfolioConstraints, **kwargs) -> np.ndarray:
+        """Previous solution (kwargs['initial_weights']) if usable, else equal weights"""
+        x0 = kwargs.get('initial_weights')
+        if x0 is not None:
+            x0 = np.clip(np.asarray(x0, dtype=float), constraints.min_weight, constraints.max_weight)
+            if len(x0) == n_assets and np.all(np.isfinite(x0)) and x0.sum() > 0:
+                return x0 / x0.sum()
+        return np.full(n_assets, 1.0 / n_assets)
+
 
 class EqualWeightOptimizer(PortfolioOptimizer):
     """Equal weight allocation"""
@@ -149,29 +326,32 @@ class RiskParityOptimizer(PortfolioOptimizer):
         """Risk parity optimization"""
 
         def risk_budget_objective(weights, covariance_matrix):
-            """Objective function for risk parity"""
-            weights = np.array(weights)
-            portfolio_vol = np.sqrt(np.dot(weights, np.dot(covariance_matrix, weights)))
+            """Objective function for risk parity and its analytic gradient"""
+            marginal = covariance_matrix @ weights
+            portfolio_vol = np.sqrt(weights @ marginal)
 
             # Risk contributions
-            marginal_contrib = np.dot(covariance_matrix, weights) / portfolio_vol
-            contrib = weights * marginal_contrib
+            contrib = weights * marginal / portfolio_vol
 
-            # Target equal risk contribution
-            target_contrib = portfolio_vol / len(weights)
+            # Deviation from equal risk contribution (sums to zero)
+            deviation = contrib - portfolio_vol / len(weights)
+
+            gradient = 2 * ((deviation * marginal + covariance_matrix @ (deviation * weights)) / portfolio_vol
+                            - (deviation @ contrib) * marginal / portfolio_vol ** 2)
 
             # Sum of squared deviations
-            return np.sum((contrib - target_contrib) ** 2)
+            return np.sum(deviation ** 2), gradient
 
         n_assets = len(expected_returns)
         cov_matrix = covariance_matrix.values
 
-        # Initial guess - equal weights
-        x0 = np.array([1.0 / n_assets] * n_assets)
+        # Initial guess - previous solution when available
+        x0 = self._initial_guess(n_assets, constraints, **kwargs)
 
         # Constraints
         constraints_list = [
-            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0}  # Weights sum to 1
+            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0,
+             'jac': lambda x: np.ones_like(x)}  # Weights sum to 1
         ]
 
         # Bounds
@@ -182,6 +362,7 @@ class RiskParityOptimizer(PortfolioOptimizer):
             risk_budget_objective,
             x0,
             args=(cov_matrix,),
+            jac=True,
             method='SLSQP',
             bounds=bounds,
             constraints=constraints_list,
@@ -208,29 +389,31 @@ class MeanVarianceOptimizer(PortfolioOptimizer):
         risk_aversion = kwargs.get('risk_aversion', 1.0)
 
         def objective(weights, expected_returns, covariance_matrix, risk_aversion):
-            """Utility function: return - risk_aversion * variance"""
-            weights = np.array(weights)
-            returns = np.dot(weights, expected_returns)
-            variance = np.dot(weights, np.dot(covariance_matrix, weights))
-            return -(returns - risk_aversion * variance)
+            """Utility function: return - risk_aversion * variance, with gradient"""
+            marginal = covariance_matrix @ weights
+            returns = weights @ expected_returns
+            variance = weights @ marginal
+            return -(returns - risk_aversion * variance), -(expected_returns - 2 * risk_aversion * marginal)
 
         n_assets = len(expected_returns)
         cov_matrix = covariance_matrix.values
         exp_returns = expected_returns.values
 
-        # Initial guess
-        x0 = np.array([1.0 / n_assets] * n_assets)
+        # Initial guess - previous solution when available
+        x0 = self._initial_guess(n_assets, constraints, **kwargs)
 
         # Constraints
         constraints_list = [
-            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0}  # Weights sum to 1
+            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0,
+             'jac': lambda x: np.ones_like(x)}  # Weights sum to 1
         ]
 
         # Optional return constraint
         if target_return is not None:
             constraints_list.append({
                 'type': 'eq',
-                'fun': lambda x: np.dot(x, exp_returns) - target_return
+                'fun': lambda x: np.dot(x, exp_returns) - target_return,
+                'jac': lambda x: exp_returns
             })
 
         # Bounds
@@ -241,6 +424,7 @@ class MeanVarianceOptimizer(PortfolioOptimizer):
             objective,
             x0,
             args=(exp_returns, cov_matrix, risk_aversion),
+            jac=True,
             method='SLSQP',
             bounds=bounds,
             constraints=constraints_list,
@@ -264,19 +448,20 @@ class MinimumVarianceOptimizer(PortfolioOptimizer):
         """Minimum variance optimization"""
 
         def objective(weights, covariance_matrix):
-            """Portfolio variance"""
-            weights = np.array(weights)
-            return np.dot(weights, np.dot(covariance_matrix, weights))
+            """Portfolio variance and its gradient"""
+            marginal = covariance_matrix @ weights
+            return weights @ marginal, 2 * marginal
 
         n_assets = len(expected_returns)
         cov_matrix = covariance_matrix.values
 
-        # Initial guess
-        x0 = np.array([1.0 / n_assets] * n_assets)
+        # Initial guess - previous solution when available
+        x0 = self._initial_guess(n_assets, constraints, **kwargs)
 
         # Constraints
         constraints_list = [
-            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0}  # Weights sum to 1
+            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0,
+             'jac': lambda x: np.ones_like(x)}  # Weights sum to 1
         ]
 
         # Bounds
@@ -287,6 +472,7 @@ class MinimumVarianceOptimizer(PortfolioOptimizer):
             objective,
             x0,
             args=(cov_matrix,),
+            jac=True,
             method='SLSQP',
             bounds=bounds,
             constraints=constraints_list,
@@ -433,6 +619,13 @@ class AdvancedPortfolioManager:
             AllocationMethod.HIERARCHICAL_RISK_PARITY: HierarchicalRiskParityOptimizer()
         }
 
+        # Incremental return statistics, updated per price row
+        self.covariance_estimator: Optional[IncrementalCovariance] = None
+        self._estimator_rows = 0  # price_history rows consumed by the estimator
+
+        # Last optimizer solution per method (warm start)
+        self._last_solutions: Dict[AllocationMethod, pd.Series] = {}
+
         # Risk free rate (annualized)
         self.risk_free_rate = 0.02
 
@@ -470,6 +663,10 @@ class AdvancedPortfolioManager:
         else:
             self.price_history = pd.concat([self.price_history, price_row.to_frame().T])
 
+        # Feed the new row to the covariance estimator (O(n²))
+        if self.covariance_estimator is not None:
+            self._sync_covariance_estimator(self.covariance_estimator.window + 1)
+
         # Update current portfolio value
         self._update_portfolio_value()
 
@@ -477,6 +674,39 @@ class AdvancedPortfolioManager:
         if self._should_rebalance():
             self.rebalance()
 
+    def _sync_covariance_estimator(self, lookback_days: int) -> Optional[IncrementalCovariance]:
+        """
+        Bring the incremental estimator up to date with price_history
+
+        The estimator covers the same returns as
+        price_history.tail(lookback_days).pct_change().dropna(). It is rebuilt
+        from history when the lookback or the columns change, and only the
+        new rows are processed otherwise.
+
+        Returns:
+            The estimator, or None if the window has missing prices (callers
+            fall back to the pandas computation)
+        """
+        symbols = list(self.price_history.columns)
+        window = lookback_days - 1
+        estimator = self.covariance_estimator
+
+        if (estimator is None or estimator.window != window or estimator.symbols != symbols
+                or self._estimator_rows > len(self.price_history)):
+            estimator = IncrementalCovariance(symbols, window, alpha=2 / (lookback_days + 1))
+            self.covariance_estimator = estimator
+            self._estimator_rows = max(len(self.price_history) - lookback_days, 0)
+
+        new_rows = self.price_history.iloc[self._estimator_rows:].to_numpy(dtype=float)
+        for row in new_rows:
+            if not estimator.update_price(row):
+                # Missing prices: dropna() semantics can't be kept incrementally
+                self.covariance_estimator = None
+                self._estimator_rows = 0
+                return None
+        self._estimator_rows = len(self.price_history)
+        return estimator
+
     def calculate_expected_returns(self, method: str = 'historical',
                                    lookback_days: int = 252) -> pd.Series:
         """
@@ -493,6 +723,12 @@ class AdvancedPortfolioManager:
             # Default expected returns if no history
             return pd.Series(0.001, index=list(self.assets.keys()))
 
+        estimator = self._sync_covariance_estimator(lookback_days)
+        if method == 'historical' and estimator is not None and estimator.n_obs > 0:
+            # Rolling mean maintained per bar
+            expected_returns = pd.Series(estimator.mean() * 252, index=estimator.symbols)
+            return expected_returns.fillna(0.001)
+
         # Get recent price data
         recent_prices = self.price_history.tail(lookback_days)
         returns = recent_prices.pct_change().dropna()
@@ -502,17 +738,13 @@ class AdvancedPortfolioManager:
             expected_returns = returns.mean() * 252  # Annualized
 
         elif method == 'exponential':
-            # Exponentially weighted returns
+            # Exponentially weighted returns (most recent weight 1)
             alpha = 2 / (lookback_days + 1)
-            weights = [(1 - alpha) ** i for i in range(len(returns))]
-            weights.reverse()
-            weights = np.array(weights)
+            weights = (1 - alpha) ** np.arange(len(returns) - 1, -1, -1)
             weights /= weights.sum()
 
-            expected_returns = pd.Series(
-                [np.average(returns[col], weights=weights) * 252 for col in returns.columns],
-                index=returns.columns
-            )
+            expected_returns = pd.Series(weights @ returns.to_numpy(dtype=float) * 252,
+                                         index=returns.columns)
 
         elif method == 'capm':
             # CAPM-based expected returns
@@ -558,6 +790,21 @@ class AdvancedPortfolioManager:
             )
             return cov_matrix
 
+        estimator = self._sync_covariance_estimator(lookback_days)
+        if estimator is not None and estimator.n_obs >= 2:
+            if method == 'sample':
+                cov = estimator.rolling_covariance()
+            elif method == 'exponential':
+                cov = estimator.ew_covariance()
+            elif method == 'shrinkage':
+                cov, _ = estimator.shrunk_covariance()
+            else:
+                raise ValueError(f"Unknown covariance method: {method}")
+
+            symbols = estimator.symbols
+            cov_matrix = pd.DataFrame(cov * 252, index=symbols, columns=symbols)  # Annualized
+            return cov_matrix.fillna(0.04)
+
         # Get recent price data
         recent_prices = self.price_history.tail(lookback_days)
         returns = recent_prices.pct_change().dropna()
@@ -573,17 +820,8 @@ class AdvancedPortfolioManager:
 
         elif method == 'shrinkage':
             # Ledoit-Wolf shrinkage estimator
-            sample_cov = returns.cov() * 252
-            n_assets = len(sample_cov)
-
-            # Shrinkage target (diagonal matrix with average variance)
-            avg_var = np.trace(sample_cov) / n_assets
-            target = avg_var * np.eye(n_assets)
-            target = pd.DataFrame(target, index=sample_cov.index, columns=sample_cov.columns)
-
-            # Shrinkage intensity (simplified)
-            shrinkage = 0.2  # 20% shrinkage
-            cov_matrix = (1 - shrinkage) * sample_cov + shrinkage * target
+            cov, _ = ledoit_wolf_shrinkage(returns.to_numpy(dtype=float))
+            cov_matrix = pd.DataFrame(cov * 252, index=returns.columns, columns=returns.columns)
 
         else:
             raise ValueError(f"Unknown covariance method: {method}")
@@ -621,10 +859,16 @@ class AdvancedPortfolioManager:
 
         optimizer = self.optimizers[method]
 
+        # Warm start from the previous solution of this method
+        previous = self._last_solutions.get(method)
+        if previous is not None and 'initial_weights' not in kwargs:
+            kwargs['initial_weights'] = previous.reindex(symbols).fillna(1.0 / len(symbols)).values
+
         # Optimize
         try:
             weights = optimizer.optimize(expected_returns, covariance_matrix, self.constraints, **kwargs)
             weights = weights.reindex(symbols, fill_value=0.0)
+            self._last_solutions[method] = weights
 
             # Apply constraints
             weights = self._apply_constraints(weights)
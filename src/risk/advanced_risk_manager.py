@@ -20,6 +20,9 @@ from dotenv import load_dotenv
 import json
 import requests
 
+from src.risk.position_pass import (PositionManagementPass, breakeven_targets,
+                                    merge_targets, trailing_targets)
+
 # Cargar configuración
 load_dotenv('configs/.env')
 
@@ -50,6 +53,9 @@ class AdvancedRiskManager:
         # Control de frecuencia
         self.CHECK_INTERVAL = int(os.getenv('RISK_CHECK_INTERVAL', '30'))  # segundos
         self.last_check = {}
+
+        # Datos de mercado compartidos y envío en lote por ciclo
+        self.position_pass = PositionManagementPass(mt5, atr_ttl=float(os.getenv('ATR_CACHE_SECONDS', '60')))
         
         # APIs
         self.twelvedata_key = os.getenv('TWELVEDATA_API_KEY')
@@ -116,9 +122,7 @@ class AdvancedRiskManager:
                 positions = mt5.positions_get()
                 if positions:
                     self.logger.info(f"Monitoreando {len(positions)} posiciones...")
-                    
-                    for position in positions:
-                        self.manage_position(position)
+                    self.manage_positions(positions)
                         
                 # Mostrar estadísticas
                 if self.statistics['breakeven_applied'] > 0 or self.statistics['trailing_updated'] > 0:
@@ -142,43 +146,87 @@ class AdvancedRiskManager:
             
     def manage_position(self, position):
         """Gestionar una posición individual"""
-        ticket = position.ticket
-        symbol = position.symbol
-        
+        self.manage_positions([position])
+
+    def manage_positions(self, positions) -> Dict[int, Dict]:
+        """
+        Gestionar todas las posiciones en una pasada
+
+        Precio, ATR y recomendación de IA se obtienen una vez por símbolo;
+        breakeven y trailing se deciden para todas las posiciones a la vez y
+        cada posición recibe como mucho una modificación (el SL más protector).
+
+        Returns:
+            {ticket: resultado del envío} de las posiciones modificadas
+        """
         # Evitar procesar la misma posición muy seguido
-        if ticket in self.last_check:
-            if time.time() - self.last_check[ticket] < 10:
-                return
-                
-        self.last_check[ticket] = time.time()
-        
-        # Obtener información del símbolo
-        symbol_info = mt5.symbol_info(symbol)
-        if not symbol_info:
-            return
-            
-        point = symbol_info.point
-        current_price = symbol_info.bid if position.type == mt5.ORDER_TYPE_BUY else symbol_info.ask
-        
-        # Calcular profit en pips
-        if position.type == mt5.ORDER_TYPE_BUY:
-            profit_pips = (current_price - position.price_open) / point
-        else:
-            profit_pips = (position.price_open - current_price) / point
-            
-        # Obtener recomendaciones de IA si está activado
-        ai_params = None
+        now = time.time()
+        positions = [p for p in positions if now - self.last_check.get(p.ticket, 0) >= 10]
+        for position in positions:
+            self.last_check[position.ticket] = now
+
+        book = self.position_pass.snapshot(positions)
+        if not len(book):
+            return {}
+
+        n = len(book)
+        profit_pips = book.profit_points()
+        breakeven_trigger = np.full(n, self.BREAKEVEN_TRIGGER_PIPS)
+        trailing_activation = np.full(n, self.TRAILING_ACTIVATION_PIPS)
+        trailing_distance = np.full(n, self.TRAILING_DISTANCE_PIPS)
+
+        # Una consulta de IA por símbolo (con la posición más adelantada)
         if self.USE_AI_OPTIMIZATION:
-            ai_params = self.get_ai_recommendations(symbol, position, profit_pips)
-            
-        # Aplicar Breakeven si está activado
+            for symbol in book.symbol_info:
+                idx = book.indices(symbol)
+                lead = idx[np.nanargmax(profit_pips[idx])] if not np.isnan(profit_pips[idx]).all() else idx[0]
+                ai_params = self.get_ai_recommendations(symbol, book.positions[lead], profit_pips[lead])
+                if not ai_params:
+                    continue
+                if 'breakeven_trigger' in ai_params:
+                    breakeven_trigger[idx] = ai_params['breakeven_trigger']
+                    self.logger.info(f"IA sugiere breakeven trigger para {symbol}: {ai_params['breakeven_trigger']} pips")
+                if 'trailing_activation' in ai_params:
+                    trailing_activation[idx] = ai_params['trailing_activation']
+                if 'trailing_distance' in ai_params:
+                    trailing_distance[idx] = ai_params['trailing_distance']
+
+        breakeven = None
         if self.ENABLE_BREAKEVEN:
-            self.check_and_apply_breakeven(position, profit_pips, point, ai_params)
-            
-        # Aplicar Trailing Stop si está activado
+            applied = np.array([self.positions_managed.get(int(t), {}).get('breakeven_applied', False)
+                                for t in book.ticket], dtype=bool)
+            breakeven = breakeven_targets(book, breakeven_trigger, self.BREAKEVEN_OFFSET_PIPS,
+                                          eligible=~applied, min_profit=self.BREAKEVEN_MIN_PROFIT_USD)
+
+        trailing = None
         if self.ENABLE_TRAILING_STOP:
-            self.check_and_apply_trailing(position, profit_pips, current_price, point, ai_params)
-            
+            # ATR solo de los símbolos con alguna posición en zona de trailing
+            if self.USE_ATR_TRAILING:
+                active = {book.symbols[i] for i in np.flatnonzero(profit_pips >= trailing_activation)}
+                if active:
+                    self.position_pass.load_atr(book, active, fetch=self.get_current_atr)
+                    atr = book.symbol_values(book.atr)
+                    with np.errstate(invalid='ignore'):
+                        trailing_distance = np.where(atr > 0, atr * self.ATR_MULTIPLIER / book.point, trailing_distance)
+            trailing = trailing_targets(book, trailing_activation, trailing_distance, self.TRAILING_STEP_PIPS)
+
+        targets = merge_targets(book, breakeven, trailing)
+        reasons = ["TRAILING" if trailing is not None and targets[i] == trailing[i] else "BREAKEVEN"
+                   for i in range(n)]
+        results = self.position_pass.apply(book, targets,
+                                           comments=[f"ARM_{reason}" for reason in reasons],
+                                           magic=int(os.getenv('MT5_MAGIC', 20250817)))
+
+        for ticket, outcome in results.items():
+            i = outcome['index']
+            if outcome['ok']:
+                fired = [reason for reason, decided in (("BREAKEVEN", breakeven), ("TRAILING", trailing))
+                         if decided is not None and not np.isnan(decided[i])]
+                self._record_modification(book.positions[i], outcome["sl"], fired, float(book.point[i]))
+            elif outcome['result']:
+                self.logger.error(f"Error modificando posición {ticket}: {outcome['result'].comment}")
+        return results
+
     def check_and_apply_breakeven(self, position, profit_pips, point, ai_params=None):
         """Verificar y aplicar breakeven a una posición"""
         ticket = position.ticket
@@ -267,33 +315,7 @@ class AdvancedRiskManager:
             result = mt5.order_send(request)
             
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                ticket = position.ticket
-                old_sl = position.sl if position.sl > 0 else position.price_open
-                
-                # Registrar en gestión
-                if ticket not in self.positions_managed:
-                    self.positions_managed[ticket] = {}
-                    
-                if reason == "BREAKEVEN":
-                    self.positions_managed[ticket]['breakeven_applied'] = True
-                    self.statistics['breakeven_applied'] += 1
-                elif reason == "TRAILING":
-                    self.positions_managed[ticket]['last_trailing'] = new_sl
-                    self.statistics['trailing_updated'] += 1
-                    
-                # Calcular pips salvados
-                if position.type == mt5.ORDER_TYPE_BUY:
-                    pips_saved = (new_sl - old_sl) / mt5.symbol_info(position.symbol).point
-                else:
-                    pips_saved = (old_sl - new_sl) / mt5.symbol_info(position.symbol).point
-                    
-                self.statistics['total_pips_saved'] += max(0, pips_saved)
-                
-                self.logger.info(f"✅ {reason} aplicado - Ticket: {ticket}, Nuevo SL: {new_sl:.5f}")
-                
-                # Enviar notificación Telegram
-                self.send_telegram_notification(position, new_sl, reason)
-                
+                self._record_modification(position, new_sl, [reason], mt5.symbol_info(position.symbol).point)
                 return True
             else:
                 if result:
@@ -304,6 +326,36 @@ class AdvancedRiskManager:
             self.logger.error(f"Error en modify_position_sl: {e}")
             return False
             
+    def _record_modification(self, position, new_sl, reasons, point):
+        """Registrar una modificación de SL aplicada (estado, estadísticas y aviso)"""
+        ticket = position.ticket
+        old_sl = position.sl if position.sl > 0 else position.price_open
+
+        # Registrar en gestión
+        if ticket not in self.positions_managed:
+            self.positions_managed[ticket] = {}
+
+        if "BREAKEVEN" in reasons:
+            self.positions_managed[ticket]['breakeven_applied'] = True
+            self.statistics['breakeven_applied'] += 1
+        if "TRAILING" in reasons:
+            self.positions_managed[ticket]['last_trailing'] = new_sl
+            self.statistics['trailing_updated'] += 1
+
+        # Calcular pips salvados
+        if position.type == mt5.ORDER_TYPE_BUY:
+            pips_saved = (new_sl - old_sl) / point
+        else:
+            pips_saved = (old_sl - new_sl) / point
+
+        self.statistics['total_pips_saved'] += max(0, pips_saved)
+
+        reason = reasons[-1] if reasons else ""
+        self.logger.info(f"✅ {reason} aplicado - Ticket: {ticket}, Nuevo SL: {new_sl:.5f}")
+
+        # Enviar notificación Telegram
+        self.send_telegram_notification(position, new_sl, reason)
+
     def get_current_atr(self, symbol) -> Optional[float]:
         """Obtener el ATR actual del símbolo desde TwelveData"""
         if not self.twelvedata_key:
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MATRIZ DE CORRELACIÓN INCREMENTAL - ALGO TRADER V3
+==================================================
+Correlación de retornos en ventana móvil, actualizada en O(n²) por barra
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class RollingCorrelationMatrix:
+    """
+    Correlación de log-retornos sobre las últimas `window` barras
+
+    Mantiene sumas y productos cruzados de la ventana, de modo que cada barra
+    nueva suma su fila y resta la que sale de la ventana (O(n²) con n
+    símbolos) en lugar de recalcular la correlación completa. Los símbolos
+    sin barra en un timestamp se consideran sin cambio de precio (retorno 0).
+    """
+
+    def __init__(self, window: int = 100, min_periods: int = 20, rebuild_every: Optional[int] = None):
+        """
+        Args:
+            window: Número de barras de la ventana
+            min_periods: Barras observadas mínimas para reportar correlación
+            rebuild_every: Barras entre recálculos exactos (evita deriva numérica)
+        """
+        self.window = window
+        self.min_periods = min_periods
+        self.rebuild_every = rebuild_every or window
+
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._returns = np.zeros((window, 0))
+        self._sum = np.zeros(0)
+        self._cross = np.zeros((0, 0))
+        self._observed = np.zeros(0, dtype=np.int64)
+        self._pos = 0
+        self.count = 0
+        self._rows_since_rebuild = 0
+
+        self._last_close: Dict[str, float] = {}
+        self._pending_ts = None
+        self._pending: Dict[str, float] = {}
+
+        self.lock = threading.RLock()
+
+    def add_symbol(self, symbol: str) -> int:
+        """Registrar un símbolo (amplía las matrices)"""
+        with self.lock:
+            if symbol in self.index:
+                return self.index[symbol]
+
+            n = len(self.symbols)
+            self.symbols.append(symbol)
+            self.index[symbol] = n
+
+            self._returns = np.hstack([self._returns, np.zeros((self.window, 1))])
+            self._sum = np.append(self._sum, 0.0)
+            self._observed = np.append(self._observed, 0)
+            cross = np.zeros((n + 1, n + 1))
+            cross[:n, :n] = self._cross
+            self._cross = cross
+            return n
+
+    def on_bar(self, symbol: str, timestamp, close: float):
+        """
+        Recibir el cierre de una barra de un símbolo
+
+        Las barras se agrupan por timestamp; la fila se procesa cuando llega
+        una barra con timestamp posterior (o al llamar a flush()).
+        """
+        with self.lock:
+            if self._pending_ts is not None and timestamp > self._pending_ts:
+                self.flush()
+            if self._pending_ts is None or timestamp >= self._pending_ts:
+                self._pending_ts = timestamp
+                self._pending[symbol] = close
+
+    def flush(self):
+        """Procesar la fila de barras pendiente"""
+        with self.lock:
+            if self._pending:
+                self.update(self._pending)
+            self._pending = {}
+            self._pending_ts = None
+
+    def update(self, closes: Dict[str, float]):
+        """Añadir una fila de cierres {símbolo: precio} del mismo timestamp"""
+        with self.lock:
+            for symbol in closes:
+                self.add_symbol(symbol)
+
+            row = np.zeros(len(self.symbols))
+            observed = np.zeros(len(self.symbols), dtype=bool)
+            for symbol, close in closes.items():
+                last = self._last_close.get(symbol)
+                if last and last > 0 and close > 0:
+                    i = self.index[symbol]
+                    row[i] = np.log(close / last)
+                    observed[i] = True
+                self._last_close[symbol] = close
+
+            if not observed.any():
+                return
+            self._push(row, observed)
+
+    def _push(self, row: np.ndarray, observed: np.ndarray):
+        old = self._returns[self._pos]
+
+        self._sum += row - old
+        self._cross += np.outer(row, row) - np.outer(old, old)
+        self._returns[self._pos] = row
+        self._pos = (self._pos + 1) % self.window
+        self.count += 1
+        self._observed = np.minimum(self._observed + observed, self.window)
+
+        self._rows_since_rebuild += 1
+        if self._rows_since_rebuild >= self.rebuild_every:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recalcular sumas exactas desde la ventana"""
+        self._sum = self._returns.sum(axis=0)
+        self._cross = self._returns.T @ self._returns
+        self._rows_since_rebuild = 0
+
+    def _covariance(self) -> np.ndarray:
+        n = min(self.count, self.window)
+        if n < 2:
+            return np.zeros_like(self._cross)
+        return (self._cross - np.outer(self._sum, self._sum) / n) / (n - 1)
+
+    def matrix(self, symbols: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Matriz de correlación
+
+        Returns:
+            (símbolos, matriz) - pares sin datos suficientes quedan en NaN
+        """
+        with self.lock:
+            symbols = [s for s in (symbols or self.symbols) if s in self.index]
+            idx = [self.index[s] for s in symbols]
+            if not idx:
+                return [], np.zeros((0, 0))
+
+            cov = self._covariance()[np.ix_(idx, idx)]
+            std = np.sqrt(np.clip(np.diag(cov), 0, None))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = cov / np.outer(std, std)
+
+            valid = self._observed[idx] >= self.min_periods
+            corr[~np.outer(valid, valid)] = np.nan
+            corr[(std == 0)[:, None] | (std == 0)[None, :]] = np.nan
+            np.fill_diagonal(corr, np.where(valid & (std > 0), 1.0, np.nan))
+            return symbols, np.clip(corr, -1.0, 1.0)
+
+    def correlation(self, symbol_a: str, symbol_b: str) -> Optional[float]:
+        """Correlación entre dos símbolos (None si no hay datos suficientes)"""
+        _, corr = self.matrix([symbol_a, symbol_b])
+        if corr.shape != (2, 2) or np.isnan(corr[0, 1]):
+            return None
+        return float(corr[0, 1])
+
+    def covariance(self, symbols: List[str]) -> np.ndarray:
+        """Covarianza de log-retornos de la ventana para `symbols` (registrados)"""
+        with self.lock:
+            idx = [self.index[s] for s in symbols]
+            return self._covariance()[np.ix_(idx, idx)]
+
+    def history(self, symbols: List[str]) -> np.ndarray:
+        """Retornos de la ventana en orden cronológico, forma (barras, símbolos)"""
+        with self.lock:
+            idx = [self.index[s] for s in symbols]
+            rows = np.roll(self._returns, -self._pos, axis=0)
+            n = min(self.count, self.window)
+            return rows[self.window - n:, idx]
+
+    def has_data(self, symbol: str) -> bool:
+        with self.lock:
+            i = self.index.get(symbol)
+            return i is not None and self._observed[i] >= self.min_periods
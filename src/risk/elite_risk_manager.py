@@ -16,9 +16,18 @@ import json
 import os
 from scipy import stats
 from scipy.optimize import minimize
+import time
 import warnings
+
+from src.risk.correlation import RollingCorrelationMatrix
+from src.risk.portfolio_var import PortfolioRiskEngine
 warnings.filterwarnings('ignore')
 
+try:
+    import MetaTrader5 as mt5
+except ImportError:
+    mt5 = None
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -68,7 +77,9 @@ class EliteRiskManager:
                  max_risk_per_trade: float = 0.02,
                  max_portfolio_risk: float = 0.06,
                  max_correlation: float = 0.7,
-                 use_kelly: bool = True):
+                 use_kelly: bool = True,
+                 var_paths: int = 100_000,
+                 mt5_module: Any = None):
         
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
@@ -96,6 +107,19 @@ class EliteRiskManager:
         self.correlation_matrix = {}
         self.position_correlations = {}
         
+        # Riesgo de portfolio (Monte Carlo sobre la covarianza móvil de cierres diarios)
+        self.mt5 = mt5_module or mt5
+        self.var_paths = var_paths
+        self.risk_engine = PortfolioRiskEngine(n_paths=var_paths)
+        self.last_prices: Dict[str, float] = {}
+        # Valor por lote de un movimiento de 1.0 en el precio, en la divisa de la cuenta
+        # (de symbol_info de MT5; se puede fijar a mano para símbolos sin terminal)
+        self.point_values: Dict[str, float] = {}
+        self.var_timeframe = getattr(self.mt5, 'TIMEFRAME_D1', 16408)
+        self.price_sync_interval = 300.0
+        self._last_price_sync = 0.0
+        self._last_bar_time: Dict[str, Any] = {}
+        
         # Métricas de performance
         self.total_trades = 0
         self.winning_trades = 0
@@ -181,17 +205,27 @@ class EliteRiskManager:
                                stop_loss: float,
                                confidence: float,
                                volatility: float,
-                               correlation_with_portfolio: float = 0) -> PositionSizing:
+                               correlation_with_portfolio: float = 0,
+                               direction: Optional[str] = None) -> PositionSizing:
         """
         Calcula el tamaño óptimo de posición usando múltiples métodos
+        
+        Los lotes se calculan con el valor por lote del símbolo (point_value).
+        Si no se conoce, el símbolo no se dimensiona: se devuelve el tamaño
+        mínimo. Con historia de precios (sync_prices), el tamaño se limita
+        para que el VaR 99% del portfolio con la nueva posición no supere
+        max_portfolio_risk. Sin `direction` se usa el lado más restrictivo.
         """
         # 1. Tamaño base (% de riesgo fijo)
         risk_amount = self.current_capital * self.max_risk_per_trade
         price_risk = abs(entry_price - stop_loss)
         # Calcular tamaño en unidades monetarias, no lotes
         base_size = risk_amount / price_risk if price_risk > 0 else 100
-        # Convertir a lotes (asumiendo 100,000 unidades por lote para Forex)
-        if 'USD' in symbol:
+        point_value = self.point_value(symbol)
+        if point_value:
+            # Lotes cuya pérdida hasta el SL es risk_amount
+            base_size = base_size / point_value
+        elif 'USD' in symbol:
             base_size = base_size / 100000  # Para forex
         else:
             base_size = base_size / entry_price  # Para otros activos
@@ -266,8 +300,19 @@ class EliteRiskManager:
         max_size = 5.0  # Max 5 lotes
         final_size = max(min_size, min(max_size, final_size))
         
+        # 7. Límite por VaR del portfolio con la nueva posición
+        if not point_value:
+            logger.warning(f"No point value for {symbol} (MT5 symbol_info unavailable), using min size")
+            final_size = min_size
+        else:
+            self.sync_prices([symbol])
+            portfolio_cap = self._portfolio_var_cap(symbol, entry_price, direction, max_size)
+            if portfolio_cap is not None and portfolio_cap < final_size:
+                logger.info(f"Size capped by portfolio VaR: {final_size:.2f} -> {portfolio_cap:.2f} lots")
+                final_size = max(min_size, portfolio_cap)
+        
         # Calcular leverage efectivo
-        position_value = final_size * entry_price
+        position_value = final_size * entry_price * (point_value or 1)
         leverage = position_value / self.current_capital
         
         return PositionSizing(
@@ -336,15 +381,168 @@ class EliteRiskManager:
         
         return checks
     
+    def update_price(self, symbol: str, timestamp, close: float):
+        """Registrar el cierre de una barra (alimenta la covarianza del motor de VaR)"""
+        self.last_prices[symbol] = close
+        self.risk_engine.on_bar(symbol, timestamp, close)
+    
+    def point_value(self, symbol: str) -> Optional[float]:
+        """
+        Valor por lote de un movimiento de 1.0 en el precio, en la divisa de la cuenta
+        
+        Sale de symbol_info de MT5 (trade_tick_value / trade_tick_size), que ya
+        incluye el tamaño de contrato y la conversión de la divisa de
+        cotización (XAUUSD, pares JPY, criptos). None si el símbolo no está en
+        point_values y MT5 no lo conoce.
+        """
+        if symbol not in self.point_values and self.mt5 is not None:
+            try:
+                info = self.mt5.symbol_info(symbol)
+            except Exception as e:
+                logger.warning(f"symbol_info({symbol}) failed: {e}")
+                info = None
+            if info is not None and info.trade_tick_size > 0 and info.trade_tick_value > 0:
+                self.point_values[symbol] = info.trade_tick_value / info.trade_tick_size
+        return self.point_values.get(symbol)
+    
+    def _closed_bars(self, symbol: str, count: int) -> List[Tuple[Any, float]]:
+        """Últimas barras diarias cerradas (sin la que está en formación) como [(timestamp, close)]"""
+        try:
+            rates = self.mt5.copy_rates_from_pos(symbol, self.var_timeframe, 1, count)
+        except Exception as e:
+            logger.warning(f"copy_rates_from_pos({symbol}) failed: {e}")
+            return []
+        if rates is None:
+            return []
+        return [(int(bar['time']), float(bar['close'])) for bar in rates]
+    
+    def sync_prices(self, symbols: Optional[List[str]] = None, force: bool = False) -> int:
+        """
+        Cargar desde MT5 los cierres diarios nuevos y pasarlos a update_price
+        
+        Se consulta como mucho cada price_sync_interval segundos. Si aparece
+        un símbolo nuevo la covarianza se reconstruye con la ventana completa
+        de todos los símbolos, ya que no admite barras anteriores a la última
+        fila procesada.
+        
+        Args:
+            symbols: Símbolos a incluir además de los de las posiciones abiertas
+            force: Ignorar el intervalo mínimo entre consultas
+        
+        Returns:
+            Barras registradas
+        """
+        if self.mt5 is None:
+            return 0
+        symbols = sorted(set(symbols or []) | {p['symbol'] for p in self.open_positions})
+        new_symbols = [s for s in symbols if s not in self._last_bar_time]
+        now = time.monotonic()
+        if not symbols or (not force and not new_symbols and now - self._last_price_sync < self.price_sync_interval):
+            return 0
+        self._last_price_sync = now
+        
+        if new_symbols:
+            # Motor nuevo con la ventana completa de todos los símbolos
+            covariance = self.risk_engine.covariance
+            self.risk_engine = PortfolioRiskEngine(
+                covariance=RollingCorrelationMatrix(window=covariance.window, min_periods=covariance.min_periods),
+                n_paths=self.var_paths
+            )
+            self._last_bar_time = {}
+            count = covariance.window + 1
+        else:
+            count = 5
+        
+        bars = []
+        for symbol in sorted(set(symbols) | set(self._last_bar_time)):
+            closed = self._closed_bars(symbol, count)
+            last = self._last_bar_time.get(symbol)
+            bars.extend((ts, symbol, close) for ts, close in closed if last is None or ts > last)
+            if closed:
+                self._last_bar_time[symbol] = max(closed[-1][0], last or closed[-1][0])
+                # tick_value de los cruces cambia con el tipo de cambio
+                self.point_values.pop(symbol, None)
+        
+        for ts, symbol, close in sorted(bars):
+            self.update_price(symbol, ts, close)
+        # Las barras están cerradas: procesar también la última fila
+        self.risk_engine.covariance.flush()
+        return len(bars)
+    
+    def _position_value(self, symbol: str, size: float, price: float) -> Optional[float]:
+        """Exposición nominal de `size` lotes en la divisa de la cuenta (None sin point_value)"""
+        point_value = self.point_value(symbol)
+        if not point_value:
+            return None
+        return size * point_value * self.last_prices.get(symbol, price)
+    
+    def _sync_risk_positions(self) -> List[str]:
+        """Pasar las posiciones abiertas al motor; devuelve los símbolos sin valorar"""
+        positions, unpriced = [], []
+        for p in self.open_positions:
+            value = self._position_value(p['symbol'], p['size'], p['entry_price'])
+            if value is None:
+                unpriced.append(p['symbol'])
+                continue
+            positions.append({
+                'symbol': p['symbol'],
+                'direction': p.get('direction', 'BUY'),
+                'value': value,
+                'ticket': p.get('ticket')
+            })
+        self.risk_engine.set_positions(positions)
+        return unpriced
+    
+    def calculate_portfolio_risk(self, method: str = 'monte_carlo') -> Dict[str, Any]:
+        """
+        VaR/CVaR de las posiciones abiertas con descomposición por posición
+        
+        Args:
+            method: 'monte_carlo' (shocks correlacionados) o 'historical'
+                (simulación histórica filtrada)
+        
+        Returns:
+            Resultado de PortfolioRiskEngine.compute; 'unpriced' lista las
+            posiciones que quedaron fuera por no tener point_value
+        """
+        self.sync_prices()
+        unpriced = self._sync_risk_positions()
+        return {**self.risk_engine.compute(method), 'unpriced': unpriced}
+    
+    def _portfolio_var_cap(self, symbol: str, entry_price: float,
+                           direction: Optional[str], max_size: float) -> Optional[float]:
+        """Lotes máximos que mantienen el VaR 99% del portfolio bajo el límite"""
+        unpriced = self._sync_risk_positions()
+        if unpriced:
+            # Sin valorar parte del portfolio el VaR saldría subestimado
+            logger.warning(f"Open positions without point value: {unpriced}, using min size")
+            return 0.0
+        var_limit = self.current_capital * self.max_portfolio_risk
+        lot_value = self._position_value(symbol, 1.0, entry_price)
+        if not lot_value or lot_value <= 0:
+            return None
+        
+        caps = []
+        for side in ([direction] if direction else ['BUY', 'SELL']):
+            value = self.risk_engine.max_position_value(symbol, side, var_limit, upper=max_size * lot_value)
+            if value is None:
+                return None
+            caps.append(value / lot_value)
+        return round(min(caps), 2)
+    
     def calculate_portfolio_correlation(self, 
                                        symbol: str,
                                        new_position_direction: str) -> float:
         """
         Calcula la correlación de una nueva posición con el portfolio existente
+        
+        Usa la correlación móvil de retornos cuando hay historia suficiente y
+        las correlaciones predefinidas en caso contrario.
         """
         if not self.open_positions:
             return 0
         
+        rolling = self.risk_engine.covariance
         # Simplificación: usar correlaciones predefinidas
         correlations = {
             ('XAUUSD', 'EURUSD'): -0.3,
@@ -358,7 +556,9 @@ class EliteRiskManager:
         total_correlation = 0
         for position in self.open_positions:
             pair = tuple(sorted([symbol, position['symbol']]))
-            corr = correlations.get(pair, 0)
+            corr = rolling.correlation(symbol, position['symbol'])
+            if corr is None:
+                corr = correlations.get(pair, 0)
             
             # Ajustar por dirección
             if position['direction'] != new_position_direction:
@@ -10,6 +10,7 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
+from collections import deque
 from enum import Enum
 
 # Configure logging
@@ -56,6 +57,207 @@ class PositionSizeResult:
     reasoning: str
 
 
+class RunningTradeStats:
+    """
+    Online trade statistics over a sliding window of recent trades
+
+    Counts and P&L sums are updated by add/subtract, return moments with
+    Welford's algorithm (reversed on eviction) and the largest win/loss and
+    equity peak with monotonic deques, so reading the statistics never
+    rescans the history. The drawdown path is only re-derived from the
+    window after an eviction moves its starting point.
+    """
+
+    def __init__(self, window: int = 100, rebuild_every: Optional[int] = None):
+        """
+        Args:
+            window: Number of trades kept
+            rebuild_every: Evictions between exact recomputations (bounds float drift)
+        """
+        self.window = window
+        self.rebuild_every = rebuild_every or window
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all trades and accumulators"""
+        # (seq, pnl, has_returns, returns, has_equity, cumulative_pnl)
+        self.trades = deque()
+        self.seq = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.returns_present = 0
+        self.returns_count = 0
+        self.returns_mean = 0.0
+        self.returns_m2 = 0.0
+        self.equity_present = 0
+        self._largest_win = deque()
+        self._largest_loss = deque()
+        self._equity_peak = deque()
+        self._max_drawdown = 0.0
+        self._drawdown_stale = False
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.trades)
+
+    def push(self, trade: Dict) -> None:
+        """
+        Add a closed trade, evicting the oldest one when the window is full
+
+        Args:
+            trade: Trade dictionary with pnl and optional returns / cumulative_pnl
+        """
+        self.seq += 1
+        pnl = float(trade.get('pnl', 0) or 0)
+        has_returns = 'returns' in trade
+        ret = _finite_or_none(trade.get('returns'))
+        has_equity = 'cumulative_pnl' in trade
+        equity = _finite_or_none(trade.get('cumulative_pnl'))
+        self.trades.append((self.seq, pnl, has_returns, ret, has_equity, equity))
+
+        if pnl > 0:
+            self.winning_trades += 1
+            self.win_sum += pnl
+            _push_extreme(self._largest_win, self.seq, pnl)
+        else:
+            self.losing_trades += 1
+            self.loss_sum += pnl
+            _push_extreme(self._largest_loss, self.seq, -pnl)
+
+        self.returns_present += has_returns
+        if ret is not None:
+            self._add_return(ret)
+
+        self.equity_present += has_equity
+        if equity is not None:
+            _push_extreme(self._equity_peak, self.seq, equity)
+            if not self._drawdown_stale:
+                self._max_drawdown = max(self._max_drawdown, self._drawdown_at(equity))
+
+        while len(self.trades) > self.window:
+            self._evict(self.trades.popleft())
+
+    def _evict(self, entry: Tuple) -> None:
+        seq, pnl, has_returns, ret, has_equity, equity = entry
+        if pnl > 0:
+            self.winning_trades -= 1
+            self.win_sum -= pnl
+        else:
+            self.losing_trades -= 1
+            self.loss_sum -= pnl
+        for extremes in (self._largest_win, self._largest_loss, self._equity_peak):
+            if extremes and extremes[0][0] == seq:
+                extremes.popleft()
+
+        self.returns_present -= has_returns
+        if ret is not None:
+            self._remove_return(ret)
+        self.equity_present -= has_equity
+        if equity is not None:
+            # The running peak restarts at the new first trade
+            self._drawdown_stale = True
+
+        self._evictions += 1
+        if self._evictions >= self.rebuild_every:
+            self._rebuild()
+
+    def _add_return(self, value: float) -> None:
+        self.returns_count += 1
+        delta = value - self.returns_mean
+        self.returns_mean += delta / self.returns_count
+        self.returns_m2 += delta * (value - self.returns_mean)
+
+    def _remove_return(self, value: float) -> None:
+        if self.returns_count <= 1:
+            self.returns_count = 0
+            self.returns_mean = 0.0
+            self.returns_m2 = 0.0
+            return
+        mean_without = (self.returns_count * self.returns_mean - value) / (self.returns_count - 1)
+        self.returns_m2 = max(self.returns_m2 - (value - self.returns_mean) * (value - mean_without), 0.0)
+        self.returns_mean = mean_without
+        self.returns_count -= 1
+
+    def _rebuild(self) -> None:
+        """Recompute sums and moments exactly from the window"""
+        pnls = np.array([entry[1] for entry in self.trades])
+        wins = pnls > 0
+        self.win_sum = float(pnls[wins].sum()) if len(pnls) else 0.0
+        self.loss_sum = float(pnls[~wins].sum()) if len(pnls) else 0.0
+
+        returns = np.array([entry[3] for entry in self.trades if entry[3] is not None])
+        self.returns_count = len(returns)
+        self.returns_mean = float(returns.mean()) if len(returns) else 0.0
+        self.returns_m2 = float(((returns - self.returns_mean) ** 2).sum()) if len(returns) else 0.0
+        self._evictions = 0
+
+    def _drawdown_at(self, equity: float) -> float:
+        peak = self._equity_peak[0][1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = abs((equity - peak) / peak) if peak else np.nan
+        return 0.0 if np.isnan(drawdown) else float(drawdown)
+
+    @property
+    def largest_win(self) -> float:
+        return self._largest_win[0][1] if self._largest_win else 0
+
+    @property
+    def largest_loss(self) -> float:
+        return self._largest_loss[0][1] if self._largest_loss else 0
+
+    @property
+    def max_drawdown(self) -> float:
+        """Largest drawdown from the running equity peak within the window"""
+        if self._drawdown_stale:
+            equity = np.array([entry[5] for entry in self.trades if entry[5] is not None])
+            self._max_drawdown = 0.0
+            if len(equity):
+                running_max = np.maximum.accumulate(equity)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    drawdown = np.abs((equity - running_max) / running_max)
+                drawdown = drawdown[np.isfinite(drawdown)]
+                self._max_drawdown = float(drawdown.max()) if len(drawdown) else 0.0
+            self._drawdown_stale = False
+        return self._max_drawdown
+
+    @property
+    def current_drawdown(self) -> float:
+        """Drawdown at the latest trade (0 if it carries no cumulative_pnl)"""
+        if not self.trades or self.trades[-1][5] is None:
+            return 0.0
+        return self._drawdown_at(self.trades[-1][5])
+
+    def sharpe_inputs(self) -> Optional[Tuple[int, float, float]]:
+        """
+        (trades in window, mean, sample std) of returns, or None without returns
+
+        The trade count mirrors the length of a 'returns' column built from
+        the window, where trades without the key are missing values.
+        """
+        if not self.returns_present:
+            return None
+        if self.returns_count < 2:
+            return len(self.trades), self.returns_mean, 0.0
+        return len(self.trades), self.returns_mean, float(np.sqrt(self.returns_m2 / (self.returns_count - 1)))
+
+
+def _finite_or_none(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+def _push_extreme(extremes: deque, seq: int, value: float) -> None:
+    """Append to a monotonic (decreasing) deque whose head is the window maximum"""
+    while extremes and extremes[-1][1] <= value:
+        extremes.pop()
+    extremes.append((seq, value))
+
+
 class EnhancedRiskManager:
     """
     Advanced Risk Management System with multiple position sizing methods
@@ -72,6 +274,9 @@ class EnhancedRiskManager:
         self.account_balance = account_balance
         self.max_risk_per_trade = max_risk_per_trade
         self.trade_history = []
+        self.max_trade_history = 100
+        self.trade_stats = RunningTradeStats(window=self.max_trade_history)
+        self._optimal_f_cache: Optional[Tuple[Tuple, float]] = None
         self.current_positions = {}
         self.risk_level = RiskLevel.CONSERVATIVE
         self.correlation_matrix = None
@@ -463,46 +668,73 @@ class EnhancedRiskManager:
                 current_drawdown=0
             )
 
-        # Calculate statistics from trade history
-        df = pd.DataFrame(self.trade_history)
-
-        winning_trades = df[df['pnl'] > 0]
-        losing_trades = df[df['pnl'] <= 0]
-
-        stats = TradeStats(
-            total_trades=len(df),
-            winning_trades=len(winning_trades),
-            losing_trades=len(losing_trades),
-            avg_win=winning_trades['pnl'].mean() if len(winning_trades) > 0 else 0.01,
-            avg_loss=abs(losing_trades['pnl'].mean()) if len(losing_trades) > 0 else 0.01,
-            largest_win=winning_trades['pnl'].max() if len(winning_trades) > 0 else 0,
-            largest_loss=abs(losing_trades['pnl'].min()) if len(losing_trades) > 0 else 0,
-            win_rate=len(winning_trades) / len(df) if len(df) > 0 else 0.5,
+        stats = self._sync_trade_stats()
+        total = len(stats)
+        winning, losing = stats.winning_trades, stats.losing_trades
+
+        trade_stats = TradeStats(
+            total_trades=total,
+            winning_trades=winning,
+            losing_trades=losing,
+            avg_win=stats.win_sum / winning if winning > 0 else 0.01,
+            avg_loss=abs(stats.loss_sum / losing) if losing > 0 else 0.01,
+            largest_win=stats.largest_win,
+            largest_loss=stats.largest_loss,
+            win_rate=winning / total,
             profit_factor=1.0,
             sharpe_ratio=0,
-            max_drawdown=0,
-            current_drawdown=0
+            max_drawdown=stats.max_drawdown,
+            current_drawdown=stats.current_drawdown
         )
 
         # Calculate profit factor
-        if stats.losing_trades > 0 and stats.avg_loss > 0:
-            total_wins = stats.winning_trades * stats.avg_win
-            total_losses = stats.losing_trades * stats.avg_loss
-            stats.profit_factor = total_wins / total_losses if total_losses > 0 else 1.0
+        if losing > 0 and stats.loss_sum < 0:
+            trade_stats.profit_factor = stats.win_sum / abs(stats.loss_sum)
 
         # Calculate Sharpe ratio if we have returns
-        if 'returns' in df.columns:
-            stats.sharpe_ratio = self.calculate_sharpe_ratio(df['returns'])
+        moments = stats.sharpe_inputs()
+        if moments is not None:
+            trade_stats.sharpe_ratio = self._sharpe_from_moments(*moments)
 
-        # Calculate drawdown
-        if 'cumulative_pnl' in df.columns:
-            running_max = df['cumulative_pnl'].expanding().max()
-            drawdown = (df['cumulative_pnl'] - running_max) / running_max
-            stats.max_drawdown = abs(drawdown.min())
-            stats.current_drawdown = abs(drawdown.iloc[-1])
+        return trade_stats
 
+    def _sync_trade_stats(self) -> RunningTradeStats:
+        """
+        Running statistics for the current trade history
+
+        Rebuilds the accumulator if trade_history was replaced or trimmed
+        outside of add_trade.
+
+        Returns:
+            RunningTradeStats in sync with trade_history
+        """
+        stats = self.trade_stats
+        if len(stats) != len(self.trade_history) or stats.window != self.max_trade_history:
+            stats = RunningTradeStats(window=self.max_trade_history)
+            for trade in self.trade_history[-self.max_trade_history:]:
+                stats.push(trade)
+            self.trade_stats = stats
+            self._optimal_f_cache = None
         return stats
 
+    def _sharpe_from_moments(self, count: int, mean: float, std: float,
+                             risk_free_rate: float = 0.02) -> float:
+        """
+        Sharpe ratio from precomputed return moments (see calculate_sharpe_ratio)
+
+        Args:
+            count: Number of observations
+            mean: Mean return
+            std: Sample standard deviation of returns
+            risk_free_rate: Annual risk-free rate
+
+        Returns:
+            Sharpe ratio
+        """
+        if count < 30 or std == 0:
+            return 0.0
+        return (mean * 252 - risk_free_rate) / (std * np.sqrt(252))
+
     def _calculate_optimal_f(self) -> float:
         """
         Calculate Optimal f using Ralph Vince's method
@@ -513,37 +745,34 @@ class EnhancedRiskManager:
         if len(self.trade_history) < 30:
             return self.max_risk_per_trade * 0.5
 
+        # Only recomputed when a trade arrives or the risk cap changes
+        key = (self._sync_trade_stats().seq, self.max_risk_per_trade)
+        if self._optimal_f_cache is not None and self._optimal_f_cache[0] == key:
+            return self._optimal_f_cache[1]
+
         # Extract P&L from trade history
-        pnls = [trade['pnl'] for trade in self.trade_history]
+        pnls = np.array([entry[1] for entry in self.trade_stats.trades])
 
         # Find the largest loss
-        largest_loss = abs(min(pnls))
+        largest_loss = abs(pnls.min())
 
         if largest_loss == 0:
-            return self.max_risk_per_trade * 0.5
-
-        # Test different f values
-        best_f = 0
-        best_twi = 0
-
-        for f in np.arange(0.01, 0.5, 0.01):
-            twi = 1.0  # Terminal Wealth Index
-
-            for pnl in pnls:
-                hpp = pnl / largest_loss  # Holding Period Return
-                twi *= (1 + f * hpp)
-
-                if twi <= 0:
-                    break
+            optimal_f = self.max_risk_per_trade * 0.5
+        else:
+            # Terminal Wealth Index for every candidate f at once; a path
+            # that hits zero or below is ruined and never selected
+            f_values = np.arange(0.01, 0.5, 0.01)
+            factors = 1 + f_values[:, None] * (pnls / largest_loss)[None, :]
+            twi = np.where((factors > 0).all(axis=1), np.prod(factors, axis=1), 0.0)
 
-            if twi > best_twi:
-                best_twi = twi
-                best_f = f
+            best = int(np.argmax(twi))
+            best_f = f_values[best] if twi[best] > 0 else 0
 
-        # Apply safety factor
-        optimal_f = best_f * 0.25  # Use 25% of optimal f
+            # Apply safety factor
+            optimal_f = min(best_f * 0.25, self.max_risk_per_trade)  # Use 25% of optimal f
 
-        return min(optimal_f, self.max_risk_per_trade)
+        self._optimal_f_cache = (key, optimal_f)
+        return optimal_f
 
     def _apply_portfolio_heat_limit(self, position_size: float, risk_amount: float) -> float:
         """
@@ -634,11 +863,12 @@ class EnhancedRiskManager:
         Args:
             trade: Trade dictionary with pnl, symbol, entry, exit, etc.
         """
+        self._sync_trade_stats().push(trade)
         self.trade_history.append(trade)
 
         # Keep only recent trades (e.g., last 100)
-        if len(self.trade_history) > 100:
-            self.trade_history = self.trade_history[-100:]
+        if len(self.trade_history) > self.max_trade_history:
+            del self.trade_history[:-self.max_trade_history]
 
     def update_position(self, symbol: str, position: Dict) -> None:
         """
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MOTOR DE RIESGO DE PORTFOLIO - ALGO TRADER V3
+=============================================
+VaR/CVaR por simulación Monte Carlo (shocks correlacionados) y simulación
+histórica filtrada, con descomposición marginal por posición
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+from src.risk.correlation import RollingCorrelationMatrix
+
+METHODS = ('monte_carlo', 'historical')
+
+
+def _direction_sign(direction) -> float:
+    """+1 para compras, -1 para ventas"""
+    return -1.0 if str(direction).upper() in ('SELL', 'SHORT', 'BEARISH', '1') else 1.0
+
+
+def _cholesky(cov: np.ndarray) -> np.ndarray:
+    """
+    Factor L con L @ L.T = cov
+
+    Si la matriz no es definida positiva (símbolos sin movimiento, ventana
+    corta) se usa la descomposición espectral con autovalores recortados a 0.
+    """
+    try:
+        return np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-18)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(cov)
+        return vectors * np.sqrt(np.clip(values, 0, None))
+
+
+def _ewma_variance(returns: np.ndarray, lam: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Varianza EWMA (RiskMetrics) por columna
+
+    Returns:
+        (varianza previa a cada barra, varianza para la barra siguiente)
+    """
+    seed = returns.var(axis=0)
+    squared = returns ** 2
+    posterior, _ = lfilter([1 - lam], [1, -lam], squared, axis=0, zi=(lam * seed)[None, :])
+    prior = np.vstack([seed[None, :], posterior[:-1]])
+    return prior, posterior[-1]
+
+
+class PortfolioRiskEngine:
+    """
+    VaR/CVaR del portfolio de posiciones abiertas
+
+    Los escenarios de retornos (caminos × símbolos) se generan una vez por
+    estado de la covarianza y se guardan: si solo cambian las posiciones, el
+    P&L de los escenarios es un producto matriz-vector. Los resultados se
+    reutilizan mientras no cambien ni las posiciones ni la covarianza.
+
+    Memoria de escenarios: n_paths × símbolos × 8 bytes por método; los
+    shocks se generan por bloques de `chunk_size` caminos.
+    """
+
+    def __init__(self,
+                 covariance: Optional[RollingCorrelationMatrix] = None,
+                 n_paths: int = 100_000,
+                 chunk_size: int = 25_000,
+                 confidence_levels: Sequence[float] = (0.95, 0.99),
+                 horizon: int = 1,
+                 ewma_lambda: float = 0.94,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            covariance: Estimador de covarianza de retornos (se crea uno si None)
+            n_paths: Caminos simulados
+            chunk_size: Caminos por bloque al generar shocks
+            confidence_levels: Niveles de confianza del VaR
+            horizon: Horizonte en barras (escala √h)
+            ewma_lambda: Decaimiento de la volatilidad EWMA del filtrado histórico
+            seed: Semilla del generador (escenarios reproducibles)
+        """
+        self.covariance = covariance or RollingCorrelationMatrix(window=250, min_periods=20)
+        self.n_paths = n_paths
+        self.chunk_size = chunk_size
+        self.confidence_levels = tuple(sorted(confidence_levels))
+        self.horizon = horizon
+        self.ewma_lambda = ewma_lambda
+        self.rng = np.random.default_rng(seed)
+
+        self.positions: List[Dict] = []
+        self._positions_key = None
+        self._scenarios: Dict[str, Tuple] = {}  # método -> (clave, símbolos, escenarios)
+        self._results: Dict[str, Tuple] = {}    # método -> (clave, resultado)
+        self.stats = {'scenario_builds': 0, 'evaluations': 0, 'cache_hits': 0}
+
+        self.lock = threading.RLock()
+
+    # Entradas
+
+    def on_bar(self, symbol: str, timestamp, close: float):
+        """Cierre de barra de un símbolo (actualiza la covarianza)"""
+        self.covariance.on_bar(symbol, timestamp, close)
+
+    def set_positions(self, positions: List[Dict]) -> bool:
+        """
+        Posiciones abiertas
+
+        Args:
+            positions: [{'symbol', 'direction', 'value'}] con value = exposición
+                nominal en la divisa de la cuenta
+
+        Returns:
+            True si las posiciones cambiaron
+        """
+        normalized = [
+            {
+                'symbol': p['symbol'],
+                'direction': p.get('direction', 'BUY'),
+                'value': float(p['value']),
+                'ticket': p.get('ticket'),
+            }
+            for p in positions
+        ]
+        key = tuple((p['symbol'], _direction_sign(p['direction']), round(p['value'], 6)) for p in normalized)
+        with self.lock:
+            if key == self._positions_key:
+                return False
+            self.positions = normalized
+            self._positions_key = key
+            return True
+
+    # Escenarios
+
+    def _covariance_key(self) -> Tuple:
+        return (self.covariance.count, tuple(self.covariance.symbols))
+
+    def _scenario_returns(self, method: str) -> Tuple[Tuple[str, ...], np.ndarray]:
+        """Escenarios de retornos de todos los símbolos del estimador: (símbolos, caminos × símbolos)"""
+        key = self._covariance_key()
+        cached = self._scenarios.get(method)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        symbols = key[1]
+        if method == 'monte_carlo':
+            scenarios = self._monte_carlo_returns(list(symbols))
+        elif method == 'historical':
+            scenarios = self._filtered_historical_returns(list(symbols))
+        else:
+            raise ValueError(f"Método de VaR no soportado: {method}")
+
+        self._scenarios[method] = (key, symbols, scenarios)
+        self.stats['scenario_builds'] += 1
+        return symbols, scenarios
+
+    def _monte_carlo_returns(self, symbols: List[str]) -> np.ndarray:
+        """Retornos simulados con shocks normales correlacionados (Cholesky)"""
+        factor = _cholesky(self.covariance.covariance(symbols) * self.horizon)
+        scenarios = np.empty((self.n_paths, len(symbols)))
+        for start in range(0, self.n_paths, self.chunk_size):
+            stop = min(start + self.chunk_size, self.n_paths)
+            shocks = self.rng.standard_normal((stop - start, len(symbols)))
+            np.matmul(shocks, factor.T, out=scenarios[start:stop])
+        return scenarios
+
+    def _filtered_historical_returns(self, symbols: List[str]) -> np.ndarray:
+        """
+        Simulación histórica filtrada
+
+        Los retornos se estandarizan con su volatilidad EWMA, se remuestrean
+        filas completas (conserva la correlación) y se reescalan con la
+        volatilidad actual.
+        """
+        history = self.covariance.history(symbols)
+        if len(history) < 2:
+            return np.zeros((self.n_paths, len(symbols)))
+
+        prior, current = _ewma_variance(history, self.ewma_lambda)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            residuals = np.where(prior > 0, history / np.sqrt(prior), 0.0)
+
+        scale = np.sqrt(current * self.horizon)
+        scenarios = np.empty((self.n_paths, len(symbols)))
+        for start in range(0, self.n_paths, self.chunk_size):
+            stop = min(start + self.chunk_size, self.n_paths)
+            rows = self.rng.integers(0, len(residuals), stop - start)
+            np.multiply(residuals[rows], scale, out=scenarios[start:stop])
+        return scenarios
+
+    def _exposures(self, positions: List[Dict], symbols: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """Columna de escenario y exposición con signo de cada posición"""
+        index = {s: i for i, s in enumerate(symbols)}
+        columns = np.array([index[p['symbol']] for p in positions], dtype=np.int64)
+        values = np.array([_direction_sign(p['direction']) * p['value'] for p in positions])
+        return columns, values
+
+    def has_data(self, symbols: Sequence[str]) -> bool:
+        """Si hay historia suficiente para todos los símbolos"""
+        return all(self.covariance.has_data(s) for s in symbols)
+
+    # Resultados
+
+    def compute(self, method: str = 'monte_carlo') -> Dict:
+        """
+        VaR/CVaR del portfolio y descomposición por posición
+
+        Returns:
+            {'var': {nivel: pérdida}, 'cvar': {...}, 'positions': [{...,
+            'standalone_var', 'marginal_var', 'component_var',
+            'component_cvar'}], ...}; las pérdidas son positivas en la
+            divisa de la cuenta. Vacío ('var' = {}) si no hay posiciones o
+            datos suficientes.
+        """
+        with self.lock:
+            positions = list(self.positions)
+            key = (self._positions_key, self._covariance_key())
+
+            cached = self._results.get(method)
+            if cached is not None and cached[0] == key:
+                self.stats['cache_hits'] += 1
+                return cached[1]
+
+            if not positions or not self.has_data({p['symbol'] for p in positions}):
+                result = {'method': method, 'var': {}, 'cvar': {}, 'positions': [], 'paths': 0}
+            else:
+                symbols, scenarios = self._scenario_returns(method)
+                result = self._evaluate(method, scenarios, positions, symbols)
+
+            self._results[method] = (key, result)
+            return result
+
+    def _evaluate(self, method: str, scenarios: np.ndarray, positions: List[Dict],
+                  symbols: Tuple[str, ...]) -> Dict:
+        columns, values = self._exposures(positions, symbols)
+        pnl_by_position = scenarios[:, columns] * values
+        pnl = pnl_by_position.sum(axis=1)
+
+        n = len(pnl)
+        band = max(50, int(n * 0.005))  # Escenarios alrededor del cuantil para el VaR marginal
+        ranks = {level: min(n - 1, int(np.floor(n * (1 - level)))) for level in self.confidence_levels}
+
+        # Solo se ordena la cola necesaria, no todos los caminos
+        depth = min(n, max(ranks.values()) + band + 1)
+        tail_idx = np.argpartition(pnl, depth - 1)[:depth] if depth < n else np.arange(n)
+        order = tail_idx[np.argsort(pnl[tail_idx], kind='stable')]
+        standalone = np.partition(pnl_by_position, sorted(set(ranks.values())), axis=0)
+
+        result = {
+            'method': method,
+            'paths': n,
+            'horizon': self.horizon,
+            'gross_value': float(np.abs(values).sum()),
+            'var': {},
+            'cvar': {},
+            'positions': [
+                {**p, 'standalone_var': {}, 'marginal_var': {}, 'component_var': {}, 'component_cvar': {}}
+                for p in positions
+            ],
+            'computed_at': datetime.now().isoformat(),
+        }
+
+        for level, k in ranks.items():
+            tail = order[:k + 1]
+            near = order[max(0, k - band):k + band + 1]
+
+            result['var'][level] = float(-pnl[order[k]])
+            result['cvar'][level] = float(-pnl[tail].mean())
+
+            # Euler: las contribuciones suman el VaR (aprox.) y el CVaR (exacto)
+            component_var = -pnl_by_position[near].mean(axis=0)
+            component_cvar = -pnl_by_position[tail].mean(axis=0)
+            for i, entry in enumerate(result['positions']):
+                entry['standalone_var'][level] = float(-standalone[k, i])
+                entry['component_var'][level] = float(component_var[i])
+                entry['component_cvar'][level] = float(component_cvar[i])
+                entry['marginal_var'][level] = float(component_var[i] / abs(values[i])) if values[i] else 0.0
+
+        self.stats['evaluations'] += 1
+        return result
+
+    def incremental_var(self, candidate: Dict, confidence: float = 0.99,
+                        method: str = 'monte_carlo') -> Optional[Dict[str, float]]:
+        """
+        VaR del portfolio antes y después de añadir una posición
+
+        Args:
+            candidate: {'symbol', 'direction', 'value'}
+
+        Returns:
+            {'var_before', 'var_after', 'incremental_var'} o None sin datos
+        """
+        with self.lock:
+            base = self._base_pnl(candidate['symbol'], method)
+            if base is None:
+                return None
+            pnl, column = base
+            added = pnl + column * _direction_sign(candidate.get('direction', 'BUY')) * float(candidate['value'])
+            before = _loss_quantile(pnl, confidence)
+            after = _loss_quantile(added, confidence)
+            return {'var_before': before, 'var_after': after, 'incremental_var': after - before}
+
+    def max_position_value(self, symbol: str, direction: str, var_limit: float,
+                           upper: float, confidence: float = 0.99,
+                           method: str = 'monte_carlo', tolerance: float = 0.01) -> Optional[float]:
+        """
+        Mayor exposición nueva en `symbol` que mantiene el VaR bajo `var_limit`
+
+        Búsqueda binaria sobre los escenarios ya generados.
+
+        Args:
+            upper: Exposición máxima a considerar
+            tolerance: Precisión relativa sobre `upper`
+
+        Returns:
+            Exposición máxima (0 si el portfolio ya supera el límite) o None sin datos
+        """
+        with self.lock:
+            base = self._base_pnl(symbol, method)
+            if base is None:
+                return None
+            pnl, column = base
+            shock = column * _direction_sign(direction)
+
+            if _loss_quantile(pnl + shock * upper, confidence) <= var_limit:
+                return upper
+            if _loss_quantile(pnl, confidence) > var_limit:
+                return 0.0
+
+            low, high = 0.0, upper
+            while high - low > upper * tolerance:
+                mid = (low + high) / 2
+                if _loss_quantile(pnl + shock * mid, confidence) <= var_limit:
+                    low = mid
+                else:
+                    high = mid
+            return low
+
+    def _base_pnl(self, symbol: str, method: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """P&L de los escenarios del portfolio actual y retorno de `symbol`"""
+        if not self.has_data({p['symbol'] for p in self.positions} | {symbol}):
+            return None
+
+        symbols, scenarios = self._scenario_returns(method)
+        if self.positions:
+            columns, values = self._exposures(self.positions, symbols)
+            pnl = scenarios[:, columns] @ values
+        else:
+            pnl = np.zeros(len(scenarios))
+        return pnl, scenarios[:, symbols.index(symbol)]
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del motor"""
+        with self.lock:
+            return {
+                **self.stats,
+                'positions': len(self.positions),
+                'symbols': list(self.covariance.symbols),
+                'bars': self.covariance.count,
+            }
+
+
+def _loss_quantile(pnl: np.ndarray, confidence: float) -> float:
+    """Pérdida (positiva) al nivel de confianza dado"""
+    k = min(len(pnl) - 1, int(np.floor(len(pnl) * (1 - confidence))))
+    return float(-np.partition(pnl, k)[k])
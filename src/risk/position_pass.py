@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PASADA DE GESTIÓN DE POSICIONES - ALGO TRADER V3
+================================================
+Una pasada por ciclo para todos los gestores de posiciones: las posiciones,
+los precios y el ATR de cada símbolo se piden una sola vez, las decisiones
+de breakeven/trailing se calculan vectorizadas y las modificaciones de SL
+se envían juntas (una orden por posición)
+"""
+
+import importlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Valores de la API de MetaTrader5 por si el módulo (o un fake) no los define
+ORDER_TYPE_BUY = 0
+TRADE_ACTION_SLTP = 6
+TRADE_RETCODE_DONE = 10009
+TIMEFRAME_M5 = 5
+
+
+def load_mt5(mt5_module: Union[str, Any] = 'MetaTrader5'):
+    """Módulo MT5 a usar: nombre importable ('MetaTrader5' o un fake) o el módulo ya importado"""
+    if isinstance(mt5_module, str):
+        return importlib.import_module(mt5_module)
+    return mt5_module
+
+
+@dataclass
+class PositionBook:
+    """
+    Snapshot de un ciclo: posiciones abiertas y cotización de sus símbolos
+
+    Los arrays van alineados con `positions`. `price` es el precio de cierre
+    de cada posición (bid para compras, ask para ventas) y queda en NaN si
+    el símbolo no tiene cotización; `digits` es -1 si no se conoce.
+    """
+    positions: List[Any]
+    symbols: List[str]
+    symbol_info: Dict[str, Any]
+    ticket: np.ndarray
+    is_buy: np.ndarray
+    direction: np.ndarray
+    price_open: np.ndarray
+    price: np.ndarray
+    sl: np.ndarray
+    tp: np.ndarray
+    profit: np.ndarray
+    volume: np.ndarray
+    point: np.ndarray
+    digits: np.ndarray
+    atr: Dict[str, Optional[float]] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def profit_points(self) -> np.ndarray:
+        """Ganancia de cada posición en puntos del símbolo"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.price - self.price_open) * self.direction / self.point
+
+    def symbol_values(self, values: Dict[str, Optional[float]], default: float = np.nan) -> np.ndarray:
+        """Expandir un valor por símbolo a un array por posición"""
+        return np.array([_as_float(values.get(symbol), default) for symbol in self.symbols])
+
+    def indices(self, symbol: str) -> np.ndarray:
+        """Posiciones de un símbolo"""
+        return np.flatnonzero(np.array(self.symbols, dtype=object) == symbol)
+
+
+class PositionManagementPass:
+    """
+    Datos de mercado compartidos y envío en lote para la gestión de posiciones
+
+    `snapshot` hace una llamada a positions_get y una a symbol_info por
+    símbolo (no por posición); `load_atr` calcula el ATR solo de los
+    símbolos pedidos y lo reutiliza durante `atr_ttl` segundos. Las
+    funciones breakeven_targets / trailing_targets / merge_targets deciden
+    para todas las posiciones a la vez y `apply` envía las órdenes.
+    """
+
+    def __init__(self,
+                 mt5_module: Union[str, Any] = 'MetaTrader5',
+                 atr_timeframe: Optional[int] = None,
+                 atr_period: int = 14,
+                 atr_ttl: float = 60.0):
+        """
+        Args:
+            mt5_module: Módulo MT5 o nombre a importar (un fake en tests)
+            atr_timeframe: Temporalidad del ATR local (por defecto M5)
+            atr_period: Periodo del ATR local
+            atr_ttl: Segundos de validez del ATR de un símbolo
+        """
+        self.mt5 = load_mt5(mt5_module)
+        self.atr_timeframe = atr_timeframe if atr_timeframe is not None else getattr(self.mt5, 'TIMEFRAME_M5', TIMEFRAME_M5)
+        self.atr_period = atr_period
+        self.atr_ttl = atr_ttl
+
+        self._atr_cache: Dict[str, Tuple[float, Optional[float]]] = {}
+        self.stats = {
+            'cycles': 0,
+            'positions': 0,
+            'symbol_requests': 0,
+            'atr_requests': 0,
+            'atr_cache_hits': 0,
+            'orders_sent': 0,
+            'orders_failed': 0
+        }
+
+    # Snapshot
+
+    def snapshot(self, positions: Optional[Iterable] = None, quotes: bool = True, **filters) -> PositionBook:
+        """
+        Posiciones y cotizaciones del ciclo
+
+        Args:
+            positions: Posiciones ya obtenidas (si no, se llama a positions_get)
+            quotes: Pedir symbol_info por símbolo; con False se usa el
+                price_current de cada posición y point/digits quedan sin definir
+            **filters: Filtros para positions_get (symbol=, group=, ticket=)
+        """
+        if positions is None:
+            positions = self.mt5.positions_get(**filters)
+        positions = list(positions or [])
+        self.stats['cycles'] += 1
+        self.stats['positions'] += len(positions)
+
+        symbols = [p.symbol for p in positions]
+        infos = {}
+        if quotes:
+            for symbol in dict.fromkeys(symbols):
+                info = self.mt5.symbol_info(symbol)
+                self.stats['symbol_requests'] += 1
+                if info is not None:
+                    infos[symbol] = info
+
+        buy_type = getattr(self.mt5, 'ORDER_TYPE_BUY', ORDER_TYPE_BUY)
+        is_buy = np.array([p.type == buy_type for p in positions], dtype=bool)
+        if quotes:
+            bid = np.array([_as_float(getattr(infos.get(s), 'bid', None)) for s in symbols])
+            ask = np.array([_as_float(getattr(infos.get(s), 'ask', None)) for s in symbols])
+            price = np.where(is_buy, bid, ask)
+            point = np.array([_as_float(getattr(infos.get(s), 'point', None)) for s in symbols])
+            digits = np.array([int(getattr(infos.get(s), 'digits', -1)) for s in symbols], dtype=int)
+        else:
+            price = np.array([_as_float(getattr(p, 'price_current', None)) for p in positions])
+            point = np.full(len(positions), np.nan)
+            digits = np.full(len(positions), -1, dtype=int)
+
+        return PositionBook(
+            positions=positions,
+            symbols=symbols,
+            symbol_info=infos,
+            ticket=np.array([p.ticket for p in positions], dtype=np.int64),
+            is_buy=is_buy,
+            direction=np.where(is_buy, 1.0, -1.0),
+            price_open=np.array([float(p.price_open) for p in positions]),
+            price=price,
+            sl=np.array([float(p.sl or 0) for p in positions]),
+            tp=np.array([float(p.tp or 0) for p in positions]),
+            profit=np.array([float(getattr(p, 'profit', 0) or 0) for p in positions]),
+            volume=np.array([float(getattr(p, 'volume', 0) or 0) for p in positions]),
+            point=point,
+            digits=digits
+        )
+
+    def load_atr(self, book: PositionBook, symbols: Optional[Iterable[str]] = None,
+                 fetch: Optional[Callable[[str], Optional[float]]] = None) -> Dict[str, Optional[float]]:
+        """
+        ATR de los símbolos indicados (por defecto todos los del snapshot)
+
+        Args:
+            book: Snapshot del ciclo (se guarda en book.atr)
+            symbols: Símbolos que necesitan ATR en este ciclo
+            fetch: Función symbol -> ATR; por defecto el ATR local con copy_rates_from_pos
+
+        Returns:
+            {símbolo: ATR o None}
+        """
+        fetch = fetch or self.local_atr
+        now = time.time()
+        for symbol in dict.fromkeys(book.symbols if symbols is None else symbols):
+            cached = self._atr_cache.get(symbol)
+            if cached is not None and now - cached[0] < self.atr_ttl:
+                self.stats['atr_cache_hits'] += 1
+                book.atr[symbol] = cached[1]
+                continue
+            try:
+                value = fetch(symbol)
+            except Exception as e:
+                logger.debug(f"Error obteniendo ATR de {symbol}: {e}")
+                value = None
+            self.stats['atr_requests'] += 1
+            value = _as_float(value, None)
+            self._atr_cache[symbol] = (now, value)
+            book.atr[symbol] = value
+        return book.atr
+
+    def local_atr(self, symbol: str) -> Optional[float]:
+        """ATR (media simple del true range) de las últimas `atr_period` barras"""
+        rates = self.mt5.copy_rates_from_pos(symbol, self.atr_timeframe, 0, self.atr_period + 1)
+        if rates is None or len(rates) < self.atr_period + 1:
+            return None
+        high = np.asarray(rates['high'], dtype=float)
+        low = np.asarray(rates['low'], dtype=float)
+        prev_close = np.asarray(rates['close'], dtype=float)[:-1]
+        true_range = np.maximum(high[1:] - low[1:],
+                                np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+        return float(true_range[-self.atr_period:].mean())
+
+    # Envío
+
+    def apply(self, book: PositionBook, targets: np.ndarray,
+              comments: Union[str, Sequence[str]] = '', magic: Optional[int] = None) -> Dict[int, Dict]:
+        """
+        Enviar las modificaciones de SL decididas para el ciclo
+
+        MT5 no admite varias órdenes en una llamada: las peticiones se
+        construyen todas primero (una por posición, ya combinadas) y se
+        envían seguidas, sin consultas intermedias al terminal.
+
+        Args:
+            book: Snapshot del ciclo
+            targets: Nuevo SL por posición (NaN = sin cambio)
+            comments: Comentario de la orden, único o por posición
+            magic: Número mágico a incluir en la orden
+
+        Returns:
+            {ticket: {'index', 'sl', 'ok', 'result'}}
+        """
+        action = getattr(self.mt5, 'TRADE_ACTION_SLTP', TRADE_ACTION_SLTP)
+        done = getattr(self.mt5, 'TRADE_RETCODE_DONE', TRADE_RETCODE_DONE)
+
+        requests = []
+        for i in np.flatnonzero(~np.isnan(targets)):
+            sl = float(targets[i])
+            if book.digits[i] >= 0:
+                sl = round(sl, int(book.digits[i]))
+            if sl == book.sl[i]:
+                continue
+            request = {
+                "action": action,
+                "symbol": book.symbols[i],
+                "position": int(book.ticket[i]),
+                "sl": sl,
+                "tp": float(book.tp[i]),
+            }
+            if magic is not None:
+                request["magic"] = magic
+            comment = comments if isinstance(comments, str) else comments[i]
+            if comment:
+                request["comment"] = comment
+            requests.append((i, request))
+
+        results = {}
+        for i, request in requests:
+            try:
+                result = self.mt5.order_send(request)
+            except Exception as e:
+                logger.error(f"Error enviando modificación de {request['position']}: {e}")
+                result = None
+            ok = result is not None and getattr(result, 'retcode', None) == done
+            self.stats['orders_sent'] += 1
+            self.stats['orders_failed'] += not ok
+            results[request["position"]] = {'index': int(i), 'sl': request["sl"], 'ok': ok, 'result': result}
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la pasada"""
+        return {**self.stats, 'atr_cached_symbols': len(self._atr_cache)}
+
+
+def breakeven_targets(book: PositionBook, trigger_points, offset_points,
+                      eligible: Optional[np.ndarray] = None,
+                      min_profit: Optional[float] = None,
+                      require_improvement: bool = True) -> np.ndarray:
+    """
+    SL de breakeven (entrada + offset) para las posiciones que alcanzan el trigger
+
+    Args:
+        book: Snapshot del ciclo
+        trigger_points: Ganancia mínima en puntos (escalar o por posición)
+        offset_points: Puntos de ganancia que deja el SL (escalar o por posición)
+        eligible: Máscara de posiciones candidatas (p. ej. sin breakeven previo)
+        min_profit: Beneficio mínimo de la posición en la divisa de la cuenta
+        require_improvement: Solo mover si el nuevo SL protege más que el actual
+
+    Returns:
+        Nuevo SL por posición (NaN = sin cambio)
+    """
+    target = book.price_open + book.direction * np.asarray(offset_points, dtype=float) * book.point
+    fire = book.profit_points() >= np.asarray(trigger_points, dtype=float)
+    if eligible is not None:
+        fire &= eligible
+    if min_profit is not None:
+        fire &= book.profit >= min_profit
+    if require_improvement:
+        fire &= np.where(book.is_buy, book.sl < target, (book.sl == 0) | (book.sl > target))
+    return np.where(fire, target, np.nan)
+
+
+def trailing_targets(book: PositionBook, activation_points, distance_points,
+                     step_points=0.0, eligible: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    SL de trailing a `distance_points` del precio actual
+
+    Solo se mueve si mejora el SL actual en al menos `step_points` (sin SL
+    previo basta con alcanzar la activación).
+
+    Returns:
+        Nuevo SL por posición (NaN = sin cambio)
+    """
+    target = book.price - book.direction * np.asarray(distance_points, dtype=float) * book.point
+    gain = (target - book.sl) * book.direction
+    no_sl = book.sl == 0
+    fire = book.profit_points() >= np.asarray(activation_points, dtype=float)
+    fire &= no_sl | ((gain > 0) & (gain >= np.asarray(step_points, dtype=float) * book.point))
+    if eligible is not None:
+        fire &= eligible
+    return np.where(fire, target, np.nan)
+
+
+def merge_targets(book: PositionBook, *targets: Optional[np.ndarray]) -> np.ndarray:
+    """SL más protector de varias decisiones (máximo en compras, mínimo en ventas)"""
+    stack = [t for t in targets if t is not None]
+    if not stack:
+        return np.full(len(book), np.nan)
+    stack = np.vstack(stack)
+    return np.where(book.is_buy, np.fmax.reduce(stack, axis=0), np.fmin.reduce(stack, axis=0))
+
+
+def _as_float(value, default: Optional[float] = np.nan) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return value if np.isfinite(value) else default
@@ -14,7 +14,7 @@ import logging
 import threading
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 import winsound  # Para Windows
 import pandas as pd
 import numpy as np
@@ -26,11 +26,30 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from src.journal.trading_journal import get_journal
 from src.broker.mt5_connection import MT5Connection
 from src.notifiers.telegram_notifier import TelegramNotifier
+from src.risk.correlation import RollingCorrelationMatrix
 
 logger = logging.getLogger(__name__)
 
+# Checks que dependen de cada tipo de evento
+CHECK_DEPENDENCIES = {
+    'account': ('drawdown', 'margin', 'exposure'),
+    'positions': ('exposure', 'protection', 'correlation'),
+    'price': ('exposure', 'correlation'),
+    'bar': ('correlation',),
+    'trades': ('losses', 'daily'),
+}
+ALL_CHECKS = ('drawdown', 'exposure', 'protection', 'margin', 'losses', 'daily', 'correlation')
+
 class RiskMonitor:
-    """Monitor de riesgo en tiempo real con alertas inteligentes"""
+    """
+    Monitor de riesgo en tiempo real con alertas inteligentes
+    
+    Funciona por eventos: on_account_update / on_positions_update /
+    on_price_update / on_bar_close / on_trade_closed actualizan el snapshot
+    cacheado y recalculan solo los checks afectados (CHECK_DEPENDENCIES).
+    El ejecutor de órdenes puede llamar a on_positions_update tras un fill
+    para tener el riesgo actualizado sin esperar al siguiente ciclo.
+    """
     
     def __init__(self):
         """Inicializa el monitor de riesgo"""
@@ -70,6 +89,31 @@ class RiskMonitor:
         self.alerts_log_file = Path("logs/risk_alerts.csv")
         self.alerts_log_file.parent.mkdir(parents=True, exist_ok=True)
         
+        # Motor por eventos: snapshot cacheado y resultados por check
+        self.event_poll_interval = 1.0  # segundos entre sondeos de cambios en MT5
+        self.account_snapshot = None
+        self.positions_snapshot = {}  # {ticket: position}
+        self.prices = {}  # {symbol: último precio recibido}
+        self.checks = {}
+        self.listeners: List[Callable[[Dict], None]] = []
+        self.engine_lock = threading.RLock()
+        self._account_fingerprint = None
+        self._positions_fingerprint = None
+        self._journal_trade_count = None
+        self.last_recompute_ms = 0.0
+        
+        # Correlación de retornos alimentada con las barras compartidas
+        self.correlation_threshold = 0.7
+        self.correlation_matrix = RollingCorrelationMatrix(window=100, min_periods=20)
+        
+        # Feed de precios y barras desde MT5 cuando nadie publica los eventos
+        self.correlation_timeframe = 5  # mt5.TIMEFRAME_M5
+        self.correlation_symbols: List[str] = []  # símbolos a seguir aunque no haya posición
+        self.bar_poll_interval = 15.0  # segundos entre consultas de barras cerradas
+        self._last_bar_poll = 0.0
+        self._last_bar_time = {}  # {symbol: timestamp de la última barra cerrada entregada}
+        self._polled_prices = {}  # {symbol: último bid leído de MT5}
+        
     def play_alert_sound(self, severity: str = 'warning'):
         """Reproduce sonido de alerta según severidad"""
         try:
@@ -386,11 +430,78 @@ Sistema: AlgoTrader V3
             'alerts': alerts
         }
         
-    def analyze_correlation_risk(self, positions: List) -> Dict:
-        """Analiza riesgo de correlación entre posiciones"""
+    def analyze_correlation_risk(self, positions: List, account_info=None) -> Dict:
+        """
+        Analiza riesgo de correlación entre posiciones
+        
+        Usa la matriz de correlación de retornos (correlation_matrix) cuando
+        hay barras suficientes para los símbolos con posición; si no, recurre a
+        los grupos de símbolos correlacionados.
+        """
         if len(positions) < 2:
             return {'status': 'ok', 'correlation_risk': 'low'}
         
+        symbols = sorted({pos.symbol for pos in positions})
+        if all(self.correlation_matrix.has_data(s) for s in symbols):
+            return self._correlation_risk_from_matrix(positions, symbols, account_info)
+        
+        return self._correlation_risk_from_groups(positions)
+    
+    def _correlation_risk_from_matrix(self, positions: List, symbols: List[str], account_info) -> Dict:
+        """Exposición correlacionada: sqrt(wᵀ C w) con w = nominal firmado por símbolo"""
+        symbols, corr = self.correlation_matrix.matrix(symbols)
+        corr = np.nan_to_num(corr)
+        
+        signed = np.zeros(len(symbols))
+        for pos in positions:
+            value = pos.volume * pos.price_current
+            signed[symbols.index(pos.symbol)] += value if pos.type == 0 else -value
+        
+        gross = np.abs(signed).sum()
+        correlated_exposure = float(np.sqrt(max(signed @ corr @ signed, 0.0)))
+        
+        equity = account_info.equity if account_info else 0
+        correlated_percent = (correlated_exposure / equity * 100) if equity > 0 else 0
+        
+        correlated_pairs = []
+        for i in range(len(symbols)):
+            for j in range(i + 1, len(symbols)):
+                if abs(corr[i, j]) >= self.correlation_threshold and signed[i] and signed[j]:
+                    correlated_pairs.append({
+                        'symbols': (symbols[i], symbols[j]),
+                        'correlation': float(corr[i, j]),
+                        # Mismo signo de riesgo: la correlación suma exposición
+                        'same_direction': bool(np.sign(signed[i] * signed[j]) == np.sign(corr[i, j]))
+                    })
+        
+        alerts = []
+        high_correlation = correlated_percent > self.risk_limits['max_correlation_exposure']
+        if high_correlation:
+            pairs_text = "\n".join(
+                f"{a}/{b}: {p['correlation']:+.2f}"
+                for p in correlated_pairs for a, b in [p['symbols']]
+            )
+            self.send_alert(
+                'correlation_exposure',
+                f"Alta exposición correlacionada: {correlated_percent:.2f}%\n"
+                f"Límite: {self.risk_limits['max_correlation_exposure']}%\n"
+                f"{pairs_text}",
+                'warning'
+            )
+            alerts.append('correlation')
+        
+        return {
+            'method': 'matrix',
+            'correlated_exposure': correlated_exposure,
+            'correlated_exposure_percent': correlated_percent,
+            'diversification_ratio': (correlated_exposure / gross) if gross > 0 else 0,
+            'correlated_pairs': correlated_pairs,
+            'high_correlation': high_correlation,
+            'alerts': alerts
+        }
+    
+    def _correlation_risk_from_groups(self, positions: List) -> Dict:
+        """Exposición por grupos de símbolos correlacionados (sin datos de barras)"""
         # Grupos de símbolos correlacionados
         correlation_groups = {
             'USD_pairs': ['EURUSD', 'GBPUSD', 'AUDUSD', 'NZDUSD'],
@@ -436,37 +547,84 @@ Sistema: AlgoTrader V3
                 high_correlation = True
         
         return {
+            'method': 'groups',
             'group_exposure': group_exposure,
             'high_correlation': high_correlation,
             'alerts': alerts
         }
+    
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """Registrar un callback que recibe cada reporte recalculado"""
+        self.listeners.append(callback)
+    
+    def _run_check(self, name: str) -> Dict:
+        """Ejecuta un check sobre el snapshot cacheado"""
+        account_info = self.account_snapshot
+        positions = self._current_positions()
+        
+        if name == 'drawdown':
+            return self.check_drawdown(account_info)
+        if name == 'exposure':
+            return self.check_exposure(positions, account_info)
+        if name == 'protection':
+            return self.check_positions_protection(positions)
+        if name == 'margin':
+            return self.check_margin_level(account_info)
+        if name == 'losses':
+            return self.check_consecutive_losses()
+        if name == 'daily':
+            return self.check_daily_limits()
+        if name == 'correlation':
+            return self.analyze_correlation_risk(positions, account_info)
+        raise ValueError(f"Check desconocido: {name}")
+    
+    def _current_positions(self) -> List:
+        """Posiciones cacheadas con el último precio recibido por evento"""
+        positions = []
+        for pos in self.positions_snapshot.values():
+            price = self.prices.get(pos.symbol)
+            if price is not None and hasattr(pos, '_replace'):
+                pos = pos._replace(price_current=price)
+            positions.append(pos)
+        return positions
+    
+    def _recompute(self, check_names, trigger: str) -> Dict:
+        """Recalcula los checks indicados y publica el reporte"""
+        start = time.perf_counter()
+        
+        with self.engine_lock:
+            for name in check_names:
+                try:
+                    self.checks[name] = self._run_check(name)
+                except Exception as e:
+                    logger.error(f"Error en check {name}: {e}")
+                    self.checks[name] = {'status': 'error', 'message': str(e)}
+            
+            report = self._build_report(trigger, list(check_names))
+            self.last_recompute_ms = (time.perf_counter() - start) * 1000
+            report['recompute_ms'] = self.last_recompute_ms
+            
+            # Guardar en historial
+            self.metrics_history.append(report)
+            if len(self.metrics_history) > self.max_metrics_history:
+                self.metrics_history = self.metrics_history[-self.max_metrics_history:]
         
-    def generate_risk_report(self) -> Dict:
-        """Genera reporte completo de riesgo"""
+        for callback in list(self.listeners):
+            try:
+                callback(report)
+            except Exception as e:
+                logger.error(f"Error en listener de riesgo: {e}")
+        
+        return report
+    
+    def _build_report(self, trigger: str, recomputed: List[str]) -> Dict:
         report = {
             'timestamp': datetime.now().isoformat(),
-            'checks': {}
+            'trigger': trigger,
+            'recomputed': recomputed,
+            'checks': dict(self.checks)
         }
         
-        # Conectar a MT5
-        if not self.mt5.connect():
-            report['status'] = 'error'
-            report['message'] = 'No se pudo conectar a MT5'
-            return report
-        
-        # Obtener datos
-        account_info = self.mt5.account_info
-        positions = self.mt5.get_positions()
-        
-        # Ejecutar todos los checks
-        report['checks']['drawdown'] = self.check_drawdown(account_info)
-        report['checks']['exposure'] = self.check_exposure(positions, account_info)
-        report['checks']['protection'] = self.check_positions_protection(positions)
-        report['checks']['margin'] = self.check_margin_level(account_info)
-        report['checks']['losses'] = self.check_consecutive_losses()
-        report['checks']['daily'] = self.check_daily_limits()
-        report['checks']['correlation'] = self.analyze_correlation_risk(positions)
-        
         # Calcular score de riesgo general (0-100, donde 100 es máximo riesgo)
         risk_score = self.calculate_risk_score(report['checks'])
         report['risk_score'] = risk_score
@@ -485,12 +643,213 @@ Sistema: AlgoTrader V3
             report['status'] = 'normal'
             report['recommendation'] = 'Condiciones normales de trading'
         
-        # Guardar en historial
-        self.metrics_history.append(report)
-        if len(self.metrics_history) > self.max_metrics_history:
-            self.metrics_history = self.metrics_history[-self.max_metrics_history:]
-        
         return report
+    
+    # ---- Eventos ----
+    
+    def on_account_update(self, account_info) -> Optional[Dict]:
+        """Nuevo snapshot de cuenta (balance/equity/margin)"""
+        if account_info is None:
+            return None
+        with self.engine_lock:
+            self.account_snapshot = account_info
+            self._account_fingerprint = self._fingerprint_account(account_info)
+        return self._recompute(CHECK_DEPENDENCIES['account'], 'account')
+    
+    def on_positions_update(self, positions: List) -> Dict:
+        """Posiciones abiertas cambiaron (fill, cierre, modificación de SL/TP)"""
+        with self.engine_lock:
+            self.positions_snapshot = {pos.ticket: pos for pos in positions}
+            self._positions_fingerprint = self._fingerprint_positions(positions)
+            for pos in positions:
+                self.prices.pop(pos.symbol, None)  # El precio de MT5 es más reciente
+        return self._recompute(CHECK_DEPENDENCIES['positions'], 'positions')
+    
+    def on_price_update(self, symbol: str, price: float) -> Optional[Dict]:
+        """Nuevo precio; solo recalcula si hay posiciones en el símbolo"""
+        with self.engine_lock:
+            self.prices[symbol] = price
+            affected = any(pos.symbol == symbol for pos in self.positions_snapshot.values())
+        if not affected:
+            return None
+        return self._recompute(CHECK_DEPENDENCIES['price'], f'price:{symbol}')
+    
+    def on_bar_close(self, symbol: str, timestamp, close: float, complete: bool = False) -> Optional[Dict]:
+        """
+        Cierre de barra compartido: actualiza la matriz de correlación
+        
+        Args:
+            complete: Ya se entregaron las barras de todos los símbolos para este
+                timestamp; la fila se procesa sin esperar a la barra siguiente
+        """
+        self.correlation_matrix.on_bar(symbol, timestamp, close)
+        if complete:
+            self.correlation_matrix.flush()
+        if len(self.positions_snapshot) < 2:
+            return None
+        return self._recompute(CHECK_DEPENDENCIES['bar'], f'bar:{symbol}')
+    
+    def on_trade_closed(self) -> Dict:
+        """Trade cerrado/registrado en el journal"""
+        with self.engine_lock:
+            self._journal_trade_count = len(self.journal.trades)
+        return self._recompute(CHECK_DEPENDENCIES['trades'], 'trades')
+    
+    @staticmethod
+    def _fingerprint_account(account_info) -> tuple:
+        return (account_info.balance, account_info.equity, account_info.margin)
+    
+    @staticmethod
+    def _fingerprint_positions(positions: List) -> tuple:
+        return tuple(sorted((p.ticket, p.volume, p.sl, p.tp) for p in positions))
+    
+    def poll_events(self) -> List[Dict]:
+        """
+        Sondea MT5 y despacha eventos solo para lo que cambió
+        
+        Fuente de eventos por defecto cuando nadie los publica directamente.
+        """
+        reports = []
+        
+        if not self.mt5.ensure_connected():
+            return reports
+        
+        positions = self.mt5.get_positions()
+        if self._fingerprint_positions(positions) != self._positions_fingerprint:
+            reports.append(self.on_positions_update(positions))
+        else:
+            # Mismas posiciones: refrescar precios sin recalcular todo
+            with self.engine_lock:
+                self.positions_snapshot = {pos.ticket: pos for pos in positions}
+        
+        account_info = self.mt5.get_account_info()
+        if account_info and self._fingerprint_account(account_info) != self._account_fingerprint:
+            reports.append(self.on_account_update(account_info))
+        
+        if len(self.journal.trades) != self._journal_trade_count:
+            reports.append(self.on_trade_closed())
+        
+        reports.extend(self.poll_prices())
+        reports.extend(self.poll_bars())
+        return reports
+    
+    def _tracked_symbols(self) -> List[str]:
+        """Símbolos con posición más los configurados en correlation_symbols"""
+        with self.engine_lock:
+            symbols = {pos.symbol for pos in self.positions_snapshot.values()}
+        return sorted(symbols | set(self.correlation_symbols))
+    
+    def poll_prices(self) -> List[Dict]:
+        """Lee el tick de los símbolos con posición y despacha on_price_update si cambió"""
+        reports = []
+        with self.engine_lock:
+            symbols = {pos.symbol for pos in self.positions_snapshot.values()}
+        
+        for symbol in sorted(symbols):
+            tick = self.mt5.get_tick(symbol)
+            if tick is None or tick.bid == self._polled_prices.get(symbol):
+                continue
+            self._polled_prices[symbol] = tick.bid
+            report = self.on_price_update(symbol, tick.bid)
+            if report:
+                reports.append(report)
+        return reports
+    
+    def _closed_bars(self, symbol: str, count: int):
+        """Barras cerradas (sin la que está en formación) como [(timestamp, close)]"""
+        rates = self.mt5.get_rates(symbol, self.correlation_timeframe, count + 1)
+        if rates is None or len(rates) < 2:
+            return None
+        return [(ts, float(close)) for ts, close in rates['close'].iloc[:-1].items()]
+    
+    def poll_bars(self, force: bool = False) -> List[Dict]:
+        """
+        Entrega a on_bar_close las barras cerradas nuevas de los símbolos seguidos
+        
+        Cada bar_poll_interval segundos. Si aparece un símbolo nuevo la matriz
+        se reconstruye con la ventana completa de todos los símbolos, ya que
+        no admite barras anteriores a la última fila procesada.
+        """
+        now = time.time()
+        if not force and now - self._last_bar_poll < self.bar_poll_interval:
+            return []
+        self._last_bar_poll = now
+        
+        symbols = self._tracked_symbols()
+        if not symbols:
+            return []
+        if any(symbol not in self._last_bar_time for symbol in symbols):
+            return self._seed_correlation(symbols)
+        
+        bars = []
+        for symbol in symbols:
+            for ts, close in self._closed_bars(symbol, 2) or []:
+                if ts > self._last_bar_time[symbol]:
+                    bars.append((ts, symbol, close))
+        bars.sort()
+        
+        reports = []
+        for i, (ts, symbol, close) in enumerate(bars):
+            self._last_bar_time[symbol] = ts
+            complete = i == len(bars) - 1 or bars[i + 1][0] != ts
+            report = self.on_bar_close(symbol, ts, close, complete=complete)
+            if report and complete:
+                reports.append(report)
+        return reports
+    
+    def _seed_correlation(self, symbols: List[str]) -> List[Dict]:
+        """Reconstruye la matriz con la ventana de barras cerradas de `symbols`"""
+        matrix = RollingCorrelationMatrix(
+            window=self.correlation_matrix.window,
+            min_periods=self.correlation_matrix.min_periods
+        )
+        bars = []
+        last_bar_time = {}
+        for symbol in symbols:
+            closed = self._closed_bars(symbol, matrix.window + 1)
+            if not closed:
+                continue  # se reintenta en la próxima consulta
+            bars.extend((ts, symbol, close) for ts, close in closed)
+            last_bar_time[symbol] = closed[-1][0]
+        
+        for ts, symbol, close in sorted(bars):
+            matrix.on_bar(symbol, ts, close)
+        matrix.flush()
+        
+        with self.engine_lock:
+            self.correlation_matrix = matrix
+            self._last_bar_time = last_bar_time
+        
+        if len(self.positions_snapshot) < 2:
+            return []
+        return [self._recompute(CHECK_DEPENDENCIES['bar'], 'bar:seed')]
+    
+    def generate_risk_report(self) -> Dict:
+        """Genera reporte completo de riesgo (todos los checks)"""
+        # Conectar a MT5 (reutiliza la conexión existente)
+        if not self.mt5.ensure_connected():
+            return {
+                'timestamp': datetime.now().isoformat(),
+                'checks': {},
+                'status': 'error',
+                'message': 'No se pudo conectar a MT5'
+            }
+        
+        # Obtener datos
+        positions = self.mt5.get_positions()
+        account_info = self.mt5.get_account_info()
+        
+        with self.engine_lock:
+            self.account_snapshot = account_info
+            self.positions_snapshot = {pos.ticket: pos for pos in positions}
+            self.prices.clear()
+            if account_info:
+                self._account_fingerprint = self._fingerprint_account(account_info)
+            self._positions_fingerprint = self._fingerprint_positions(positions)
+            self._journal_trade_count = len(self.journal.trades)
+        
+        # Ejecutar todos los checks
+        return self._recompute(ALL_CHECKS, 'full')
         
     def calculate_risk_score(self, checks: Dict) -> float:
         """Calcula un score de riesgo general (0-100)"""
@@ -526,17 +885,25 @@ Sistema: AlgoTrader V3
         """Bucle principal de monitoreo"""
         logger.info("Monitor de riesgo iniciado")
         
+        last_full_report = 0.0
+        
         while self.is_running:
             try:
-                # Generar reporte
-                report = self.generate_risk_report()
-                
-                # Log del estado
-                logger.info(f"Risk Score: {report.get('risk_score', 0):.1f} - "
-                          f"Status: {report.get('status', 'unknown')}")
+                # Reporte completo cada check_interval; entre medias solo eventos
+                if time.time() - last_full_report >= self.check_interval:
+                    report = self.generate_risk_report()
+                    last_full_report = time.time()
+                    
+                    # Log del estado
+                    logger.info(f"Risk Score: {report.get('risk_score', 0):.1f} - "
+                              f"Status: {report.get('status', 'unknown')}")
+                else:
+                    for report in self.poll_events():
+                        logger.info(f"Risk Score: {report.get('risk_score', 0):.1f} - "
+                                  f"Status: {report.get('status', 'unknown')} "
+                                  f"(evento {report.get('trigger')})")
                 
-                # Esperar antes del siguiente check
-                time.sleep(self.check_interval)
+                time.sleep(self.event_poll_interval)
                 
             except KeyboardInterrupt:
                 logger.info("Monitor detenido por usuario")
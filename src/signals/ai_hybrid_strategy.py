@@ -268,7 +268,7 @@ class AIHybridStrategy:
                 
                 if df is not None and len(df) > 0:
                     closes = df['close'].tolist()
-                    closes_multi[tf] = closes[:10]  # Solo últimos 10
+                    closes_multi[tf] = closes  # Cronológicos; el prompt los resume
                     logger.info(f"[OK] {tf}: {len(closes_multi[tf])} cierres obtenidos")
                 else:
                     closes_multi[tf] = []
@@ -2,6 +2,7 @@
 from typing import Dict, Any, Optional
 from openai import OpenAI
 from .schemas import AIValidationResult, Setup
+from src.ai.llm_cache import get_llm_cache
 
 # ===================== Config cliente =====================
 # Si usas Ollama local:
@@ -17,8 +18,16 @@ if "localhost" in _API_BASE or "127.0.0.1" in _API_BASE:
 else:
     _MODEL = os.getenv("OLLAMA_MODEL", "gpt-4o-mini")
 
+_CLIENT: Optional[OpenAI] = None
+
 def _client() -> OpenAI:
-    return OpenAI(base_url=_API_BASE, api_key=_API_KEY)
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = OpenAI(base_url=_API_BASE, api_key=_API_KEY)
+    return _CLIENT
+
+# Respuestas por snapshot cuantizado (RSI/MACD/RVOL por tf, precio al 0.1%)
+_cache = get_llm_cache("llm_validator", ttl=float(os.getenv("LLM_CACHE_TTL", "120")))
 
 # ===================== Utilidades JSON =====================
 def _first_json_block(text: str) -> Optional[str]:
@@ -32,17 +41,23 @@ def _first_json_block(text: str) -> Optional[str]:
     return None
 
 def _chat_json(system_prompt: str, user_prompt: str, max_retries: int = 2) -> Dict[str, Any]:
-    """Llama al modelo y devuelve un dict. Reintenta si no es JSON válido."""
+    """
+    Llama al modelo y devuelve un dict.
+
+    Si la respuesta no es JSON se reintenta en la misma conversación
+    pidiendo solo el JSON; los errores de red esperan con backoff creciente.
+    """
     cli = _client()
-    for _ in range(max_retries + 1):
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user",   "content": user_prompt},
+    ]
+    for attempt in range(max_retries + 1):
         try:
             resp = cli.chat.completions.create(
                 model=_MODEL,
                 temperature=0.2,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user",   "content": user_prompt},
-                ],
+                messages=messages,
             )
             content = resp.choices[0].message.content if resp and resp.choices else ""
             block = _first_json_block(content or "")
@@ -51,13 +66,27 @@ def _chat_json(system_prompt: str, user_prompt: str, max_retries: int = 2) -> Di
                     return json.loads(block)
                 return json.loads(content)
             except Exception:
-                time.sleep(0.2)
+                messages = messages[:2] + [
+                    {"role": "assistant", "content": content or ""},
+                    {"role": "user", "content": "Responde SOLO con el JSON válido del esquema indicado, sin texto adicional."},
+                ]
                 continue
         except Exception as e:
             logging.exception("LLM call failed: %s", e)
-            time.sleep(0.3)
+            time.sleep(0.3 * 2 ** attempt)
     return {}
 
+def _cached_chat_json(namespace: str, features: Dict[str, Any],
+                      system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    """_chat_json con caché semántica y una sola llamada por clave en vuelo"""
+    key = _cache.make_key(namespace, features)
+    return _cache.get_or_compute(key, lambda: _chat_json(system_prompt, user_prompt),
+                                 cacheable=bool)
+
+def cache_stats() -> Dict[str, Any]:
+    """Aciertos y llamadas evitadas de la caché del validador"""
+    return _cache.get_stats()
+
 # ===================== Prompts =====================
 def _system_decision_with_bounds(precio: float, symbol: str) -> str:
     low, high = precio*0.997, precio*1.003  # ±0.3%
@@ -116,7 +145,7 @@ def validate_signal(snapshot: Dict[str, Any]) -> AIValidationResult:
         system_prompt = _system_decision_with_bounds(precio, symbol)
 
         user_prompt = json.dumps(snapshot, ensure_ascii=False)
-        data = _chat_json(system_prompt, user_prompt)
+        data = _cached_chat_json(f"decision:{_MODEL}", snapshot, system_prompt, user_prompt)
 
         senal = str(data.get("senal_final", "NO OPERAR")).upper()
         conf  = float(data.get("confianza", 0.0))
@@ -188,7 +217,7 @@ def reevaluate_position(state: Dict[str, Any]) -> AIValidationResult:
     """
     try:
         user_prompt = json.dumps(state, ensure_ascii=False)
-        data = _chat_json(_SYSTEM_REEVAL, user_prompt)
+        data = _cached_chat_json(f"reeval:{_MODEL}", state, _SYSTEM_REEVAL, user_prompt)
 
         accion = str(data.get("accion", "keep")).lower()
         conf   = float(data.get("confianza", 0.0))
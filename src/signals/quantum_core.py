@@ -18,9 +18,14 @@ Autor: Xentristech Trading AI
 Fecha: 2025-01-16
 """
 
+import copy
+import math
+from collections import deque
+from datetime import datetime
+
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 import logging
@@ -182,14 +187,21 @@ class QuantumCore:
         if ema_period is None:
             ema_period = self.ema_period
 
-        close = df['close']
+        # 2. Energía Potencial (volatilidad)
+        V = self.calculate_atr(df, period=atr_period)
+
+        return self._action_from_atr(df['close'], V, ema_period)
 
+    def _action_from_atr(
+        self,
+        close: pd.Series,
+        V: pd.Series,
+        ema_period: int
+    ) -> Tuple[pd.Series, float, pd.Series]:
+        """Pasos de calculate_action a partir de un ATR ya calculado"""
         # 1. Energía Cinética (momentum absoluto)
         T = (close - close.shift(1)).abs()
 
-        # 2. Energía Potencial (volatilidad)
-        V = self.calculate_atr(df, period=atr_period)
-
         # 3. Acción bruta (momentum neto)
         raw_action = T - V
 
@@ -318,6 +330,11 @@ class QuantumCore:
         A_current = A.iloc[-1] if len(A) > 0 else 0
         atr_current = atr.iloc[-1] if len(atr) > 0 else 0
 
+        return self._classify_regime(A_current, h, atr_current)
+
+    @staticmethod
+    def _classify_regime(A_current: float, h: float, atr_current: float) -> MarketRegime:
+        """Régimen a partir de los valores actuales (ver detect_market_regime)"""
         # Tendencia: Acción por encima de 2h
         if abs(A_current) > 2 * h:
             return MarketRegime.TREND
@@ -455,6 +472,26 @@ class QuantumCore:
         return price - multiplier * atr  # Default
 
 
+    def _compute_series(self, df: pd.DataFrame) -> Tuple[pd.Series, float, pd.Series, pd.Series]:
+        """A, h, level y ATR con los parámetros actuales (ATR calculado una sola vez)"""
+        atr = self.calculate_atr(df)
+        A, h, level = self._action_from_atr(df['close'], atr, self.ema_period)
+        return A, h, level, atr
+
+    def _current_params(self) -> Dict[str, Any]:
+        return {
+            'atr_period': self.atr_period,
+            'ema_period': self.ema_period,
+            'h_factor': self.h_factor,
+            'k': self.k
+        }
+
+    def _apply_params(self, params: Dict[str, Any]):
+        self.atr_period = params['atr_period']
+        self.ema_period = params['ema_period']
+        self.h_factor = params['h_factor']
+        self.k = params['k']
+
     def generate_quantum_metrics(self, df: pd.DataFrame) -> QuantumMetrics:
         """
         Generar métricas cuánticas completas
@@ -465,20 +502,21 @@ class QuantumCore:
         Returns:
             QuantumMetrics con todos los valores calculados
         """
+        return self._generate_metrics(df)[0]
+
+    def _generate_metrics(self, df: pd.DataFrame) -> Tuple[QuantumMetrics, Tuple]:
+        """generate_quantum_metrics devolviendo también las series calculadas"""
         # Calcular componentes
-        A, h, level = self.calculate_action(df)
+        series = self._compute_series(df)
+        A, h, level, atr = series
         band_upper, band_lower = self.calculate_quantum_bands(A, h)
-        atr = self.calculate_atr(df)
         regime = self.detect_market_regime(A, h, atr)
 
         # Auto-scaling si está activado
         if self.auto_scaling:
             new_params = self.auto_scale_parameters(regime)
             # Actualizar parámetros internos
-            self.atr_period = new_params['atr_period']
-            self.ema_period = new_params['ema_period']
-            self.h_factor = new_params['h_factor']
-            self.k = new_params['k']
+            self._apply_params(new_params)
 
         return QuantumMetrics(
             action=A.iloc[-1],
@@ -487,7 +525,7 @@ class QuantumCore:
             band_upper=band_upper.iloc[-1],
             band_lower=band_lower.iloc[-1],
             regime=regime
-        )
+        ), series
 
 
     def generate_signal(
@@ -519,9 +557,15 @@ class QuantumCore:
         Returns:
             QuantumSignal con acción y métricas
         """
-        # Calcular métricas
-        metrics = self.generate_quantum_metrics(df)
-        A, h, level = self.calculate_action(df)
+        # Calcular métricas (el auto-scaling puede cambiar los parámetros)
+        params_before = self._current_params()
+        metrics, series = self._generate_metrics(df)
+
+        # Las series solo se recalculan si cambiaron los períodos o h_factor
+        params_after = self._current_params()
+        if any(params_before[key] != params_after[key] for key in ('atr_period', 'ema_period', 'h_factor')):
+            series = self._compute_series(df)
+        A, h, level, _ = series
         band_upper, band_lower = self.calculate_quantum_bands(A, h)
 
         # Detectar divergencias
@@ -537,13 +581,36 @@ class QuantumCore:
         has_bullish_div = bullish_div.iloc[-1] if len(bullish_div) > 0 else False
         has_bearish_div = bearish_div.iloc[-1] if len(bearish_div) > 0 else False
 
+        return self._decide_signal(
+            metrics, A_now, A_prev, level_now, level_prev,
+            band_upper.iloc[-1], band_lower.iloc[-1],
+            has_bullish_div, has_bearish_div,
+            enter_level, exit_level, pd.Timestamp.now()
+        )
+
+    def _decide_signal(
+        self,
+        metrics: QuantumMetrics,
+        A_now: float,
+        A_prev: float,
+        level_now: int,
+        level_prev: int,
+        band_upper: float,
+        band_lower: float,
+        has_bullish_div: bool,
+        has_bearish_div: bool,
+        enter_level: int,
+        exit_level: int,
+        timestamp: pd.Timestamp
+    ) -> QuantumSignal:
+        """Reglas de entrada/salida de generate_signal sobre los valores actuales"""
         # SEÑAL DE COMPRA (LONG)
         long_signal = False
         confidence = 0
         reason = ""
 
         # Condición 1: Divergencia alcista + Acción rompiendo banda superior
-        if has_bullish_div and A_now > band_upper.iloc[-1]:
+        if has_bullish_div and A_now > band_upper:
             long_signal = True
             confidence = 90
             reason = "Divergencia alcista + Ruptura banda superior"
@@ -564,7 +631,7 @@ class QuantumCore:
             reason = "Divergencia bajista detectada"
 
         # Condición 2: Acción rompe banda inferior
-        elif A_now < band_lower.iloc[-1]:
+        elif A_now < band_lower:
             exit_signal = True
             confidence = 85
             reason = "Ruptura banda inferior - Agotamiento"
@@ -598,10 +665,399 @@ class QuantumCore:
             metrics=metrics,
             divergence_bullish=has_bullish_div,
             divergence_bearish=has_bearish_div,
-            timestamp=pd.Timestamp.now()
+            timestamp=timestamp
         )
 
 
+    def _param_sets(self) -> Tuple[List[Dict[str, Any]], Dict[MarketRegime, int]]:
+        """
+        Conjuntos de parámetros alcanzables: el actual y, con auto-scaling,
+        los de cada régimen
+
+        Returns:
+            Tuple(lista de parámetros, índice del conjunto por régimen)
+        """
+        sets = [self._current_params()]
+        regime_index: Dict[MarketRegime, int] = {}
+        if self.auto_scaling:
+            for regime in MarketRegime:
+                scaled = self.auto_scale_parameters(regime)
+                params = {key: scaled[key] for key in ('atr_period', 'ema_period', 'h_factor', 'k')}
+                if params not in sets:
+                    sets.append(params)
+                regime_index[regime] = sets.index(params)
+        return sets, regime_index
+
+    @staticmethod
+    def _quantize(values: np.ndarray) -> np.ndarray:
+        """round(A / h) como entero, 0 para valores no finitos"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level = np.nan_to_num(np.round(values), nan=0.0, posinf=0.0, neginf=0.0)
+        return level.astype(int)
+
+    @staticmethod
+    def _quantize_value(value: float) -> int:
+        """Versión escalar de _quantize (round() también redondea a par)"""
+        return int(round(value)) if math.isfinite(value) else 0
+
+    def generate_signals(
+        self,
+        df: pd.DataFrame,
+        enter_level: int = 2,
+        exit_level: int = 0
+    ) -> pd.DataFrame:
+        """
+        Modo batch para backtesting: la señal de cada barra en una pasada
+
+        Equivale a llamar generate_signal(df.iloc[:t+1]) barra a barra con
+        este núcleo (incluido el auto-scaling encadenado), pero calcula las
+        series de cada conjunto de parámetros una sola vez: h es la
+        desviación estándar expansiva de A. No modifica los parámetros del
+        núcleo.
+
+        Args:
+            df: DataFrame con datos OHLC
+            enter_level: Nivel mínimo para entrada
+            exit_level: Nivel máximo para salida
+
+        Returns:
+            DataFrame (mismo índice que df) con action, confidence, reason,
+            métricas (A, h, level, band_upper, band_lower, regime) y
+            divergence_bullish/divergence_bearish
+        """
+        n_bars = len(df)
+        close = df['close']
+        sets, regime_index = self._param_sets()
+
+        # Series por par (atr_period, ema_period), calculadas una vez
+        by_periods: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for params in sets:
+            periods = (params['atr_period'], params['ema_period'])
+            if periods not in by_periods:
+                atr = self.calculate_atr(df, period=periods[0])
+                A = ((close - close.shift(1)).abs() - atr).ewm(span=periods[1], adjust=False).mean()
+                std = A.expanding().std(ddof=0)
+                by_periods[periods] = (A.to_numpy(dtype=float), std.to_numpy(dtype=float),
+                                       atr.to_numpy(dtype=float))
+
+        A_all = np.vstack([by_periods[(p['atr_period'], p['ema_period'])][0] for p in sets])
+        atr_all = np.vstack([by_periods[(p['atr_period'], p['ema_period'])][2] for p in sets])
+        h_all = np.vstack([by_periods[(p['atr_period'], p['ema_period'])][1] * p['h_factor'] for p in sets])
+        h_all = np.where((h_all == 0) | np.isnan(h_all), 1e-8, h_all)
+        k_all = np.array([p['k'] for p in sets])
+
+        # Régimen de cada conjunto en cada barra (mismo orden que _classify_regime)
+        regimes = list(MarketRegime)
+        abs_A = np.abs(A_all)
+        with np.errstate(invalid='ignore'):
+            regime_codes = np.select(
+                [abs_A > 2 * h_all, abs_A < h_all, atr_all > 3 * h_all, abs_A < 0.3 * h_all],
+                [regimes.index(MarketRegime.TREND), regimes.index(MarketRegime.RANGE),
+                 regimes.index(MarketRegime.VOLATILE), regimes.index(MarketRegime.LOW_ENERGY)],
+                regimes.index(MarketRegime.RANGE)
+            )
+
+        # Encadenar el auto-scaling: métricas con p0, señal con p1
+        p0 = np.zeros(n_bars, dtype=int)
+        p1 = np.zeros(n_bars, dtype=int)
+        if self.auto_scaling:
+            next_set = np.array([regime_index[regime] for regime in regimes])[regime_codes]
+            current = 0
+            for t in range(n_bars):
+                p0[t] = current
+                current = next_set[current, t]
+                p1[t] = current
+
+        bars = np.arange(n_bars)
+        prev_bars = np.maximum(bars - 1, 0)
+
+        # Métricas (parámetros antes del auto-scaling)
+        A0, h0, k0 = A_all[p0, bars], h_all[p0, bars], k_all[p0]
+
+        # Valores de la señal (parámetros después del auto-scaling)
+        A_now, h1, k1 = A_all[p1, bars], h_all[p1, bars], k_all[p1]
+        A_prev = A_all[p1, prev_bars]
+        level_now = self._quantize(A_now / h1)
+        level_prev = self._quantize(A_prev / h1)
+        band_upper, band_lower = A_now + k1 * h1, A_now - k1 * h1
+
+        # Divergencias contra la barra div_lookback atrás
+        price = close.to_numpy(dtype=float)
+        lookback_bars = bars - self.div_lookback
+        has_lookback = lookback_bars >= 0
+        lookback_bars = np.maximum(lookback_bars, 0)
+        price_then, A_then = price[lookback_bars], A_all[p1, lookback_bars]
+        with np.errstate(invalid='ignore'):
+            bullish = has_lookback & (price < price_then) & (A_now > A_then)
+            bearish = has_lookback & (price > price_then) & (A_now < A_then)
+
+            # Reglas de _decide_signal
+            long_div = bullish & (A_now > band_upper)
+            long_level = ~long_div & (level_prev <= exit_level) & (level_now >= enter_level) & (A_now > A_prev)
+            exit_conditions = [bearish, A_now < band_lower, level_now <= exit_level, A_now < A_prev]
+
+        long_signal = long_div | long_level
+        exit_signal = np.logical_or.reduce(exit_conditions)
+
+        level_text = level_now.astype(str).astype(object)
+        long_reason = np.select(
+            [long_div, long_level],
+            ["Divergencia alcista + Ruptura banda superior", "Nivel cuantizado " + level_text + " + Acción creciente"],
+            ""
+        )
+        exit_reason = np.select(
+            exit_conditions,
+            ["Divergencia bajista detectada", "Ruptura banda inferior - Agotamiento",
+             "Nivel " + level_text + " - Sin momentum", "Acción decreciente"],
+            ""
+        )
+        confidence = np.where(exit_signal, np.select(exit_conditions, [95, 85, 75, 65]),
+                              np.select([long_div, long_level], [90, 80], 0))
+        reason = np.where(exit_signal, exit_reason, long_reason)
+
+        action = np.where(long_signal, "BUY", np.where(exit_signal, "EXIT", "WAIT"))
+        waiting = ~long_signal & ~exit_signal
+        confidence = np.where(waiting, 50, confidence)
+        reason = np.where(waiting, "Sin señal clara - Esperar", reason)
+
+        return pd.DataFrame({
+            'action': action,
+            'confidence': confidence,
+            'reason': reason,
+            'A': A0,
+            'h': h0,
+            'level': self._quantize(A0 / h0),
+            'band_upper': A0 + k0 * h0,
+            'band_lower': A0 - k0 * h0,
+            'regime': [regimes[code].value for code in regime_codes[p0, bars]],
+            'divergence_bullish': bullish,
+            'divergence_bearish': bearish,
+        }, index=df.index)
+
+
+class _ActionState:
+    """Estado incremental de ATR, A(t) y varianza de A para un par (atr_period, ema_period)"""
+
+    def __init__(self, atr_period: int, ema_period: int, div_lookback: int, window: int = 500):
+        self.atr_alpha = 1 / atr_period
+        self.ema_alpha = 2 / (ema_period + 1)
+        self.atr = math.nan
+        self.action = math.nan
+        self.action_prev = math.nan
+        self.actions = deque(maxlen=div_lookback + 1)
+
+        # Últimos `window` valores de A con su suma y suma de cuadrados:
+        # np.nanstd(A) sobre la ventana de velas que recibe el cálculo por lotes
+        self.window = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, high: float, low: float, close: float, prev_close: Optional[float]):
+        if prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self.atr = true_range if math.isnan(self.atr) else self.atr + self.atr_alpha * (true_range - self.atr)
+
+        self.action_prev = self.action
+        if prev_close is not None:
+            raw_action = abs(close - prev_close) - self.atr
+            if math.isnan(self.action):
+                self.action = raw_action
+            else:
+                self.action += self.ema_alpha * (raw_action - self.action)
+
+            if len(self.window) == self.window.maxlen:
+                oldest = self.window[0]
+                self.total -= oldest
+                self.total_sq -= oldest * oldest
+            self.window.append(self.action)
+            self.total += self.action
+            self.total_sq += self.action * self.action
+
+        self.actions.append(self.action)
+
+    def h(self, h_factor: float) -> float:
+        count = len(self.window)
+        if count:
+            mean = self.total / count
+            h = math.sqrt(max(self.total_sq / count - mean * mean, 0.0)) * h_factor
+        else:
+            h = math.nan
+        if h == 0 or math.isnan(h):
+            h = 1e-8
+        return h
+
+
+class QuantumSession:
+    """
+    Sesión Quantum Action con estado para un símbolo
+
+    Mantiene ATR (EWM), A(t) suavizada y la varianza de A de forma
+    incremental, de modo que cada barra nueva actualiza la señal en O(1) en
+    lugar de recalcular las series completas. Con auto-scaling mantiene un
+    estado por cada par de períodos alcanzable, así el cambio de régimen no
+    obliga a recalcular. h se calcula sobre los últimos `window` valores de
+    A, como generate_signal() sobre un frame de `window` velas; mientras haya
+    menos barras la señal coincide con generate_signal() sobre el histórico
+    completo.
+    """
+
+    def __init__(self, core: Optional[QuantumCore] = None, symbol: str = "", window: int = 500):
+        """
+        Args:
+            core: Núcleo del que se toman los parámetros iniciales (no se modifica)
+            symbol: Símbolo de la sesión
+            window: Velas sobre las que se calcula h (outputsize de los datos)
+        """
+        self.core = core or QuantumCore()
+        self.symbol = symbol
+        self.auto_scaling = self.core.auto_scaling
+        self.div_lookback = self.core.div_lookback
+
+        sets, self._regime_index = self.core._param_sets()
+        self._param_list = sets
+        self.params = dict(sets[0])
+        self.states: Dict[Tuple[int, int], _ActionState] = {}
+        for params in sets:
+            periods = (params['atr_period'], params['ema_period'])
+            if periods not in self.states:
+                self.states[periods] = _ActionState(periods[0], periods[1], self.div_lookback, window)
+
+        self.closes = deque(maxlen=self.div_lookback + 1)
+        self.prev_close: Optional[float] = None
+        self.bars = 0
+        self.last_time = None
+        self.last_signal: Optional[QuantumSignal] = None
+        # Estado previo a la última barra de update_frame (puede estar en formación)
+        self._before_last = None
+
+    def _state(self, params: Dict[str, Any]) -> _ActionState:
+        return self.states[(params['atr_period'], params['ema_period'])]
+
+    @property
+    def atr(self) -> float:
+        """ATR actual con los parámetros vigentes"""
+        return self._state(self.params).atr
+
+    def update(
+        self,
+        high: float,
+        low: float,
+        close: float,
+        timestamp=None,
+        enter_level: int = 2,
+        exit_level: int = 0
+    ) -> QuantumSignal:
+        """
+        Añadir una barra cerrada y devolver la señal actualizada
+
+        Args:
+            high, low, close: Precios de la barra
+            timestamp: Tiempo de la barra (por defecto ahora)
+            enter_level: Nivel mínimo para entrada
+            exit_level: Nivel máximo para salida
+
+        Returns:
+            QuantumSignal para esta barra
+        """
+        for state in self.states.values():
+            state.update(high, low, close, self.prev_close)
+        self.closes.append(close)
+        self.prev_close = close
+        self.bars += 1
+        if timestamp is not None:
+            self.last_time = timestamp
+
+        # Métricas con los parámetros vigentes
+        params = self.params
+        state = self._state(params)
+        h = state.h(params['h_factor'])
+        regime = QuantumCore._classify_regime(state.action, h, state.atr)
+        metrics = QuantumMetrics(
+            action=state.action,
+            h=h,
+            level=QuantumCore._quantize_value(state.action / h),
+            band_upper=state.action + params['k'] * h,
+            band_lower=state.action - params['k'] * h,
+            regime=regime
+        )
+
+        # Auto-scaling
+        if self.auto_scaling:
+            self.params = dict(self._param_list[self._regime_index[regime]])
+            params = self.params
+            state = self._state(params)
+            h = state.h(params['h_factor'])
+
+        A_now = state.action
+        A_prev = state.action_prev if self.bars > 1 else A_now
+        level_now = QuantumCore._quantize_value(A_now / h)
+        level_prev = QuantumCore._quantize_value(A_prev / h)
+
+        has_bullish_div = has_bearish_div = False
+        if len(self.closes) > self.div_lookback:
+            price_then, A_then = self.closes[0], state.actions[0]
+            has_bullish_div = close < price_then and A_now > A_then
+            has_bearish_div = close > price_then and A_now < A_then
+
+        self.last_signal = self.core._decide_signal(
+            metrics, A_now, A_prev, level_now, level_prev,
+            A_now + params['k'] * h, A_now - params['k'] * h,
+            has_bullish_div, has_bearish_div,
+            enter_level, exit_level,
+            pd.Timestamp(timestamp) if isinstance(timestamp, (datetime, np.datetime64)) else pd.Timestamp.now()
+        )
+        return self.last_signal
+
+    def _checkpoint(self):
+        return copy.deepcopy((self.states, self.closes, self.prev_close, self.bars,
+                              self.last_time, self.params, self.last_signal))
+
+    def _restore(self, checkpoint):
+        (self.states, self.closes, self.prev_close, self.bars,
+         self.last_time, self.params, self.last_signal) = checkpoint
+
+    def update_frame(self, df: pd.DataFrame, **kwargs) -> Optional[QuantumSignal]:
+        """
+        Añadir las barras de df posteriores a la última procesada
+
+        El tiempo se toma de la columna 'time' o, si no existe, del índice.
+        Sirve para alimentar la sesión con ventanas solapadas (p. ej. las
+        últimas 500 velas de TwelveData en cada ciclo). La última barra de
+        cada llamada puede estar aún en formación: si la siguiente ventana
+        la trae con el mismo timestamp, se deshace y se vuelve a aplicar con
+        sus valores definitivos.
+
+        Returns:
+            Última señal (None si aún no hay barras)
+        """
+        if 'time' in df.columns:
+            times = df['time']
+        elif isinstance(df.index, pd.DatetimeIndex):
+            times = df.index.to_series()
+        else:
+            raise ValueError("update_frame requiere una columna 'time' o un DatetimeIndex")
+
+        if self._before_last is not None and (times == self.last_time).any():
+            self._restore(self._before_last)
+        self._before_last = None
+
+        mask = np.ones(len(df), dtype=bool) if self.last_time is None else (times > self.last_time).to_numpy()
+        new_times = times[mask]
+        highs = df['high'].to_numpy(dtype=float)[mask]
+        lows = df['low'].to_numpy(dtype=float)[mask]
+        closes = df['close'].to_numpy(dtype=float)[mask]
+
+        last = len(closes) - 1
+        for i, (bar_time, high, low, close) in enumerate(zip(new_times, highs, lows, closes)):
+            if i == last:
+                self._before_last = self._checkpoint()
+            self.update(high, low, close, timestamp=bar_time, **kwargs)
+
+        return self.last_signal
+
+
 # ========== EJEMPLO DE USO ==========
 if __name__ == "__main__":
     # Configurar logging
@@ -28,6 +28,7 @@ sys.path.insert(0, str(project_dir))
 # Imports del proyecto
 from src.signals.quantum_core import (
     QuantumCore,
+    QuantumSession,
     QuantumSignal,
     QuantumMetrics,
     MarketRegime,
@@ -100,6 +101,9 @@ class QuantumSignalGenerator:
             auto_scaling=auto_scaling
         )
 
+        # Sesiones incrementales por símbolo/timeframe (cada una con sus parámetros)
+        self.sessions: Dict[str, QuantumSession] = {}
+
         # AI Validation
         self.use_ai = use_ai_validation
         if self.use_ai:
@@ -364,11 +368,16 @@ Responde en formato: VALID|85|El momentum es fuerte y la divergencia confirma
                 logger.warning(f"Insufficient data for {symbol} {interval}")
                 return None
 
-            # Generar señal cuántica
-            signal = self.quantum.generate_signal(df)
+            # Generar señal cuántica (solo se procesan las velas nuevas)
+            session_key = f"{symbol}_{interval}"
+            session = self.sessions.get(session_key)
+            if session is None:
+                session = QuantumSession(self.quantum, symbol=symbol)
+                self.sessions[session_key] = session
+            signal = session.update_frame(df)
 
-            # Calcular ATR actual
-            atr = self.quantum.calculate_atr(df).iloc[-1]
+            # ATR actual
+            atr = session.atr
 
             # Calcular velocidad y aceleración
             velocity, acceleration = self.calculate_velocity_acceleration(df)
@@ -7,6 +7,7 @@ Version: 3.0
 import numpy as np
 import pandas as pd
 import talib
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
@@ -95,6 +96,51 @@ class MarketContext:
     dollar_strength: float = 0  # DXY influence
 
 
+@dataclass
+class PriceFeatures:
+    """Raw OHLCV values used by the scoring components, extracted once per symbol"""
+    bars: int = 0
+    close: float = 0
+    prev_close: float = 0
+    close_20: float = 0  # close 19 bars ago (iloc[-20])
+    volume: float = 0
+    prev_volume: float = 0
+    rsi_20: float = np.nan  # RSI 19 bars ago
+    returns_std: float = np.nan
+    volume_mean: float = np.nan
+
+
+def stack_panel(frames: Dict[str, pd.DataFrame],
+                max_bars: Optional[int] = None) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Stack OHLCV DataFrames into a panel of 2D arrays
+
+    Shorter histories are left-padded with NaN so every row ends on its last bar.
+
+    Args:
+        frames: Dictionary of symbol -> OHLCV DataFrame
+        max_bars: Keep only the last max_bars bars of each symbol
+
+    Returns:
+        Tuple of (symbols, {'close'|'high'|'low'|'volume': array (n_symbols, n_bars)})
+    """
+    symbols = list(frames.keys())
+    n_bars = max((len(df) for df in frames.values()), default=0)
+    if max_bars is not None:
+        n_bars = min(n_bars, max_bars)
+
+    panel = {}
+    for column in ('close', 'high', 'low', 'volume'):
+        values = np.full((len(symbols), n_bars), np.nan)
+        for i, symbol in enumerate(symbols):
+            series = frames[symbol][column].to_numpy(dtype=float)[-n_bars:] if n_bars else []
+            if len(series):
+                values[i, n_bars - len(series):] = series
+        panel[column] = values
+
+    return symbols, panel
+
+
 @dataclass
 class SignalScore:
     """Detailed signal scoring result"""
@@ -149,6 +195,9 @@ class SignalScoringSystem:
             'strong_sell': 25
         }
 
+        # Bars required to compute indicators (SMA 200 uses fewer bars if needed)
+        self.min_bars = 50
+
         # Initialize scoring functions
         self.scoring_functions = {
             'trend': self._score_trend,
@@ -175,31 +224,64 @@ class SignalScoringSystem:
         Returns:
             SignalScore object with detailed scoring
         """
-        # Calculate indicators if not provided
-        if indicators is None:
-            indicators = self._calculate_indicators(data)
+        _, panel = stack_panel({'data': data})
+        computed, features = self._compute_panel(panel)
+
+        return self._score(features[0], indicators or computed[0], context, ml_prediction)
+
+    def calculate_signal_scores(self,
+                                panel: Dict[str, np.ndarray],
+                                contexts: Optional[List[Optional[MarketContext]]] = None,
+                                ml_predictions: Optional[List[Optional[Dict]]] = None) -> List[SignalScore]:
+        """
+        Score a panel of symbols in a single pass
+
+        Every indicator is computed once per symbol (window indicators
+        vectorized across the panel) and shared by all scoring components.
+
+        Args:
+            panel: {'close'|'high'|'low'|'volume': array (n_symbols, n_bars)},
+                   see stack_panel()
+            contexts: Market context per symbol (None entries are derived from the data)
+            ml_predictions: ML prediction per symbol
 
+        Returns:
+            List of SignalScore in panel row order
+        """
+        indicators, features = self._compute_panel(panel)
+        n_symbols = len(features)
+        contexts = contexts or [None] * n_symbols
+        ml_predictions = ml_predictions or [None] * n_symbols
+
+        return [
+            self._score(features[i], indicators[i], contexts[i], ml_predictions[i])
+            for i in range(n_symbols)
+        ]
+
+    def _score(self, features: PriceFeatures, indicators: TechnicalIndicators,
+               context: Optional[MarketContext], ml_prediction: Optional[Dict]) -> SignalScore:
+        """Score one symbol from its precomputed features and indicators"""
         # Get market context if not provided
         if context is None:
-            context = self._analyze_market_context(data)
+            context = self._analyze_market_context(features, indicators)
 
         # Calculate component scores
         component_scores = {}
 
         # Trend Analysis
-        trend_score, trend_signals = self._score_trend(data, indicators)
+        trend_score, trend_signals = self._score_trend(features, indicators)
         component_scores['trend'] = trend_score
 
         # Momentum Analysis
-        momentum_score, momentum_signals = self._score_momentum(data, indicators)
+        momentum_score, momentum_signals = self._score_momentum(features, indicators)
         component_scores['momentum'] = momentum_score
 
         # Volume Analysis
-        volume_score, volume_signals = self._score_volume(data, indicators)
+        volume_score, volume_signals = self._score_volume(features, indicators)
         component_scores['volume'] = volume_score
 
         # Volatility Analysis
-        volatility_score, volatility_signals = self._score_volatility(data, indicators, context)
+        volatility_score, volatility_signals = self._score_volatility(features, indicators, context)
         component_scores['volatility'] = volatility_score
 
         # Sentiment Analysis
@@ -223,10 +305,10 @@ class SignalScoringSystem:
         strength = self._calculate_strength(overall_score, confidence)
 
         # Calculate risk-reward ratio
-        risk_reward = self._calculate_risk_reward(data, indicators)
+        risk_reward = self._calculate_risk_reward(features, indicators)
 
         # Expected move calculation
-        expected_move = self._calculate_expected_move(data, indicators, overall_score)
+        expected_move = self._calculate_expected_move(features, indicators, overall_score)
 
         # Combine all indicator signals
         all_signals = {**trend_signals, **momentum_signals, **volume_signals, **volatility_signals}
@@ -265,65 +347,152 @@ class SignalScoringSystem:
         Returns:
             TechnicalIndicators object
         """
-        indicators = TechnicalIndicators()
-
-        # Ensure we have enough data
-        if len(data) < 200:
-            logger.warning("Insufficient data for all indicators")
-            return indicators
-
-        close = data['close'].values
-        high = data['high'].values
-        low = data['low'].values
-        volume = data['volume'].values
-
-        # Trend Indicators
-        indicators.sma_20 = talib.SMA(close, timeperiod=20)[-1]
-        indicators.sma_50 = talib.SMA(close, timeperiod=50)[-1]
-        indicators.sma_200 = talib.SMA(close, timeperiod=200)[-1]
-        indicators.ema_9 = talib.EMA(close, timeperiod=9)[-1]
-        indicators.ema_21 = talib.EMA(close, timeperiod=21)[-1]
-
-        macd, macd_signal, macd_hist = talib.MACD(close)
-        indicators.macd = macd[-1]
-        indicators.macd_signal = macd_signal[-1]
-        indicators.macd_histogram = macd_hist[-1]
-
-        indicators.adx = talib.ADX(high, low, close)[-1]
-        indicators.plus_di = talib.PLUS_DI(high, low, close)[-1]
-        indicators.minus_di = talib.MINUS_DI(high, low, close)[-1]
-
-        # Momentum Indicators
-        indicators.rsi = talib.RSI(close)[-1]
-        k, d = talib.STOCH(high, low, close)
-        indicators.stochastic_k = k[-1]
-        indicators.stochastic_d = d[-1]
-        indicators.cci = talib.CCI(high, low, close)[-1]
-        indicators.williams_r = talib.WILLR(high, low, close)[-1]
-        indicators.roc = talib.ROC(close)[-1]
-
-        # Volume Indicators
-        indicators.obv = talib.OBV(close, volume)[-1]
-        indicators.volume_sma = talib.SMA(volume, timeperiod=20)[-1]
-        indicators.volume_ratio = volume[-1] / indicators.volume_sma if indicators.volume_sma > 0 else 1
-        indicators.mfi = talib.MFI(high, low, close, volume)[-1]
-        indicators.accumulation_distribution = talib.AD(high, low, close, volume)[-1]
-
-        # Volatility Indicators
-        indicators.atr = talib.ATR(high, low, close)[-1]
-        upper, middle, lower = talib.BBANDS(close)
-        indicators.bollinger_upper = upper[-1]
-        indicators.bollinger_middle = middle[-1]
-        indicators.bollinger_lower = lower[-1]
-        indicators.bollinger_bandwidth = (upper[-1] - lower[-1]) / middle[-1] if middle[-1] > 0 else 0
-
-        # Donchian Channels
-        indicators.donchian_upper = max(high[-20:])
-        indicators.donchian_lower = min(low[-20:])
-
-        return indicators
-
-    def _score_trend(self, data: pd.DataFrame, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
+        _, panel = stack_panel({'data': data})
+        indicators, _ = self._compute_panel(panel)
+        return indicators[0]
+
+    def _compute_panel(self, panel: Dict[str, np.ndarray]) -> Tuple[List[TechnicalIndicators], List[PriceFeatures]]:
+        """
+        Calculate indicators and price features for every row of a panel
+
+        Window indicators (SMA, Bollinger, Donchian, Stochastic, CCI,
+        Williams %R, MFI, ROC) only need the last bars and are computed with
+        NumPy across all symbols at once; cumulative ones (OBV, A/D) are
+        vectorized sums; recursive ones (EMA, MACD, RSI, ADX/DI, ATR) use one
+        TA-Lib call per symbol over that symbol's valid bars. Values match
+        the TA-Lib defaults used previously.
+
+        Args:
+            panel: {'close'|'high'|'low'|'volume': array (n_symbols, n_bars)},
+                   NaN-padded on the left for shorter histories
+
+        Returns:
+            Tuple of (indicators per row, price features per row)
+        """
+        close = np.atleast_2d(np.asarray(panel['close'], dtype=float))
+        high = np.atleast_2d(np.asarray(panel['high'], dtype=float))
+        low = np.atleast_2d(np.asarray(panel['low'], dtype=float))
+        volume = np.atleast_2d(np.asarray(panel['volume'], dtype=float))
+        n_symbols, n_bars = close.shape
+
+        valid = np.isfinite(close)
+        first = np.where(valid.any(axis=1), valid.argmax(axis=1), n_bars)
+        bars = n_bars - first
+
+        def last(values: np.ndarray, offset: int = 1) -> np.ndarray:
+            return values[:, -offset] if n_bars >= offset else np.full(n_symbols, np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Price features
+            returns = close[:, 1:] / close[:, :-1] - 1
+            returns_valid = np.isfinite(returns)
+            returns_count = returns_valid.sum(axis=1)
+            returns_mean = np.where(returns_valid, returns, 0).sum(axis=1) / returns_count
+            returns_std = np.sqrt(np.where(returns_valid, (returns - returns_mean[:, None]) ** 2, 0).sum(axis=1)
+                                  / (returns_count - 1))
+            volume_mean = np.where(valid, volume, 0).sum(axis=1) / valid.sum(axis=1)
+
+            features = [
+                PriceFeatures(
+                    bars=int(bars[i]),
+                    close=close[i, -1] if n_bars else 0,
+                    prev_close=last(close, 2)[i],
+                    close_20=last(close, 20)[i],
+                    volume=volume[i, -1] if n_bars else 0,
+                    prev_volume=last(volume, 2)[i],
+                    returns_std=returns_std[i],
+                    volume_mean=volume_mean[i],
+                )
+                for i in range(n_symbols)
+            ]
+
+            indicators = [TechnicalIndicators() for _ in range(n_symbols)]
+            ready = np.flatnonzero(bars >= self.min_bars)
+            if len(bars) > len(ready):
+                logger.warning(f"Insufficient data for {len(bars) - len(ready)} symbol(s) "
+                               f"(minimum {self.min_bars} bars)")
+            if len(ready) == 0:
+                return indicators, features
+
+            c, h, l, v = close[ready], high[ready], low[ready], volume[ready]
+
+            # Trend (SMA 200 falls back to all available bars on shorter histories)
+            sma_20 = c[:, -20:].mean(axis=1)
+            sma_50 = c[:, -50:].mean(axis=1)
+            sma_200 = np.nanmean(c[:, -200:], axis=1)
+
+            # Momentum
+            hh14, ll14 = h[:, -14:].max(axis=1), l[:, -14:].min(axis=1)
+            williams_r = np.where(hh14 - ll14 != 0, -100 * (hh14 - c[:, -1]) / (hh14 - ll14), 0.0)
+
+            tp = (h + l + c) / 3
+            tp14 = tp[:, -14:]
+            tp_mean = tp14.mean(axis=1)
+            mean_dev = np.abs(tp14 - tp_mean[:, None]).mean(axis=1)
+            cci = np.where(mean_dev != 0, (tp14[:, -1] - tp_mean) / (0.015 * mean_dev), 0.0)
+
+            roc = np.where(c[:, -11] != 0, (c[:, -1] / c[:, -11] - 1) * 100, 0.0)
+
+            # Stochastic (5, 3 SMA, 3 SMA): fast %K of the last 5 bars
+            hh5 = sliding_window_view(h[:, -9:], 5, axis=1).max(axis=2)
+            ll5 = sliding_window_view(l[:, -9:], 5, axis=1).min(axis=2)
+            fast_k = np.where(hh5 - ll5 != 0, 100 * (c[:, -5:] - ll5) / (hh5 - ll5), 0.0)
+            slow_k = sliding_window_view(fast_k, 3, axis=1).mean(axis=2)
+            stochastic_k, stochastic_d = slow_k[:, -1], slow_k.mean(axis=1)
+
+            # Volume
+            volume_sma = v[:, -20:].mean(axis=1)
+            volume_ratio = np.where(volume_sma > 0, v[:, -1] / volume_sma, 1.0)
+
+            tp_change = np.diff(tp[:, -15:], axis=1)
+            money_flow = (tp * v)[:, -14:]
+            positive_flow = np.where(tp_change > 0, money_flow, 0).sum(axis=1)
+            total_flow = positive_flow + np.where(tp_change < 0, money_flow, 0).sum(axis=1)
+            mfi = np.where(total_flow >= 1, 100 * positive_flow / total_flow, 0.0)
+
+            direction = np.sign(np.diff(c, axis=1))
+            obv = v[np.arange(len(ready)), first[ready]] + np.nansum(direction * v[:, 1:], axis=1)
+            bar_range = h - l
+            clv = np.where(bar_range > 0, ((c - l) - (h - c)) / bar_range, 0.0)
+            accumulation_distribution = np.nansum(clv * v, axis=1)
+
+            # Volatility: Bollinger (20, 2) with population std, Donchian 20
+            bb_window = c[:, -20:]
+            bb_middle = bb_window.mean(axis=1)
+            bb_std = bb_window.std(axis=1)
+            bb_upper, bb_lower = bb_middle + 2 * bb_std, bb_middle - 2 * bb_std
+            bb_width = np.where(bb_middle > 0, (bb_upper - bb_lower) / bb_middle, 0.0)
+            donchian_upper, donchian_lower = h[:, -20:].max(axis=1), l[:, -20:].min(axis=1)
+
+        for j, i in enumerate(ready):
+            # Recursive indicators over the symbol's valid bars
+            ci, hi, li = close[i, first[i]:], high[i, first[i]:], low[i, first[i]:]
+            macd, macd_signal, macd_hist = talib.MACD(ci)
+            rsi = talib.RSI(ci)
+            features[i].rsi_20 = rsi[-20]
+
+            indicators[i] = TechnicalIndicators(
+                sma_20=sma_20[j], sma_50=sma_50[j], sma_200=sma_200[j],
+                ema_9=talib.EMA(ci, timeperiod=9)[-1],
+                ema_21=talib.EMA(ci, timeperiod=21)[-1],
+                macd=macd[-1], macd_signal=macd_signal[-1], macd_histogram=macd_hist[-1],
+                adx=talib.ADX(hi, li, ci)[-1],
+                plus_di=talib.PLUS_DI(hi, li, ci)[-1],
+                minus_di=talib.MINUS_DI(hi, li, ci)[-1],
+                rsi=rsi[-1],
+                stochastic_k=stochastic_k[j], stochastic_d=stochastic_d[j],
+                cci=cci[j], williams_r=williams_r[j], roc=roc[j],
+                obv=obv[j], volume_sma=volume_sma[j], volume_ratio=volume_ratio[j],
+                mfi=mfi[j], accumulation_distribution=accumulation_distribution[j],
+                atr=talib.ATR(hi, li, ci)[-1],
+                bollinger_upper=bb_upper[j], bollinger_middle=bb_middle[j],
+                bollinger_lower=bb_lower[j], bollinger_bandwidth=bb_width[j],
+                donchian_upper=donchian_upper[j], donchian_lower=donchian_lower[j],
+            )
+
+        return indicators, features
+
+    def _score_trend(self, features: PriceFeatures, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
         """
         Score trend indicators
 
@@ -332,7 +501,7 @@ class SignalScoringSystem:
         """
         signals = {}
         score = 50  # Start neutral
-        current_price = data['close'].iloc[-1]
+        current_price = features.close
 
         # Moving Average Analysis
         ma_score = 0
@@ -400,7 +569,7 @@ class SignalScoringSystem:
 
         return score, signals
 
-    def _score_momentum(self, data: pd.DataFrame, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
+    def _score_momentum(self, features: PriceFeatures, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
         """
         Score momentum indicators
 
@@ -486,7 +655,7 @@ class SignalScoringSystem:
         total_score = 50 + rsi_score + stoch_score + cci_score + williams_score + roc_score
 
         # Check for divergences
-        divergence = self._check_divergences(data, indicators)
+        divergence = self._check_divergences(features, indicators)
         if divergence == 'bullish':
             total_score += 20
             signals['divergence'] = 'bullish_divergence'
@@ -499,7 +668,7 @@ class SignalScoringSystem:
 
         return score, signals
 
-    def _score_volume(self, data: pd.DataFrame, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
+    def _score_volume(self, features: PriceFeatures, indicators: TechnicalIndicators) -> Tuple[float, Dict]:
         """
         Score volume indicators
 
@@ -526,7 +695,7 @@ class SignalScoringSystem:
 
         # OBV Trend
         obv_score = 0
-        obv_sma = talib.SMA(np.array([indicators.obv]), timeperiod=1)[-1]  # Simplified
+        obv_sma = indicators.obv  # Simplified
         if indicators.obv > obv_sma:
             obv_score = 15
             signals['obv'] = 'bullish'
@@ -559,7 +728,7 @@ class SignalScoringSystem:
             signals['ad'] = 'distribution'
 
         # Price-Volume Trend Analysis
-        pv_score = self._analyze_price_volume_trend(data)
+        pv_score = self._analyze_price_volume_trend(features)
         if pv_score > 0:
             signals['price_volume'] = 'bullish'
         else:
@@ -573,7 +742,7 @@ class SignalScoringSystem:
 
         return score, signals
 
-    def _score_volatility(self, data: pd.DataFrame, indicators: TechnicalIndicators,
+    def _score_volatility(self, features: PriceFeatures, indicators: TechnicalIndicators,
                          context: MarketContext) -> Tuple[float, Dict]:
         """
         Score volatility indicators
@@ -582,7 +751,7 @@ class SignalScoringSystem:
             Tuple of (score 0-100, signal dictionary)
         """
         signals = {}
-        current_price = data['close'].iloc[-1]
+        current_price = features.close
 
         # Bollinger Bands Analysis
         bb_score = 0
@@ -815,18 +984,18 @@ class SignalScoringSystem:
 
         return min(1.0, strength)
 
-    def _calculate_risk_reward(self, data: pd.DataFrame, indicators: TechnicalIndicators) -> float:
+    def _calculate_risk_reward(self, features: PriceFeatures, indicators: TechnicalIndicators) -> float:
         """
         Calculate risk-reward ratio
 
         Args:
-            data: OHLCV data
+            features: Price features
             indicators: Technical indicators
 
         Returns:
             Risk-reward ratio
         """
-        current_price = data['close'].iloc[-1]
+        current_price = features.close
 
         # Use ATR for risk/reward calculation
         atr = indicators.atr
@@ -845,20 +1014,20 @@ class SignalScoringSystem:
             return reward / risk
         return 1.0  # Default
 
-    def _calculate_expected_move(self, data: pd.DataFrame, indicators: TechnicalIndicators,
+    def _calculate_expected_move(self, features: PriceFeatures, indicators: TechnicalIndicators,
                                 score: float) -> float:
         """
         Calculate expected price move percentage
 
         Args:
-            data: OHLCV data
+            features: Price features
             indicators: Technical indicators
             score: Overall signal score
 
         Returns:
             Expected move as percentage
         """
-        current_price = data['close'].iloc[-1]
+        current_price = features.close
 
         # Base expected move on ATR
         atr_move = (indicators.atr / current_price) * 100
@@ -875,23 +1044,22 @@ class SignalScoringSystem:
 
         return expected
 
-    def _check_divergences(self, data: pd.DataFrame, indicators: TechnicalIndicators) -> str:
+    def _check_divergences(self, features: PriceFeatures, indicators: TechnicalIndicators) -> str:
         """
         Check for price-indicator divergences
 
         Returns:
             'bullish', 'bearish', or 'none'
         """
-        if len(data) < 50:
+        if features.bars < 50:
             return 'none'
 
         # Simple divergence check using RSI
-        price_trend = 1 if data['close'].iloc[-1] > data['close'].iloc[-20] else -1
+        price_trend = 1 if features.close > features.close_20 else -1
 
         # RSI trend (simplified)
-        rsi_values = talib.RSI(data['close'].values)
-        if len(rsi_values) >= 20:
-            rsi_trend = 1 if rsi_values[-1] > rsi_values[-20] else -1
+        if features.bars >= 20:
+            rsi_trend = 1 if indicators.rsi > features.rsi_20 else -1
 
             if price_trend < 0 and rsi_trend > 0:
                 return 'bullish'  # Price down, RSI up
@@ -900,21 +1068,22 @@ class SignalScoringSystem:
 
         return 'none'
 
-    def _analyze_price_volume_trend(self, data: pd.DataFrame) -> float:
+    def _analyze_price_volume_trend(self, features: PriceFeatures) -> float:
         """
         Analyze price-volume relationship
 
         Returns:
             Score -20 to +20
         """
-        if len(data) < 2:
+        if features.bars < 2:
             return 0
 
-        # Recent price change
-        price_change = (data['close'].iloc[-1] - data['close'].iloc[-2]) / data['close'].iloc[-2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Recent price change
+            price_change = (features.close - features.prev_close) / features.prev_close
 
-        # Recent volume change
-        volume_change = (data['volume'].iloc[-1] - data['volume'].iloc[-2]) / data['volume'].iloc[-2]
+            # Recent volume change
+            volume_change = (features.volume - features.prev_volume) / features.prev_volume
 
         # Bullish: Price up with volume up
         if price_change > 0 and volume_change > 0:
@@ -929,24 +1098,23 @@ class SignalScoringSystem:
         else:
             return -5
 
-    def _analyze_market_context(self, data: pd.DataFrame) -> MarketContext:
+    def _analyze_market_context(self, features: PriceFeatures,
+                                indicators: TechnicalIndicators) -> MarketContext:
         """
         Analyze market context
 
         Args:
-            data: OHLCV data
+            features: Price features
+            indicators: Technical indicators
 
         Returns:
             MarketContext object
         """
         context = MarketContext()
 
-        # Simplified context analysis
-        returns = data['close'].pct_change()
-
         # Trend strength
-        sma_20 = talib.SMA(data['close'].values, 20)[-1]
-        sma_50 = talib.SMA(data['close'].values, 50)[-1]
+        sma_20 = indicators.sma_20
+        sma_50 = indicators.sma_50
         if sma_20 > sma_50 * 1.02:
             context.trend_strength = 0.5
         elif sma_20 < sma_50 * 0.98:
@@ -955,7 +1123,7 @@ class SignalScoringSystem:
             context.trend_strength = 0
 
         # Volatility regime
-        volatility = returns.std()
+        volatility = features.returns_std
         if volatility > 0.03:
             context.volatility_regime = "high"
         elif volatility < 0.01:
@@ -964,8 +1132,8 @@ class SignalScoringSystem:
             context.volatility_regime = "normal"
 
         # Volume profile
-        avg_volume = data['volume'].mean()
-        current_volume = data['volume'].iloc[-1]
+        avg_volume = features.volume_mean
+        current_volume = features.volume
         if current_volume > avg_volume * 2:
             context.volume_profile = "extreme"
         elif current_volume > avg_volume * 1.5:
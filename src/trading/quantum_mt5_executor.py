@@ -17,6 +17,8 @@ from datetime import datetime
 from dataclasses import dataclass
 import logging
 
+import numpy as np
+
 # Agregar path del proyecto
 project_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_dir))
@@ -28,6 +30,7 @@ from src.signals.quantum_core import (
     TrailingMode
 )
 from src.signals.quantum_signal_generator import QuantumAnalysis
+from src.risk.position_pass import PositionManagementPass, merge_targets
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +102,9 @@ class QuantumMT5Executor:
         # Posiciones cuánticas activas
         self.quantum_positions: Dict[int, QuantumPosition] = {}
 
+        # Snapshot y envío en lote de la gestión de posiciones
+        self.position_pass = PositionManagementPass(mt5)
+
         # Estado MT5
         self.mt5_connected = False
         self.connect_mt5()
@@ -504,51 +510,76 @@ class QuantumMT5Executor:
         if not self.mt5_connected:
             return
 
-        # Obtener todas las posiciones de MT5
-        positions = mt5.positions_get()
+        # Obtener todas las posiciones de MT5 (una llamada por ciclo)
+        positions = [
+            pos for pos in (mt5.positions_get() or [])
+            if pos.magic == 123456 and pos.symbol in current_analyses  # Solo posiciones cuánticas con análisis
+        ]
         if not positions:
             return
 
+        # 1. Verificar señal EXIT
+        managed = []
         for pos in positions:
-            if pos.magic != 123456:  # Solo posiciones cuánticas
-                continue
-
-            symbol = pos.symbol
-            ticket = pos.ticket
-
-            # Verificar si tenemos análisis actual
-            if symbol not in current_analyses:
-                continue
-
-            analysis = current_analyses[symbol]
-
-            # 1. Verificar señal EXIT
-            if analysis.signal.action == "EXIT":
-                logger.warning(f"⚠️ EXIT signal for {symbol}, closing {ticket}")
-                self.close_quantum_position(ticket)
-                continue
-
-            # 2. Aplicar trailing stop
-            if self.use_trailing:
-                self.update_trailing_stop(ticket, analysis)
-
-            # 3. Aplicar breakeven
-            if self.use_breakeven:
-                current_price = mt5.symbol_info_tick(symbol).bid
-                if pos.type == 0:  # BUY
-                    profit_pct = (current_price - pos.price_open) / pos.price_open
-                    if profit_pct >= self.breakeven_trigger and pos.sl < pos.price_open:
-                        # Mover a breakeven
-                        request = {
-                            "action": mt5.TRADE_ACTION_SLTP,
-                            "symbol": symbol,
-                            "sl": pos.price_open,
-                            "tp": pos.tp,
-                            "position": ticket
-                        }
-                        result = mt5.order_send(request)
-                        if result.retcode == mt5.TRADE_RETCODE_DONE:
-                            logger.info(f"✅ BREAKEVEN {symbol}: Ticket={ticket}")
+            if current_analyses[pos.symbol].signal.action == "EXIT":
+                logger.warning(f"⚠️ EXIT signal for {pos.symbol}, closing {pos.ticket}")
+                self.close_quantum_position(pos.ticket)
+            else:
+                managed.append(pos)
+
+        # Un precio por símbolo para todas las posiciones restantes
+        book = self.position_pass.snapshot(managed)
+        if not len(book):
+            return
+
+        # 2. Trailing stop (un cálculo por símbolo y modo de trailing)
+        trailing = None
+        if self.use_trailing:
+            trailing = np.full(len(book), np.nan)
+            quantum = QuantumCore()
+            levels = {}
+            for i, pos in enumerate(book.positions):
+                quantum_pos = self.quantum_positions.get(pos.ticket)
+                if quantum_pos is None or not book.is_buy[i] or np.isnan(book.price[i]):
+                    continue
+                key = (pos.symbol, quantum_pos.trailing_mode)
+                if key not in levels:
+                    analysis = current_analyses[pos.symbol]
+                    levels[key] = quantum.calculate_trailing_stop(
+                        price=float(book.price[i]),
+                        A=analysis.signal.metrics.action,
+                        h=analysis.signal.metrics.h,
+                        atr=analysis.atr,
+                        level=analysis.signal.metrics.level,
+                        mode=quantum_pos.trailing_mode,
+                        multiplier=self.trailing_mult
+                    )
+                trailing[i] = levels[key]
+
+            # Solo mover SL si es mejor (más alto para BUY)
+            with np.errstate(invalid='ignore'):
+                trailing = np.where(trailing > book.sl, trailing, np.nan)
+
+        # 3. Breakeven (BUY con ganancia >= breakeven_trigger)
+        breakeven = None
+        if self.use_breakeven:
+            with np.errstate(invalid='ignore'):
+                profit_pct = (book.price - book.price_open) / book.price_open
+                ready = book.is_buy & (profit_pct >= self.breakeven_trigger) & (book.sl < book.price_open)
+            breakeven = np.where(ready, book.price_open, np.nan)
+
+        # Una modificación por posición con el SL más protector
+        targets = merge_targets(book, trailing, breakeven)
+        from_trailing = targets == trailing if trailing is not None else np.zeros(len(book), dtype=bool)
+        results = self.position_pass.apply(book, targets)
+        for ticket, outcome in results.items():
+            i = outcome['index']
+            if not outcome['ok']:
+                logger.error(f"SL update failed for {ticket}: {getattr(outcome['result'], 'retcode', None)}")
+            elif from_trailing[i]:
+                logger.info(f"✅ TRAILING {book.symbols[i]}: {book.sl[i]:.5f} → {outcome['sl']:.5f}")
+            else:
+                logger.info(f"✅ BREAKEVEN {book.symbols[i]}: Ticket={ticket}")
 
 
     def get_statistics(self) -> Dict:
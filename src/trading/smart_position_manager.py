@@ -4,14 +4,23 @@ Breakeven automático, Trailing Stop dinámico, TP parciales
 Sistema autónomo de clase mundial
 """
 import os
+import sys
 import time
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 from dataclasses import dataclass
+from pathlib import Path
 import MetaTrader5 as mt5
 from dotenv import load_dotenv
 
+try:
+    from src.risk.position_pass import PositionManagementPass, PositionBook
+except ImportError:
+    # Importado como módulo suelto (pro_trading_bot.py): agregar la raíz del proyecto
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    from src.risk.position_pass import PositionManagementPass, PositionBook
+
 load_dotenv('.env')
 
 @dataclass
@@ -27,6 +36,7 @@ class PositionManager:
     profit: float
     points: float
     magic: int
+    open_time: float = 0
     
     # Estados de gestión
     breakeven_activated: bool = False
@@ -75,6 +85,11 @@ class SmartPositionManager:
         
         # Tracking de posiciones
         self.positions_data: Dict[int, PositionManager] = {}
+
+        # Snapshot del ciclo: posiciones y symbol_info una vez por símbolo
+        self.position_pass = PositionManagementPass(mt5)
+        self.book: Optional[PositionBook] = None
+        self._levels_cache: Dict[str, Dict] = {}
         self.logger = self._setup_logger()
         
     def _setup_logger(self):
@@ -100,6 +115,12 @@ class SmartPositionManager:
         
         return logger
     
+    def _symbol_info(self, symbol: str):
+        """symbol_info del snapshot del ciclo (consulta a MT5 si no está)"""
+        if self.book is not None and symbol in self.book.symbol_info:
+            return self.book.symbol_info[symbol]
+        return mt5.symbol_info(symbol)
+
     def calculate_atr(self, symbol: str, timeframe=mt5.TIMEFRAME_M15, period=14):
         """Calcular ATR para ajustes dinámicos"""
         rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, period + 1)
@@ -135,7 +156,7 @@ class SmartPositionManager:
             # Calcular volatilidad (ATR)
             atr = self.calculate_atr(symbol)
             if atr:
-                symbol_info = mt5.symbol_info(symbol)
+                symbol_info = self._symbol_info(symbol)
                 if symbol_info:
                     price = symbol_info.bid
                     atr_percent = (atr / price) * 100
@@ -170,7 +191,10 @@ class SmartPositionManager:
         return conditions
     
     def calculate_dynamic_levels(self, position: PositionManager) -> Dict:
-        """Calcular niveles dinámicos basados en condiciones del mercado"""
+        """Calcular niveles dinámicos basados en condiciones del mercado (una vez por símbolo y ciclo)"""
+        if position.symbol in self._levels_cache:
+            return self._levels_cache[position.symbol]
+
         market = self.analyze_market_conditions(position.symbol)
         
         # Ajustar niveles según volatilidad
@@ -201,6 +225,7 @@ class SmartPositionManager:
             levels['partial_tp1'] *= 0.8
             levels['partial_tp2'] *= 0.9
             
+        self._levels_cache[position.symbol] = levels
         return levels
     
     def manage_breakeven(self, position: PositionManager, levels: Dict) -> bool:
@@ -213,9 +238,9 @@ class SmartPositionManager:
         if current_profit_points >= levels['breakeven_trigger']:
             # Calcular nuevo SL (precio de entrada + buffer)
             if position.type == mt5.ORDER_TYPE_BUY:
-                new_sl = position.price_open + (levels['breakeven_buffer'] * mt5.symbol_info(position.symbol).point)
+                new_sl = position.price_open + (levels['breakeven_buffer'] * self._symbol_info(position.symbol).point)
             else:  # SELL
-                new_sl = position.price_open - (levels['breakeven_buffer'] * mt5.symbol_info(position.symbol).point)
+                new_sl = position.price_open - (levels['breakeven_buffer'] * self._symbol_info(position.symbol).point)
             
             # Modificar posición
             request = {
@@ -246,7 +271,7 @@ class SmartPositionManager:
         if not position.breakeven_activated or current_profit_points < levels['trailing_start']:
             return False
         
-        symbol_info = mt5.symbol_info(position.symbol)
+        symbol_info = self._symbol_info(position.symbol)
         current_price = symbol_info.bid if position.type == mt5.ORDER_TYPE_BUY else symbol_info.ask
         
         # Calcular nuevo nivel de SL
@@ -316,7 +341,7 @@ class SmartPositionManager:
         if current_profit_points >= levels['partial_tp1'] and not position.partial_closed:
             close_volume = position.volume * self.partial_tp1_percent
             
-            symbol_info = mt5.symbol_info(position.symbol)
+            symbol_info = self._symbol_info(position.symbol)
             
             # Preparar orden de cierre parcial
             if position.type == mt5.ORDER_TYPE_BUY:
@@ -352,7 +377,7 @@ class SmartPositionManager:
         if current_profit_points >= levels['partial_tp2'] and position.partial_closed:
             close_volume = position.volume * self.partial_tp2_percent
             
-            symbol_info = mt5.symbol_info(position.symbol)
+            symbol_info = self._symbol_info(position.symbol)
             
             if position.type == mt5.ORDER_TYPE_BUY:
                 order_type = mt5.ORDER_TYPE_SELL
@@ -399,7 +424,7 @@ class SmartPositionManager:
             
             # Si la ganancia cae demasiado desde el máximo, proteger
             if current_profit_points < position.max_profit_reached - 10:
-                symbol_info = mt5.symbol_info(position.symbol)
+                symbol_info = self._symbol_info(position.symbol)
                 
                 # Mover SL para proteger ganancias
                 if position.type == mt5.ORDER_TYPE_BUY:
@@ -433,7 +458,7 @@ class SmartPositionManager:
     def manage_time_based_exit(self, position: PositionManager) -> bool:
         """Gestión basada en tiempo"""
         # Calcular tiempo en posición
-        position_time = datetime.now() - datetime.fromtimestamp(mt5.positions_get(ticket=position.ticket)[0].time)
+        position_time = datetime.now() - datetime.fromtimestamp(position.open_time)
         hours_in_position = position_time.total_seconds() / 3600
         
         # Cerrar posiciones muy antiguas
@@ -455,7 +480,7 @@ class SmartPositionManager:
     
     def force_breakeven(self, position: PositionManager) -> bool:
         """Forzar breakeven inmediato"""
-        symbol_info = mt5.symbol_info(position.symbol)
+        symbol_info = self._symbol_info(position.symbol)
         
         # Mover SL a precio de entrada
         new_sl = position.price_open
@@ -479,7 +504,7 @@ class SmartPositionManager:
     
     def close_position_complete(self, position: PositionManager, reason: str = "") -> bool:
         """Cerrar posición completa"""
-        symbol_info = mt5.symbol_info(position.symbol)
+        symbol_info = self._symbol_info(position.symbol)
         
         if position.type == mt5.ORDER_TYPE_BUY:
             order_type = mt5.ORDER_TYPE_SELL
@@ -507,16 +532,20 @@ class SmartPositionManager:
         return False
     
     def update_positions(self):
-        """Actualizar información de posiciones"""
-        positions = mt5.positions_get(symbol=self.symbol)
+        """Actualizar información de posiciones (un snapshot por ciclo)"""
+        self.book = self.position_pass.snapshot(symbol=self.symbol)
+        self._levels_cache = {}
         
-        if not positions:
+        if not len(self.book):
             self.positions_data.clear()
             return
             
+        # Puntos de ganancia/pérdida de todas las posiciones a la vez
+        points = self.book.profit_points()
+            
         # Actualizar datos de posiciones existentes
         current_tickets = []
-        for pos in positions:
+        for i, pos in enumerate(self.book.positions):
             current_tickets.append(pos.ticket)
             
             if pos.ticket not in self.positions_data:
@@ -530,8 +559,9 @@ class SmartPositionManager:
                     sl=pos.sl,
                     tp=pos.tp,
                     profit=pos.profit,
-                    points=(pos.price_current - pos.price_open) / mt5.symbol_info(pos.symbol).point,
-                    magic=pos.magic
+                    points=float(points[i]),
+                    magic=pos.magic,
+                    open_time=getattr(pos, 'time', 0)
                 )
                 self.logger.info(f"📌 Nueva posición detectada #{pos.ticket}")
             else:
@@ -541,13 +571,7 @@ class SmartPositionManager:
                 pm.sl = pos.sl
                 pm.tp = pos.tp
                 pm.volume = pos.volume
-                
-                # Calcular puntos de ganancia/pérdida
-                symbol_info = mt5.symbol_info(pos.symbol)
-                if pos.type == mt5.ORDER_TYPE_BUY:
-                    pm.points = (pos.price_current - pos.price_open) / symbol_info.point
-                else:
-                    pm.points = (pos.price_open - pos.price_current) / symbol_info.point
+                pm.points = float(points[i])
                     
         # Eliminar posiciones cerradas
         for ticket in list(self.positions_data.keys()):
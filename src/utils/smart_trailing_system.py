@@ -13,6 +13,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
 # Agregar src al path
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root / 'src'))
@@ -22,12 +24,25 @@ try:
 except ImportError:
     TelegramNotifier = None
 
+try:
+    from src.risk.position_pass import (PositionManagementPass, breakeven_targets,
+                                        merge_targets, trailing_targets)
+except ImportError:
+    # Ejecución standalone: src.* se resuelve desde la raíz del proyecto
+    sys.path.append(str(project_root))
+    from src.risk.position_pass import (PositionManagementPass, breakeven_targets,
+                                        merge_targets, trailing_targets)
+
 logger = logging.getLogger(__name__)
 
 class SmartTrailingSystem:
     """Sistema inteligente de trailing stop y breakeven"""
     
-    def __init__(self):
+    def __init__(self, mt5_module=None):
+        # Snapshot y envío en lote de las modificaciones de cada ciclo
+        self.mt5 = mt5_module or mt5
+        self.position_pass = PositionManagementPass(self.mt5)
+
         # CONFIGURACIÓN OPTIMIZADA - MÁS AGRESIVA
         self.BREAKEVEN_TRIGGER = 15        # 15 pips (era 25)
         self.BREAKEVEN_OFFSET = 3          # +3 pips sobre entrada
@@ -74,6 +89,10 @@ class SmartTrailingSystem:
         else:
             return price_diff * 10000  # Pares mayores
     
+    def pip_size(self, symbol: str) -> float:
+        """Tamaño de un pip en precio (inverso de calculate_pips)"""
+        return 1.0 / self.calculate_pips(symbol, 1.0)
+
     def apply_manual_breakeven(self, position) -> bool:
         """Aplica breakeven manual y envía alerta a Telegram"""
         try:
@@ -113,33 +132,18 @@ class SmartTrailingSystem:
             
             # Aplicar breakeven
             request = {
-                "action": mt5.TRADE_ACTION_SLTP,
+                "action": self.mt5.TRADE_ACTION_SLTP,
                 "symbol": symbol,
                 "position": ticket,
                 "sl": new_sl,
                 "tp": position.tp,
             }
             
-            result = mt5.order_send(request)
+            result = self.mt5.order_send(request)
             
-            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+            if result and result.retcode == self.mt5.TRADE_RETCODE_DONE:
                 self.breakeven_applied.add(ticket)
-                
-                # Enviar alerta a Telegram
-                message = f"""
-🛡️ *BREAKEVEN APLICADO*
-
-📈 *{symbol}* #{ticket}
-💰 Ganancia: {pips_profit:.1f} pips
-🎯 SL Movido: {new_sl:.5f}
-⚖️ Trade protegido sin pérdida
-
-🕐 {datetime.now().strftime('%H:%M:%S')}
-"""
-                if self.telegram:
-                    self.telegram.send_message(message, parse_mode='Markdown')
-                    
-                logger.info(f"[BREAKEVEN] {symbol} #{ticket}: {pips_profit:.1f} pips -> SL {new_sl:.5f}")
+                self._announce_breakeven(symbol, ticket, pips_profit, new_sl)
                 return True
             else:
                 logger.error(f"Error aplicando breakeven a {ticket}: {result}")
@@ -198,31 +202,17 @@ class SmartTrailingSystem:
             
             # Aplicar trailing stop
             request = {
-                "action": mt5.TRADE_ACTION_SLTP,
+                "action": self.mt5.TRADE_ACTION_SLTP,
                 "symbol": symbol,
                 "position": ticket,
                 "sl": new_sl,
                 "tp": position.tp,
             }
             
-            result = mt5.order_send(request)
+            result = self.mt5.order_send(request)
             
-            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                # Notificar trailing aplicado
-                message = f"""
-🔄 *TRAILING STOP AJUSTADO*
-
-📈 *{symbol}* #{ticket}  
-💰 Ganancia: {pips_profit:.1f} pips
-🔄 SL: {current_sl:.5f} → {new_sl:.5f}
-📏 Distancia: {trailing_distance} pips
-
-🕐 {datetime.now().strftime('%H:%M:%S')}
-"""
-                if self.telegram:
-                    self.telegram.send_message(message, parse_mode='Markdown')
-                    
-                logger.info(f"[TRAILING] {symbol} #{ticket}: {pips_profit:.1f} pips -> SL {current_sl:.5f} → {new_sl:.5f}")
+            if result and result.retcode == self.mt5.TRADE_RETCODE_DONE:
+                self._announce_trailing(symbol, ticket, pips_profit, current_sl, new_sl, trailing_distance)
                 return True
             else:
                 logger.error(f"Error aplicando trailing a {ticket}: {result}")
@@ -232,47 +222,102 @@ class SmartTrailingSystem:
             logger.error(f"Error en apply_automatic_trailing: {e}")
             return False
     
+    def _announce_breakeven(self, symbol: str, ticket: int, pips_profit: float, new_sl: float):
+        """Alerta de Telegram y log de un breakeven aplicado"""
+        # Enviar alerta a Telegram
+        message = f"""
+🛡️ *BREAKEVEN APLICADO*
+
+📈 *{symbol}* #{ticket}
+💰 Ganancia: {pips_profit:.1f} pips
+🎯 SL Movido: {new_sl:.5f}
+⚖️ Trade protegido sin pérdida
+
+🕐 {datetime.now().strftime('%H:%M:%S')}
+"""
+        if self.telegram:
+            self.telegram.send_message(message, parse_mode='Markdown')
+            
+        logger.info(f"[BREAKEVEN] {symbol} #{ticket}: {pips_profit:.1f} pips -> SL {new_sl:.5f}")
+
+    def _announce_trailing(self, symbol: str, ticket: int, pips_profit: float,
+                           current_sl: float, new_sl: float, trailing_distance: float):
+        """Alerta de Telegram y log de un trailing aplicado"""
+        message = f"""
+🔄 *TRAILING STOP AJUSTADO*
+
+📈 *{symbol}* #{ticket}  
+💰 Ganancia: {pips_profit:.1f} pips
+🔄 SL: {current_sl:.5f} → {new_sl:.5f}
+📏 Distancia: {trailing_distance} pips
+
+🕐 {datetime.now().strftime('%H:%M:%S')}
+"""
+        if self.telegram:
+            self.telegram.send_message(message, parse_mode='Markdown')
+            
+        logger.info(f"[TRAILING] {symbol} #{ticket}: {pips_profit:.1f} pips -> SL {current_sl:.5f} → {new_sl:.5f}")
+
     def process_all_positions(self) -> Dict[str, int]:
-        """Procesa todas las posiciones abiertas"""
-        if not mt5.initialize():
+        """
+        Procesa todas las posiciones abiertas en una pasada
+
+        Breakeven (si no se aplicó antes) tiene prioridad sobre el trailing;
+        las decisiones se calculan para todas las posiciones a la vez y se
+        envía como mucho una modificación por posición.
+        """
+        if not self.mt5.initialize():
             logger.error("No se pudo conectar a MT5")
             return {"error": 1}
         
-        positions = mt5.positions_get()
-        if not positions:
+        book = self.position_pass.snapshot(quotes=False)
+        if not len(book):
             return {"no_positions": 1}
-        
+
+        # Pips según el símbolo, como calculate_pips
+        book.point = np.array([self.pip_size(symbol) for symbol in book.symbols])
+        params = [self.get_symbol_params(symbol) for symbol in book.symbols]
+        pips_profit = book.profit_points()
+
+        applied = np.array([int(t) in self.breakeven_applied for t in book.ticket], dtype=bool)
+        breakeven = breakeven_targets(book, [p['breakeven_trigger'] for p in params], self.BREAKEVEN_OFFSET,
+                                      eligible=~applied, require_improvement=False)
+        distance = np.array([p['trailing_distance'] for p in params], dtype=float)
+        trailing = trailing_targets(book, [p['trailing_trigger'] for p in params], distance,
+                                    eligible=np.isnan(breakeven))
+
         results = {
-            "total_positions": len(positions),
+            "total_positions": len(book),
             "breakeven_applied": 0,
             "trailing_applied": 0,
             "skipped": 0
         }
         
-        for position in positions:
-            try:
-                # Intentar breakeven manual
-                if self.apply_manual_breakeven(position):
-                    results["breakeven_applied"] += 1
-                
-                # Intentar trailing automático
-                elif self.apply_automatic_trailing(position):
-                    results["trailing_applied"] += 1
-                else:
-                    results["skipped"] += 1
-                    
-            except Exception as e:
-                logger.error(f"Error procesando posición {position.ticket}: {e}")
-                results["skipped"] += 1
-        
+        sent = self.position_pass.apply(book, merge_targets(book, breakeven, trailing))
+        for ticket, outcome in sent.items():
+            i = outcome['index']
+            symbol = book.symbols[i]
+            if not outcome['ok']:
+                kind = "breakeven" if not np.isnan(breakeven[i]) else "trailing"
+                logger.error(f"Error aplicando {kind} a {ticket}: {outcome['result']}")
+            elif not np.isnan(breakeven[i]):
+                self.breakeven_applied.add(ticket)
+                self._announce_breakeven(symbol, ticket, pips_profit[i], outcome['sl'])
+                results["breakeven_applied"] += 1
+            else:
+                self._announce_trailing(symbol, ticket, pips_profit[i], book.sl[i], outcome['sl'],
+                                        params[i]['trailing_distance'])
+                results["trailing_applied"] += 1
+
+        results["skipped"] = results["total_positions"] - results["breakeven_applied"] - results["trailing_applied"]
         return results
     
     def get_position_status(self) -> List[Dict]:
         """Obtiene estado de todas las posiciones"""
-        if not mt5.initialize():
+        if not self.mt5.initialize():
             return []
         
-        positions = mt5.positions_get()
+        positions = self.mt5.positions_get()
         if not positions:
             return []
         
@@ -2,8 +2,6 @@
 State Manager - Sistema unificado de gestión de estado
 Gestiona el estado global del sistema de trading
 """
-import json
-import time
 import threading
 from datetime import datetime
 from pathlib import Path
@@ -12,6 +10,8 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import logging
 
+from .state_persistence import StatePersistence, TimedLock
+
 logger = logging.getLogger(__name__)
 
 class TradingState(Enum):
@@ -60,18 +60,22 @@ class StateManager:
     Thread-safe y persistente
     """
     
-    def __init__(self, state_file: str = "data/system_state.json"):
+    def __init__(self, state_file: str = "data/system_state.json",
+                 journal: bool = True, compact_every: int = 500):
         """
         Inicializa el gestor de estado
         
         Args:
             state_file: Archivo donde persistir el estado
+            journal: Registrar cambios en un diario append-only entre snapshots
+            compact_every: Operaciones del diario entre snapshots completos
         """
         self.state_file = Path(state_file)
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.persistence = StatePersistence(self.state_file, journal=journal, compact_every=compact_every)
         
         # Estado interno
-        self._lock = threading.RLock()
+        self._lock = TimedLock()
         self._state = {
             'trading_state': TradingState.IDLE.value,
             'positions': {},
@@ -96,58 +100,49 @@ class StateManager:
         logger.info("StateManager inicializado")
     
     def _load_state(self):
-        """Carga el estado desde archivo"""
+        """Carga el estado desde archivo (snapshot más diario de cambios)"""
         try:
-            if self.state_file.exists():
-                with open(self.state_file, 'r') as f:
-                    saved_state = json.load(f)
-                    
-                # Mantener solo datos relevantes
-                if 'stats' in saved_state:
-                    # Resetear contadores de sesión
-                    saved_state['stats']['cycles'] = 0
-                    saved_state['stats']['start_time'] = datetime.now().isoformat()
+            saved_state = self.persistence.load()
+            if saved_state is not None:
+                # Un diario sin snapshot previo trae solo los campos de stats
+                # que se modificaron: se combinan con los valores por defecto
+                saved_stats = saved_state.pop('stats', None)
                     
                 with self._lock:
                     self._state.update(saved_state)
+                    if saved_stats is not None:
+                        self._state['stats'].update(saved_stats)
+                        # Resetear contadores de sesión
+                        self._state['stats']['cycles'] = 0
+                        self._state['stats']['start_time'] = datetime.now().isoformat()
+                        self.persistence.record_set(['stats'], self._state['stats'])
                     
                 logger.info(f"Estado cargado desde {self.state_file}")
         except Exception as e:
             logger.warning(f"No se pudo cargar estado previo: {e}")
     
-    def save_state(self):
-        """Guarda el estado actual a archivo"""
+    def save_state(self, force: bool = False):
+        """
+        Guarda los cambios pendientes
+        
+        El estado se serializa bajo el lock y se escribe fuera de él (rename
+        atómico para snapshots); si no hubo cambios no se escribe nada.
+        """
         try:
-            with self._lock:
-                # Convertir datetime a string para JSON
-                state_copy = self._state.copy()
-                
-                # Serializar fechas
-                if 'stats' in state_copy and 'start_time' in state_copy['stats']:
-                    if isinstance(state_copy['stats']['start_time'], datetime):
-                        state_copy['stats']['start_time'] = state_copy['stats']['start_time'].isoformat()
-                
-                if 'stats' in state_copy and 'last_trade_time' in state_copy['stats']:
-                    if isinstance(state_copy['stats']['last_trade_time'], datetime):
-                        state_copy['stats']['last_trade_time'] = state_copy['stats']['last_trade_time'].isoformat()
-                
-                # Guardar a archivo
-                with open(self.state_file, 'w') as f:
-                    json.dump(state_copy, f, indent=2, default=str)
-                    
+            self.persistence.save(self._state, self._lock, force=force)
         except Exception as e:
             logger.error(f"Error guardando estado: {e}")
     
     def _auto_save_loop(self):
         """Loop de auto-guardado cada 60 segundos"""
-        while not self._stop_event.is_set():
-            time.sleep(60)
+        while not self._stop_event.wait(60):
             self.save_state()
     
     def set_trading_state(self, state: TradingState):
         """Actualiza el estado de trading"""
         with self._lock:
             self._state['trading_state'] = state.value
+            self.persistence.record_set(['trading_state'], state.value)
             logger.debug(f"Estado de trading: {state.value}")
     
     def get_trading_state(self) -> TradingState:
@@ -161,6 +156,8 @@ class StateManager:
         with self._lock:
             self._state['positions'][position.ticket] = asdict(position)
             self._state['stats']['trades_total'] += 1
+            self.persistence.record_set(['positions', position.ticket], self._state['positions'][position.ticket])
+            self.persistence.record_set(['stats', 'trades_total'], self._state['stats']['trades_total'])
             logger.info(f"Posición añadida: {position.ticket}")
     
     def update_position(self, ticket: int, **kwargs):
@@ -168,6 +165,7 @@ class StateManager:
         with self._lock:
             if ticket in self._state['positions']:
                 self._state['positions'][ticket].update(kwargs)
+                self.persistence.record_set(['positions', ticket], self._state['positions'][ticket])
     
     def remove_position(self, ticket: int, profit: float = 0):
         """Elimina una posición cerrada"""
@@ -188,6 +186,9 @@ class StateManager:
                 if sym:
                     self._state.setdefault('pnl_by_symbol', {})
                     self._state['pnl_by_symbol'][sym] = self._state['pnl_by_symbol'].get(sym, 0.0) + float(profit)
+                    self.persistence.record_set(['pnl_by_symbol', sym], self._state['pnl_by_symbol'][sym])
+                self.persistence.record_delete(['positions', ticket])
+                self.persistence.record_set(['stats'], self._state['stats'])
                 logger.info(f"Posición cerrada: {ticket}, Profit: {profit}")
     
     def get_positions(self) -> Dict[int, Dict]:
@@ -204,6 +205,7 @@ class StateManager:
                 **data,
                 'timestamp': datetime.now().isoformat()
             }
+            self.persistence.record_set(['market_data', symbol], self._state['market_data'][symbol])
     
     def get_market_data(self, symbol: str) -> Optional[Dict]:
         """Obtiene datos de mercado para un símbolo"""
@@ -219,6 +221,7 @@ class StateManager:
             # Mantener solo últimas 100 señales
             if len(self._state['signals']) > 100:
                 self._state['signals'] = self._state['signals'][-100:]
+            self.persistence.record_append(['signals'], signal, max_len=100)
     
     def get_recent_signals(self, limit: int = 10) -> List[Dict]:
         """Obtiene las señales más recientes"""
@@ -240,6 +243,9 @@ class StateManager:
             # Mantener solo últimos 50 errores
             if len(self._state['errors']) > 50:
                 self._state['errors'] = self._state['errors'][-50:]
+            self.persistence.record_append(['errors'], error_entry, max_len=50)
+            self.persistence.record_set(['stats', 'errors'], self._state['stats']['errors'])
+            self.persistence.record_set(['stats', 'last_error'], self._state['stats']['last_error'])
             
             logger.error(f"Error registrado: {error}")
     
@@ -247,6 +253,7 @@ class StateManager:
         """Actualiza el contador de ciclos"""
         with self._lock:
             self._state['stats']['cycles'] = cycle_number
+            self.persistence.record_set(['stats', 'cycles'], cycle_number)
     
     def get_session_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas de la sesión actual"""
@@ -271,10 +278,18 @@ class StateManager:
                 )).total_seconds() if 'start_time' in self._state['stats'] else 0
             }
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas del lock de estado y de la persistencia"""
+        return {
+            'lock': self._lock.get_stats(),
+            'persistence': self.persistence.get_stats()
+        }
+    
     def update_config(self, config: Dict[str, Any]):
         """Actualiza la configuración en el estado"""
         with self._lock:
             self._state['config'].update(config)
+            self.persistence.record_set(['config'], self._state['config'])
     
     def get_config(self) -> Dict[str, Any]:
         """Obtiene la configuración actual"""
@@ -287,13 +302,16 @@ class StateManager:
             self._state['stats']['cycles'] = 0
             self._state['stats']['start_time'] = datetime.now().isoformat()
             self._state['errors'] = []
+            self.persistence.record_set(['stats', 'cycles'], 0)
+            self.persistence.record_set(['stats', 'start_time'], self._state['stats']['start_time'])
+            self.persistence.record_set(['errors'], [])
             logger.info("Estadísticas de sesión reseteadas")
     
     def shutdown(self):
         """Cierra el StateManager de forma segura"""
         logger.info("Cerrando StateManager...")
         self._stop_event.set()
-        self.save_state()
+        self.save_state(force=True)
         if self._auto_save_thread.is_alive():
             self._auto_save_thread.join(timeout=2)
         logger.info("StateManager cerrado")
@@ -0,0 +1,270 @@
+"""
+State Persistence - Persistencia incremental del estado
+Snapshots atómicos y diario de cambios (JSONL) con compactación periódica
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TimedLock:
+    """
+    Lock instrumentado: mide espera y tiempo de retención
+
+    Envuelve un Lock o RLock; en locks reentrantes solo cuenta la
+    adquisición más externa.
+    """
+
+    def __init__(self, lock=None):
+        self._lock = lock if lock is not None else threading.RLock()
+        self._depth = 0
+        self._acquired_at = 0.0
+        self.stats = {
+            'acquisitions': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+            'total_hold': 0.0,
+            'max_hold': 0.0
+        }
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._depth += 1
+            if self._depth == 1:
+                self._acquired_at = time.perf_counter()
+                wait = self._acquired_at - start
+                self.stats['acquisitions'] += 1
+                self.stats['total_wait'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+        return acquired
+
+    def release(self):
+        if self._depth == 1:
+            hold = time.perf_counter() - self._acquired_at
+            self.stats['total_hold'] += hold
+            self.stats['max_hold'] = max(self.stats['max_hold'], hold)
+        self._depth -= 1
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Métricas del lock en milisegundos"""
+        stats = dict(self.stats)
+        count = stats['acquisitions'] or 1
+        return {
+            'acquisitions': stats['acquisitions'],
+            'avg_wait_ms': stats['total_wait'] / count * 1000,
+            'max_wait_ms': stats['max_wait'] * 1000,
+            'avg_hold_ms': stats['total_hold'] / count * 1000,
+            'max_hold_ms': stats['max_hold'] * 1000
+        }
+
+class StatePersistence:
+    """
+    Persistencia de un dict de estado
+
+    Las mutaciones se registran como operaciones (set/del sobre una ruta de
+    claves) mientras el llamador tiene el lock del estado; la escritura a
+    disco ocurre fuera del lock. Con diario activo, cada guardado añade las
+    operaciones pendientes al archivo .journal y cada `compact_every`
+    operaciones se escribe un snapshot completo (atómico) y se vacía el
+    diario. Al cargar se aplica el snapshot y después el diario.
+    """
+
+    def __init__(self, state_file: Path, journal: bool = True, compact_every: int = 500):
+        """
+        Args:
+            state_file: Archivo del snapshot JSON
+            journal: Registrar cambios en un diario append-only
+            compact_every: Operaciones del diario entre snapshots completos
+        """
+        self.state_file = Path(state_file)
+        self.journal_file = self.state_file.with_suffix(self.state_file.suffix + '.journal')
+        self.journal = journal
+        self.compact_every = compact_every
+
+        self.dirty = False
+        self._pending: List[str] = []
+        self._journal_ops = 0
+        self._io_lock = threading.Lock()
+        self.stats = {
+            'snapshots': 0,
+            'journal_writes': 0,
+            'ops_logged': 0,
+            'ops_replayed': 0,
+            'skipped_saves': 0,
+            'last_write_ms': 0.0,
+            'last_snapshot_bytes': 0
+        }
+
+    # Registro (llamar con el lock del estado tomado)
+
+    def record_set(self, path: Sequence, value: Any):
+        """Registrar que `path` pasa a valer `value`"""
+        self.dirty = True
+        if self.journal:
+            self._pending.append(json.dumps({'op': 'set', 'path': list(path), 'value': value},
+                                            separators=(',', ':'), default=str))
+
+    def record_append(self, path: Sequence, value: Any, max_len: Optional[int] = None):
+        """Registrar que se añadió `value` a la lista `path` (recortada a `max_len`)"""
+        self.dirty = True
+        if self.journal:
+            self._pending.append(json.dumps({'op': 'append', 'path': list(path), 'value': value, 'max_len': max_len},
+                                            separators=(',', ':'), default=str))
+
+    def record_delete(self, path: Sequence):
+        """Registrar que se eliminó `path`"""
+        self.dirty = True
+        if self.journal:
+            self._pending.append(json.dumps({'op': 'del', 'path': list(path)}, separators=(',', ':')))
+
+    # Escritura
+
+    def save(self, state: Dict, lock, force: bool = False) -> bool:
+        """
+        Persistir los cambios pendientes
+
+        Args:
+            state: Dict de estado
+            lock: Lock que protege `state` (solo se retiene para copiar)
+            force: Escribir un snapshot completo aunque no haya cambios
+
+        Returns:
+            True si se escribió algo
+        """
+        with self._io_lock:
+            with lock:
+                if not self.dirty and not force:
+                    self.stats['skipped_saves'] += 1
+                    return False
+
+                pending, self._pending = self._pending, []
+                compact = (force or not self.journal
+                           or self._journal_ops + len(pending) >= self.compact_every)
+                snapshot = json.dumps(state, separators=(',', ':'), default=str) if compact else None
+                self.dirty = False
+
+            start = time.perf_counter()
+            try:
+                if compact:
+                    self._write_snapshot(snapshot)
+                else:
+                    self._append_journal(pending)
+            except Exception:
+                with lock:
+                    self.dirty = True
+                    if not compact:
+                        self._pending[:0] = pending
+                raise
+            self.stats['last_write_ms'] = (time.perf_counter() - start) * 1000
+            return True
+
+    def _write_snapshot(self, snapshot: str):
+        tmp_file = self.state_file.with_suffix(self.state_file.suffix + '.tmp')
+        with open(tmp_file, 'w') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+
+        # El snapshot ya incluye todo lo registrado en el diario (un cierre
+        # justo antes de borrarlo solo podría duplicar entradas 'append')
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        self._journal_ops = 0
+        self.stats['snapshots'] += 1
+        self.stats['last_snapshot_bytes'] = len(snapshot)
+
+    def _append_journal(self, lines: List[str]):
+        if not lines:
+            return
+        with open(self.journal_file, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_ops += len(lines)
+        self.stats['journal_writes'] += 1
+        self.stats['ops_logged'] += len(lines)
+
+    # Lectura
+
+    def load(self) -> Optional[Dict]:
+        """
+        Estado persistido: snapshot más las operaciones del diario
+
+        Returns:
+            Dict de estado o None si no hay nada guardado
+        """
+        state = None
+        if self.state_file.exists():
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+
+        if self.journal_file.exists():
+            state = state if state is not None else {}
+            replayed = 0
+            with open(self.journal_file, 'r') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        # Última línea incompleta por un cierre abrupto
+                        logger.warning(f"Diario de estado truncado en la operación {replayed + 1}")
+                        break
+                    apply_operation(state, op)
+                    replayed += 1
+            self._journal_ops = replayed
+            self.stats['ops_replayed'] = replayed
+            if replayed:
+                logger.info(f"Diario de estado: {replayed} operaciones reaplicadas")
+
+        return state
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de persistencia"""
+        return {**self.stats, 'pending_ops': len(self._pending), 'journal_ops': self._journal_ops}
+
+def apply_operation(state: Dict, op: Dict):
+    """Aplicar una operación del diario sobre el estado"""
+    path = op['path']
+    target = state
+    for key in path[:-1]:
+        key = _resolve_key(target, key)
+        if not isinstance(target.get(key), dict):
+            if op['op'] == 'del':
+                return
+            target[key] = {}
+        target = target[key]
+
+    key = _resolve_key(target, path[-1])
+    if op['op'] == 'set':
+        target[key] = op['value']
+    elif op['op'] == 'append':
+        items = target.get(key)
+        items = items if isinstance(items, list) else []
+        items.append(op['value'])
+        if op.get('max_len'):
+            items = items[-op['max_len']:]
+        target[key] = items
+    elif op['op'] == 'del':
+        target.pop(key, None)
+
+def _resolve_key(target: Dict, key):
+    # Las claves numéricas del snapshot JSON vuelven como texto
+    if key not in target and not isinstance(key, str) and str(key) in target:
+        return str(key)
+    return key
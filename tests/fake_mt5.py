@@ -0,0 +1,93 @@
+"""
+Fake MetaTrader5 module for multi-account tests
+Mimics the session-per-process behaviour of the real API
+"""
+from collections import namedtuple
+
+AccountInfo = namedtuple('AccountInfo', 'login balance equity server')
+TradePosition = namedtuple('TradePosition', 'ticket symbol type volume price_open price_current sl tp profit')
+Tick = namedtuple('Tick', 'bid ask time')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price comment request')
+
+ACCOUNTS = {
+    1001: {
+        'password': 'pw1001',
+        'balance': 1000.0,
+        'positions': [
+            TradePosition(1, 'EURUSD', 0, 0.1, 1.1000, 1.1010, 1.0950, 1.1100, 10.0),
+            TradePosition(2, 'XAUUSD', 1, 0.01, 2400.0, 2395.0, 0.0, 0.0, 5.0),
+        ],
+    },
+    1002: {
+        'password': 'pw1002',
+        'balance': 2500.0,
+        'positions': [],
+    },
+}
+
+_state = {'initialized': False, 'login': None, 'logins': 0}
+
+def initialize(path=None, **kwargs):
+    _state['initialized'] = True
+    return True
+
+def login(login, password=None, server=None, **kwargs):
+    account = ACCOUNTS.get(login)
+    if not _state['initialized'] or account is None or account['password'] != password:
+        return False
+    _state['login'] = login
+    _state['logins'] += 1
+    return True
+
+def shutdown():
+    _state['initialized'] = False
+    _state['login'] = None
+
+def last_error():
+    return (1, 'Success') if _state['login'] else (-6, 'Authorization failed')
+
+def account_info():
+    if not _state['initialized'] or _state['login'] is None:
+        return None
+    account = ACCOUNTS[_state['login']]
+    return AccountInfo(_state['login'], account['balance'], account['balance'], 'Fake-Server')
+
+def positions_get(ticket=None, **kwargs):
+    if account_info() is None:
+        return None
+    positions = ACCOUNTS[_state['login']]['positions']
+    return tuple(p for p in positions if ticket is None or p.ticket == ticket)
+
+def symbol_info_tick(symbol):
+    if not _state['initialized']:
+        return None
+    return Tick(1.0, 1.0001, 1700000000)
+
+TIMEFRAME_H1 = 16385
+
+def copy_rates_from_pos(symbol, timeframe, start, count):
+    if not _state['initialized']:
+        return None
+    return [(1700000000 + 3600 * i, 1.0, 1.001, 0.999, 1.0, 100, 10, 0) for i in range(count)]
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+
+def order_send(request):
+    if account_info() is None:
+        return None
+    positions = ACCOUNTS[_state['login']]['positions']
+    matches = [i for i, p in enumerate(positions) if p.ticket == request.get('position')]
+    if not matches:
+        return OrderSendResult(TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, 'Invalid request', request)
+    i = matches[0]
+    if request['action'] == TRADE_ACTION_SLTP:
+        positions[i] = positions[i]._replace(sl=request['sl'], tp=request['tp'])
+        return OrderSendResult(TRADE_RETCODE_DONE, 0, 0, 0.0, 0.0, 'Request executed', request)
+    position = positions.pop(i)
+    return OrderSendResult(TRADE_RETCODE_DONE, position.ticket + 100, position.ticket + 100,
+                           position.volume, request['price'], 'Request executed', request)
@@ -0,0 +1,79 @@
+"""
+Tests del dimensionado de EliteRiskManager con valores por lote y cierres diarios de MT5 (simulador)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.broker import mt5_simulator
+from src.broker.mt5_simulator import MT5Simulator, TIMEFRAME_D1
+
+mt5_simulator.install()
+
+from src.risk.elite_risk_manager import EliteRiskManager
+
+START = 1672531200  # 2023-01-01 00:00 UTC
+DAYS = 300
+
+def daily_bars(price, vol, shocks):
+    close = price * np.exp(np.cumsum(vol * shocks))
+    return pd.DataFrame({'time': START + 86400 * np.arange(DAYS), 'open': close, 'high': close * 1.001,
+                         'low': close * 0.999, 'close': close, 'tick_volume': 100})
+
+def make_sim():
+    rng = np.random.default_rng(11)
+    common = rng.normal(size=DAYS)
+    sim = MT5Simulator(warmup=280 * 86400)
+    sim.load_bars('EURUSD', daily_bars(1.1, 0.005, common + 0.3 * rng.normal(size=DAYS)), TIMEFRAME_D1)
+    sim.load_bars('GBPUSD', daily_bars(1.3, 0.005, common + 0.3 * rng.normal(size=DAYS)), TIMEFRAME_D1)
+    sim.load_bars('XAUUSD', daily_bars(2000, 0.01, rng.normal(size=DAYS)), TIMEFRAME_D1)
+    sim.initialize()
+    mt5_simulator.set_simulator(sim)
+    return sim
+
+def make_manager(sim):
+    return EliteRiskManager(initial_capital=10000, var_paths=5000, mt5_module=sim)
+
+def test_point_value_comes_from_symbol_info():
+    manager = make_manager(make_sim())
+    assert manager.point_value('EURUSD') == pytest.approx(100000)
+    assert manager.point_value('XAUUSD') == pytest.approx(100)
+    assert manager.point_value('UNKNOWN') is None
+
+    # Riesgo de 200: SL de 10 pips en EURUSD (100 por lote) y de 10 dólares en XAUUSD (1000 por lote)
+    eurusd = manager.calculate_position_size('EURUSD', 1.1, 1.099, confidence=100, volatility=0)
+    xauusd = manager.calculate_position_size('XAUUSD', 2000, 1990, confidence=100, volatility=0)
+    assert eurusd.base_size == 2.0 and xauusd.base_size == 0.2
+
+def test_unknown_symbol_gets_min_size():
+    manager = make_manager(make_sim())
+    sizing = manager.calculate_position_size('UNKNOWN', 100, 99, confidence=100, volatility=0)
+    assert sizing.final_size == sizing.min_size
+
+def test_sizing_syncs_daily_closes_and_caps_by_portfolio_var():
+    sim = make_sim()
+    manager = make_manager(sim)
+    manager.open_positions = [{'symbol': 'GBPUSD', 'direction': 'BUY', 'size': 2.0, 'entry_price': 1.3}]
+    manager.max_portfolio_risk = 0.05
+
+    sizing = manager.calculate_position_size('EURUSD', 1.1, 1.09, confidence=100, volatility=0, direction='BUY')
+    assert manager.risk_engine.has_data(['EURUSD', 'GBPUSD'])
+    assert manager.risk_engine.covariance.correlation('EURUSD', 'GBPUSD') > 0.8
+
+    # GBPUSD ya consume casi todo el límite: la nueva posición correlacionada queda recortada
+    uncapped = make_manager(sim).calculate_position_size('EURUSD', 1.1, 1.09, confidence=100, volatility=0)
+    assert sizing.final_size < uncapped.final_size
+
+    risk = manager.calculate_portfolio_risk()
+    assert risk['unpriced'] == [] and risk['var'][0.99] > 0
+
+    # Un día más: solo se añade la barra nueva de cada símbolo
+    calls = sim.calls['copy_rates_from_pos']
+    sim.advance(86400)
+    assert manager.sync_prices(force=True) == 2
+    assert sim.calls['copy_rates_from_pos'] == calls + 2
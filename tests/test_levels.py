@@ -0,0 +1,56 @@
+"""
+Tests del motor de niveles con ventanas solapadas y vela en formación
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.levels import LevelEngine, fractal_pivots
+
+def make_bars(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    return pd.DataFrame({'time': pd.date_range('2025-01-01', periods=n, freq='5min'),
+                         'high': close + 0.002 * rng.random(n), 'low': close - 0.002 * rng.random(n),
+                         'close': close, 'volume': rng.integers(1, 100, n).astype(float)})
+
+def forming(bar):
+    """Versión parcial de una barra: rango estrecho alrededor de la apertura"""
+    partial = bar.copy()
+    partial['high'] = partial['low'] = partial['close'] = (bar['high'] + bar['low']) / 2
+    return partial
+
+def test_forming_bar_is_replaced_when_it_closes():
+    bars = make_bars()
+    engine = LevelEngine(max_bars=100)
+
+    # Cada ventana trae la barra anterior ya cerrada y la siguiente aún en formación
+    for end in range(40, len(bars) + 1):
+        window = bars.iloc[end - 40:end].copy()
+        window.iloc[-1] = forming(window.iloc[-1])
+        engine.update('EURUSD', 'M5', window)
+        engine.update('EURUSD', 'M5', bars.iloc[end - 40:end])
+
+    reference = LevelEngine(max_bars=100)
+    for end in range(40, len(bars) + 1):
+        reference.update('EURUSD', 'M5', bars.iloc[end - 40:end])
+    assert engine.pivots('EURUSD', 'M5') == reference.pivots('EURUSD', 'M5')
+    assert engine.levels('EURUSD', 'M5') == reference.levels('EURUSD', 'M5')
+
+    retained = bars.tail(len(engine.bars('EURUSD', 'M5')['high']))
+    assert np.array_equal(engine.bars('EURUSD', 'M5')['high'], retained['high'].to_numpy())
+
+def test_pivots_match_batch_detection():
+    bars = make_bars()
+    engine = LevelEngine()
+    engine.update('EURUSD', 'M5', bars.iloc[:150])
+    engine.update('EURUSD', 'M5', bars.iloc[100:])
+
+    pivot_highs, pivot_lows = fractal_pivots(bars['high'].to_numpy(), bars['low'].to_numpy())
+    pivots = engine.pivots('EURUSD', 'M5')
+    assert [p[0] for p in pivots['highs']] == list(pivot_highs)
+    assert [p[0] for p in pivots['lows']] == list(pivot_lows)
@@ -0,0 +1,101 @@
+"""
+Tests de la caché semántica de decisiones LLM
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai.llm_cache import FeatureQuantizer, LLMDecisionCache, level_distances
+
+def test_quantized_snapshots_share_bucket():
+    quantizer = FeatureQuantizer()
+    base = {'symbol': 'XAUUSD', 'price': 2650.0, 'rsi': 51.0, 'macd': 0.150, 'trend': 'alcista',
+            'analysis': 'Texto libre largo que cambia en cada ciclo con números 2650.12'}
+    near = dict(base, price=2650.8, rsi=54.9, macd=0.155,
+                analysis='  texto libre largo que cambia en cada ciclo\ncon números 2650.12 ')
+
+    assert quantizer.quantize(base) == quantizer.quantize(near)
+    assert quantizer.quantize(base) != quantizer.quantize(dict(base, rsi=56.0))
+    assert quantizer.quantize(base) != quantizer.quantize(dict(base, macd=-0.15))
+    assert quantizer.quantize(base) != quantizer.quantize(dict(base, trend='bajista'))
+
+def test_long_text_changes_the_key():
+    quantizer = FeatureQuantizer()
+    bullish = {'symbol': 'XAUUSD', 'rsi': 51.0, 'analysis': 'Ruptura alcista confirmada con volumen creciente'}
+    bearish = dict(bullish, analysis='Rechazo bajista en resistencia con divergencia en RSI')
+    assert quantizer.quantize(bullish) != quantizer.quantize(bearish)
+
+def test_price_like_fields_use_price_step():
+    quantizer = FeatureQuantizer()
+    base = {'price': 2650.0, 'ema_20': 2640.0, 'support': 2600.0, 'bb_upper': 2680.0}
+    # Un 0.3% de diferencia cambia la cubeta (paso del precio, no el 5% por defecto)
+    for name in ('ema_20', 'support', 'bb_upper'):
+        assert quantizer.quantize(base) != quantizer.quantize(dict(base, **{name: base[name] * 1.003}))
+    assert quantizer.quantize(base) == quantizer.quantize(dict(base, ema_20=2640.5))
+    assert quantizer.quantize({'volume_ratio_x': 1.0}) == quantizer.quantize({'volume_ratio_x': 1.003})
+
+def test_level_distances_in_atr_units():
+    distances = level_distances(100.0, {'vwap': 99.0, 'poc': None}, 2.0)
+    assert distances == {'vwap': {'dist_atr': 0.5}}
+
+def test_lru_and_ttl():
+    cache = LLMDecisionCache(max_entries=2, ttl=0.05)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # expulsa 'b' (menos usada)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1 and stats['expirations'] >= 1
+
+def test_inflight_requests_are_coalesced():
+    cache = LLMDecisionCache()
+    calls = []
+    release = threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        release.wait(2)
+        return {'signal': 'HOLD'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', slow_call)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'signal': 'HOLD'}] * 5
+    assert cache.get_or_compute('k', slow_call) == {'signal': 'HOLD'}
+    stats = cache.get_stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 4 and stats['hits'] == 1
+    assert stats['hit_rate'] == 5 / 6
+
+def test_async_coalescing_and_uncacheable_results():
+    cache = LLMDecisionCache()
+    calls = []
+
+    async def model_call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return None
+
+    async def run():
+        return await asyncio.gather(*[cache.aget_or_compute('k', model_call) for _ in range(3)])
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert len(calls) == 1
+    # None no se cachea: la siguiente petición vuelve a llamar al modelo
+    asyncio.run(cache.aget_or_compute('k', model_call))
+    assert len(calls) == 2
@@ -0,0 +1,129 @@
+"""
+Tests del simulador MetaTrader5 con datos sintéticos
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.broker import mt5_simulator
+from src.broker.mt5_simulator import MT5Simulator
+
+START = 1704067200  # 2024-01-01 00:00 UTC
+
+def make_bars(n=120, step=0.0001):
+    """Barras M1 con tendencia alcista constante"""
+    close = np.round(1.1000 + step * np.arange(1, n + 1), 5)
+    open_ = np.r_[1.1000, close[:-1]]
+    return pd.DataFrame({'time': START + 60 * np.arange(n), 'open': open_, 'high': close + 0.00005,
+                         'low': open_ - 0.00005, 'close': close, 'tick_volume': 10, 'spread': 10})
+
+def make_sim(**kwargs):
+    sim = MT5Simulator(warmup=3600, **kwargs)
+    sim.load_bars('EURUSD', make_bars())
+    sim.initialize()
+    return sim
+
+def test_rates_have_no_lookahead_and_aggregate_timeframes():
+    sim = make_sim()
+    rates = sim.copy_rates_from_pos('EURUSD', mt5_simulator.TIMEFRAME_M5, 0, 3)
+
+    # A las 01:00 la barra M5 en curso solo tiene su apertura
+    assert list(rates['time']) == [START + 3000, START + 3300, START + 3600]
+    assert rates['close'][-1] == rates['open'][-1] == sim.symbol_info_tick('EURUSD').bid
+    completed = rates[-2]
+    m1 = make_bars().iloc[55:60]
+    assert completed['open'] == m1['open'].iloc[0] and completed['close'] == m1['close'].iloc[-1]
+    assert completed['high'] == round(m1['high'].max(), 5) and completed['tick_volume'] == 50
+
+    sim.advance(120)
+    assert sim.copy_rates_from_pos('EURUSD', mt5_simulator.TIMEFRAME_M1, 0, 1)['time'][0] == START + 3720
+    assert len(sim.copy_ticks_from('EURUSD', START + 3600, 100)) == 4 * 2 + 1
+
+def test_market_order_latency_slippage_and_take_profit():
+    sim = make_sim(latency_ms=20000, slippage_points=2)
+    tick = sim.symbol_info_tick('EURUSD')
+    result = sim.order_send({'action': mt5_simulator.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1,
+                             'type': mt5_simulator.ORDER_TYPE_BUY, 'tp': round(tick.bid + 0.0005, 5), 'magic': 1})
+
+    # Se llena con el tick 20 s después (mínimo de la barra) al ask, más 2 puntos
+    assert result.retcode == mt5_simulator.TRADE_RETCODE_DONE
+    assert result.price == round(1.10595 + 0.0001 + 0.00002, 5)
+
+    sim.advance(10 * 60)
+    assert sim.positions_total() == 0
+    exit_deal = sim.history_deals_get(START, START + 86400)[-1]
+    assert exit_deal.reason == mt5_simulator.DEAL_REASON_TP and exit_deal.profit > 0
+    assert sim.account_info().balance == round(10000 + exit_deal.profit, 2)
+
+def test_stop_loss_ignores_ticks_before_a_delayed_fill():
+    bid = np.full(60, 1.1000)
+    bid[5] = 1.0980   # caída antes de que la orden se llene
+    bid[20:] = 1.1010
+    sim = MT5Simulator(latency_ms=20000)
+    sim.load_ticks('EURUSD', pd.DataFrame({'time': START + np.arange(60), 'bid': bid, 'ask': bid + 0.0001}))
+    sim.initialize()
+
+    result = sim.order_send({'action': mt5_simulator.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1,
+                             'type': mt5_simulator.ORDER_TYPE_BUY, 'sl': 1.0990})
+    assert result.retcode == mt5_simulator.TRADE_RETCODE_DONE and result.price == 1.1011
+
+    # La posición nace a +20 s: la caída de +5 s no puede cerrarla
+    sim.advance(30)
+    assert sim.positions_total() == 1
+    assert [deal.entry for deal in sim.history_deals_get(START, START + 86400)] == [mt5_simulator.DEAL_ENTRY_IN]
+
+def test_tick_table_with_only_time_msc():
+    stamps = START * 1000 + 250 * np.arange(8)
+    sim = MT5Simulator()
+    assert sim.load_ticks('EURUSD', pd.DataFrame({'time_msc': stamps, 'bid': 1.1, 'ask': 1.1001})) == 8
+    sim.initialize()
+    sim.step(3)
+    tick = sim.symbol_info_tick('EURUSD')
+    assert tick.time_msc == START * 1000 + 750 and tick.time == START
+
+    with pytest.raises(ValueError, match='columna de tiempo'):
+        sim.load_ticks('GBPUSD', pd.DataFrame({'bid': [1.3], 'ask': [1.3001]}))
+
+def test_pending_order_and_validation():
+    sim = make_sim()
+    price = sim.symbol_info_tick('EURUSD').ask
+    placed = sim.order_send({'action': mt5_simulator.TRADE_ACTION_PENDING, 'symbol': 'EURUSD', 'volume': 0.1,
+                             'type': mt5_simulator.ORDER_TYPE_BUY_STOP, 'price': round(price + 0.0003, 5)})
+    assert placed.retcode == mt5_simulator.TRADE_RETCODE_PLACED and sim.orders_total() == 1
+
+    sim.advance(5 * 60)
+    assert sim.orders_total() == 0 and sim.positions_get()[0].ticket == placed.order
+
+    bad_volume = sim.order_send({'action': mt5_simulator.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.015,
+                                 'type': mt5_simulator.ORDER_TYPE_SELL})
+    assert bad_volume.retcode == mt5_simulator.TRADE_RETCODE_INVALID_VOLUME
+    assert sim.get_stats()['calls']['order_send'] == 2
+
+def test_install_replaces_metatrader5_and_reads_mt5_tick_export(tmp_path):
+    stamps = pd.date_range('2024-01-01', periods=8, freq='500ms')
+    pd.DataFrame({'<DATE>': stamps.strftime('%Y.%m.%d'), '<TIME>': stamps.strftime('%H:%M:%S.%f').str[:-3],
+                  '<BID>': 2050 + np.arange(8) * 0.1, '<ASK>': 2050.3 + np.arange(8) * 0.1}
+                 ).to_csv(tmp_path / 'XAUUSD_ticks.csv', sep='\t', index=False)
+
+    previous = sys.modules.get('MetaTrader5')
+    try:
+        sim = mt5_simulator.install(data_dir=tmp_path)
+        import MetaTrader5 as mt5
+        assert mt5 is mt5_simulator
+        assert mt5.symbol_info_tick('XAUUSD') is None and mt5.last_error()[0] == -10004
+        assert mt5.initialize()
+        assert mt5.symbol_info('XAUUSD').digits == 2
+        assert mt5.symbol_info_tick('XAUUSD').bid == 2050.0
+        sim.step(3)
+        assert mt5.symbol_info_tick('XAUUSD').time_msc == START * 1000 + 1500
+    finally:
+        mt5_simulator.set_simulator(MT5Simulator())
+        if previous is None:
+            sys.modules.pop('MetaTrader5', None)
+        else:
+            sys.modules['MetaTrader5'] = previous
@@ -0,0 +1,144 @@
+"""
+Tests de la caché de snapshot MT5 sobre el simulador
+"""
+import sys
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.broker import mt5_simulator
+from src.broker.mt5_simulator import MT5Simulator
+
+mt5_simulator.install()
+
+# Cargar src/core sin su __init__ (arrastra dependencias de todo el bot)
+if 'core' not in sys.modules:
+    _core = types.ModuleType('core')
+    _core.__path__ = [str(ROOT / 'src' / 'core')]
+    sys.modules['core'] = _core
+
+from core.mt5_connection import MT5ConnectionManager
+from core.mt5_snapshot import MT5Snapshot
+
+START = 1704067200  # 2024-01-01 00:00 UTC
+
+def make_sim():
+    close = np.round(1.1000 + 0.0001 * np.arange(1, 121), 5)
+    bars = pd.DataFrame({'time': START + 60 * np.arange(120), 'open': np.r_[1.1000, close[:-1]],
+                         'high': close + 0.00005, 'low': close - 0.00015, 'close': close,
+                         'tick_volume': 10, 'spread': 10})
+    sim = MT5Simulator(warmup=3600)
+    sim.load_bars('EURUSD', bars)
+    sim.load_bars('GBPUSD', bars.assign(open=bars.open + 0.17, high=bars.high + 0.17,
+                                        low=bars.low + 0.17, close=bars.close + 0.17))
+    sim.initialize()
+    mt5_simulator.set_simulator(sim)
+    return sim
+
+def make_manager():
+    manager = MT5ConnectionManager(liveness_ttl=5.0)
+    manager.connected = True
+    return manager
+
+def test_repeated_queries_share_one_sweep():
+    sim = make_sim()
+    snapshot = MT5Snapshot(make_manager(), ttl=60, mt5_module=sim)
+
+    for _ in range(5):
+        assert snapshot.account_info(caller='risk').balance == 10000.0
+        assert snapshot.positions_get(caller='risk') == ()
+        assert snapshot.symbol_info_tick('EURUSD', caller='signals').bid > 1.1
+    assert snapshot.symbol_info_tick('GBPUSD', caller='signals').bid > 1.2
+
+    # Cada dato nuevo se pide una vez; lo aún fresco no se repite en la pasada
+    assert sim.calls['account_info'] == 1
+    assert sim.calls['positions_get'] == 1
+    assert sim.calls['symbol_info_tick'] == 2
+    assert sim.calls['terminal_info'] == 1
+
+    stats = snapshot.get_stats()
+    assert stats['sweeps'] == 3 and stats['hits'] == 13
+    assert stats['callers']['risk'] == {'account_info': 5, 'positions_get': 5, 'hits': 9, 'misses': 1}
+    assert stats['callers']['signals']['symbol_info_tick'] == 6
+    assert stats['watched_symbols'] == ['EURUSD', 'GBPUSD']
+
+def test_ttl_expiry_refreshes_everything_in_one_pass():
+    sim = make_sim()
+    snapshot = MT5Snapshot(make_manager(), ttl=0.05, mt5_module=sim)
+    snapshot.watch(['EURUSD', 'GBPUSD'])
+    first = snapshot.symbol_info_tick('EURUSD')
+
+    sim.advance(60)
+    time.sleep(0.06)
+    assert snapshot.account_info() is not None
+    calls = dict(sim.calls)
+
+    # La cuenta caducada trajo también los ticks vigilados
+    assert snapshot.symbol_info_tick('EURUSD').bid > first.bid
+    assert snapshot.symbol_info_tick('GBPUSD') is not None
+    assert dict(sim.calls) == calls
+    assert snapshot.get_stats()['callers'][__name__]['symbol_info_tick'] == 3
+
+def test_order_send_invalidates_positions_and_account():
+    sim = make_sim()
+    snapshot = MT5Snapshot(make_manager(), ttl=60, mt5_module=sim)
+    assert snapshot.positions_get(symbol='EURUSD') == ()
+
+    result = snapshot.order_send({'action': mt5_simulator.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1,
+                                  'type': mt5_simulator.ORDER_TYPE_BUY, 'magic': 7})
+    assert result.retcode == mt5_simulator.TRADE_RETCODE_DONE
+
+    positions = snapshot.positions_get(symbol='EURUSD')
+    assert [p.ticket for p in positions] == [result.order]
+    assert snapshot.positions_get(ticket=result.order) == positions
+    assert snapshot.positions_get(symbol='GBPUSD') == ()
+    assert snapshot.account_info().margin > 0
+    assert sim.calls['positions_get'] == 2
+
+def test_reconnect_discards_cached_session():
+    sim = make_sim()
+    manager = make_manager()
+    snapshot = MT5Snapshot(manager, ttl=60, mt5_module=sim)
+    snapshot.account_info()
+    snapshot.account_info()
+
+    manager.last_connection = 'new-session'
+    snapshot.account_info()
+
+    assert sim.calls['account_info'] == 2
+    assert snapshot.get_stats()['reconnect_invalidations'] == 1
+
+def test_none_results_do_not_count_as_alive():
+    sim = make_sim()
+    manager = make_manager()
+    snapshot = MT5Snapshot(manager, ttl=0, mt5_module=sim)
+    assert snapshot.account_info() is not None
+    assert manager.last_alive > 0
+
+    # Terminal caído: las llamadas devuelven None sin lanzar excepción
+    sim.shutdown()
+    assert snapshot.account_info() is None
+    assert manager.last_alive == 0.0
+
+    # La siguiente verificación consulta terminal_info en lugar de confiar en liveness_ttl
+    probes = sim.calls['terminal_info']
+    assert not manager.is_connected()
+    assert sim.calls['terminal_info'] == probes + 1
+
+def test_heartbeat_check_ignores_liveness_ttl():
+    sim = make_sim()
+    manager = make_manager()
+    manager.last_alive = time.monotonic()
+    assert manager.is_connected()
+    assert sim.calls['terminal_info'] == 0
+
+    sim.shutdown()
+    assert manager.is_connected()  # atajo de liveness_ttl
+    assert not manager.is_connected(force=True)
+    assert sim.calls['terminal_info'] == 1
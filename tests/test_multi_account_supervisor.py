@@ -0,0 +1,105 @@
+"""
+Tests del supervisor multi-cuenta con un módulo MT5 falso
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.broker import mt5_simulator
+
+# El proceso principal no usa MT5, pero trade_validator lo importa
+mt5_simulator.install()
+
+from multi_account_supervisor import AccountSupervisor, aggregate_snapshots
+from enhanced_modules.trade_validator import TradeAnalysis, TradeValidator
+
+ACCOUNTS = {
+    'cuenta_a': {'login': 1001, 'password': 'pw1001', 'server': 'Fake-Server', 'active': True},
+    'cuenta_b': {'login': 1002, 'password': 'pw1002', 'server': 'Fake-Server', 'active': True},
+    'cuenta_c': {'login': 1003, 'password': 'x', 'server': 'Fake-Server', 'active': False},
+}
+
+def test_workers_keep_session_between_cycles():
+    supervisor = AccountSupervisor(ACCOUNTS, mt5_module='fake_mt5', snapshot_timeout=20)
+    try:
+        first = supervisor.collect_snapshots()
+        second = supervisor.collect_snapshots()
+    finally:
+        supervisor.stop()
+
+    assert set(second) == {'cuenta_a', 'cuenta_b'}
+    for name in second:
+        assert second[name]['status'] == 'CONNECTED'
+        # Un solo login por worker aunque haya varios ciclos
+        assert second[name]['connects'] == 1
+        assert second[name]['pid'] == first[name]['pid']
+    assert first['cuenta_a']['pid'] != first['cuenta_b']['pid']
+
+def test_aggregate_reports_unprotected_positions():
+    supervisor = AccountSupervisor(ACCOUNTS, mt5_module='fake_mt5', snapshot_timeout=20)
+    try:
+        summary = aggregate_snapshots(supervisor.collect_snapshots())
+    finally:
+        supervisor.stop()
+
+    assert summary['total_positions'] == 2
+    assert summary['total_problems'] == 1
+    assert [(name, pos['ticket']) for name, pos in summary['unprotected']] == [('cuenta_a', 2)]
+    balances = {a['name']: a['balance'] for a in summary['account_summary']}
+    assert balances == {'cuenta_a': 1000.0, 'cuenta_b': 2500.0}
+
+def test_failed_login_reported_as_disconnected():
+    accounts = {'mala': {'login': 1001, 'password': 'wrong', 'server': 'Fake-Server'}}
+    supervisor = AccountSupervisor(accounts, mt5_module='fake_mt5', snapshot_timeout=20)
+    try:
+        snapshots = supervisor.collect_snapshots()
+    finally:
+        supervisor.stop()
+
+    assert snapshots['mala']['status'] == 'DISCONNECTED'
+    assert aggregate_snapshots(snapshots)['account_summary'][0]['status'] == 'DISCONNECTED'
+
+def test_snapshot_carries_market_data_for_unprotected_symbols():
+    supervisor = AccountSupervisor(ACCOUNTS, mt5_module='fake_mt5', snapshot_timeout=20)
+    try:
+        snapshots = supervisor.collect_snapshots()
+    finally:
+        supervisor.stop()
+
+    market = snapshots['cuenta_a']['market']
+    # Solo XAUUSD tiene una posición sin SL/TP
+    assert list(market) == ['XAUUSD']
+    assert market['XAUUSD']['source'] == 'mt5'
+    assert market['XAUUSD']['current_price'] == 1.0 and len(market['XAUUSD']['rates']) == 50
+
+def test_approve_and_close_run_in_account_worker():
+    supervisor = AccountSupervisor(ACCOUNTS, mt5_module='fake_mt5', snapshot_timeout=20)
+    validator = TradeValidator(order_executor=supervisor.send_order)
+
+    def pending(code, ticket, recommendation):
+        validator.pending_validations[code] = TradeAnalysis(
+            ticket, 'XAUUSD', 'SELL', True, 0.8, [], 2410.0, 2380.0, {}, recommendation, account='cuenta_a'
+        )
+
+    try:
+        first = supervisor.collect_snapshots()
+        pending('VAL2', 2, 'MODIFY')
+        pending('VAL1', 1, 'KEEP')
+        approved = asyncio.run(validator.process_telegram_command('APPROVE VAL2'))
+        closed = asyncio.run(validator.process_telegram_command('CLOSE VAL1'))
+        unknown = supervisor.send_order('cuenta_c', 'close', {'ticket': 1})
+        second = supervisor.collect_snapshots()
+    finally:
+        supervisor.stop()
+
+    assert approved == '✅ SL/TP aplicados a #2'
+    assert closed == '✅ Posición #1 cerrada'
+    assert unknown['status'] == 'UNKNOWN_ACCOUNT'
+    # Las órdenes se ejecutaron en la sesión del worker de cuenta_a
+    snapshot = second['cuenta_a']
+    assert snapshot['pid'] == first['cuenta_a']['pid'] and snapshot['connects'] == 1
+    assert [(p['ticket'], p['sl'], p['tp']) for p in snapshot['positions']] == [(2, 2410.0, 2380.0)]
+    assert snapshot['unprotected'] == []
@@ -0,0 +1,74 @@
+"""
+Tests del ensemble concurrente de OllamaAdvanced con un cliente en streaming falso
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai.ollama_advanced import _NO_RESULTS, OllamaAdvanced
+
+RESPONSE = ("<think>ACTION: SELL\nREASONING: draft</think>"
+            "ACTION: BUY\nENTRY: 1.1000\nSL: 1.0950\nTP1: 1.1050\nTP2: 1.1100\nTP3: 1.1150\n"
+            "CONFIDENCE: 80%\nRRR: 2\nPOSITION_SIZE: 0.05 lots\nREASONING: " + "detail " * 200)
+
+class FakeStream:
+    """Respuesta troceada por líneas y palabras, con retardo por trozo"""
+    def __init__(self, delay):
+        self.delay = delay
+        self.chunks_read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for token in RESPONSE.replace('\n', '\n ').split(' '):
+            time.sleep(self.delay)
+            self.chunks_read += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token + ' '))])
+
+    def close(self):
+        self.closed = True
+
+class FakeClient:
+    def __init__(self, delays):
+        self.delays = delays
+        self.streams = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, temperature, max_tokens, stream, **options):
+        assert stream and options['extra_body']['keep_alive']
+        self.streams[model] = FakeStream(self.delays[model])
+        return self.streams[model]
+
+def make_ai(delays):
+    ai = OllamaAdvanced()
+    ai.client = FakeClient(delays)
+    ai.models = {name: {'specialty': 'test', 'weight': 1.0, 'timeout': 20} for name in delays}
+    ai.latency = {}
+    return ai
+
+def test_stream_stops_once_decision_is_complete():
+    ai = make_ai({'fast': 0.0})
+    result = asyncio.run(ai.analyze_with_model_async('fast', 'prompt'))
+
+    stream = ai.client.streams['fast']
+    assert result['action'] == 'BUY' and result['position_size'] == 0.05
+    assert stream.closed and stream.chunks_read < 40  # no lee el razonamiento
+    assert ai.get_model_stats()['fast']['answered'] == 1
+
+def test_quorum_skips_slow_model_and_deadline_counts_as_timeout():
+    ai = make_ai({'fast': 0.001, 'mid': 0.002, 'slow': 0.05})
+    signal = asyncio.run(ai._run_ensemble('EURUSD', {}))
+
+    assert signal.action == 'BUY'
+    assert signal.reasoning == 'Ensemble consensus from 2 models'
+    assert ai.get_model_stats()['slow']['cancelled'] == 1
+    assert ai.effective_weight('slow', 1.0) == 1.0  # cortar por quórum no penaliza
+
+    ai.models = {'slow': ai.models['slow']}
+    ai.ensemble_deadline = 0.05
+    assert asyncio.run(ai._run_ensemble('EURUSD', {})) is _NO_RESULTS
+    assert ai.get_model_stats()['slow']['timeouts'] == 1
+    assert ai.effective_weight('slow', 1.0) < 1.0
@@ -0,0 +1,119 @@
+"""
+Tests de la pasada de gestión de posiciones con un MT5 falso
+"""
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.risk.position_pass import (PositionManagementPass, breakeven_targets,
+                                    merge_targets, trailing_targets)
+
+Position = namedtuple('Position', 'ticket symbol type volume price_open price_current sl tp profit magic time')
+SymbolInfo = namedtuple('SymbolInfo', 'bid ask point digits')
+OrderResult = namedtuple('OrderResult', 'retcode comment')
+
+class FakeMT5:
+    """Subconjunto de la API de MetaTrader5 que usa la pasada, con contadores"""
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_ACTION_SLTP = 6
+    TRADE_RETCODE_DONE = 10009
+    TIMEFRAME_M5 = 5
+
+    def __init__(self, positions, quotes, rates=None):
+        self.positions = positions
+        self.quotes = quotes
+        self.rates = rates or {}
+        self.calls = {'positions_get': 0, 'symbol_info': 0, 'copy_rates_from_pos': 0}
+        self.orders = []
+
+    def positions_get(self, **filters):
+        self.calls['positions_get'] += 1
+        symbol = filters.get('symbol')
+        return tuple(p for p in self.positions if symbol is None or p.symbol == symbol)
+
+    def symbol_info(self, symbol):
+        self.calls['symbol_info'] += 1
+        return self.quotes.get(symbol)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start, count):
+        self.calls['copy_rates_from_pos'] += 1
+        rates = self.rates.get(symbol)
+        return None if rates is None else rates[-count:]
+
+    def order_send(self, request):
+        self.orders.append(request)
+        return OrderResult(self.TRADE_RETCODE_DONE, 'done')
+
+def make_fake():
+    positions = [
+        # Compra EURUSD +30 pips sin SL
+        Position(1, 'EURUSD', 0, 0.1, 1.1000, 1.1030, 0.0, 1.1100, 30.0, 1, 0),
+        # Compra EURUSD +5 pips
+        Position(2, 'EURUSD', 0, 0.1, 1.1025, 1.1030, 1.0990, 0.0, 5.0, 1, 0),
+        # Venta XAUUSD +25 puntos (point 0.1) con SL lejano
+        Position(3, 'XAUUSD', 1, 0.01, 2400.0, 2397.5, 2410.0, 0.0, 2.5, 1, 0),
+    ]
+    quotes = {
+        'EURUSD': SymbolInfo(bid=1.1030, ask=1.1031, point=0.0001, digits=5),
+        'XAUUSD': SymbolInfo(bid=2397.4, ask=2397.5, point=0.1, digits=2),
+    }
+    return FakeMT5(positions, quotes)
+
+def test_snapshot_requests_each_symbol_once():
+    fake = make_fake()
+    position_pass = PositionManagementPass(fake)
+    book = position_pass.snapshot()
+
+    assert fake.calls == {'positions_get': 1, 'symbol_info': 2, 'copy_rates_from_pos': 0}
+    assert list(book.ticket) == [1, 2, 3]
+    np.testing.assert_allclose(book.profit_points(), [30.0, 5.0, 25.0])
+
+def test_vectorized_decisions_and_single_order_per_position():
+    fake = make_fake()
+    position_pass = PositionManagementPass(fake)
+    book = position_pass.snapshot()
+
+    breakeven = breakeven_targets(book, trigger_points=20, offset_points=2)
+    trailing = trailing_targets(book, activation_points=20, distance_points=10, step_points=5)
+    np.testing.assert_allclose(breakeven, [1.1002, np.nan, 2399.8])
+    np.testing.assert_allclose(trailing, [1.1020, np.nan, 2398.5])
+
+    results = position_pass.apply(book, merge_targets(book, breakeven, trailing), comments='TEST')
+
+    # Una orden por posición, con el SL más protector ya redondeado
+    assert [order['position'] for order in fake.orders] == [1, 3]
+    assert fake.orders[0]['sl'] == 1.102
+    assert fake.orders[1]['sl'] == 2398.5
+    assert all(outcome['ok'] for outcome in results.values())
+
+def test_trailing_respects_step_and_unchanged_sl_is_not_sent():
+    fake = make_fake()
+    position_pass = PositionManagementPass(fake)
+    book = position_pass.snapshot()
+    book.sl[:] = [1.1018, 1.0990, 2398.5]
+
+    trailing = trailing_targets(book, activation_points=20, distance_points=10, step_points=5)
+    assert np.isnan(trailing[0])  # solo mejora 2 pips
+
+    position_pass.apply(book, np.array([np.nan, np.nan, 2398.5]))
+    assert fake.orders == []
+
+def test_atr_is_fetched_once_per_symbol_within_ttl():
+    fake = make_fake()
+    bars = np.zeros(20, dtype=[('high', float), ('low', float), ('close', float)])
+    bars['high'], bars['low'], bars['close'] = 1.1010, 1.0990, 1.1000
+    fake.rates['EURUSD'] = bars
+    position_pass = PositionManagementPass(fake, atr_period=14, atr_ttl=60)
+
+    for _ in range(3):
+        book = position_pass.snapshot()
+        atr = position_pass.load_atr(book, ['EURUSD'])
+
+    assert fake.calls['copy_rates_from_pos'] == 1
+    assert abs(atr['EURUSD'] - 0.0020) < 1e-12
+    assert position_pass.get_stats()['atr_cache_hits'] == 2
@@ -0,0 +1,51 @@
+"""
+Tests del ensamblado de prompts compactos y sus métricas
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai.prompt_builder import (PromptBuilder, PromptMetrics, compact_number, format_indicators,
+                                   stream_chat, summarize_series)
+
+def test_compact_formatting():
+    assert compact_number(2401.123456, 6) == '2401.12'
+    assert compact_number(0.000123456) == '0.0001235'
+    assert format_indicators({'rsi': 45.1234, 'bb': {'upper': 1.2}, 'closes': [1, 2]}) == 'rsi=45.12 bb.upper=1.2'
+    assert summarize_series([1, 2, 3, 4, 5]).startswith('n=5 last=5 chg=+400.00% rng=1-5 pos=1.00')
+    assert summarize_series([]) == 'n=0'
+
+def test_budget_drops_lowest_priority_and_keeps_required():
+    builder = PromptBuilder('x' * 35)  # 10 tokens con 3.5 caracteres por token
+    sections = [('header', 'h' * 35, 0), ('low', 'l' * 70, 1), ('high', 'k' * 70, 5)]
+
+    full = builder.build(sections)
+    assert full.dropped == [] and full.estimated_tokens == 10 + 11 + 21 + 21
+
+    fitted = builder.build(sections, budget_tokens=45)
+    assert fitted.dropped == ['low'] and fitted.estimated_tokens <= 45
+    assert fitted.messages()[0] == {'role': 'system', 'content': 'x' * 35}
+
+    tight = builder.build(sections, budget_tokens=15)
+    assert tight.dropped == ['low', 'high', 'header(truncated)']
+    assert tight.estimated_tokens <= 15
+
+def test_stream_chat_measures_ttft_and_calibrates_tokens():
+    def create(model, messages, **options):
+        assert options['stream'] and options['extra_body']['keep_alive']
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+                  for text in ('SEÑAL ', 'FINAL: COMPRA')]
+        chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=20, completion_tokens=2)))
+        return iter(chunks)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    metrics = PromptMetrics()
+    prompt = PromptBuilder('p' * 70).build([('data', 'd' * 70, 0)])
+
+    assert stream_chat(client, 'model', prompt, metrics) == 'SEÑAL FINAL: COMPRA'
+    stats = metrics.get_stats()
+    assert stats['calls'] == 1 and stats['avg_prompt_tokens'] == 20
+    assert stats['last']['prompt_tokens_reported'] and stats['avg_ttft'] is not None
+    assert stats['chars_per_token'] > 3.5  # 140 caracteres / 20 tokens = 7
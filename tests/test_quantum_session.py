@@ -0,0 +1,69 @@
+"""
+Tests de QuantumSession con ventanas solapadas y vela en formación
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.signals.quantum_core import QuantumCore, QuantumSession
+
+def make_bars(n=120, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    return pd.DataFrame({'time': pd.date_range('2025-01-01', periods=n, freq='1h'),
+                         'open': close, 'high': close + rng.random(n), 'low': close - rng.random(n),
+                         'close': close + rng.normal(0, 0.1, n)})
+
+def assert_same_state(a, b):
+    assert a.bars == b.bars and a.last_time == b.last_time
+    assert np.isclose(a.atr, b.atr)
+    assert a.last_signal.action == b.last_signal.action and a.last_signal.confidence == b.last_signal.confidence
+    assert np.isclose(a.last_signal.metrics.action, b.last_signal.metrics.action)
+
+def test_forming_bar_is_replaced_by_its_final_values():
+    bars = make_bars()
+    core = QuantumCore(auto_scaling=True)
+
+    # Ventana 1: la última vela (índice 79) aún en formación
+    forming = bars.iloc[:80].copy()
+    forming.loc[79, ['high', 'low', 'close']] = bars.loc[79, 'open'] + np.array([0.05, -0.05, 0.01])
+    session = QuantumSession(core)
+    session.update_frame(forming)
+
+    # Ventana 2 solapada: la vela 79 ya cerrada y una vela nueva
+    session.update_frame(bars.iloc[20:81])
+
+    reference = QuantumSession(core)
+    reference.update_frame(bars.iloc[:81])
+    assert_same_state(session, reference)
+
+def test_overlapping_windows_without_changes_match_single_pass():
+    bars = make_bars()
+    core = QuantumCore()
+    session = QuantumSession(core)
+    session.update_frame(bars.iloc[:60])
+    for end in range(60, 121, 7):
+        session.update_frame(bars.iloc[max(0, end - 50):end])
+    session.update_frame(bars.iloc[70:120])
+
+    reference = QuantumSession(core)
+    reference.update_frame(bars)
+    assert_same_state(session, reference)
+
+def test_h_uses_rolling_window_of_action():
+    bars = make_bars(n=800, seed=7)
+    session = QuantumSession(QuantumCore(auto_scaling=False), window=500)
+    state = session._state(session.params)
+
+    actions = []
+    for _, bar in bars.iterrows():
+        session.update(bar['high'], bar['low'], bar['close'], timestamp=bar['time'])
+        actions.append(state.action)
+        if len(actions) > 500:
+            expected = np.nanstd(actions[-500:]) * session.core.h_factor
+            assert np.isclose(state.h(session.core.h_factor), expected, rtol=1e-9)
+            assert np.isclose(session.last_signal.metrics.h, expected, rtol=1e-9)
@@ -0,0 +1,109 @@
+"""
+Tests del feed de precios y barras del monitor de riesgo con una conexión MT5 falsa
+"""
+import sys
+import types
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.modules.setdefault('winsound', types.ModuleType('winsound'))
+
+from src.broker import mt5_simulator
+
+mt5_simulator.install()
+
+from src.risk import risk_monitor
+from src.risk.risk_monitor import RiskMonitor
+
+Position = namedtuple('Position', 'ticket symbol type volume price_open price_current sl tp profit')
+Tick = namedtuple('Tick', 'bid ask')
+Account = namedtuple('Account', 'balance equity margin margin_free margin_level')
+
+START = pd.Timestamp('2024-01-01')
+
+class FakeConnection:
+    """Subconjunto de MT5Connection que usa el monitor; las barras avanzan con `advance`"""
+
+    def __init__(self, closes):
+        self.closes = closes  # {symbol: array de cierres}
+        self.bars = 60
+        self.positions = [Position(1, 'EURUSD', 0, 0.1, 1.1, 1.1, 1.09, 1.12, 0.0),
+                          Position(2, 'GBPUSD', 0, 0.1, 1.3, 1.3, 1.29, 1.32, 0.0)]
+        self.calls = {'get_tick': 0, 'get_rates': 0}
+
+    def advance(self, bars=1):
+        self.bars += bars
+
+    def ensure_connected(self):
+        return True
+
+    def get_positions(self):
+        return self.positions
+
+    def get_account_info(self):
+        return Account(10000.0, 10000.0, 100.0, 9900.0, 10000.0)
+
+    def get_tick(self, symbol):
+        self.calls['get_tick'] += 1
+        price = self.closes[symbol][self.bars - 1]
+        return Tick(price, price + 0.0001)
+
+    def get_rates(self, symbol, timeframe, count):
+        self.calls['get_rates'] += 1
+        end = self.bars
+        start = max(0, end - count)
+        times = START + pd.to_timedelta(5 * np.arange(start, end), unit='min')
+        return pd.DataFrame({'close': self.closes[symbol][start:end]}, index=pd.Index(times, name='time'))
+
+class FakeJournal:
+    trades = []
+
+def make_monitor(monkeypatch):
+    monkeypatch.setattr(risk_monitor, 'TelegramNotifier', lambda: None)
+    monkeypatch.setattr(risk_monitor, 'get_journal', FakeJournal)
+    rng = np.random.default_rng(7)
+    common = rng.normal(0, 0.001, 200)
+    closes = {
+        'EURUSD': 1.1 * np.exp(np.cumsum(common + rng.normal(0, 0.0002, 200))),
+        'GBPUSD': 1.3 * np.exp(np.cumsum(common + rng.normal(0, 0.0002, 200))),
+    }
+    monitor = RiskMonitor()
+    monitor.mt5 = FakeConnection(closes)
+    monitor.send_alert = lambda *args, **kwargs: None
+    return monitor
+
+def test_poll_events_seeds_and_updates_correlation_matrix(monkeypatch):
+    monitor = make_monitor(monkeypatch)
+    monitor.poll_events()
+
+    # Semilla: la ventana de barras cerradas de ambos símbolos
+    matrix = monitor.correlation_matrix
+    assert matrix.count == 58 and matrix.has_data('EURUSD') and matrix.has_data('GBPUSD')
+    assert matrix.correlation('EURUSD', 'GBPUSD') > 0.9
+    assert monitor.checks['correlation']['method'] == 'matrix'
+
+    # Nueva barra cerrada: una fila más vía on_bar_close, sin reconstruir
+    monitor.mt5.advance()
+    monitor.poll_bars(force=True)
+    assert monitor.correlation_matrix is matrix and matrix.count == 59
+
+    # Sin barras nuevas no cambia nada
+    monitor.poll_bars(force=True)
+    assert matrix.count == 59
+
+def test_price_updates_dispatched_only_on_change(monkeypatch):
+    monitor = make_monitor(monkeypatch)
+    monitor.poll_events()
+    assert set(monitor.prices) == {'EURUSD', 'GBPUSD'}
+
+    reports = monitor.poll_prices()
+    assert reports == []
+
+    monitor.mt5.advance()
+    reports = monitor.poll_prices()
+    assert [r['trigger'] for r in reports] == ['price:EURUSD', 'price:GBPUSD']
+    assert monitor.prices['EURUSD'] == monitor.mt5.closes['EURUSD'][monitor.mt5.bars - 1]